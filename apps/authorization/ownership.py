@@ -0,0 +1,112 @@
+"""
+The check that FHIR data from BFD belongs to the token's beneficiary.
+
+validate_ownership walks a resource, or a Bundle and the Bundles nested in it, once, with a stack of
+entry iterators rather than recursion, and tells which beneficiary each resource is for from its type:
+
+- Coverage: ``beneficiary.reference``
+- ExplanationOfBenefit: ``patient.reference``
+- Patient: ``id``
+- AuditEvent: ``entity[0].what.reference``
+
+It stops at the first resource that is not for the beneficiary, a MISMATCH, and returns the index of the
+Bundle entry it was in. Resources of other types are a MISMATCH, the API never returns them.
+
+As with the recursive check the permission classes used before, a resource it cannot tell the
+beneficiary of is MALFORMED when it is ``obj`` itself and is skipped when it is in a Bundle, and a Bundle
+with malformed entries is MALFORMED when it is ``obj`` and the rest of it is skipped when it is nested.
+"""
+
+from typing import NamedTuple, Optional
+
+OK = 'ok'
+MISMATCH = 'mismatch'
+MALFORMED = 'malformed'
+
+
+class Ownership(NamedTuple):
+    status: str
+    # Index of the top level Bundle entry the first resource that failed is in, None for a resource
+    index: Optional[int] = None
+    resource_type: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+
+OWNED = Ownership(OK)
+
+
+def reference_id(reference) -> str:
+    """The id of a ``Patient/<id>`` reference, as ``reference.split('/')[1]``"""
+    resource_type, sep, rest = reference.partition('/')
+    if not sep:
+        raise ValueError(reference)
+    return rest.partition('/')[0]
+
+
+def validate_ownership(obj, patient_id: str) -> Ownership:
+    """Check that ``obj`` and every resource in it are for the beneficiary ``patient_id``"""
+    owner_reference = f'Patient/{patient_id}'
+    # An iterator over the Bundle entries being checked at each level, the first is over ``obj``
+    levels = [enumerate(({'resource': obj},))]
+    index = None
+    while levels:
+        depth = len(levels)
+        try:
+            for position, entry in levels[-1]:
+                if depth == 2:
+                    index = position
+                resource = entry['resource']
+                resource_type = None
+                try:
+                    resource_type = resource['resourceType']
+                    if resource_type == 'ExplanationOfBenefit':
+                        reference = resource['patient']['reference']
+                    elif resource_type == 'Coverage':
+                        reference = resource['beneficiary']['reference']
+                    elif resource_type == 'Patient':
+                        if resource['id'] != patient_id:
+                            return Ownership(MISMATCH, index, resource_type)
+                        continue
+                    elif resource_type == 'Bundle':
+                        levels.append(enumerate(resource.get('entry', [])))
+                        break
+                    elif resource_type == 'AuditEvent':
+                        reference = resource.get('entity', [{}])[0].get('what', {}).get('reference', '')
+                    else:
+                        return Ownership(MISMATCH, index, resource_type)
+
+                    if reference != owner_reference and reference_id(reference) != patient_id:
+                        return Ownership(MISMATCH, index, resource_type)
+                except (KeyError, TypeError, IndexError, AttributeError, ValueError):
+                    if depth == 1:
+                        return Ownership(MALFORMED, index, resource_type)
+                    # A resource in a Bundle that has no beneficiary to tell is skipped
+            else:
+                levels.pop()
+        except (KeyError, TypeError):
+            # The Bundle's entries are malformed, the rest of that Bundle is skipped unless it is ``obj``
+            if depth == 2:
+                return Ownership(MALFORMED, index)
+            levels.pop()
+
+    return OWNED
+
+
+def check_ownership(request, obj, patient_id: str, resource_type: Optional[str] = None) -> Ownership:
+    """
+    validate_ownership, remembered on the request for the last object checked, so that the permission
+    classes of a view that each check ``obj`` walk it once. With ``resource_type``, a resource of another
+    type is a MISMATCH.
+    """
+    if resource_type is not None and isinstance(obj, dict) and obj.get('resourceType', resource_type) != resource_type:
+        return Ownership(MISMATCH, None, obj['resourceType'])
+
+    checked = getattr(request, '_ownership', None)
+    if checked is not None and checked[0] is obj and checked[1] == patient_id:
+        return checked[2]
+    result = validate_ownership(obj, patient_id)
+    request._ownership = (obj, patient_id, result)
+    return result
@@ -1,7 +1,8 @@
 from rest_framework import exceptions, permissions
 
-from apps.authorization.models import DataAccessGrant
+from apps.authorization.ownership import MISMATCH, check_ownership, validate_ownership
 from apps.constants import APPLICATION_THIRTEEN_MONTH_DATA_ACCESS_EXPIRED_MESG
+from apps.dot_ext.auth_context import get_auth_context
 from apps.versions import VersionNotMatched, Versions
 
 
@@ -11,11 +12,8 @@ class DataAccessGrantPermission(permissions.BasePermission):
     """
 
     def has_permission(self, request, view) -> bool:  # type: ignore
-        dag = None
-        try:
-            dag = DataAccessGrant.objects.get(beneficiary=request.auth.user, application=request.auth.application)
-        except DataAccessGrant.DoesNotExist:
-            return False
+        context = get_auth_context(request, request.auth)
+        dag = context.grant if context else None
 
         if dag:
             if dag.has_expired():
@@ -35,42 +33,20 @@ class DataAccessGrantPermission(permissions.BasePermission):
             # it specially here. We're going to gate it to v3 as well.
             if view.version == Versions.V3 and 'generate-insurance-card' in request.path:
                 return True
-            return is_resource_for_patient(obj, request.crosswalk.fhir_id(view.version))
+            result = check_ownership(request, obj, request.crosswalk.fhir_id(view.version))
+            if result.status == MISMATCH:
+                raise exceptions.NotFound()
+            return result.ok
         else:
             raise VersionNotMatched()
 
 
 def is_resource_for_patient(obj, patient_id):
-    try:
-        if obj['resourceType'] == 'Coverage':
-            reference = obj['beneficiary']['reference']
-            reference_id = reference.split('/')[1]
-            if reference_id != patient_id:
-                raise exceptions.NotFound()
-        elif obj['resourceType'] == 'ExplanationOfBenefit':
-            reference = obj['patient']['reference']
-            reference_id = reference.split('/')[1]
-            if reference_id != patient_id:
-                raise exceptions.NotFound()
-        elif obj['resourceType'] == 'Patient':
-            reference_id = obj['id']
-            if reference_id != patient_id:
-                raise exceptions.NotFound()
-        elif obj['resourceType'] == 'Bundle':
-            for entry in obj.get('entry', []):
-                is_resource_for_patient(entry['resource'], patient_id)
-        elif obj['resourceType'] == 'AuditEvent':
-            entity = obj.get('entity', [{}])
-            patient_info = entity[0].get('what', {})
-            reference = patient_info.get('reference', '')
-            reference_id = reference.split('/')[1]
-            if reference_id != patient_id:
-                raise exceptions.NotFound()
-        else:
-            raise exceptions.NotFound()
-
-    except exceptions.NotFound:
-        raise
-    except Exception:
-        return False
-    return True
+    """
+    Whether ``obj`` is for the beneficiary ``patient_id``, raising NotFound when it is for someone else,
+    to avoid telling an unauthorized user that the object exists
+    """
+    result = validate_ownership(obj, patient_id)
+    if result.status == MISMATCH:
+        raise exceptions.NotFound()
+    return result.ok
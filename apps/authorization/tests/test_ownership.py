@@ -0,0 +1,167 @@
+import random
+
+from django.test import SimpleTestCase
+from rest_framework import exceptions
+
+from apps.authorization.ownership import MALFORMED, MISMATCH, OK, Ownership, check_ownership, validate_ownership
+from apps.authorization.permissions import is_resource_for_patient
+
+PATIENT_ID = '-20140000008325'
+OTHER_ID = '-20140000008326'
+
+
+def resource(resource_type, patient_id=PATIENT_ID):
+    if resource_type == 'Coverage':
+        return {'resourceType': 'Coverage', 'id': 'part-a', 'beneficiary': {'reference': f'Patient/{patient_id}'}}
+    if resource_type == 'ExplanationOfBenefit':
+        return {
+            'resourceType': 'ExplanationOfBenefit',
+            'id': 'carrier',
+            'patient': {'reference': f'Patient/{patient_id}'},
+        }
+    if resource_type == 'AuditEvent':
+        return {'resourceType': 'AuditEvent', 'entity': [{'what': {'reference': f'Patient/{patient_id}'}}]}
+    return {'resourceType': 'Patient', 'id': patient_id}
+
+
+def bundle(*resources):
+    return {'resourceType': 'Bundle', 'entry': [{'resource': r} for r in resources]}
+
+
+MALFORMED_RESOURCES = [
+    {},
+    [],
+    {'resourceType': 'Coverage'},
+    {'resourceType': 'Coverage', 'beneficiary': {'reference': PATIENT_ID}},
+    {'resourceType': 'ExplanationOfBenefit', 'patient': {'reference': None}},
+    {'resourceType': 'Patient'},
+    {'resourceType': 'AuditEvent', 'entity': []},
+    {'resourceType': 'AuditEvent'},
+    {'resourceType': 'Bundle', 'entry': [{}]},
+    {'resourceType': 'Bundle', 'entry': None},
+]
+
+
+def random_resource(rng, depth=0):
+    """A random resource, Bundle or malformed resource"""
+    choice = rng.random()
+    if choice < 0.15 and depth < 3:
+        return bundle(*[random_resource(rng, depth + 1) for _ in range(rng.randrange(6))])
+    if choice < 0.2:
+        return rng.choice(MALFORMED_RESOURCES)
+    resource_type = rng.choice(['Coverage', 'ExplanationOfBenefit', 'Patient', 'AuditEvent'])
+    return resource(resource_type, PATIENT_ID if rng.random() < 0.8 else OTHER_ID)
+
+
+def recursive_check(obj, patient_id):
+    """The recursive check the permission classes used before, True, False or raises NotFound"""
+    try:
+        if obj['resourceType'] == 'Coverage':
+            if obj['beneficiary']['reference'].split('/')[1] != patient_id:
+                raise exceptions.NotFound()
+        elif obj['resourceType'] == 'ExplanationOfBenefit':
+            if obj['patient']['reference'].split('/')[1] != patient_id:
+                raise exceptions.NotFound()
+        elif obj['resourceType'] == 'Patient':
+            if obj['id'] != patient_id:
+                raise exceptions.NotFound()
+        elif obj['resourceType'] == 'Bundle':
+            for entry in obj.get('entry', []):
+                recursive_check(entry['resource'], patient_id)
+        elif obj['resourceType'] == 'AuditEvent':
+            reference = obj.get('entity', [{}])[0].get('what', {}).get('reference', '')
+            if reference.split('/')[1] != patient_id:
+                raise exceptions.NotFound()
+        else:
+            raise exceptions.NotFound()
+    except exceptions.NotFound:
+        raise
+    except Exception:
+        return False
+    return True
+
+
+def recursive_status(obj, patient_id):
+    try:
+        return OK if recursive_check(obj, patient_id) else MALFORMED
+    except exceptions.NotFound:
+        return MISMATCH
+
+
+class TestOwnership(SimpleTestCase):
+    def test_resources(self):
+        for resource_type in ['Coverage', 'ExplanationOfBenefit', 'Patient', 'AuditEvent']:
+            with self.subTest(resource_type):
+                self.assertEqual(validate_ownership(resource(resource_type), PATIENT_ID), Ownership(OK))
+                self.assertEqual(
+                    validate_ownership(resource(resource_type, OTHER_ID), PATIENT_ID),
+                    Ownership(MISMATCH, None, resource_type),
+                )
+        self.assertEqual(
+            validate_ownership({'resourceType': 'Observation'}, PATIENT_ID), Ownership(MISMATCH, None, 'Observation')
+        )
+        self.assertTrue(validate_ownership(bundle(), PATIENT_ID).ok)
+        self.assertTrue(validate_ownership({'resourceType': 'Bundle'}, PATIENT_ID).ok)
+        coverage = {'resourceType': 'Coverage', 'beneficiary': {'reference': f'Patient/{PATIENT_ID}/_history/1'}}
+        self.assertTrue(validate_ownership(coverage, PATIENT_ID).ok)
+
+        for obj in MALFORMED_RESOURCES:
+            with self.subTest(obj):
+                self.assertEqual(validate_ownership(obj, PATIENT_ID).status, MALFORMED)
+
+    def test_bundles(self):
+        nested = bundle(resource('Patient'), bundle(resource('Coverage'), resource('Coverage', OTHER_ID)))
+        self.assertEqual(validate_ownership(nested, PATIENT_ID), Ownership(MISMATCH, 1, 'Coverage'))
+
+        # A resource in a Bundle that has no beneficiary to tell is skipped
+        self.assertEqual(
+            validate_ownership(bundle(resource('Patient'), {}, resource('Patient', OTHER_ID)), PATIENT_ID),
+            Ownership(MISMATCH, 2, 'Patient'),
+        )
+        eob = {'resourceType': 'ExplanationOfBenefit', 'id': 'carrier'}
+        self.assertTrue(validate_ownership(bundle(eob, resource('Coverage')), PATIENT_ID).ok)
+
+        # The rest of a nested Bundle with malformed entries is skipped, not the Bundle it is in
+        nested = bundle(
+            {'resourceType': 'Bundle', 'entry': [{}, {'resource': resource('Patient', OTHER_ID)}]},
+            resource('Coverage', OTHER_ID),
+        )
+        self.assertEqual(validate_ownership(nested, PATIENT_ID), Ownership(MISMATCH, 1, 'Coverage'))
+        self.assertEqual(validate_ownership(nested['entry'][0]['resource'], PATIENT_ID), Ownership(MALFORMED, 0))
+
+        with self.assertRaises(exceptions.NotFound):
+            is_resource_for_patient(resource('Patient', OTHER_ID), PATIENT_ID)
+        self.assertFalse(is_resource_for_patient({'resourceType': 'Coverage'}, PATIENT_ID))
+        self.assertTrue(is_resource_for_patient(bundle({'resourceType': 'Coverage'}), PATIENT_ID))
+
+    def test_random_resources(self):
+        rng = random.Random(4252)
+        for _ in range(2000):
+            obj = random_resource(rng)
+            result = validate_ownership(obj, PATIENT_ID)
+            self.assertEqual(result.status, recursive_status(obj, PATIENT_ID), obj)
+
+            # In a Bundle, with owned entries around it, only a mismatch fails it
+            padded = validate_ownership(bundle(resource('Patient'), obj, resource('Coverage')), PATIENT_ID)
+            if result.status == MISMATCH:
+                self.assertEqual(padded[:2], (MISMATCH, 1), obj)
+            else:
+                self.assertTrue(padded.ok, obj)
+
+    def test_check_ownership(self):
+        class Request:
+            pass
+
+        request = Request()
+        obj = bundle(resource('Coverage'))
+        self.assertTrue(check_ownership(request, obj, PATIENT_ID).ok)
+        obj['entry'].append({'resource': resource('Coverage', OTHER_ID)})
+        # Remembered for the same object
+        self.assertTrue(check_ownership(request, obj, PATIENT_ID).ok)
+        self.assertFalse(check_ownership(request, dict(obj), PATIENT_ID).ok)
+
+        self.assertEqual(
+            check_ownership(request, resource('Patient'), PATIENT_ID, 'Coverage'),
+            Ownership(MISMATCH, None, 'Patient'),
+        )
+        self.assertTrue(check_ownership(request, resource('Coverage'), PATIENT_ID, 'Coverage').ok)
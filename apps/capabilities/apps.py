@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CapabilitiesConfig(AppConfig):
+    name = 'apps.capabilities'
+    label = 'capabilities'
+
+    def ready(self):
+        from . import signals  # noqa
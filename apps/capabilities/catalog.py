@@ -0,0 +1,188 @@
+"""
+In-memory catalog of the protected capabilities and of the capabilities of each application.
+
+CapabilitiesScopes queried ProtectedCapability on every authorize page, token issuance and refresh
+token scope check, and AuthContext.capabilities queried the capabilities of the application on every
+v3 FHIR request checked by AppScopePermission. The catalog loads all capabilities and the links between
+applications and capabilities with two queries, into:
+
+- the slug -> title map of all capabilities,
+- the slugs of the default capabilities,
+- the slugs of the capabilities of each application, and those available to it (its own and the
+  default ones),
+- the resource and permissions of each SMART scope (e.g. patient/Patient.rs), so checking that a
+  scope is a subscope of another compares them without splitting the strings again.
+
+Slugs are kept in the order the capabilities were created. The catalog is built on first use.
+Saving or deleting a ProtectedCapability, deleting an Application or changing the capabilities of an
+application drops the catalog of this process and writes a new version to the default cache, again
+once the transaction is committed (see apps.capabilities.signals). Other processes read the version at
+most every SCOPE_CATALOG_VERSION_INTERVAL seconds and rebuild their catalog when it changed. The
+catalog is also rebuilt SCOPE_CATALOG_MAX_AGE seconds after it was built, for rows changed without the
+models' signals.
+"""
+
+import threading
+import time
+import uuid
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+from oauth2_provider.models import get_application_model
+
+from apps.capabilities.models import ProtectedCapability
+
+# Seconds before the catalog is rebuilt, for rows changed without the models' signals
+SCOPE_CATALOG_MAX_AGE = 300
+# Least seconds between two reads of the version other processes write when a capability changes
+SCOPE_CATALOG_VERSION_INTERVAL = 5
+SCOPE_CATALOG_VERSION_KEY = 'scope-catalog:version'
+
+
+class SmartScope(NamedTuple):
+    """A scope split at its last dot, patient/Patient.rs is ('patient/Patient', {'r', 's'})"""
+
+    resource: str
+    permissions: FrozenSet[str]
+
+
+def split_smart_scope(scope: str) -> Optional[SmartScope]:
+    """The resource and permissions of ``scope``, None when it has no dot"""
+    resource, dot, permissions = scope.rpartition('.')
+    if not dot:
+        return None
+    return SmartScope(resource, frozenset(permissions))
+
+
+class Catalog(NamedTuple):
+    titles: Dict[str, str]
+    defaults: Tuple[str, ...]
+    # application id -> slugs, only for applications with capabilities of their own
+    by_application: Dict[int, Tuple[str, ...]]
+    available: Dict[int, Tuple[str, ...]]
+    smart_scopes: Dict[str, Optional[SmartScope]]
+
+
+def build_catalog() -> Catalog:
+    capabilities = list(ProtectedCapability.objects.order_by('id').values_list('id', 'slug', 'title', 'default'))
+    links = get_application_model().scope.through.objects.values_list('application_id', 'protectedcapability_id')
+
+    slugs = {pk: slug for pk, slug, _, _ in capabilities}
+    # Order in which each slug is listed
+    positions = {slug: position for position, (_, slug, _, _) in enumerate(capabilities)}
+    defaults = tuple(slug for _, slug, _, default in capabilities if default)
+
+    own = {}
+    for application_id, capability_id in links:
+        own.setdefault(application_id, set()).add(slugs[capability_id])
+
+    return Catalog(
+        titles={slug: title for _, slug, title, _ in capabilities},
+        defaults=defaults,
+        by_application={pk: tuple(sorted(scopes, key=positions.get)) for pk, scopes in own.items()},
+        available={pk: tuple(sorted(scopes.union(defaults), key=positions.get)) for pk, scopes in own.items()},
+        smart_scopes={slug: split_smart_scope(slug) for slug in positions},
+    )
+
+
+class ScopeCatalog:
+    """Thread-safe catalog of all protected capabilities and the applications they are given to"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._built_at = 0
+        self._builds = 0
+        self._invalidations = 0
+        self._version = None
+        self._version_read_at = None
+
+    def get(self) -> Catalog:
+        self._read_version()
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._built_at < SCOPE_CATALOG_MAX_AGE:
+            return catalog
+
+        with self._lock:
+            if self._catalog is None or time.monotonic() - self._built_at >= SCOPE_CATALOG_MAX_AGE:
+                self._catalog = build_catalog()
+                self._built_at = time.monotonic()
+                self._builds += 1
+            return self._catalog
+
+    def _read_version(self) -> None:
+        now = time.monotonic()
+        if self._version_read_at is not None and now - self._version_read_at < SCOPE_CATALOG_VERSION_INTERVAL:
+            return
+        version = cache.get(SCOPE_CATALOG_VERSION_KEY)
+        with self._lock:
+            if version != self._version:
+                self._catalog = None
+                self._version = version
+            self._version_read_at = now
+
+    def titles(self) -> Dict[str, str]:
+        """slug -> title of all capabilities"""
+        return dict(self.get().titles)
+
+    def default_scopes(self) -> List[str]:
+        return list(self.get().defaults)
+
+    def application_scopes(self, application_id: int) -> List[str]:
+        """Slugs of the capabilities of the application"""
+        return list(self.get().by_application.get(application_id, ()))
+
+    def available_scopes(self, application_id: int) -> List[str]:
+        """Slugs of the default capabilities and the capabilities of the application"""
+        catalog = self.get()
+        return list(catalog.available.get(application_id, catalog.defaults))
+
+    def is_smart_subscope(self, requested: str, scopes: List[str]) -> bool:
+        """Whether ``requested`` is one of ``scopes`` or asks for the resource of one of them with some of
+        its permissions, like patient/Patient.r of patient/Patient.rs"""
+        if requested in scopes:
+            return True
+
+        smart_scopes = self.get().smart_scopes
+        wanted = smart_scopes[requested] if requested in smart_scopes else split_smart_scope(requested)
+        if wanted is None:
+            return False
+        for scope in scopes:
+            granted = smart_scopes[scope] if scope in smart_scopes else split_smart_scope(scope)
+            if (
+                granted is not None
+                and granted.resource == wanted.resource
+                and wanted.permissions <= granted.permissions
+            ):
+                return True
+        return False
+
+    def invalidate(self) -> None:
+        """Drops the catalog of this process after a capability or the capabilities of an application
+        changed, and has the other processes drop theirs"""
+        version = uuid.uuid4().hex
+        cache.set(SCOPE_CATALOG_VERSION_KEY, version, None)
+        with self._lock:
+            self._catalog = None
+            self._version = version
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._catalog = None
+            self._version_read_at = None
+            self._builds = 0
+            self._invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            catalog = self._catalog
+            return {
+                'builds': self._builds,
+                'invalidations': self._invalidations,
+                'scopes': len(catalog.titles) if catalog else 0,
+                'applications': len(catalog.by_application) if catalog else 0,
+            }
+
+
+scope_catalog = ScopeCatalog()
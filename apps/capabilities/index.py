@@ -0,0 +1,125 @@
+"""
+In-memory index of the routes each scope gives access to.
+
+TokenHasProtectedCapability used to load the ProtectedCapability rows of the token's scopes on every
+request, decode their protected_resources and try each pattern in turn. The index maps every scope slug
+to the HTTP methods it allows and, for each method, the literal paths and a single compiled regex
+combining its patterns, so the check is a dict lookup and one match per scope. Patterns that can't be
+combined into one regex are matched one by one.
+
+It is built on first use and rebuilt when a ProtectedCapability is saved or deleted in this process (see
+apps.capabilities.signals). Other processes pick changes up within SCOPE_INDEX_MAX_AGE seconds.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, List, NamedTuple, Pattern, Tuple
+
+from apps.capabilities.models import ProtectedCapability
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+# Seconds before the index is rebuilt, for changes made by other processes
+SCOPE_INDEX_MAX_AGE = 60
+
+
+class Routes(NamedTuple):
+    paths: FrozenSet[str]
+    # The patterns combined into one, or each of them when they can't be combined
+    patterns: Tuple[Pattern, ...]
+
+    def match(self, path: str) -> bool:
+        return path in self.paths or any(pattern.fullmatch(path) is not None for pattern in self.patterns)
+
+
+def combine_patterns(slug: str, patterns: List[str]) -> Tuple[Pattern, ...]:
+    """One regex matching any of ``patterns``, or each of them compiled on its own when they can't be
+    combined, like patterns using the same group name or with inline global flags"""
+    if not patterns:
+        return ()
+    try:
+        return (re.compile('|'.join(f'(?:{p})' for p in patterns)),)
+    except re.error as e:
+        logger.warning(f'Matching the patterns of scope {slug} one by one, they cannot be combined: {e}')
+        return tuple(re.compile(p) for p in patterns)
+
+
+def compile_routes(slug: str, protected_resources: str) -> Dict[str, Routes]:
+    """Map each method of a protected_resources JSON list to its Routes"""
+    try:
+        resources = json.loads(protected_resources)
+    except ValueError:
+        logger.warning(f'Ignoring the protected resources of scope {slug}, they are not valid JSON')
+        return {}
+
+    by_method = {}
+    for resource in resources:
+        if len(resource) != 2:
+            logger.warning(f'Ignoring malformed protected resource {resource!r} of scope {slug}')
+            continue
+        method, path = resource
+        paths, patterns = by_method.setdefault(method, (set(), []))
+        paths.add(path)
+        try:
+            re.compile(path)
+        except re.error:
+            logger.warning(f'Only matching the invalid pattern {path!r} of scope {slug} literally')
+            continue
+        patterns.append(path)
+
+    return {
+        method: Routes(frozenset(paths), combine_patterns(slug, patterns))
+        for method, (paths, patterns) in by_method.items()
+    }
+
+
+class ScopeRouteIndex:
+    """Thread-safe slug -> method -> Routes map of all protected capabilities"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._built_at = 0
+        self._builds = 0
+
+    def get(self) -> Dict[str, Dict[str, Routes]]:
+        index = self._index
+        if index is not None and time.monotonic() - self._built_at < SCOPE_INDEX_MAX_AGE:
+            return index
+
+        with self._lock:
+            if self._index is None or time.monotonic() - self._built_at >= SCOPE_INDEX_MAX_AGE:
+                self._index = {
+                    slug: compile_routes(slug, protected_resources)
+                    for slug, protected_resources in ProtectedCapability.objects.values_list(
+                        'slug', 'protected_resources'
+                    )
+                }
+                self._built_at = time.monotonic()
+                self._builds += 1
+            return self._index
+
+    def allows(self, scopes, method: str, path: str) -> bool:
+        """Whether any of ``scopes`` gives access to ``path`` with ``method``"""
+        index = self.get()
+        for scope in scopes:
+            routes = index.get(scope, {}).get(method)
+            if routes is not None and routes.match(path):
+                return True
+        return False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+            self._builds = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'builds': self._builds, 'scopes': len(self._index or {})}
+
+
+scope_routes = ScopeRouteIndex()
@@ -1,11 +1,8 @@
-import json
-import re
-
 from rest_framework import permissions, status
 from rest_framework.exceptions import APIException, ParseError
 from waffle import switch_is_active
 
-from apps.capabilities.models import ProtectedCapability
+from apps.capabilities.index import scope_routes
 
 
 class BBCapabilitiesPermissionTokenScopeMissingException(APIException):
@@ -30,25 +27,7 @@ class TokenHasProtectedCapability(permissions.BasePermission):
             return True
 
         if hasattr(token, 'scope'):  # OAuth 2
-            token_scopes = token.scope.split()
-
-            protected_resources = list(
-                ProtectedCapability.objects.filter(slug__in=token_scopes)
-                .values_list('protected_resources', flat=True)
-                .all()
-            )
-
-            for protected_resource in protected_resources:
-                for method, path in json.loads(protected_resource):
-                    if method != request.method:
-                        continue
-                    if path == request.path:
-                        return True
-                    if re.fullmatch(path, request.path) is not None:
-                        return True
-
-            return False
-
+            return scope_routes.allows(token.scope.split(), request.method, request.path)
         else:
             # BB2-237: Replaces ASSERT with exception. We should never reach here.
             mesg = (
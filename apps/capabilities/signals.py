@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .catalog import scope_catalog
+from .index import scope_routes
+
+
+def clear_scope_routes(sender, **kwargs):
+    scope_routes.clear()
+
+
+def invalidate_scope_catalog(sender, using=None, **kwargs):
+    scope_catalog.invalidate()
+    if transaction.get_connection(using).in_atomic_block:
+        # Again once committed, a catalog of the rows as they were may be built in between
+        transaction.on_commit(scope_catalog.invalidate, using=using)
+
+
+def invalidate_changed_application_scopes(sender, action=None, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_scope_catalog(sender, **kwargs)
+
+
+post_save.connect(clear_scope_routes, sender='capabilities.ProtectedCapability')
+post_delete.connect(clear_scope_routes, sender='capabilities.ProtectedCapability')
+
+post_save.connect(invalidate_scope_catalog, sender='capabilities.ProtectedCapability')
+post_delete.connect(invalidate_scope_catalog, sender='capabilities.ProtectedCapability')
+# Deleting an application drops its capabilities without m2m_changed
+post_delete.connect(invalidate_scope_catalog, sender='dot_ext.Application')
+m2m_changed.connect(invalidate_changed_application_scopes, sender='dot_ext.Application_scope')
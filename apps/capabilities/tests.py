@@ -4,6 +4,7 @@ from django.contrib.auth.models import Group
 from django.test import TestCase
 from waffle.testutils import override_switch
 
+from apps.capabilities.index import compile_routes, scope_routes
 from apps.capabilities.models import ProtectedCapability
 from apps.capabilities.permissions import (
     BBCapabilitiesPermissionTokenScopeMissingException,
@@ -128,3 +129,71 @@ class TestTokenHasProtectedCapabilityScopesSwitchFalse(TestCase):
         perm = TokenHasProtectedCapability()
         # Note that this is allowed with the scopes switch False/Off
         self.assertTrue(perm.has_permission(request, None))
+
+
+class TestScopeRouteIndex(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='test')
+        self.capability = ProtectedCapability.objects.create(
+            title='patient',
+            slug='patient/Patient.read',
+            group=self.group,
+            protected_resources=json.dumps(
+                [['GET', '/v[23]/fhir/Patient[/?].*$'], ['GET', '/v[23]/fhir/Patient[/]?$']]
+            ),
+        )
+        scope_routes.clear()
+        self.addCleanup(scope_routes.clear)
+
+    def test_compile_routes(self):
+        routes = compile_routes(
+            'scope', json.dumps([['GET', '/a/[0-9]+'], ['GET', '/b'], ['POST', '/c'], ['GET', '/d/(']])
+        )
+
+        self.assertEqual(set(routes), {'GET', 'POST'})
+        self.assertTrue(routes['GET'].match('/a/12'))
+        self.assertTrue(routes['GET'].match('/b'))
+        self.assertFalse(routes['GET'].match('/a/12/b'))
+        self.assertFalse(routes['GET'].match('/c'))
+        # Invalid patterns still match literally, and don't spoil the others
+        self.assertTrue(routes['GET'].match('/d/('))
+        self.assertEqual(compile_routes('scope', json.dumps([["GET', '/some-url"]])), {})
+        self.assertEqual(compile_routes('scope', 'not json'), {})
+
+    def test_compile_routes_that_cannot_be_combined(self):
+        # Valid on their own, but not in one regex
+        routes = compile_routes(
+            'scope',
+            json.dumps(
+                [
+                    ['GET', '/a/(?P<id>[0-9]+)'],
+                    ['GET', '/b/(?P<id>[a-z]+)'],
+                    ['GET', '(?i)/c'],
+                ]
+            ),
+        )
+
+        self.assertEqual(len(routes['GET'].patterns), 3)
+        self.assertTrue(routes['GET'].match('/a/12'))
+        self.assertTrue(routes['GET'].match('/b/xy'))
+        self.assertTrue(routes['GET'].match('/C'))
+        self.assertFalse(routes['GET'].match('/a/xy'))
+
+    def test_allows(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(scope_routes.allows(['openid', 'patient/Patient.read'], 'GET', '/v2/fhir/Patient/-1'))
+            self.assertTrue(scope_routes.allows(['patient/Patient.read'], 'GET', '/v3/fhir/Patient'))
+            self.assertFalse(scope_routes.allows(['patient/Patient.read'], 'POST', '/v2/fhir/Patient/-1'))
+            self.assertFalse(scope_routes.allows(['patient/Patient.read'], 'GET', '/v2/fhir/Coverage/'))
+            self.assertFalse(scope_routes.allows([], 'GET', '/v2/fhir/Patient/-1'))
+
+    def test_rebuilt_when_capabilities_change(self):
+        self.assertFalse(scope_routes.allows(['patient/Patient.read'], 'GET', '/v2/fhir/Coverage/'))
+
+        self.capability.protected_resources = json.dumps([['GET', '/v2/fhir/Coverage/']])
+        self.capability.save()
+        self.assertTrue(scope_routes.allows(['patient/Patient.read'], 'GET', '/v2/fhir/Coverage/'))
+
+        self.capability.delete()
+        self.assertFalse(scope_routes.allows(['patient/Patient.read'], 'GET', '/v2/fhir/Coverage/'))
+        self.assertEqual(scope_routes.stats(), {'builds': 1, 'scopes': 0})
@@ -0,0 +1,278 @@
+"""
+Two-tier cache backend.
+
+The default cache is a DatabaseCache, so every waffle flag and switch lookup is a SQL round trip.
+TwoTierCache keeps recently read values in a bounded in-process LRU (L1) in front of the shared
+backend (L2), picked per key prefix with a policy:
+
+    WRITE_THROUGH: reads are served from L1 for up to L1_TIMEOUT seconds, writes go to L2 and L1.
+    NEGATIVE:      WRITE_THROUGH, and keys missing from L2 are remembered as missing in L1 too.
+    BYPASS:        L1 is not used, for keys other processes have to see right away, like locks,
+                   rate limit state or the jti replay sentinels.
+
+Whatever the policy, add(), incr() and decr() are done by L2 alone, they are only atomic there, and
+L1 is updated from their result. A value changed through another process may be served from L1 for
+up to L1_TIMEOUT seconds.
+
+Select it with CACHE_BACKEND=apps.core.cache.TwoTierCache, the LOCATION, TIMEOUT, KEY_PREFIX and
+VERSION of the cache are the L2 backend's. The OPTIONS are:
+
+    L2_BACKEND:     the shared backend, a DatabaseCache by default
+    L2_OPTIONS:     the OPTIONS of the shared backend
+    L1_MAX_ENTRIES: keys kept in L1, the least recently used is dropped first
+    L1_TIMEOUT:     seconds a value is kept in L1
+    POLICIES:       {key prefix: policy}, the longest matching prefix wins
+    DEFAULT_POLICY: the policy of the keys no prefix matches, BYPASS by default
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+WRITE_THROUGH = 'write-through'
+NEGATIVE = 'negative'
+BYPASS = 'bypass'
+
+DEFAULT_L2_BACKEND = 'django.core.cache.backends.db.DatabaseCache'
+DEFAULT_L1_MAX_ENTRIES = 1000
+DEFAULT_L1_TIMEOUT = 10
+DEFAULT_POLICIES = {
+    # waffle.models caches flags, switches and samples, and CACHE_EMPTY for the ones that do not exist
+    'waffle:': NEGATIVE,
+    # apps.fhir.server.singleflight locks
+    'bfd-flight:': BYPASS,
+    # apps.dot_ext.throttling.CacheStore
+    'throttle_': BYPASS,
+}
+
+# Stored in L1 for keys known to be missing from L2
+_MISSING = object()
+# Returned for keys L1 does not have
+_ABSENT = object()
+
+
+class LocalLRU:
+    """Thread-safe LRU of pickled values that expire after their own timeout, with lookup counts"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._reset_after_fork()
+        self.counts = dict.fromkeys(('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses', 'bypassed'), 0)
+
+    def get(self, key):
+        """Returns the value, _MISSING for a negative entry, or _ABSENT"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _ABSENT
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return _ABSENT
+            self._entries.move_to_end(key)
+        return value if value is _MISSING else pickle.loads(value)
+
+    def set(self, key, value, timeout):
+        if value is not _MISSING:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counts, 'l1_entries': len(self._entries)}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.counts = dict.fromkeys(self.counts, 0)
+
+    def _reset_after_fork(self):
+        # The entries are inherited, a lock held by another thread of the parent would never be released
+        self._lock = threading.Lock()
+
+
+# Django creates a cache backend per thread, they share the L1 of their LOCATION
+_l1s = {}
+_l1s_lock = threading.Lock()
+
+
+def get_l1(location, max_entries):
+    with _l1s_lock:
+        if location not in _l1s:
+            _l1s[location] = LocalLRU(max_entries)
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=_l1s[location]._reset_after_fork)
+        return _l1s[location]
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        l2_backend = import_string(options.pop('L2_BACKEND', DEFAULT_L2_BACKEND))
+        self.l2 = l2_backend(location, {**params, 'OPTIONS': options.pop('L2_OPTIONS', {})})
+        super().__init__({**params, 'OPTIONS': {}})
+
+        self.l1 = get_l1(location, options.get('L1_MAX_ENTRIES', DEFAULT_L1_MAX_ENTRIES))
+        self.l1_timeout = options.get('L1_TIMEOUT', DEFAULT_L1_TIMEOUT)
+        self.default_policy = options.get('DEFAULT_POLICY', BYPASS)
+        # Longest prefixes first
+        self.policies = sorted(options.get('POLICIES', DEFAULT_POLICIES).items(), key=lambda p: -len(p[0]))
+        for prefix, policy in self.policies + [('', self.default_policy)]:
+            if policy not in (WRITE_THROUGH, NEGATIVE, BYPASS):
+                raise ValueError(f'Unknown cache policy {policy!r} for the key prefix {prefix!r}')
+
+    def policy(self, key):
+        for prefix, policy in self.policies:
+            if key.startswith(prefix):
+                return policy
+        return self.default_policy
+
+    def _l1_timeout(self, timeout):
+        """Seconds to keep a value written with ``timeout`` in L1, 0 when it is not kept"""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return max(min(timeout, self.l1_timeout), 0)
+
+    def _remember(self, key, version, value, timeout=DEFAULT_TIMEOUT):
+        l1_key = self.make_and_validate_key(key, version=version)
+        l1_timeout = self._l1_timeout(timeout)
+        if l1_timeout > 0:
+            self.l1.set(l1_key, value, l1_timeout)
+        else:
+            self.l1.delete(l1_key)
+
+    def _forget(self, key, version):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+
+    def get(self, key, default=None, version=None):
+        policy = self.policy(key)
+        if policy == BYPASS:
+            self.l1.count('bypassed')
+            return self.l2.get(key, default, version=version)
+
+        value = self.l1.get(self.make_and_validate_key(key, version=version))
+        if value is not _ABSENT:
+            self.l1.count('l1_hits')
+            return default if value is _MISSING else value
+
+        self.l1.count('l1_misses')
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.l1.count('l2_misses')
+            if policy == NEGATIVE:
+                self._remember(key, version, _MISSING)
+            return default
+        self.l1.count('l2_hits')
+        self._remember(key, version, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        bypassed = []
+        for key in keys:
+            if self.policy(key) == BYPASS:
+                bypassed.append(key)
+                continue
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                found[key] = value
+        if bypassed:
+            self.l1.count('bypassed', len(bypassed))
+            found.update(self.l2.get_many(bypassed, version=version))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        if self.policy(key) == BYPASS:
+            return
+        self._remember(key, version, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if self.policy(key) == BYPASS:
+                continue
+            if key in failed:
+                self._forget(key, version)
+            else:
+                self._remember(key, version, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if self.policy(key) == BYPASS:
+            return added
+        if added:
+            self._remember(key, version, value, timeout)
+        else:
+            # The value L2 has is not known, and a negative entry is wrong
+            self._forget(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.l2.touch(key, timeout, version=version)
+        if self.policy(key) != BYPASS and not touched:
+            self._forget(key, version)
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        try:
+            value = self.l2.incr(key, delta, version=version)
+        finally:
+            if self.policy(key) != BYPASS:
+                self._forget(key, version)
+        return value
+
+    def delete(self, key, version=None):
+        if self.policy(key) != BYPASS:
+            self._forget(key, version)
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            if self.policy(key) != BYPASS:
+                self._forget(key, version)
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def stats(self) -> dict:
+        """Counts of this process' lookups, and the share of them L1 answered"""
+        stats = self.l1.stats()
+        lookups = stats['l1_hits'] + stats['l1_misses']
+        return {**stats, 'l1_hit_ratio': round(stats['l1_hits'] / lookups, 4) if lookups else None}
+
+    def reset_stats(self) -> None:
+        self.l1.reset_stats()
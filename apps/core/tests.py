@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from waffle import switch_is_active
+from waffle.models import Switch
+
+from apps.core.cache import _l1s
+
+TWO_TIER_CACHES = {
+    'default': {
+        'BACKEND': 'apps.core.cache.TwoTierCache',
+        'LOCATION': 'two-tier-tests',
+        'OPTIONS': {
+            'L2_BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'L1_MAX_ENTRIES': 3,
+            'POLICIES': {'hot:': 'write-through', 'hot:negative:': 'negative', 'hot:lock:': 'bypass'},
+        },
+    },
+}
+
+
+@override_settings(CACHES=TWO_TIER_CACHES)
+class TestTwoTierCache(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+        self.cache.reset_stats()
+
+    def test_reads_are_served_from_l1(self):
+        self.cache.set('hot:a', {'value': 1})
+        with patch.object(self.cache.l2, 'get') as l2_get:
+            self.assertEqual(self.cache.get('hot:a'), {'value': 1})
+        l2_get.assert_not_called()
+
+        # Values are copies
+        self.cache.get('hot:a')['value'] = 2
+        self.assertEqual(self.cache.get('hot:a'), {'value': 1})
+
+        self.cache.l2.set('hot:b', 'b')
+        self.assertEqual(self.cache.get('hot:b'), 'b')
+        self.assertEqual(self.cache.get('hot:b'), 'b')
+        self.assertEqual(self.cache.get('hot:c', 'default'), 'default')
+        stats = self.cache.stats()
+        self.assertEqual((stats['l1_hits'], stats['l1_misses'], stats['l2_hits'], stats['l2_misses']), (4, 2, 1, 1))
+        self.assertEqual(stats['l1_hit_ratio'], 0.6667)
+
+    def test_bypassed_keys_are_always_read_from_l2(self):
+        for key in ('hot:lock:a', 'other'):
+            self.cache.set(key, 1)
+            self.cache.l2.set(key, 2)
+            self.assertEqual(self.cache.get(key), 2)
+            self.assertEqual(self.cache.get_many([key, 'hot:missing']), {key: 2})
+        self.assertEqual(self.cache.stats()['bypassed'], 4)
+
+    def test_negative_caching(self):
+        self.assertIsNone(self.cache.get('hot:negative:a'))
+        self.cache.l2.set('hot:negative:a', 1)
+        self.assertIsNone(self.cache.get('hot:negative:a'))
+        self.assertTrue(self.cache.add('hot:negative:b', 1) and not self.cache.add('hot:negative:b', 2))
+
+        # Without it, the next read goes to L2 again
+        self.assertIsNone(self.cache.get('hot:a'))
+        self.cache.l2.set('hot:a', 1)
+        self.assertEqual(self.cache.get('hot:a'), 1)
+
+        # A negative entry is replaced when the key is added
+        self.assertIsNone(self.cache.get('hot:negative:d'))
+        self.assertTrue(self.cache.add('hot:negative:d', 'd'))
+        self.assertEqual(self.cache.get('hot:negative:d'), 'd')
+
+    def test_add_and_incr_are_atomic_in_l2(self):
+        self.cache.set('hot:a', 1)
+        self.cache.l2.set('hot:a', 5)
+        self.assertFalse(self.cache.add('hot:a', 2))
+        # L1 does not know the value L2 kept
+        self.assertEqual(self.cache.get('hot:a'), 5)
+
+        self.assertEqual(self.cache.incr('hot:a'), 6)
+        self.cache.l2.set('hot:a', 10)
+        self.assertEqual(self.cache.decr('hot:a'), 9)
+        self.assertEqual(self.cache.get('hot:a'), 9)
+
+    def test_writes_and_deletes_go_through(self):
+        self.cache.set_many({'hot:a': 1, 'hot:b': 2, 'hot:lock:c': 3})
+        self.assertEqual(
+            self.cache.l2.get_many(['hot:a', 'hot:b', 'hot:lock:c']), {'hot:a': 1, 'hot:b': 2, 'hot:lock:c': 3}
+        )
+        self.assertEqual(
+            self.cache.get_many(['hot:a', 'hot:b', 'hot:lock:c', 'hot:d']), {'hot:a': 1, 'hot:b': 2, 'hot:lock:c': 3}
+        )
+
+        self.cache.delete('hot:a')
+        self.cache.delete_many(['hot:b'])
+        self.assertIsNone(self.cache.get('hot:a'))
+        self.assertFalse(self.cache.has_key('hot:b'))
+
+        # Not kept in L1 when it expires right away
+        self.cache.set('hot:e', 1, timeout=0)
+        self.assertIsNone(self.cache.get('hot:e'))
+
+    def test_least_recently_used_keys_are_dropped(self):
+        for key in ('hot:a', 'hot:b', 'hot:c'):
+            self.cache.set(key, key)
+        self.cache.get('hot:a')
+        self.cache.set('hot:d', 'hot:d')
+
+        self.assertEqual(self.cache.stats()['l1_entries'], 3)
+        self.cache.l2.set('hot:b', 'changed')
+        self.cache.l2.set('hot:a', 'changed')
+        self.assertEqual(self.cache.get('hot:b'), 'changed')
+        self.assertEqual(self.cache.get('hot:a'), 'hot:a')
+
+    def test_l1_entries_expire(self):
+        with patch('apps.core.cache.time.monotonic', return_value=1000):
+            self.cache.set('hot:a', 1)
+        self.cache.l2.set('hot:a', 2)
+        with patch('apps.core.cache.time.monotonic', return_value=1009):
+            self.assertEqual(self.cache.get('hot:a'), 1)
+        with patch('apps.core.cache.time.monotonic', return_value=1010):
+            self.assertEqual(self.cache.get('hot:a'), 2)
+
+    def test_threads_share_l1(self):
+        self.assertIs(self.cache.l1, _l1s['two-tier-tests'])
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            **TWO_TIER_CACHES['default'],
+            'LOCATION': 'two-tier-waffle',
+            'OPTIONS': {'L2_BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+    }
+)
+class TestTwoTierCacheWaffle(TestCase):
+    def test_switch_lookups_are_served_from_l1(self):
+        caches['default'].clear()
+        Switch.objects.create(name='two_tier_switch', active=True)
+        self.assertTrue(switch_is_active('two_tier_switch'))
+        self.assertFalse(switch_is_active('missing_switch'))
+
+        with self.assertNumQueries(0), patch.object(caches['default'].l2, 'get') as l2_get:
+            self.assertTrue(switch_is_active('two_tier_switch'))
+            self.assertFalse(switch_is_active('missing_switch'))
+        l2_get.assert_not_called()
+
+        # Waffle deletes the cache keys of a switch once it is saved
+        with self.captureOnCommitCallbacks(execute=True):
+            Switch.objects.filter(name='two_tier_switch').update(active=False)
+            Switch.objects.get(name='two_tier_switch').save()
+        self.assertFalse(switch_is_active('two_tier_switch'))
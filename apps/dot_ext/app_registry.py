@@ -0,0 +1,155 @@
+"""
+Process-wide registry of the Application fields the OAuth views check on every call.
+
+get_application_from_meta, get_application_from_data, validate_app_is_active, the request audit log and
+AuthorizationView.form_valid used to load the Application by client_id or id on every token, revoke,
+introspect and authorize call. application_registry keeps an immutable ApplicationSnapshot of the
+fields they check for each application asked for, for up to APPLICATION_REGISTRY_MAX_ENTRIES
+applications, dropping the least recently used one first. Only the paths that need the model instance
+(DOT's authorization view, data access grants) still load it, with ApplicationSnapshot.get_instance.
+
+Saving or deleting an Application drops the snapshots of this process and writes a new version to the
+default cache (see apps.dot_ext.signals). Other processes read the version at most every
+APPLICATION_REGISTRY_VERSION_INTERVAL seconds and drop all their snapshots when it changed. Snapshots
+are also dropped APPLICATION_REGISTRY_MAX_AGE seconds after they were loaded, for rows changed without
+the model's signals, like QuerySet.update().
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from oauth2_provider.models import get_application_model
+
+# Applications whose snapshot is kept
+APPLICATION_REGISTRY_MAX_ENTRIES = 1024
+# Seconds a snapshot is used for before the application is loaded again
+APPLICATION_REGISTRY_MAX_AGE = 300
+# Least seconds between two reads of the version other processes write when an application changes
+APPLICATION_REGISTRY_VERSION_INTERVAL = 5
+APPLICATION_REGISTRY_VERSION_KEY = 'app-registry:version'
+
+
+class ApplicationSnapshot(NamedTuple):
+    """The fields of an Application the OAuth views check, as they were when it was loaded"""
+
+    id: int
+    client_id: str
+    name: str
+    active: bool
+    data_access_type: Optional[str]
+    allowed_auth_type: str
+    part_d_eob_only: bool
+    require_demographic_scopes: Optional[bool]
+    jwks_uri: Optional[str]
+    user_id: int
+
+    def has_one_time_only_data_access(self) -> bool:
+        return self.data_access_type == 'ONE_TIME'
+
+    def get_instance(self):
+        """The Application model instance, loaded from the database"""
+        return get_application_model().objects.get(pk=self.id)
+
+
+class ApplicationRegistry:
+    """Thread-safe, size bounded client_id -> ApplicationSnapshot map, loaded on first use"""
+
+    COUNTS = ('hits', 'misses', 'invalidations', 'evicted')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # client_id -> (loaded at, snapshot), and id -> client_id
+        self._snapshots = OrderedDict()
+        self._client_ids = {}
+        # Bumped whenever snapshots are dropped, so a load that raced with it isn't kept
+        self._generation = 0
+        self._version = None
+        self._version_read_at = None
+        self._counts = dict.fromkeys(self.COUNTS, 0)
+
+    def get(self, client_id: str) -> ApplicationSnapshot:
+        """The snapshot of the application with ``client_id``, raises Application.DoesNotExist like
+        Application.objects.get(client_id=client_id)"""
+        return self._get(client_id, {'client_id': client_id})
+
+    def get_by_id(self, pk: int) -> ApplicationSnapshot:
+        """The snapshot of the application with primary key ``pk``, raises Application.DoesNotExist"""
+        return self._get(self._client_ids.get(pk), {'pk': pk})
+
+    def _get(self, client_id: Optional[str], lookup: dict) -> ApplicationSnapshot:
+        self._read_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._snapshots.get(client_id)
+            if entry is not None and now - entry[0] < APPLICATION_REGISTRY_MAX_AGE:
+                self._snapshots.move_to_end(client_id)
+                self._counts['hits'] += 1
+                return entry[1]
+            self._counts['misses'] += 1
+            generation = self._generation
+
+        Application = get_application_model()
+        row = Application.objects.filter(**lookup).values(*ApplicationSnapshot._fields).first()
+        if row is None:
+            raise Application.DoesNotExist('Application matching query does not exist.')
+        snapshot = ApplicationSnapshot(**row)
+
+        with self._lock:
+            if generation == self._generation:
+                self._drop(snapshot.id)
+                self._snapshots[snapshot.client_id] = (now, snapshot)
+                self._client_ids[snapshot.id] = snapshot.client_id
+                while len(self._snapshots) > APPLICATION_REGISTRY_MAX_ENTRIES:
+                    _, (_, evicted) = self._snapshots.popitem(last=False)
+                    self._client_ids.pop(evicted.id, None)
+                    self._counts['evicted'] += 1
+        return snapshot
+
+    def _read_version(self) -> None:
+        now = time.monotonic()
+        if self._version_read_at is not None and now - self._version_read_at < APPLICATION_REGISTRY_VERSION_INTERVAL:
+            return
+        version = cache.get(APPLICATION_REGISTRY_VERSION_KEY)
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+            self._version_read_at = now
+
+    def _drop(self, pk: int) -> None:
+        client_id = self._client_ids.pop(pk, None)
+        if client_id is not None:
+            self._snapshots.pop(client_id, None)
+
+    def _clear(self) -> None:
+        self._snapshots.clear()
+        self._client_ids.clear()
+        self._generation += 1
+
+    def invalidate(self) -> None:
+        """Drops the snapshots of this process after an application was saved or deleted, and has the
+        other processes drop theirs"""
+        version = uuid.uuid4().hex
+        cache.set(APPLICATION_REGISTRY_VERSION_KEY, version, None)
+        with self._lock:
+            # All of them, the version this process had read may already be out of date
+            self._clear()
+            self._version = version
+            self._counts['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self._version_read_at = None
+            self._counts = dict.fromkeys(self.COUNTS, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, 'applications': len(self._snapshots)}
+
+
+application_registry = ApplicationRegistry()
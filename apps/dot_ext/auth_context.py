@@ -0,0 +1,98 @@
+"""
+Request-scoped authorization context.
+
+The bearer token of a FHIR request is needed by the authentication class, the view, several permissions,
+the headers sent to BFD and the request log. Instead of each of them looking it up again, the token is
+loaded once, with a single joined query for its application and the application's owner, the
+beneficiary and their crosswalk, the AccessTokenExtension and the DataAccessGrant, and the resulting
+AuthContext is kept on the request for all of them.
+"""
+
+from functools import cached_property
+from typing import List, Optional
+
+from django.db.models import F, FilteredRelation, Q
+from oauth2_provider.models import get_access_token_model
+
+from apps.capabilities.catalog import scope_catalog
+
+# Attribute of the Django HttpRequest holding the context
+AUTH_CONTEXT_ATTR = '_bb2_auth_context'
+
+
+def access_tokens():
+    """AccessToken queryset joined with everything an API request needs to know about the token"""
+    return (
+        get_access_token_model()
+        .objects.annotate(
+            data_access_grant=FilteredRelation(
+                'user__dataaccessgrant',
+                condition=Q(user__dataaccessgrant__application=F('application')),
+            )
+        )
+        .select_related(
+            'application',
+            'application__user',
+            'user',
+            'user__crosswalk',
+            'accesstokenextension',
+            'data_access_grant',
+        )
+    )
+
+
+class AuthContext:
+    """
+    The access token of a request with its related objects. Missing ones (a client credentials token has
+    no beneficiary, older tokens have no extension) are None.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.application = token.application
+        self.developer = self.application.user if self.application else None
+        self.beneficiary = token.user
+        self.crosswalk = getattr(self.beneficiary, 'crosswalk', None)
+        self.extension = getattr(token, 'accesstokenextension', None)
+        self.grant = getattr(token, 'data_access_grant', None) if self.beneficiary else None
+        if self.grant is not None:
+            # Both are already loaded, don't fetch them again through the grant
+            self.grant.application = self.application
+            self.grant.beneficiary = self.beneficiary
+
+    @cached_property
+    def capabilities(self) -> List[str]:
+        """Slugs of the protected capabilities of the application, only v3 requests need them"""
+        if self.application is None:
+            return []
+        return scope_catalog.application_scopes(self.application.id)
+
+    @cached_property
+    def scopes(self) -> List[str]:
+        """The token's scopes that are known protected capabilities"""
+        return list(self.token.scopes)
+
+
+def set_auth_context(request, token) -> AuthContext:
+    """Keep the context of ``token``, loaded with access_tokens(), on ``request``"""
+    context = AuthContext(token)
+    setattr(getattr(request, '_request', request), AUTH_CONTEXT_ATTR, context)
+    return context
+
+
+def get_auth_context(request, token) -> Optional[AuthContext]:
+    """
+    The context of the access token ``token`` (the token string or an AccessToken) of ``request``, None
+    when there is no such token. It is loaded and kept on the request if authentication did not do it.
+    """
+    if not token:
+        return None
+    token = str(token)
+    context = getattr(getattr(request, '_request', request), AUTH_CONTEXT_ATTR, None)
+    if context is not None and context.token.token == token:
+        return context
+
+    access_token = access_tokens().filter(token=token).first()
+    if access_token is None:
+        return None
+    return set_auth_context(request, access_token)
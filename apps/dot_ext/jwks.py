@@ -0,0 +1,143 @@
+"""
+Process-wide cache of the JSON Web Key Sets client_credentials token calls are verified with.
+
+TokenView.post used to create a PyJWKClient for the application's jwks_uri and another one for the CSP's
+(CLEAR or ID.me) JWKS on every call, so each call downloaded and parsed both key sets before it could
+verify anything. jwks_registry keeps the parsed signing keys of each JWKS URI for JWKS_CACHE_TTL seconds,
+for up to JWKS_CACHE_MAX_URIS URIs, dropping the least recently used one first.
+
+A JWT signed with a kid the cached keys don't have fetches them again, so a rotated key is picked up
+right away, but at most once every JWKS_REFRESH_INTERVAL seconds per URI: unknown kids can't make every
+call wait on the JWKS server. When fetching the keys again fails, the ones fetched before keep being
+used for up to JWKS_STALE_TTL seconds after they expired.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import jwt
+from jwt import PyJWK, PyJWKClient, PyJWKSet
+from jwt.exceptions import PyJWKClientConnectionError, PyJWKClientError
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+# Seconds the keys of a JWKS URI are used for before they are fetched again
+JWKS_CACHE_TTL = 300
+# Least seconds between two fetches of a JWKS URI for kids it didn't have, or after a failed fetch
+JWKS_REFRESH_INTERVAL = 30
+# Seconds expired keys are still used for while the JWKS URI can't be fetched
+JWKS_STALE_TTL = 60 * 60
+# JWKS URIs whose keys are kept
+JWKS_CACHE_MAX_URIS = 256
+
+
+def parse_signing_keys(data) -> Dict[str, PyJWK]:
+    """kid -> key of the signing keys of a JWKS document, the keys PyJWKClient would match a kid against"""
+    if not isinstance(data, dict):
+        raise PyJWKClientError('The JWKS endpoint did not return a JSON object')
+    keys = {}
+    for key in PyJWKSet.from_dict(data).keys:
+        if key.public_key_use in ('sig', None) and key.key_id:
+            keys.setdefault(key.key_id, key)
+    if not keys:
+        raise PyJWKClientError('The JWKS endpoint did not contain any signing keys')
+    return keys
+
+
+class JWKSet:
+    """The cached signing keys of one JWKS URI, looked up like PyJWKClient does"""
+
+    def __init__(self, uri: str, registry: 'JWKSRegistry'):
+        # Also rejects URIs that aren't http(s)
+        self._client = PyJWKClient(uri, cache_jwk_set=False)
+        self.uri = uri
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._keys: Optional[Dict[str, PyJWK]] = None
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+
+    def get_signing_key_from_jwt(self, token) -> PyJWK:
+        return self.get_signing_key(jwt.get_unverified_header(token).get('kid'))
+
+    def get_signing_key(self, kid) -> PyJWK:
+        keys = self._keys
+        if keys is not None and kid in keys and time.monotonic() - self._fetched_at < JWKS_CACHE_TTL:
+            self._registry.incr('hits')
+            return keys[kid]
+
+        with self._lock:
+            # Another thread may have fetched the keys while this one waited for the lock
+            now = time.monotonic()
+            if self._keys is None or (
+                (now - self._fetched_at >= JWKS_CACHE_TTL or kid not in self._keys)
+                and now - self._attempted_at >= JWKS_REFRESH_INTERVAL
+            ):
+                self._fetch(now)
+            elif now - self._fetched_at >= JWKS_CACHE_TTL + JWKS_STALE_TTL:
+                raise PyJWKClientConnectionError(f'The keys of {self.uri} expired and could not be fetched again')
+            keys = self._keys
+
+        if kid not in keys:
+            raise PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+        return keys[kid]
+
+    def _fetch(self, now: float) -> None:
+        self._attempted_at = now
+        self._registry.incr('fetches')
+        try:
+            keys = parse_signing_keys(self._client.fetch_data())
+        except Exception as e:
+            self._registry.incr('fetch_errors')
+            if self._keys is None or now - self._fetched_at >= JWKS_CACHE_TTL + JWKS_STALE_TTL:
+                raise
+            self._registry.incr('stale')
+            logger.warning(f'Using the keys of {self.uri} fetched {now - self._fetched_at:.0f}s ago: {e}')
+            return
+        self._keys, self._fetched_at = keys, now
+
+
+class JWKSRegistry:
+    """Thread-safe, size bounded JWKS URI -> JWKSet map"""
+
+    COUNTS = ('hits', 'fetches', 'fetch_errors', 'stale', 'evicted')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sets = OrderedDict()
+        self._counts = dict.fromkeys(self.COUNTS, 0)
+
+    def get(self, uri: str) -> JWKSet:
+        """The JWKSet of ``uri``, to pass where a PyJWKClient(uri) was"""
+        with self._lock:
+            jwk_set = self._sets.get(uri)
+            if jwk_set is not None:
+                self._sets.move_to_end(uri)
+                return jwk_set
+
+            jwk_set = self._sets[uri] = JWKSet(uri, self)
+            while len(self._sets) > JWKS_CACHE_MAX_URIS:
+                self._sets.popitem(last=False)
+                self._counts['evicted'] += 1
+            return jwk_set
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            self._counts[field] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+            self._counts = dict.fromkeys(self.COUNTS, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, 'uris': len(self._sets)}
+
+
+jwks_registry = JWKSRegistry()
@@ -8,7 +8,7 @@ from oauth2_provider.models import get_application_model
 
 from apps.dot_ext.constants import AUTH_FLOW_REQUEST_LOGGING_PATHS_REGEX, SESSION_AUTH_FLOW_TRACE_KEYS
 from apps.dot_ext.models import AuthFlowUuid
-from apps.dot_ext.utils import get_application_from_data
+from apps.dot_ext.utils import get_application_snapshot_from_data
 
 """
   Logger related functions for dot_ext/mymedicare_cb modules.
@@ -239,7 +239,7 @@ def update_session_auth_flow_trace_from_code(request, code):
 
 def update_session_auth_flow_trace_from_request(request):
     try:
-        application = get_application_from_data(request)
+        application = get_application_snapshot_from_data(request)
 
         # Set values in session.
         request.session['auth_app_id'] = str(application.id)
@@ -7,6 +7,7 @@ from oauthlib.oauth2.rfc6749 import utils
 from oauthlib.oauth2.rfc6749.errors import InvalidGrantError
 
 from apps.constants import AUDIT_EVENT_SCOPE_SET, CLIENT_CREDENTIALS
+from apps.dot_ext.auth_context import access_tokens
 from apps.dot_ext.scopes import CapabilitiesScopes
 from apps.pkce.oauth2_validators import PKCEValidatorMixin
 
@@ -48,6 +49,10 @@ class OAuth2Validator(DotOAuth2Validator):
 
         return super().authenticate_client(request, *args, **kwargs)
 
+    def _load_access_token(self, token):
+        # Loads the token with everything the API request needs, see apps.dot_ext.auth_context
+        return access_tokens().filter(token=token).first()
+
     def is_within_original_scope(
         self,
         request_scopes: List[str],
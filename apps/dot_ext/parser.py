@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import functools
 import re
 import typing
 import unicodedata
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
 
 import usaddress  # type: ignore
 
@@ -17,19 +18,31 @@ from .constants import (
     SUFFIX_MAP,
 )
 
+# Normalized address lines whose usaddress parse and formatting are kept by address_normalizer
+ADDRESS_CACHE_SIZE = 4096
+# Characters outside DIACRITICS whose mapping remove_diacritics keeps
+DIACRITICS_CACHE_MAX_CHARS = 65536
+
+
+class _DiacriticsTable(dict):
+    """str.translate table of DIACRITICS, mapping other characters to the first of their NFKD form as they are met"""
+
+    def __missing__(self, codepoint: int) -> str | None:
+        decomposed = unicodedata.normalize('NFKD', chr(codepoint))
+        value = decomposed[0] if decomposed[0].isascii() else None
+        if len(self) < DIACRITICS_CACHE_MAX_CHARS:
+            self[codepoint] = value
+        return value
+
+
+_DIACRITICS_TABLE = _DiacriticsTable({ord(char): mapped for char, mapped in DIACRITICS.items()})
+
 
 def remove_diacritics(text: str) -> str:
     """Remove diacritics from text based on Project US@ specifications."""
-    mapped_chars: list[str] = []
-    for char in text:
-        if char in DIACRITICS:
-            mapped_chars.append(DIACRITICS[char])
-        else:
-            # Fallback for characters not in manual map
-            decomposed = unicodedata.normalize('NFKD', char)
-            mapped_chars.append(decomposed[0] if decomposed else char)
-    text = ''.join(mapped_chars)
-    return text.encode('ASCII', 'ignore').decode('utf-8')
+    if text.isascii():
+        return text
+    return text.translate(_DIACRITICS_TABLE)
 
 
 def _apply_smart_state_abbreviations(text: str) -> str:
@@ -89,24 +102,21 @@ def _apply_smart_state_abbreviations(text: str) -> str:
     return ' '.join(words)
 
 
-def _apply_highway_fixes(text: str) -> str:
-    """Normalize highway and route notations into standard Project US@ format."""
-    text = _apply_smart_state_abbreviations(text)
+def _repl_interstate(match: re.Match[str]) -> str:
+    full = match.group(0)
+    before = match.string[: match.start()].strip()
+    words = before.split()
+    if words:
+        last_word = words[-1].upper()
+        if last_word in SECONDARY_UNITS or last_word in SECONDARY_UNITS.values():
+            # Likely a secondary unit ID (eg APT I1), not an Interstate highway
+            return full
+    return f'INTERSTATE {match.group(1)}'
 
-    def repl_interstate(match: re.Match[str]) -> str:
-        full = match.group(0)
-        idx = match.start()
-        if idx > 0:
-            before = text[:idx].strip()
-            words = before.split()
-            if words:
-                last_word = words[-1].upper()
-                if last_word in SECONDARY_UNITS or last_word in SECONDARY_UNITS.values():
-                    # Likely a secondary unit ID (eg APT I1), not an Interstate highway
-                    return full
-        return f'INTERSTATE {match.group(1)}'
-
-    replaces: list[tuple[str, str | Callable[[re.Match[str]], str]]] = [
+
+_HIGHWAY_REPLACEMENTS: list[tuple[re.Pattern[str], str | Callable[[re.Match[str]], str]]] = [
+    (re.compile(pattern), replacement)
+    for pattern, replacement in (
         (r'\bBX\s+(\d+)\b', r'BOX \1'),
         (r'\b(RR|HC|RFD|RD|RT)(\d+)\b', r'\1 \2'),
         # Support (RFD|RD|RT|RR) [Optional Route] [Number] [BOX|#] [AlphaNum] [Trailing Text]
@@ -140,7 +150,7 @@ def _apply_highway_fixes(text: str) -> str:
         (r'\bB0X\b', 'BOX'),
         (r'\bRUTA RURAL\b', 'RR'),
         (r'\bIH(\d{1,4}[A-Z]?)\b', r'INTERSTATE \1'),
-        (r'\bI\s?(\d{1,4}[A-Z]?)(?:\s+(?:HIGHWAY|HWY))?\b', repl_interstate),
+        (r'\bI\s?(\d{1,4}[A-Z]?)(?:\s+(?:HIGHWAY|HWY))?\b', _repl_interstate),
         (
             r'\bUS(?:\s+HIGHWAY)?\s+(\d{1,4}[A-Z]?)(?:\s+(?:HIGHWAY|HWY))?\b',
             r'US HIGHWAY \1',
@@ -157,12 +167,24 @@ def _apply_highway_fixes(text: str) -> str:
         (r'\bSR\s+(\d{1,4}[A-Z]?)(?:\s+(?:ROAD|RD|ROUTE|RT|RTE))?\b', r'STATE ROAD \1'),
         (r'\bSR\b', 'STATE ROAD'),
         (r'\bTSR\b', 'TOWNSHIP ROAD'),
-    ]
-    for pattern, replacement in replaces:
-        text = re.sub(pattern, replacement, text)
+    )
+]
+
+
+def _apply_highway_fixes(text: str) -> str:
+    """Normalize highway and route notations into standard Project US@ format."""
+    text = _apply_smart_state_abbreviations(text)
+    for pattern, replacement in _HIGHWAY_REPLACEMENTS:
+        text = pattern.sub(replacement, text)
     return text
 
 
+_DECIMAL_POINT = re.compile(r'(\d)\.(\d)')
+_PUNCTUATION = re.compile(r'[*.()":;\'&@]')
+_HYPHEN_SPACES = re.compile(r'\s*-\s*')
+_SPACES = re.compile(r'[^\S\r\n]+')
+
+
 def normalize_text(text: str) -> str:
     """Uppercase text and normalize basic punctuation/spacing."""
     text = remove_diacritics(text)
@@ -170,18 +192,18 @@ def normalize_text(text: str) -> str:
     text = _apply_highway_fixes(text)
 
     # Mask floating point periods to preserve them (e.g. 39.2)
-    text = re.sub(r'(\d)\.(\d)', r'\1_DOT_\2', text)
+    text = _DECIMAL_POINT.sub(r'\1_DOT_\2', text)
 
     # Remove unnecessary punctuation
     # Preserve commas since they reduce ambiguity in address components
-    text = re.sub(r'[*.()":;\'&@]', '', text)
+    text = _PUNCTUATION.sub('', text)
 
     # Restore floating point periods
     text = text.replace('_DOT_', '.')
     # Compress spaces around hyphens
-    text = re.sub(r'\s*-\s*', '-', text)
+    text = _HYPHEN_SPACES.sub('-', text)
     # Compress multiple spaces into one
-    return re.sub(r'[^\S\r\n]+', ' ', text).strip()
+    return _SPACES.sub(' ', text).strip()
 
 
 CANADIAN_POSTAL_CODE_PATTERN = r'\b[A-Z]\d[A-Z]\s?\d[A-Z]\d\b'
@@ -200,6 +222,7 @@ CANADIAN_PROVINCES = (
     'SK',
     'YT',
 )
+_CANADIAN_POSTAL_CODE = re.compile(CANADIAN_POSTAL_CODE_PATTERN)
 
 
 def _apply_canada_fixes(lines: list[str]) -> list[str]:
@@ -207,7 +230,7 @@ def _apply_canada_fixes(lines: list[str]) -> list[str]:
     postal_code = ''
     postal_idx = -1
     for i, line in enumerate(lines):
-        match = re.search(CANADIAN_POSTAL_CODE_PATTERN, line.upper())
+        match = _CANADIAN_POSTAL_CODE.search(line.upper())
         if match:
             postal_code = match.group(0)
             postal_idx = i
@@ -228,93 +251,123 @@ def _apply_canada_fixes(lines: list[str]) -> list[str]:
     return lines
 
 
-def normalize_address(address_str: str) -> str:
-    """Take a multi-line address string and convert it to Project US@ format."""
-    # First, split lines and normalize each line
-    lines = [normalize_text(line) for line in address_str.split('\n')]
-    # Remove empty lines and deduplicate
-    deduped_lines: list[str] = []
-    for line in lines:
-        if line and line not in deduped_lines:
-            deduped_lines.append(line)
-    lines = deduped_lines
-
-    # Pre-process Canadian addresses to combine Province and Postal Code with single spacing
-    lines = _apply_canada_fixes(lines)
-
-    # Re-split lines if any rule added a newline (e.g. rural route splits)
-    full_text = '\n'.join(lines)
-    lines = [line for line in full_text.split('\n') if line]
-
-    # Pre-calculate flags for line-by-line backwards layout compatibility context
-    is_military = any(re.search(r'\b(AP|AE|AA)\b', line.upper()) for line in lines)
-    is_pr = any(re.search(r'\bPR\b', line.upper()) for line in lines)
-
-    formatted_lines: list[str] = []
-    highway_keywords = (
-        'COUNTY HIGHWAY',
-        'COUNTY ROAD',
-        'INTERSTATE',
-        'HIGHWAY',
-        'FM',
-        'US HIGHWAY',
-        'STATE HIGHWAY',
-        'ROUTE',
-        'ROAD',
-        'STATE ROUTE',
-        'STATE ROAD',
-        'URB ',
-        'EXT ',
-    )
+_MILITARY_STATES = re.compile(r'\b(AP|AE|AA)\b')
+_PUERTO_RICO = re.compile(r'\bPR\b')
+_STATION = re.compile(r'\b(STA|STATION)\b')
+_HIGHWAY_KEYWORDS = (
+    'COUNTY HIGHWAY',
+    'COUNTY ROAD',
+    'INTERSTATE',
+    'HIGHWAY',
+    'FM',
+    'US HIGHWAY',
+    'STATE HIGHWAY',
+    'ROUTE',
+    'ROAD',
+    'STATE ROUTE',
+    'STATE ROAD',
+    'URB ',
+    'EXT ',
+)
 
-    for line in lines:
-        try:
-            if line.startswith(highway_keywords) or (
-                is_pr and re.search(r'\b(STA|STATION)\b', line.upper()) and 'PO BOX' not in line.upper()
-            ):
-                raw_parsed: list[tuple[str, str]] = usaddress.parse(line)
-                formatted_lines.append(_format_from_raw(raw_parsed))
-                continue
 
-            parsed_tokens, addr_type = usaddress.tag(line)  # type: ignore
+def _format_line(line: str, is_military: bool, is_pr: bool) -> str:
+    """Format one normalized address line with usaddress."""
+    try:
+        if line.startswith(_HIGHWAY_KEYWORDS) or (is_pr and _STATION.search(line) and 'PO BOX' not in line):
+            raw_parsed: list[tuple[str, str]] = usaddress.parse(line)
+            return _format_from_raw(raw_parsed)
 
-            # Check if line contains a Canadian Province
-            is_canada_line = False
-            if 'StateName' in parsed_tokens:
-                state_val = parsed_tokens['StateName'].upper().split()[0]
-                if state_val in CANADIAN_PROVINCES:
-                    is_canada_line = True
+        parsed_tokens, addr_type = usaddress.tag(line)  # type: ignore
 
-            if (addr_type == 'Ambiguous' and not is_canada_line) or (
-                'StreetName' not in parsed_tokens
-                and 'USPSBoxType' not in parsed_tokens
-                and 'USPSBoxGroupType' not in parsed_tokens
-            ):
-                raw_parsed_fallback: list[tuple[str, str]] = usaddress.parse(line)
-                fmt_string = _format_from_raw(raw_parsed_fallback)
-            else:
-                fmt_string = _format_from_dict(parsed_tokens, is_military=is_military)
-            if not fmt_string.strip() and line.strip():
-                # Dictionary returned empty for a non-empty line, fallback to raw sequential
-                raw_parsed_fallback: list[tuple[str, str]] = usaddress.parse(line)
-                fmt_string = _format_from_raw(raw_parsed_fallback)
-            formatted_lines.append(fmt_string)
-        except Exception as e:
-            if 'RepeatedLabelError' in str(type(e)):
-                raw_parsed_err: list[tuple[str, str]] = getattr(e, 'parsed_string', [])
-                formatted_lines.append(_format_from_raw(raw_parsed_err))
-            else:
-                formatted_lines.append(line)
+        # Check if line contains a Canadian Province
+        is_canada_line = False
+        if 'StateName' in parsed_tokens:
+            state_val = parsed_tokens['StateName'].upper().split()[0]
+            if state_val in CANADIAN_PROVINCES:
+                is_canada_line = True
+
+        if (addr_type == 'Ambiguous' and not is_canada_line) or (
+            'StreetName' not in parsed_tokens
+            and 'USPSBoxType' not in parsed_tokens
+            and 'USPSBoxGroupType' not in parsed_tokens
+        ):
+            raw_parsed_fallback: list[tuple[str, str]] = usaddress.parse(line)
+            fmt_string = _format_from_raw(raw_parsed_fallback)
+        else:
+            fmt_string = _format_from_dict(parsed_tokens, is_military=is_military)
+        if not fmt_string.strip() and line.strip():
+            # Dictionary returned empty for a non-empty line, fallback to raw sequential
+            raw_parsed_fallback: list[tuple[str, str]] = usaddress.parse(line)
+            fmt_string = _format_from_raw(raw_parsed_fallback)
+        return fmt_string
+    except Exception as e:
+        if 'RepeatedLabelError' in str(type(e)):
+            raw_parsed_err: list[tuple[str, str]] = getattr(e, 'parsed_string', [])
+            return _format_from_raw(raw_parsed_err)
+        return line
+
+
+class AddressNormalizer:
+    """Converts addresses to Project US@ format, keeping the normalize_text of the last ``cache_size``
+    input lines and how the last ``cache_size`` normalized lines were formatted, since running usaddress
+    and the highway regexes on them is most of the work."""
+
+    def __init__(self, cache_size: int = ADDRESS_CACHE_SIZE):
+        self._normalize_text = functools.lru_cache(maxsize=cache_size)(normalize_text)
+        self._format_line = functools.lru_cache(maxsize=cache_size)(_format_line)
+
+    def normalize(self, address_str: str) -> str:
+        """Take a multi-line address string and convert it to Project US@ format."""
+        # First, split lines and normalize each line
+        lines = [self._normalize_text(line) for line in address_str.split('\n')]
+        # Remove empty lines and deduplicate
+        lines = [line for line in dict.fromkeys(lines) if line]
+
+        # Pre-process Canadian addresses to combine Province and Postal Code with single spacing
+        lines = _apply_canada_fixes(lines)
+
+        # Re-split lines if any rule added a newline (e.g. rural route splits)
+        lines = [line for line in '\n'.join(lines).split('\n') if line]
+
+        # Pre-calculate flags for line-by-line backwards layout compatibility context
+        is_military = any(_MILITARY_STATES.search(line) for line in lines)
+        is_pr = any(_PUERTO_RICO.search(line) for line in lines)
+
+        formatted_lines = [self._format_line(line, is_military, is_pr) for line in lines]
+        normalized_lines = [line for line in formatted_lines if line.strip() and line.strip().upper() not in COUNTRIES]
 
-    normalized_lines = [line for line in formatted_lines if line.strip() and line.strip().upper() not in COUNTRIES]
+        res = '\n'.join(normalized_lines)
 
-    res = '\n'.join(normalized_lines)
+        # Only apply PR exceptions for Puerto Rico addresses to preserve Canada spacing
+        if is_pr:
+            return _apply_pr_exceptions(res)
+        return res
 
-    # Only apply PR exceptions for Puerto Rico addresses to preserve Canada spacing
-    is_pr = any(re.search(r'\bPR\b', line.upper()) for line in lines)
-    if is_pr:
-        return _apply_pr_exceptions(res)
-    return res
+    def normalize_many(self, addresses: Iterable[str]) -> Iterator[str]:
+        """normalize() each address in turn, for batches that repeat lines across addresses."""
+        for address_str in addresses:
+            yield self.normalize(address_str)
+
+    def cache_info(self) -> dict:
+        return {'text': self._normalize_text.cache_info(), 'lines': self._format_line.cache_info()}
+
+    def cache_clear(self) -> None:
+        self._normalize_text.cache_clear()
+        self._format_line.cache_clear()
+
+
+address_normalizer = AddressNormalizer()
+
+
+def normalize_address(address_str: str) -> str:
+    """Take a multi-line address string and convert it to Project US@ format."""
+    return address_normalizer.normalize(address_str)
+
+
+def normalize_addresses(addresses: Iterable[str]) -> Iterator[str]:
+    """Lazily normalize_address() each of ``addresses``, for offline jobs."""
+    return address_normalizer.normalize_many(addresses)
 
 
 def _format_directional(word: str) -> str:
@@ -333,6 +386,9 @@ def _format_state(word: str) -> str:
     return STATES.get(word, word)
 
 
+_NON_LETTERS = re.compile(r'[^A-Z\s]')
+
+
 def _format_from_dict(tokens: dict[str, str], is_military: bool = False) -> str:
     """Format an address from a dictionary of usaddress tags."""
     # Standardize dictionary bad tags for non-unit strings ending with digits
@@ -361,7 +417,7 @@ def _format_from_dict(tokens: dict[str, str], is_military: bool = False) -> str:
             # If the value consists solely of secondary units, re-categorize it to OccupancyType
             val_upper: str = val.upper()
             # Extract basic words removing numbers/punctuation for comparison
-            words: list[str] = re.sub(r'[^A-Z\s]', '', val_upper).split()
+            words: list[str] = _NON_LETTERS.sub('', val_upper).split()
             if words and all(w in SECONDARY_UNITS or w in SECONDARY_UNITS.values() for w in words):
                 tokens['OccupancyType'] = val
                 del tokens[key]
@@ -671,6 +727,12 @@ def _format_from_raw(raw_parsed: list[tuple[str, str]]) -> str:
     return '\n'.join(_apply_pr_exceptions(line_item) for line_item in lines_raw)
 
 
+_PR_PO_BOX = re.compile(r'\b(APARTADO|APDO|GPO BOX)\b', re.IGNORECASE)
+_PR_BOX = re.compile(r'\b(BUZON|BZN)\b', re.IGNORECASE)
+_PR_RURAL_ROUTE = re.compile(r'\b(RUTA RURAL|RURAL)\b', re.IGNORECASE)
+_PR_HOUSE_NUMBER_HYPHEN = re.compile(r'^([A-Z]{1,2})-(\d+[A-Z]?)\b')
+
+
 def _apply_pr_exceptions(text: str) -> str:
     """Apply Project US@ Puerto Rico specific formatting and reordering rules."""
     # Reorder Station lines to be ABOVE delivery lines if they are below (e.g., Sta below PO Box)
@@ -695,8 +757,9 @@ def _apply_pr_exceptions(text: str) -> str:
             condo_lines.append(line_clean)
         elif any(k in line_up for k in ('PO BOX', 'STA', 'STATION')):
             postal_lines.append(line_clean)
-        elif any(k in line_up for k in ('CALLE', 'C/ ', 'AVE', 'AVENIDA', 'KM', 'ROAD', 'ROUTE', 'RR')) or re.search(
-            r'^\d', line_clean
+        elif (
+            any(k in line_up for k in ('CALLE', 'C/ ', 'AVE', 'AVENIDA', 'KM', 'ROAD', 'ROUTE', 'RR'))
+            or line_clean[0].isdecimal()
         ):
             street_lines_list.append(line_clean)
         else:
@@ -723,18 +786,18 @@ def _apply_pr_exceptions(text: str) -> str:
     text = '\n'.join(lines)
 
     # Standardize Spanish boxes on the combined text (e.g., APARTADO -> PO BOX)
-    text = re.sub(r'\b(APARTADO|APDO|GPO BOX)\b', 'PO BOX', text, flags=re.IGNORECASE)
+    text = _PR_PO_BOX.sub('PO BOX', text)
     # Standardize Spanish boxes for Rural routes (e.g., BUZON -> BOX)
-    text = re.sub(r'\b(BUZON|BZN)\b', 'BOX', text, flags=re.IGNORECASE)
+    text = _PR_BOX.sub('BOX', text)
     # Standardize Spanish rural routes (e.g., RUTA RURAL -> RR)
-    text = re.sub(r'\b(RUTA RURAL|RURAL)\b', 'RR', text, flags=re.IGNORECASE)
+    text = _PR_RURAL_ROUTE.sub('RR', text)
 
     lines_pr = text.split('\n')
     final_lines_pr: list[str] = []
     for line_pr in lines_pr:
         line_str = line_pr.strip()
         # Remove hyphens from alphanumeric house numbers at the absolute front (e.g., A-17 -> A17)
-        line_str = re.sub(r'^([A-Z]{1,2})-(\d+[A-Z]?)\b', r'\1\2', line_str)
+        line_str = _PR_HOUSE_NUMBER_HYPHEN.sub(r'\1\2', line_str)
         words_pr = line_str.split()
         new_words: list[str] = []
         skip = False
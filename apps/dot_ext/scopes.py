@@ -1,15 +1,14 @@
 from typing import List
 
-from django.db.models import Q
 from oauth2_provider.scopes import BaseScopes
 
-from apps.capabilities.models import ProtectedCapability
+from apps.capabilities.catalog import scope_catalog
 from apps.dot_ext.constants import BENE_PERSONAL_INFO_SCOPES
 
 
 class CapabilitiesScopes(BaseScopes):
     """
-    A scope backend that uses ProtectedCapability model.
+    A scope backend that uses ProtectedCapability model, through the in-memory scope catalog.
     """
 
     def get_all_scopes(self):
@@ -17,7 +16,7 @@ class CapabilitiesScopes(BaseScopes):
         Returns a dict-like object that contains all the scopes
         in the ProtectedCapability model.
         """
-        return dict(ProtectedCapability.objects.values_list('slug', 'title'))
+        return scope_catalog.titles()
 
     def get_available_scopes(self, application=None, request=None, *args, **kwargs):
         """
@@ -29,11 +28,7 @@ class CapabilitiesScopes(BaseScopes):
             return []
 
         # Get list of all available scopes
-        app_scopes_avail = list(
-            ProtectedCapability.objects.filter(Q(default=True) | Q(application=application))
-            .values_list('slug', flat=True)
-            .distinct()
-        )
+        app_scopes_avail = scope_catalog.available_scopes(application.id)
 
         # Set scopes based on application choice. Default behavior is False, if it hasn't been set yet.
         if application.require_demographic_scopes:
@@ -52,7 +47,7 @@ class CapabilitiesScopes(BaseScopes):
             return []
 
         # at the moment we assume that the default scopes are all those availables
-        app_scopes_default = list(ProtectedCapability.objects.filter(default=True).values_list('slug', flat=True))
+        app_scopes_default = scope_catalog.default_scopes()
 
         # Set scopes based on application choice. Default behavior is False, if it hasn't been set yet.
         if application.require_demographic_scopes:
@@ -120,51 +115,4 @@ class CapabilitiesScopes(BaseScopes):
         Returns:
             bool: Whether or not the requested scope is a valid SMART v2 subscope of any scope in the original scope list
         """
-        # First try exact match
-        if requested in original_list:
-            return True
-
-        # For each scope in the original scope list, check if the requested scope is a valid subscope of it
-        # If the requested scope does not match any scope in the original scope list, and is not a subscope either
-        # we will fail the refresh token request
-        for orig in original_list:
-            if self._smart_scope_contains(orig, requested):
-                return True
-        return False
-
-    def _smart_scope_contains(
-        self,
-        original: str,
-        requested: str,
-    ) -> bool:
-        """Determine if the requested scope is a valid SMART v2 subscope of the original scope.
-
-        Args:
-            original (str): Part of the scope originally granted for the access token being refreshed
-            requested (str): Part of the scope being requested in the current refresh token request
-        Returns:
-            bool: Whether or not the requested scope is a valid SMART v2 subscope of the original
-        """
-
-        # Split into context/resource and permissions
-        # Example: original = patient/Patient.rs, requested = patient/Patient.r
-        # That would result in the following splits:
-        # orig_resource = patient/Patient, orig_perms = rs
-        # req_resource = patient/Patient, req_perms = r
-        try:
-            orig_resource, orig_perms = original.rsplit('.', 1)
-            req_resource, req_perms = requested.rsplit('.', 1)
-        except ValueError:
-            return False
-
-        # Resource part must match exactly
-        if orig_resource != req_resource:
-            return False
-
-        # All requested permission chars must be present in original
-        # valid_chars is used to ignore any invalid chars that may be present in the scopes,
-        # such as 'patient/Patient.rw' which has an invalid 'w' char
-        orig_perm_set = set(orig_perms)
-        req_perm_set = set(req_perms)
-
-        return req_perm_set.issubset(orig_perm_set)
+        return scope_catalog.is_smart_subscope(requested, original_list)
@@ -1,10 +1,12 @@
 import logging
 
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import Signal
 from oauth2_provider.models import get_access_token_model, get_application_model
 
 from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.dot_ext.app_registry import ApplicationSnapshot, application_registry
 from apps.dot_ext.models import ArchivedToken
 from libs.decorators import waffle_function_switch
 from libs.mail import Mailer
@@ -14,6 +16,9 @@ AccessToken = get_access_token_model()
 
 logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
 
+# Saves writing none of these keep the snapshots of application_registry
+SNAPSHOT_FIELDS = frozenset(ApplicationSnapshot._fields) | {'user'}
+
 
 beneficiary_authorized_application = Signal()
 
@@ -84,5 +89,38 @@ def outreach_first_api_call(sender, instance=None, **kwargs):
         )
 
 
+def read_application_snapshot_fields(sender, instance=None, update_fields=None, using=None, **kwargs):
+    """
+    On an application pre_save signal, keep the fields of its snapshot as they are in the database, so
+    application_registry is only invalidated when one of them changes.
+    """
+    instance._snapshot_fields_before = None
+    if instance.pk is None or (update_fields is not None and not SNAPSHOT_FIELDS.intersection(update_fields)):
+        return
+    instance._snapshot_fields_before = (
+        sender.objects.using(using).filter(pk=instance.pk).values_list(*ApplicationSnapshot._fields).first()
+    )
+
+
+def invalidate_application_registry(sender, using=None, **kwargs):
+    application_registry.invalidate()
+    if transaction.get_connection(using).in_atomic_block:
+        # Again once committed, a snapshot of the row as it was may be loaded in between
+        transaction.on_commit(application_registry.invalidate, using=using)
+
+
+def invalidate_changed_application(sender, instance=None, created=False, update_fields=None, **kwargs):
+    if not created:
+        if update_fields is not None and not SNAPSHOT_FIELDS.intersection(update_fields):
+            return
+        before = getattr(instance, '_snapshot_fields_before', None)
+        if before is not None and before == tuple(getattr(instance, field) for field in ApplicationSnapshot._fields):
+            return
+    invalidate_application_registry(sender, **kwargs)
+
+
 post_save.connect(outreach_first_application, sender=Application)
+pre_save.connect(read_application_snapshot_fields, sender=Application)
+post_save.connect(invalidate_changed_application, sender=Application)
+post_delete.connect(invalidate_application_registry, sender=Application)
 pre_save.connect(outreach_first_api_call, sender=AccessToken)
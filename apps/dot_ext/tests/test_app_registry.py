@@ -0,0 +1,119 @@
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from httmock import HTTMock, all_requests
+from oauth2_provider.models import AccessToken
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.dot_ext.app_registry import (
+    APPLICATION_REGISTRY_MAX_AGE,
+    APPLICATION_REGISTRY_VERSION_INTERVAL,
+    APPLICATION_REGISTRY_VERSION_KEY,
+    ApplicationRegistry,
+    application_registry,
+)
+from apps.dot_ext.models import Application
+from apps.test import BaseApiTest
+
+
+@all_requests
+def patient(url, req):
+    return {'status_code': 200, 'content': {'resourceType': 'Patient', 'id': DEFAULT_SAMPLE_FHIR_ID_V2}}
+
+
+class TestApplicationRegistry(BaseApiTest):
+    def setUp(self):
+        super().setUp()
+        self.application = self._create_application('Registry App', data_access_type='ONE_TIME')
+        cache.delete(APPLICATION_REGISTRY_VERSION_KEY)
+
+        self.now = 1000.0
+        clock = patch('apps.dot_ext.app_registry.time', Mock(monotonic=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        application_registry.clear()
+
+    def test_cached(self):
+        app = application_registry.get(self.application.client_id)
+        self.assertEqual((app.id, app.name, app.active), (self.application.id, 'Registry App', True))
+        self.assertTrue(app.has_one_time_only_data_access())
+        self.assertEqual(app.get_instance(), self.application)
+
+        with self.assertNumQueries(0):
+            self.assertIs(application_registry.get(self.application.client_id), app)
+            self.assertIs(application_registry.get_by_id(self.application.id), app)
+
+        self.now += APPLICATION_REGISTRY_MAX_AGE
+        with self.assertNumQueries(1):
+            application_registry.get_by_id(self.application.id)
+        self.assertEqual(application_registry.stats()['hits'], 2)
+
+        with self.assertRaises(Application.DoesNotExist):
+            application_registry.get('unknown')
+
+    def test_saved_and_deleted(self):
+        application_registry.get(self.application.client_id)
+        self.application.active = False
+        self.application.save()
+        self.assertFalse(application_registry.get(self.application.client_id).active)
+
+        self.application.delete()
+        with self.assertRaises(Application.DoesNotExist):
+            application_registry.get(self.application.client_id)
+
+    def test_unchanged_fields_kept(self):
+        application_registry.get(self.application.client_id)
+        self.application.description = 'Not in the snapshot'
+        self.application.save()
+        self.application.name = 'Renamed App'
+        self.application.save(update_fields=['last_active'])
+
+        with self.assertNumQueries(0):
+            application_registry.get(self.application.client_id)
+        self.assertEqual(application_registry.stats()['invalidations'], 0)
+
+    def test_api_call_kept(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+        application = AccessToken.objects.get(token=access_token).application
+        version = cache.get(APPLICATION_REGISTRY_VERSION_KEY)
+        application_registry.get(application.client_id)
+        invalidations = application_registry.stats()['invalidations']
+
+        for _ in range(2):
+            with HTTMock(patient):
+                response = self.client.get(
+                    f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}', headers={'Authorization': f'Bearer {access_token}'}
+                )
+            self.assertEqual(response.status_code, 200)
+
+        application.refresh_from_db()
+        self.assertIsNotNone(application.last_active)
+        self.assertEqual(application_registry.stats()['invalidations'], invalidations)
+        self.assertEqual(cache.get(APPLICATION_REGISTRY_VERSION_KEY), version)
+        with self.assertNumQueries(0):
+            application_registry.get(application.client_id)
+
+    def test_other_process(self):
+        other = ApplicationRegistry()
+        other.get(self.application.client_id)
+        self.application.require_demographic_scopes = False
+        self.application.save()
+
+        # Not until it reads the version again
+        self.now += APPLICATION_REGISTRY_VERSION_INTERVAL - 1
+        self.assertTrue(other.get(self.application.client_id).require_demographic_scopes)
+        self.now += 1
+        self.assertFalse(other.get(self.application.client_id).require_demographic_scopes)
+
+    @patch('apps.dot_ext.app_registry.APPLICATION_REGISTRY_MAX_ENTRIES', 1)
+    def test_bounded(self):
+        second = self._create_application('Second App', user=self.application.user)
+        application_registry.get(self.application.client_id)
+        application_registry.get(second.client_id)
+
+        with self.assertNumQueries(1):
+            application_registry.get_by_id(self.application.id)
+        self.assertEqual(application_registry.stats()['evicted'], 2)
+        self.assertEqual(application_registry.stats()['applications'], 1)
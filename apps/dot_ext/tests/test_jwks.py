@@ -0,0 +1,147 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import SimpleTestCase
+from jwt.exceptions import PyJWKClientConnectionError, PyJWKClientError
+
+from apps.dot_ext.jwks import (
+    JWKS_CACHE_TTL,
+    JWKS_REFRESH_INTERVAL,
+    JWKS_STALE_TTL,
+    JWKSRegistry,
+)
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    return private_key, {**jwk, 'kid': kid, 'use': 'sig', 'alg': 'RS256'}
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.fetches += 1
+        if self.server.fail:
+            self.send_error(500)
+            return
+        content = json.dumps({'keys': self.server.keys}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestJWKSRegistry(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key, cls.jwk = make_key('key-1')
+        cls.new_private_key, cls.new_jwk = make_key('key-2')
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), JWKSHandler)
+        self.server.keys, self.server.fetches, self.server.fail = [self.jwk], 0, False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.uri = f'http://127.0.0.1:{self.server.server_address[1]}/.well-known/jwks.json'
+
+        self.now = 1000.0
+        clock = patch('apps.dot_ext.jwks.time', Mock(monotonic=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.registry = JWKSRegistry()
+
+    def token(self, kid='key-1', private_key=None):
+        return jwt.encode({'iss': 'app'}, private_key or self.private_key, algorithm='RS256', headers={'kid': kid})
+
+    def test_cached(self):
+        token = self.token()
+        key = self.registry.get(self.uri).get_signing_key_from_jwt(token)
+        self.assertEqual(jwt.decode(token, key, algorithms=['RS256']), {'iss': 'app'})
+        self.registry.get(self.uri).get_signing_key_from_jwt(token)
+        self.assertEqual(self.server.fetches, 1)
+
+        self.now += JWKS_CACHE_TTL
+        self.registry.get(self.uri).get_signing_key_from_jwt(token)
+        self.assertEqual(self.server.fetches, 2)
+        self.assertEqual(self.registry.stats()['hits'], 1)
+
+    def test_unknown_kid(self):
+        jwk_set = self.registry.get(self.uri)
+        jwk_set.get_signing_key_from_jwt(self.token())
+
+        # A rotated key is fetched right away
+        self.now += JWKS_REFRESH_INTERVAL
+        self.server.keys = [self.jwk, self.new_jwk]
+        token = self.token('key-2', self.new_private_key)
+        key = jwk_set.get_signing_key_from_jwt(token)
+        self.assertEqual(jwt.decode(token, key, algorithms=['RS256']), {'iss': 'app'})
+        self.assertEqual(self.server.fetches, 2)
+
+        # An unknown one no more than once every JWKS_REFRESH_INTERVAL, counting from that fetch
+        for _ in range(3):
+            with self.assertRaisesRegex(PyJWKClientError, 'key-3'):
+                jwk_set.get_signing_key_from_jwt(self.token('key-3'))
+        self.now += JWKS_REFRESH_INTERVAL - 1
+        with self.assertRaises(PyJWKClientError):
+            jwk_set.get_signing_key_from_jwt(self.token('key-3'))
+        self.assertEqual(self.server.fetches, 2)
+
+        self.now += 1
+        with self.assertRaises(PyJWKClientError):
+            jwk_set.get_signing_key_from_jwt(self.token('key-3'))
+        self.assertEqual(self.server.fetches, 3)
+
+    def test_stale_if_error(self):
+        jwk_set = self.registry.get(self.uri)
+        jwk_set.get_signing_key_from_jwt(self.token())
+        self.server.fail = True
+
+        self.now += JWKS_CACHE_TTL
+        with self.assertLogs('hhs_server.apps.dot_ext.jwks', 'WARNING'):
+            self.assertEqual(jwk_set.get_signing_key_from_jwt(self.token()).key_id, 'key-1')
+        # Not fetched again until JWKS_REFRESH_INTERVAL
+        jwk_set.get_signing_key_from_jwt(self.token())
+        self.assertEqual(self.server.fetches, 2)
+
+        self.now += JWKS_STALE_TTL
+        with self.assertRaises(PyJWKClientConnectionError):
+            jwk_set.get_signing_key_from_jwt(self.token())
+        self.assertEqual(self.registry.stats()['fetch_errors'], 2)
+
+        self.server.fail = False
+        self.now += JWKS_REFRESH_INTERVAL
+        self.assertEqual(jwk_set.get_signing_key_from_jwt(self.token()).key_id, 'key-1')
+
+    def test_no_keys(self):
+        self.server.fail = True
+        with self.assertRaises(PyJWKClientConnectionError):
+            self.registry.get(self.uri).get_signing_key_from_jwt(self.token())
+        with self.assertRaises(PyJWKClientError):
+            self.registry.get('file:///etc/passwd')
+
+        self.server.fail = False
+        self.server.keys = [{**self.jwk, 'use': 'enc'}]
+        with self.assertRaisesRegex(PyJWKClientError, 'signing keys'):
+            self.registry.get(self.uri).get_signing_key_from_jwt(self.token())
+
+    @patch('apps.dot_ext.jwks.JWKS_CACHE_MAX_URIS', 2)
+    def test_bounded(self):
+        first = self.registry.get(self.uri)
+        second = self.registry.get(self.uri + '?2')
+        self.assertIs(self.registry.get(self.uri), first)
+        self.registry.get(self.uri + '?3')
+
+        self.assertIs(self.registry.get(self.uri), first)
+        self.assertIsNot(self.registry.get(self.uri + '?2'), second)
+        self.assertEqual(self.registry.stats()['uris'], 2)
+        self.assertEqual(self.registry.stats()['evicted'], 2)
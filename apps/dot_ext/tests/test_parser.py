@@ -0,0 +1,49 @@
+import json
+import os
+
+from django.test import SimpleTestCase
+
+from apps.dot_ext.parser import AddressNormalizer, normalize_address, normalize_addresses, remove_diacritics
+
+# Addresses and how normalize_address formatted them before it cached lines and precompiled its regexes
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), 'address_normalization_golden.json')
+
+
+class TestAddressNormalization(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(GOLDEN_FILE, encoding='utf-8') as f:
+            cls.golden = json.load(f)
+
+    def test_golden(self):
+        for case in self.golden:
+            with self.subTest(address=case['input']):
+                self.assertEqual(normalize_address(case['input']), case['expected'])
+
+    def test_normalize_addresses(self):
+        addresses = [case['input'] for case in self.golden]
+        expected = [case['expected'] for case in self.golden]
+        self.assertEqual(list(normalize_addresses(addresses)), expected)
+        # Again, from the cached lines
+        self.assertEqual(list(normalize_addresses(iter(addresses))), expected)
+
+    def test_cache(self):
+        normalizer = AddressNormalizer(cache_size=2)
+        self.assertEqual(normalizer.normalize('123 Main St., Apt. 4B'), '123 MAIN ST APT 4B')
+        self.assertEqual(normalizer.normalize('123  main st, apt 4b'), '123 MAIN ST APT 4B')
+        self.assertEqual(normalizer.cache_info()['text'].hits, 0)
+        self.assertEqual(normalizer.cache_info()['lines'].hits, 1)
+
+        list(normalizer.normalize_many(['1 Elm St', '2 Elm St', '3 Elm St']))
+        self.assertEqual(normalizer.cache_info()['lines'].currsize, 2)
+        self.assertEqual(normalizer.normalize('3 Elm St'), '3 ELM ST')
+        self.assertEqual(normalizer.cache_info()['text'].hits, 1)
+
+        normalizer.cache_clear()
+        self.assertEqual(normalizer.cache_info()['text'].currsize, 0)
+        self.assertEqual(normalizer.cache_info()['lines'].currsize, 0)
+
+    def test_remove_diacritics(self):
+        self.assertEqual(remove_diacritics('Ñandú Œuvre Straße Ⅻ ｆｕｌｌ 東京 🏠'), 'NandU Ouvre StraSe X full  ')
+        self.assertEqual(remove_diacritics('123 MAIN ST'), '123 MAIN ST')
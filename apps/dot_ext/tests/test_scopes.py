@@ -1,6 +1,17 @@
+from unittest.mock import Mock, patch
+
 from django.conf import settings
+from django.core.cache import cache
 from oauth2_provider.scopes import get_scopes_backend
 
+from apps.capabilities.catalog import (
+    SCOPE_CATALOG_VERSION_INTERVAL,
+    SCOPE_CATALOG_VERSION_KEY,
+    ScopeCatalog,
+    scope_catalog,
+)
+from apps.capabilities.models import ProtectedCapability
+from apps.dot_ext.auth_context import AuthContext
 from apps.dot_ext.scopes import CapabilitiesScopes
 from apps.test import BaseApiTest
 
@@ -110,3 +121,87 @@ class TestScopesBackendClass(BaseApiTest):
         assert 'patient/Coverage.rs' in condensed_scopes
         assert 'patient/ExplanationOfBenefit.s' in condensed_scopes
         assert 'profile' in condensed_scopes
+
+    def test_scopes_loaded_once(self):
+        """
+        Test that the scopes backend and AuthContext.capabilities only query
+        the capabilities when the scope catalog is built, and that the
+        catalog is rebuilt when the capabilities of an application change.
+        """
+        capability_a = self._create_capability('Capability A', [])
+        capability_b = self._create_capability('Capability B', [], default=False)
+        capability_c = self._create_capability('Capability C', [], default=False)
+        application = self._create_application('an app')
+        application.scope.add(capability_b)
+        other_application = self._create_application('another app', user=application.user)
+        scopes = CapabilitiesScopes()
+
+        # The capabilities and the links of the applications to them
+        with self.assertNumQueries(2):
+            assert scopes.get_all_scopes() == {
+                'capability-a': 'Capability A',
+                'capability-b': 'Capability B',
+                'capability-c': 'Capability C',
+            }
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                assert scopes.get_available_scopes(application=application) == ['capability-a', 'capability-b']
+                assert scopes.get_available_scopes(application=other_application) == ['capability-a']
+                assert scopes.get_default_scopes(application=application) == ['capability-a']
+                assert AuthContext(Mock(application=application)).capabilities == ['capability-b']
+                assert scopes.is_smart_subscope('capability-a', ['capability-b']) is False
+
+        application.scope.add(capability_c)
+        application.scope.remove(capability_b)
+        assert scopes.get_available_scopes(application=application) == ['capability-a', 'capability-c']
+        capability_a.delete()
+        assert scopes.get_default_scopes(application=application) == []
+        assert scope_catalog.stats() == {'builds': 3, 'invalidations': 7, 'scopes': 2, 'applications': 1}
+
+    def test_scope_catalog_other_process(self):
+        """
+        Test that another process rebuilds its catalog once it reads the
+        version written when the capabilities of an application change,
+        and that the version is written again once the change is committed.
+        """
+        capability = self._create_capability('Capability A', [], default=False)
+        application = self._create_application('an app')
+        now = 1000.0
+        clock = patch('apps.capabilities.catalog.time', Mock(monotonic=lambda: now))
+        clock.start()
+        self.addCleanup(clock.stop)
+        other = ScopeCatalog()
+        assert other.application_scopes(application.id) == []
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            application.scope.add(capability)
+            version = cache.get(SCOPE_CATALOG_VERSION_KEY)
+        assert len(callbacks) == 1
+        assert cache.get(SCOPE_CATALOG_VERSION_KEY) != version
+
+        # Not until it reads the version again
+        now += SCOPE_CATALOG_VERSION_INTERVAL - 1
+        assert other.application_scopes(application.id) == []
+        now += 1
+        assert other.application_scopes(application.id) == ['capability-a']
+
+    def test_is_smart_subscope(self):
+        """
+        Test that a scope is a SMART subscope of the same scope, and of the
+        scopes of the same resource with all of its permissions.
+        """
+        self._create_capability('Patient', [])
+        ProtectedCapability.objects.filter(slug='patient').update(slug='patient/Patient.rs')
+        scopes = CapabilitiesScopes()
+        granted = ['openid', 'patient/Patient.rs', 'patient/Coverage.r']
+
+        assert scopes.is_smart_subscope('openid', granted)
+        assert scopes.is_smart_subscope('patient/Patient.rs', granted)
+        assert scopes.is_smart_subscope('patient/Patient.sr', granted)
+        assert scopes.is_smart_subscope('patient/Patient.s', granted)
+        assert scopes.is_smart_subscope('patient/Coverage.r', granted)
+        assert not scopes.is_smart_subscope('patient/Coverage.s', granted)
+        assert not scopes.is_smart_subscope('patient/Patient.rw', granted)
+        assert not scopes.is_smart_subscope('patient/ExplanationOfBenefit.r', granted)
+        assert not scopes.is_smart_subscope('profile', granted)
+        assert not scopes.is_smart_subscope('patient/Patient.r', ['patient/Patient'])
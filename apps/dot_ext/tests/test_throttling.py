@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from apps.dot_ext.throttling import CacheStore, LocalMemoryStore, SharedMemoryStore, gcra
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle'},
+}
+
+
+class TestGCRA(SimpleTestCase):
+    def test_burst_then_one_per_interval(self):
+        tat = None
+        # 3 per 60 seconds
+        for _ in range(3):
+            allowed, tat = gcra(tat, 1000, 20, 60)
+            self.assertTrue(allowed)
+        self.assertEqual(tat, 1060)
+
+        allowed, tat = gcra(tat, 1000, 20, 60)
+        self.assertFalse(allowed)
+        self.assertEqual(tat, 1060)
+
+        self.assertFalse(gcra(tat, 1019, 20, 60)[0])
+        self.assertEqual(gcra(tat, 1020, 20, 60), (True, 1080))
+        # Unused allowance does not build up past the burst
+        self.assertEqual(gcra(tat, 5000, 20, 60), (True, 5020))
+
+
+class StoreTestMixin:
+    def make_store(self):
+        raise NotImplementedError
+
+    def test_keys_are_limited_separately(self):
+        store = self.make_store()
+        self.assertEqual([store.apply('a', 1000, 20, 60)[0] for _ in range(4)], [True, True, True, False])
+        self.assertTrue(store.apply('b', 1000, 20, 60)[0])
+        self.assertEqual(store.apply('a', 1020, 20, 60), (True, 1080))
+
+
+class TestLocalMemoryStore(StoreTestMixin, SimpleTestCase):
+    def make_store(self):
+        return LocalMemoryStore()
+
+    def test_expired_keys_are_dropped(self):
+        store = LocalMemoryStore(max_keys=2)
+        store.apply('a', 1000, 20, 60)
+        store.apply('b', 1000, 20, 60)
+        store.apply('c', 1100, 20, 60)
+
+        self.assertEqual(set(store._tats), {'c'})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestCacheStore(StoreTestMixin, SimpleTestCase):
+    def make_store(self):
+        return CacheStore('throttle')
+
+
+class TestSharedMemoryStore(StoreTestMixin, SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'throttle')
+
+    def make_store(self, slots=1024):
+        return SharedMemoryStore(self.path, slots)
+
+    @override_settings(THROTTLE_SHARED_MEMORY_PATH=None)
+    def test_path_must_be_set(self):
+        with self.assertRaises(ImproperlyConfigured):
+            SharedMemoryStore()
+
+    def test_state_is_shared_between_processes(self):
+        store = self.make_store()
+        # Opened in the parent like under gunicorn's preload, and by the children themselves
+        store.apply('other', 1000, 1, 100)
+        read_fd, write_fd = os.pipe()
+        children = []
+        for i in range(4):
+            pid = os.fork()
+            if pid == 0:
+                child_store = store if i % 2 else self.make_store()
+                allowed = sum(child_store.apply('key', 1000, 1, 100)[0] for _ in range(50))
+                os.write(write_fd, bytes([allowed]))
+                os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+        os.close(write_fd)
+        allowed = sum(os.read(read_fd, 4))
+        os.close(read_fd)
+
+        self.assertEqual(allowed, 100)
+        self.assertFalse(store.apply('key', 1000, 1, 100)[0])
+
+    def test_least_recently_replenished_key_is_evicted(self):
+        # A single group of probes
+        store = self.make_store(slots=8)
+        for i in range(8):
+            store.apply(f'key-{i}', 1000 + i, 20, 60)
+        self.assertFalse(store.apply('key-3', 1003, 50, 60)[0])
+
+        store.apply('key-8', 1010, 20, 60)
+
+        # key-0 was replaced, and starts with a full allowance again
+        self.assertEqual(store.apply('key-0', 1010, 40, 60), (True, 1050))
+        self.assertFalse(store.apply('key-3', 1010, 50, 60)[0])
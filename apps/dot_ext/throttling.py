@@ -1,8 +1,165 @@
+"""
+Token rate limiting.
+
+DRF's SimpleRateThrottle keeps the list of request times of every token in the default cache, which
+is the database in deployments, and the list grows with the rate. TokenRateThrottle uses the generic
+cell rate algorithm (GCRA) instead: the only state per token is the time its allowance is used up
+until (its "theoretical arrival time"), and a request is allowed when that is at most one rate
+period ahead of now.
+
+The state is kept in a THROTTLE_STORE:
+
+    CacheStore:        a Django cache (THROTTLE_CACHE, the default one unless set), the default. As
+                       with SimpleRateThrottle the limits apply to the whole deployment when the cache
+                       is shared between hosts. Reads and writes are not atomic, concurrent requests
+                       from several hosts may let a few requests over the limit through.
+    SharedMemoryStore: a fixed-size table in a memory-mapped file at THROTTLE_SHARED_MEMORY_PATH,
+                       which must be set, shared by all the workers of a host. The limits apply per
+                       host: with N hosts behind the load balancer a token may make N times
+                       TOKEN_THROTTLE_RATE, so the rate has to be divided by the number of hosts.
+    LocalMemoryStore:  a dict in the process, each worker has its own limits.
+
+Any class with the same apply() method can be used.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
 from rest_framework.throttling import SimpleRateThrottle
 
 from apps.dot_ext.constants import HEADERS
 
+DEFAULT_THROTTLE_STORE = 'apps.dot_ext.throttling.CacheStore'
+
+# Slots of the shared memory table, and how many of them a key may be stored in
+SHARED_MEMORY_SLOTS = 65536
+SHARED_MEMORY_PROBES = 8
+# (key hash, theoretical arrival time)
+SLOT = struct.Struct('<Qd')
+
+
+def gcra(tat, now, interval, period):
+    """
+    Returns (allowed, tat) for a request made at ``now`` when the key's theoretical arrival time is
+    ``tat`` (None for a new key), for ``period`` / ``interval`` requests per ``period``.
+    """
+    new_tat = max(tat or now, now) + interval
+    if new_tat - now > period:
+        return False, tat
+    return True, new_tat
+
+
+class LocalMemoryStore:
+    """Per process store, expired keys are dropped when it reaches max_keys"""
+
+    def __init__(self, max_keys=SHARED_MEMORY_SLOTS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._tats = {}
+
+    def apply(self, key, now, interval, period):
+        with self._lock:
+            allowed, tat = gcra(self._tats.get(key), now, interval, period)
+            self._tats[key] = tat
+            if len(self._tats) > self.max_keys:
+                self._tats = {k: t for k, t in self._tats.items() if t > now}
+        return allowed, tat
+
+
+class SharedMemoryStore:
+    """
+    Open addressing table of SHARED_MEMORY_SLOTS (key hash, tat) slots in a memory-mapped file. A key
+    lives in one of the SHARED_MEMORY_PROBES slots after its hash, when they are all taken by other
+    keys the one that was replenished first is reused. The slots of a key are locked with fcntl
+    between processes, and with a lock between the threads of a process.
+    """
+
+    def __init__(self, path=None, slots=SHARED_MEMORY_SLOTS):
+        self.path = path or getattr(settings, 'THROTTLE_SHARED_MEMORY_PATH', None)
+        if not self.path:
+            raise ImproperlyConfigured('THROTTLE_SHARED_MEMORY_PATH must be set to use SharedMemoryStore')
+        self.slots = slots
+        self._fd = None
+        self._map = None
+        self._reset_after_fork()
+
+    def _open(self):
+        size = self.slots * SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._map = mmap.mmap(fd, size)
+        self._fd = fd
+
+    def apply(self, key, now, interval, period):
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+        first = key_hash % (self.slots - SHARED_MEMORY_PROBES + 1)
+        with self._lock:
+            if self._map is None:
+                self._open()
+            start, length = first * SLOT.size, SHARED_MEMORY_PROBES * SLOT.size
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                # The key's slot, or the one to take: empty slots have a tat of 0
+                slot, tat = None, None
+                victim, victim_tat = first, math.inf
+                for i in range(first, first + SHARED_MEMORY_PROBES):
+                    slot_hash, slot_tat = SLOT.unpack_from(self._map, i * SLOT.size)
+                    if slot_hash == key_hash:
+                        slot, tat = i, slot_tat
+                        break
+                    if slot_tat < victim_tat:
+                        victim, victim_tat = i, slot_tat
+                if slot is None:
+                    slot = victim
+
+                allowed, tat = gcra(tat, now, interval, period)
+                SLOT.pack_into(self._map, slot * SLOT.size, key_hash, tat)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        return allowed, tat
+
+    def _reset_after_fork(self):
+        # The mapping is inherited, fcntl locks and the thread lock are not
+        self._lock = threading.Lock()
+
+
+class CacheStore:
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, 'THROTTLE_CACHE', 'default')
+
+    def apply(self, key, now, interval, period):
+        cache = caches[self.alias]
+        allowed, tat = gcra(cache.get(key), now, interval, period)
+        if allowed:
+            cache.set(key, tat, math.ceil(tat - now) + 1)
+        return allowed, tat
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(getattr(settings, 'THROTTLE_STORE', None) or DEFAULT_THROTTLE_STORE)()
+                if hasattr(_store, '_reset_after_fork') and hasattr(os, 'register_at_fork'):
+                    os.register_at_fork(after_in_child=_store._reset_after_fork)
+    return _store
+
 
 class TokenRateThrottle(SimpleRateThrottle):
     """
@@ -26,22 +183,27 @@ class TokenRateThrottle(SimpleRateThrottle):
         }
 
     def allow_request(self, request, view):
-        # run this first to populate/update self.history, self.now, self.duration, self.num_requests
-        result = super(TokenRateThrottle, self).allow_request(request, view)
-        try:
-            request.META[HEADERS['Remaining']] = self.num_requests - len(self.history)
-            request.META[HEADERS['Limit']] = self.num_requests
-            if self.history:
-                remaining_duration = self.duration - (self.now - self.history[-1])
-            else:
-                remaining_duration = self.duration
-
-            request.META[HEADERS['Reset']] = remaining_duration
-        # Allows for throttling to be turned off completely
-        except AttributeError:
-            pass
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        self.interval = self.duration / self.num_requests
+        allowed, self.tat = get_throttle_store().apply(self.key, self.now, self.interval, self.duration)
+
+        # Time until the token's allowance is replenished, and how many requests it has left until then
+        remaining_duration = max(self.tat - self.now, 0)
+        request.META[HEADERS['Remaining']] = max(int((self.duration - remaining_duration) / self.interval + 1e-9), 0)
+        request.META[HEADERS['Limit']] = self.num_requests
+        request.META[HEADERS['Reset']] = remaining_duration
+
+        return allowed
 
-        return result
+    def wait(self):
+        return max(self.tat + self.interval - self.duration - self.now, 0)
 
 
 class ThrottleMiddleware(MiddlewareMixin):
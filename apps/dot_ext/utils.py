@@ -31,6 +31,7 @@ from apps.constants import (
     HHS_SERVER_LOGNAME_FMT,
     REFRESH_TOKEN,
 )
+from apps.dot_ext.app_registry import ApplicationSnapshot, application_registry
 from apps.dot_ext.constants import (
     APPLICATION_THIRTEEN_MONTH_DATA_ACCESS_NOT_FOUND_MESG,
     CLEAR_HIGHER_ISS,
@@ -142,6 +143,15 @@ def get_application_from_meta(request) -> Application | None:
     RETURN:
         application or None
     """
+    app = get_application_snapshot_from_meta(request)
+    return app.get_instance() if app is not None else None
+
+
+def get_application_snapshot_from_meta(request) -> ApplicationSnapshot | None:
+    """
+    get_application_from_meta, returning the application's ApplicationSnapshot
+    from application_registry rather than loading the model.
+    """
     request_meta = getattr(request, 'META', None)
     client_id, ac = None, None
     Application = get_application_model()
@@ -160,9 +170,9 @@ def get_application_from_meta(request) -> Application | None:
     try:
         if client_id is not None:
             validate_client_id(client_id)
-            app = Application.objects.get(client_id=client_id)
+            app = application_registry.get(client_id)
         elif ac is not None:
-            app = Application.objects.get(id=ac.application_id)
+            app = application_registry.get_by_id(ac.application_id)
     except Application.DoesNotExist:
         raise InvalidClientError(description='Application does not exist')
     return app
@@ -177,6 +187,15 @@ def get_application_from_data(request):
     RETURN:
         application or None
     """
+    app = get_application_snapshot_from_data(request)
+    return app.get_instance() if app is not None else None
+
+
+def get_application_snapshot_from_data(request) -> ApplicationSnapshot | None:
+    """
+    get_application_from_data, returning the application's ApplicationSnapshot
+    from application_registry rather than loading the model.
+    """
     client_id, token, rt, app = None, None, None, None
     Application = get_application_model()
 
@@ -239,12 +258,12 @@ def get_application_from_data(request):
                 )
     try:
         if token is not None:
-            if client_id and token.application.client_id != client_id:
+            app = application_registry.get_by_id(token.application_id)
+            if client_id and app.client_id != client_id:
                 raise InvalidRequestError(
                     description='Token does not match client_id',
                     status_code=HTTPStatus.BAD_REQUEST,
                 )
-            app = Application.objects.get(id=token.application_id)
             return app
     except Application.DoesNotExist:
         raise InvalidClientError(
@@ -264,12 +283,12 @@ def get_application_from_data(request):
             )
     try:
         if rt is not None:
-            if client_id and rt.application.client_id != client_id:
+            app = application_registry.get_by_id(rt.application_id)
+            if client_id and app.client_id != client_id:
                 raise InvalidRequestError(
                     description='Token does not match client_id',
                     status_code=HTTPStatus.BAD_REQUEST,
                 )
-            app = Application.objects.get(id=rt.application_id)
             return app
     except Application.DoesNotExist:
         raise InvalidClientError(
@@ -279,7 +298,7 @@ def get_application_from_data(request):
 
     try:
         if client_id:
-            app = Application.objects.get(client_id=client_id)
+            app = application_registry.get(client_id)
             return app
     except Application.DoesNotExist:
         raise InvalidClientError(
@@ -292,9 +311,14 @@ def get_application_from_data(request):
 
 
 def get_application_from_request(request):
-    meta_app = get_application_from_meta(request)
-    data_app = get_application_from_data(request)
-    if meta_app and data_app and meta_app != data_app:
+    app = get_application_snapshot_from_request(request)
+    return app.get_instance() if app is not None else None
+
+
+def get_application_snapshot_from_request(request) -> ApplicationSnapshot | None:
+    meta_app = get_application_snapshot_from_meta(request)
+    data_app = get_application_snapshot_from_data(request)
+    if meta_app and data_app and meta_app.id != data_app.id:
         raise InvalidRequestError(
             description='different app in headers than in request data',
             status_code=HTTPStatus.BAD_REQUEST,
@@ -321,7 +345,15 @@ def validate_app_is_active(request: HttpRequest) -> Application:
     Returns:
         Model: Application model
     """
-    app = get_application_from_request(request)
+    return get_active_application_snapshot(request).get_instance()
+
+
+def get_active_application_snapshot(request: HttpRequest) -> ApplicationSnapshot:
+    """
+    validate_app_is_active, returning the application's ApplicationSnapshot
+    from application_registry rather than loading the model.
+    """
+    app = get_application_snapshot_from_request(request)
 
     if not app:
         raise InvalidClientError('App id failed')
@@ -344,7 +376,7 @@ def validate_app_is_active(request: HttpRequest) -> Application:
             refresh_code = request.POST.get(REFRESH_TOKEN, None)
             try:
                 refresh_token = RefreshToken.objects.get(token=refresh_code)
-                dag = DataAccessGrant.objects.get(beneficiary=refresh_token.user, application=app)
+                dag = DataAccessGrant.objects.get(beneficiary_id=refresh_token.user_id, application_id=app.id)
 
                 if dag:
                     # If we get a DAG, but it has expired, we pass back a message (again)
@@ -38,7 +38,6 @@ from fhir.resources.R4B.identifier import Identifier
 from fhir.resources.R4B.meta import Meta
 from fhir.resources.R4B.parameters import Parameters, ParametersParameter
 from fhir.resources.R4B.patient import Patient
-from jwt import PyJWKClient
 from oauth2_provider.exceptions import OAuthToolkitError
 from oauth2_provider.models import (
     get_access_token_model,
@@ -77,6 +76,7 @@ from apps.constants import (
     REFRESH_TOKEN,
     USER_TYPE_ALIGNED_NETWORKS_BENEFICIARY,
 )
+from apps.dot_ext.app_registry import ApplicationSnapshot
 from apps.dot_ext.constants import (
     APPLICATION_DOES_NOT_HAVE_CLIENT_CREDENTIALS_ENABLED,
     APPLICATION_HAS_CLIENT_CREDENTIALS_ENABLED_NON_CLIENT_CREDENTIALS_AUTH_CALL_MADE,
@@ -97,6 +97,7 @@ from apps.dot_ext.constants import (
     YYYY_MM_DD_REGEX,
 )
 from apps.dot_ext.forms import SimpleAllowForm
+from apps.dot_ext.jwks import JWKSet, jwks_registry
 from apps.dot_ext.loggers import (
     cleanup_session_auth_flow_trace,
     create_session_auth_flow_trace,
@@ -105,7 +106,7 @@ from apps.dot_ext.loggers import (
     set_session_auth_flow_trace_value,
     update_instance_auth_flow_trace_with_code,
 )
-from apps.dot_ext.models import AccessTokenExtension, Application, Approval
+from apps.dot_ext.models import AccessTokenExtension, Approval
 from apps.dot_ext.parser import normalize_address
 from apps.dot_ext.scopes import CapabilitiesScopes
 from apps.dot_ext.signals import beneficiary_authorized_application
@@ -113,9 +114,10 @@ from apps.dot_ext.utils import (
     build_jwks_urls,
     check_can_token_scope_for_audit_event_scopes,
     check_session_and_create_access_token_extension,
+    get_active_application_snapshot,
     get_api_version_number_from_url,
-    get_application_from_data,
-    get_application_from_meta,
+    get_application_snapshot_from_data,
+    get_application_snapshot_from_meta,
     get_oauth_param,
     json_response_from_oauth2_error,
     remove_application_user_pair_tokens_data_access,
@@ -448,7 +450,10 @@ class AuthorizationView(DotAuthorizationView):
     def form_valid(self, form):
         client_id = form.cleaned_data['client_id']
 
-        application = get_application_model().objects.get(client_id=client_id)
+        # dispatch loaded the application of the request's client_id
+        application = self.application
+        if application.client_id != client_id:
+            application = get_application_model().objects.get(client_id=client_id)
         credentials = {
             'client_id': form.cleaned_data.get('client_id'),
             'redirect_uri': form.cleaned_data.get('redirect_uri'),
@@ -670,11 +675,11 @@ class TokenView(DotTokenView):
         except ObjectDoesNotExist:
             raise AccessDeniedError(description='Unable to verify permission.')
 
-    def _check_if_client_credentials_call_is_allowed(self, app: Application, version: int) -> bool:
+    def _check_if_client_credentials_call_is_allowed(self, app: ApplicationSnapshot, version: int) -> bool:
         """Checks if the version for the call is v3 + the app is allowed to do this and has a jwks_uri
 
         Args:
-            app (Application): model
+            app (ApplicationSnapshot): the application
             version (Versions): Version constant
 
         Returns:
@@ -764,12 +769,12 @@ class TokenView(DotTokenView):
 
         return None
 
-    def _validate_authorization_jwt(self, token: str, client_id: str, jwks_client: PyJWKClient) -> str:
+    def _validate_authorization_jwt(self, token: str, client_id: str, jwks_client: JWKSet) -> str:
         """Validates an authorization JWT and returns the id_token if valid
 
         Args:
             token (str): the base64 encoded auth jwt
-            jwks_client (PyJWKClient): instantiated client for the authorization jwt
+            jwks_client (JWKSet): cached signing keys for the authorization jwt
 
         Raises:
             InvalidRequestError: any jwt error throws this
@@ -867,12 +872,12 @@ class TokenView(DotTokenView):
 
         return True
 
-    def _validate_ial_jwt(self, id_token: str, jwks_client: PyJWKClient) -> dict:
+    def _validate_ial_jwt(self, id_token: str, jwks_client: JWKSet) -> dict:
         """Validates an IAL JWT from a trusted CSP
 
         Args:
             id_token (str): base64 encoded id_token jwt from cms_smart extension
-            jwks_client (PyJWKClient): instantiated client for the authorization jwt
+            jwks_client (JWKSet): cached signing keys for the authorization jwt
 
         Raises:
             InvalidRequestError: if any validation step fails, log and raise
@@ -1168,7 +1173,7 @@ class TokenView(DotTokenView):
             if version == Versions.V3 and grant_type == REFRESH_TOKEN:
                 self._validate_v3_token_call(request)
 
-            app = validate_app_is_active(request)
+            app = get_active_application_snapshot(request)
 
             if grant_type == 'authorization_code' and app.allowed_auth_type == 'CLIENT_CREDENTIALS':
                 error_message = APPLICATION_HAS_CLIENT_CREDENTIALS_ENABLED_NON_CLIENT_CREDENTIALS_AUTH_CALL_MADE.format(
@@ -1210,7 +1215,7 @@ class TokenView(DotTokenView):
                         id_token = self._validate_authorization_jwt(
                             request.POST.get('client_assertion', ''),
                             app.client_id,
-                            PyJWKClient(app.jwks_uri),
+                            jwks_registry.get(app.jwks_uri),
                         )
 
                         # Determine if this is CLEAR or ID.ME
@@ -1221,7 +1226,7 @@ class TokenView(DotTokenView):
                             log.warning('id_token did not have a valid iss')
                             raise InvalidRequestError
 
-                        ial_valid = self._validate_ial_jwt(id_token, PyJWKClient(csp_jwks))
+                        ial_valid = self._validate_ial_jwt(id_token, jwks_registry.get(csp_jwks))
                         if not ial_valid:
                             log.error('_validate_ial_jwt returned None')
                             raise ServerError
@@ -1259,7 +1264,7 @@ class TokenView(DotTokenView):
                             log_dict['patient_match_found'] = True
                             log_dict['patient'] = fhir_id
                             log.info(json.dumps(log_dict))
-                            create_or_update_data_access_grant_client_credential_flow(user, app)
+                            create_or_update_data_access_grant_client_credential_flow(user, app.get_instance())
                         else:
                             log.info(json.dumps(log_dict))
                             log.debug(f'No patient match found for client_credentials call for app: {app.name}')
@@ -1313,7 +1318,7 @@ class TokenView(DotTokenView):
                     refresh_token = get_refresh_token_model().objects.create(
                         user=user,
                         token=secrets.token_urlsafe(22),  # generate a secure random token with 22 bytes (30 chars)
-                        application=app,
+                        application_id=app.id,
                         access_token=token,
                     )
 
@@ -1347,7 +1352,7 @@ class TokenView(DotTokenView):
                 dag_expiry = ''
                 if user_is_anb:
                     try:
-                        dag = DataAccessGrant.objects.get(beneficiary=token.user, application=app)
+                        dag = DataAccessGrant.objects.get(beneficiary=token.user, application_id=app.id)
                         if grant_type == REFRESH_TOKEN:
                             dag.update_90_day_rolling_window()
                         if dag.expiration_date is not None:
@@ -1356,7 +1361,7 @@ class TokenView(DotTokenView):
                         dag_expiry = ''
                 elif app.data_access_type == 'THIRTEEN_MONTH':
                     try:
-                        dag = DataAccessGrant.objects.get(beneficiary=token.user, application=app)
+                        dag = DataAccessGrant.objects.get(beneficiary=token.user, application_id=app.id)
                         if dag.expiration_date is not None:
                             dag_expiry = dag.expiration_date.strftime(DATETIME_ISO_FORMAT)
                     except DataAccessGrant.DoesNotExist:
@@ -1421,7 +1426,7 @@ class RevokeTokenView(DotRevokeTokenView):
     @method_decorator(sensitive_post_parameters('password'))
     def post(self, request, *args, **kwargs):
         try:
-            meta_app = get_application_from_meta(request)
+            meta_app = get_application_snapshot_from_meta(request)
         except InvalidClientError as e:
             return json_response_from_oauth2_error(e)
 
@@ -1432,7 +1437,7 @@ class RevokeTokenView(DotRevokeTokenView):
             )
 
         try:
-            data_app = get_application_from_data(request)
+            data_app = get_application_snapshot_from_data(request)
         except (InvalidClientError, InvalidRequestError):
             # If we couldn't find client from request, that suggests that the token was invalid, return 200
             return HttpResponse(status=HTTPStatus.OK)
@@ -1443,7 +1448,7 @@ class RevokeTokenView(DotRevokeTokenView):
                 status=HTTPStatus.FORBIDDEN,
             )
 
-        if meta_app and data_app and meta_app != data_app:
+        if meta_app and data_app and meta_app.id != data_app.id:
             return JsonResponse(
                 {
                     'status_code': HTTPStatus.FORBIDDEN,
@@ -1461,7 +1466,7 @@ class RevokeView(DotRevokeTokenView):
     def post(self, request, *args, **kwargs):
         at_model = get_access_token_model()
         try:
-            app = validate_app_is_active(request)
+            app = get_active_application_snapshot(request)
         except (InvalidClientError, InvalidGrantError) as error:
             return json_response_from_oauth2_error(error)
 
@@ -1477,7 +1482,7 @@ class RevokeView(DotRevokeTokenView):
             log.debug(f'Token {escaped_tkn} was not found.')
 
         try:
-            dag = DataAccessGrant.objects.get(beneficiary=token.user, application=app)
+            dag = DataAccessGrant.objects.get(beneficiary=token.user, application_id=app.id)
             dag.delete()
         except Exception:
             log.debug(f'DAG lookup failed for token {escaped_tkn}.')
@@ -1489,7 +1494,7 @@ class RevokeView(DotRevokeTokenView):
 class IntrospectTokenView(DotIntrospectTokenView):
     def get(self, request, *args, **kwargs):
         try:
-            validate_app_is_active(request)
+            get_active_application_snapshot(request)
         except InvalidClientError as error:
             return json_response_from_oauth2_error(error)
 
@@ -1497,7 +1502,7 @@ class IntrospectTokenView(DotIntrospectTokenView):
 
     def post(self, request, *args, **kwargs):
         try:
-            validate_app_is_active(request)
+            get_active_application_snapshot(request)
         except InvalidClientError as error:
             return json_response_from_oauth2_error(error)
 
@@ -0,0 +1,115 @@
+"""
+Write-behind tracking of Application activity.
+
+Every authenticated FHIR request used to save the whole application row just to bump last_active, so
+a busy application meant a stream of UPDATEs contending for one row, each sending the model's save
+signals. Without an interval only the timestamps are written, with a single UPDATE per request. With
+FHIR_SERVER['APP_ACTIVITY_FLUSH_INTERVAL'] set, the last time each application was seen is kept in
+memory instead, and a background thread writes them all in one bulk UPDATE every interval. Whatever is
+left is written when the worker exits. last_active may lag by up to the interval, and with several
+workers the latest flush wins.
+
+first_active is still written right away, once, with a conditional UPDATE: the first API call outreach
+email (apps.dot_ext.signals) relies on it.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+from django.db import connections
+from django.utils import timezone
+from oauth2_provider.models import get_application_model
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.server.settings import fhir_settings
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+# Applications written per UPDATE statement
+FLUSH_BATCH_SIZE = 500
+
+
+class ApplicationActivity:
+    def __init__(self):
+        self._reset_after_fork()
+
+    def record(self, application) -> None:
+        """Note that ``application`` made an API call now"""
+        Application = get_application_model()
+        now = timezone.now()
+        application.last_active = now
+        first_call = application.first_active is None
+        if first_call:
+            application.first_active = now
+
+        if fhir_settings.app_activity_flush_interval <= 0:
+            # BB2-2008 only the timestamps are written, without the model's validation and save signals
+            timestamps = {'last_active': now, 'first_active': now} if first_call else {'last_active': now}
+            Application.objects.filter(pk=application.pk).update(**timestamps)
+        elif first_call:
+            Application.objects.filter(pk=application.pk, first_active__isnull=True).update(
+                first_active=now, last_active=now
+            )
+        else:
+            with self._lock:
+                self._pending[application.pk] = now
+                self._counts['recorded'] += 1
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def flush(self) -> int:
+        """Write the pending last_active times, returns how many applications were updated"""
+        Application = get_application_model()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            Application.objects.bulk_update(
+                [Application(pk=pk, last_active=last_active) for pk, last_active in pending.items()],
+                ['last_active'],
+                batch_size=FLUSH_BATCH_SIZE,
+            )
+        except Exception:
+            logger.exception('Failed to write application activity')
+            with self._lock:
+                # Retried with the next flush, unless the application was seen again since
+                for pk, last_active in pending.items():
+                    self._pending.setdefault(pk, last_active)
+            return 0
+
+        with self._lock:
+            self._counts['flushes'] += 1
+            self._counts['written'] += len(pending)
+        return len(pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, 'pending': len(self._pending)}
+
+    def _run(self):
+        while not self._stop.wait(max(fhir_settings.app_activity_flush_interval, 1)):
+            try:
+                self.flush()
+            finally:
+                # Runs in its own thread, with its own database connections
+                connections.close_all()
+
+    def _reset_after_fork(self) -> None:
+        # The parent process writes what it recorded, the flush thread is not running in the child
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._counts = dict.fromkeys(('recorded', 'flushes', 'written'), 0)
+
+
+app_activity = ApplicationActivity()
+
+atexit.register(app_activity.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=app_activity._reset_after_fork)
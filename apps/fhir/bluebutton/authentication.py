@@ -1,7 +1,9 @@
-from django.utils import timezone
 from oauth2_provider.contrib.rest_framework import authentication
 from rest_framework import exceptions
 
+from apps.dot_ext.auth_context import set_auth_context
+from apps.fhir.bluebutton.activity import app_activity
+
 
 class OAuth2ResourceOwner(authentication.OAuth2Authentication):
     def authenticate(self, request):
@@ -18,18 +20,14 @@ class OAuth2ResourceOwner(authentication.OAuth2Authentication):
 
         if user_auth_tuple is not None:
             user, access_token = user_auth_tuple
+            set_auth_context(request, access_token)
             request.resource_owner = user
             if not hasattr(user, 'crosswalk'):
                 return None
             request.crosswalk = user.crosswalk
 
             # Update Application activity metric datetime fields
-            access_token.application.last_active = timezone.now()
-            if access_token.application.first_active is None:
-                access_token.application.first_active = access_token.application.last_active
-            # BB2-2008 call dedicated save on application model to avoid
-            # unnecessary validations
-            access_token.application.save_without_validate()
+            app_activity.record(access_token.application)
 
             return user, access_token
         return None
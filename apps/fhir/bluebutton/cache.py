@@ -0,0 +1,150 @@
+"""
+Per-beneficiary cache of BFD responses for the FHIR read and search views.
+
+Apps tend to poll the same Patient, Coverage and first page ExplanationOfBenefit calls for a
+beneficiary. With a TTL set for a resource type in FHIR_SERVER['RESPONSE_CACHE_TTL'], the checked
+BFD response for a call is kept in process memory and served again until it expires. A cached
+response is only ever looked up after the request has passed authentication and the view's permission
+classes, and its object permissions are checked again on every hit.
+
+Entries are keyed by everything that changes what BFD returns for a call: the beneficiary's fhir_id,
+the API version, the resource type, the BFD URL and its (sorted) query parameters, the host and scheme
+the call was made to (forwarded to BFD, which builds the paging links of a Bundle from them), and the
+SAMHSA and Part D flags of the access token. They are dropped least recently used first once the cache
+holds more than FHIR_SERVER['RESPONSE_CACHE_MAX_BYTES'] of BFD responses, and all of a beneficiary's
+entries are purged when one of their grants is deleted, a token of theirs is revoked or their crosswalk
+changes. These events are seen by the process that handles them; other processes rely on the TTL, the
+grant and token themselves are checked against the database on every request.
+
+Whether a view response was served from the cache is reported in the X-Cache header (HIT or MISS).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from oauth2_provider.models import AccessToken
+
+from apps.authorization.models import DataAccessGrant
+from apps.dot_ext.admin import MyAccessToken
+from apps.fhir.bluebutton.models import Crosswalk
+from apps.fhir.server.settings import fhir_settings
+
+CACHE_HEADER = 'X-Cache'
+
+
+class FhirResponseCache:
+    """Thread-safe LRU cache of checked BFD response data, with an index of entries per beneficiary user"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (expires, size, user_id, data), least recently used first
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._size = 0
+        self._counts = dict.fromkeys(('hits', 'misses', 'expired', 'evicted', 'purged'), 0)
+
+    @staticmethod
+    def ttl(resource_type: str) -> int:
+        """Seconds that responses for ``resource_type`` are cached for, 0 if they are not cached"""
+        return fhir_settings.response_cache_ttl.get(resource_type, 0)
+
+    @staticmethod
+    def key(fhir_id, version, resource_type, prepped, include_samhsa, part_d_eob_only) -> tuple:
+        url = urlsplit(prepped.url)
+        params = tuple(sorted(parse_qsl(url.query, keep_blank_values=True)))
+        host, scheme = prepped.headers.get('X-Forwarded-Host'), prepped.headers.get('X-Forwarded-Proto')
+        return (
+            fhir_id,
+            version,
+            resource_type,
+            url.netloc,
+            url.path,
+            params,
+            host,
+            scheme,
+            include_samhsa,
+            part_d_eob_only,
+        )
+
+    def get(self, key):
+        """Cached data for ``key``, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counts['misses'] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self._counts['expired'] += 1
+                self._counts['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts['hits'] += 1
+            return entry[3]
+
+    def set(self, key, user_id, data, size: int) -> None:
+        """Cache ``data`` (``size`` bytes as read from BFD) for the TTL of the key's resource type"""
+        ttl = self.ttl(key[2])
+        max_bytes = fhir_settings.response_cache_max_bytes
+        if ttl <= 0 or size > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, user_id, data)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            self._size += size
+            while self._size > max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._counts['evicted'] += 1
+
+    def purge_user(self, user_id) -> None:
+        """Drop every entry cached for the beneficiary ``user_id``"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+                self._counts['purged'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters, with the current number of entries and bytes"""
+        with self._lock:
+            return {**self._counts, 'entries': len(self._entries), 'bytes': self._size}
+
+    def _remove(self, key):
+        expires, size, user_id, data = self._entries.pop(key)
+        self._size -= size
+        keys = self._keys_by_user[user_id]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[user_id]
+
+
+response_cache = FhirResponseCache()
+
+
+@receiver(post_delete, sender=DataAccessGrant)
+def purge_grant_removed(sender, instance=None, **kwargs):
+    response_cache.purge_user(instance.beneficiary_id)
+
+
+@receiver(post_delete, sender=MyAccessToken)
+@receiver(post_delete, sender=AccessToken)
+def purge_token_removed(sender, instance=None, **kwargs):
+    if instance.user_id is not None:
+        response_cache.purge_user(instance.user_id)
+
+
+@receiver(post_save, sender=Crosswalk)
+@receiver(post_delete, sender=Crosswalk)
+def purge_crosswalk_changed(sender, instance=None, **kwargs):
+    response_cache.purge_user(instance.user_id)
@@ -0,0 +1,111 @@
+"""
+In-memory CapabilityStatements for the FHIR /metadata endpoints.
+
+BFD's CapabilityStatement only changes with a release, but SDKs fetch /metadata every time they start.
+The filtered statement for each API version (and issuer, which sets the OAuth URIs in it) is built
+once, kept in memory as the rendered body with a strong ETag, and served from there.
+
+Once it is older than FHIR_SERVER['CAPABILITY_REFRESH_INTERVAL'] seconds, the next request still gets
+the statement in memory and starts a rebuild in a background thread. If that fails (BFD is down or
+returns an error), the last good statement is kept and the rebuild is tried again after
+CAPABILITY_RETRY_INTERVAL seconds. Only the very first build for a version is made in the request, its
+errors are returned to the client as before. An interval of 0 turns the cache off.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from django.db import connections
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.server.settings import fhir_settings
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+# Seconds before a failed rebuild is tried again
+CAPABILITY_RETRY_INTERVAL = 60
+
+
+class CapabilityStatement(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def make_capability_statement(body: bytes) -> CapabilityStatement:
+    return CapabilityStatement(body, f'"{hashlib.sha256(body).hexdigest()}"')
+
+
+class CapabilityStatementCache:
+    """
+    Thread-safe map of built statements. get() is given a ``build`` callable that returns a
+    CapabilityStatement, or the error response to send when BFD could not be reached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (statement, monotonic time it is due to be rebuilt)
+        self._statements = {}
+        self._refreshing = set()
+        self._counts = dict.fromkeys(('builds', 'hits', 'refreshes', 'refresh_errors'), 0)
+
+    def get(self, key, build):
+        interval = fhir_settings.capability_refresh_interval
+        if interval <= 0:
+            return build()
+
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is not None:
+                self._counts['hits'] += 1
+                statement, refresh_at = entry
+                if refresh_at <= time.monotonic() and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self.refresh, args=(key, build), daemon=True).start()
+                return statement
+
+        result = build()
+        with self._lock:
+            self._counts['builds'] += 1
+            if isinstance(result, CapabilityStatement):
+                self._statements[key] = (result, time.monotonic() + interval)
+        return result
+
+    def refresh(self, key, build) -> None:
+        """Rebuild the statement for ``key``, keeping the one in memory if that fails"""
+        try:
+            result = build()
+        except Exception:
+            logger.exception('Failed to refresh the CapabilityStatement')
+            result = None
+        finally:
+            # Runs in its own thread, with its own database connections
+            connections.close_all()
+
+        with self._lock:
+            self._refreshing.discard(key)
+            self._counts['refreshes'] += 1
+            if isinstance(result, CapabilityStatement):
+                self._statements[key] = (result, time.monotonic() + fhir_settings.capability_refresh_interval)
+            else:
+                self._counts['refresh_errors'] += 1
+                if key in self._statements:
+                    statement, _ = self._statements[key]
+                    self._statements[key] = (statement, time.monotonic() + CAPABILITY_RETRY_INTERVAL)
+
+        if result is not None and not isinstance(result, CapabilityStatement):
+            logger.warning(f'BFD returned {result.status_code} for its CapabilityStatement, serving the last good copy')
+
+    def clear(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._counts = dict.fromkeys(self._counts, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, 'statements': len(self._statements)}
+
+
+capability_statements = CapabilityStatementCache()
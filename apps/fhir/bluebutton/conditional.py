@@ -0,0 +1,124 @@
+"""
+Conditional requests for the FHIR read and search views.
+
+FhirDataView sends a strong ETag with every response it does not stream: a digest of the checked data
+as it is handed to the renderer, and of the media type it is rendered as. A request whose If-None-Match
+has that ETag gets a 304 with no body, the renderer never runs.
+
+When the data carries BFD validators (meta.versionId or meta.lastUpdated), they are remembered with the
+ETag for the beneficiary, the API call and the token's SAMHSA and Part D flags. The next request for the
+same call with that ETag in If-None-Match asks BFD with If-None-Match / If-Modified-Since, and a 304
+from BFD is passed on without a body being read. Validators are kept in process memory, at most
+MAX_VALIDATORS of them, least recently used dropped first. A request with an ETag this process does not
+know is sent to BFD as usual, and still gets a 304 if the data did not change.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.http import HttpResponseNotModified
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags
+
+MAX_VALIDATORS = 10000
+
+
+class NotModified(Exception):
+    """BFD answered a conditional request with 304, the client's copy, ``etag``, is current"""
+
+    def __init__(self, etag):
+        super().__init__(etag)
+        self.etag = etag
+
+
+def make_etag(data, media_type: str) -> str:
+    digest = hashlib.sha256(media_type.encode())
+    digest.update(b'\0')
+    digest.update(json.dumps(data, separators=(',', ':')).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def request_etags(request) -> list:
+    return parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def not_modified_response(etag) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def bfd_validators(data):
+    """(meta.versionId, meta.lastUpdated) of a resource or Bundle from BFD, None when it has neither"""
+    meta = data.get('meta') if isinstance(data, dict) else None
+    if not isinstance(meta, dict) or (meta.get('versionId') is None and meta.get('lastUpdated') is None):
+        return None
+    return meta.get('versionId'), meta.get('lastUpdated')
+
+
+def conditional_headers(validators) -> dict:
+    """Headers asking BFD for a 304 when the resource still has ``validators``"""
+    version_id, last_updated = validators
+    headers = {}
+    if version_id is not None:
+        headers['If-None-Match'] = f'W/"{version_id}"'
+    last_updated = parse_datetime(last_updated) if last_updated else None
+    if last_updated is not None:
+        headers['If-Modified-Since'] = http_date(last_updated.timestamp())
+    return headers
+
+
+class ValidatorCache:
+    """Thread-safe LRU of the BFD validators of the data the API sent with an ETag"""
+
+    def __init__(self, max_entries=MAX_VALIDATORS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counts = dict.fromkeys(('hits', 'misses', 'not_modified'), 0)
+
+    @staticmethod
+    def key(request, version, etag) -> tuple:
+        return (
+            request.user.pk,
+            version,
+            request.get_full_path(),
+            getattr(request, 'include_samhsa', None),
+            getattr(request, 'part_d_eob_only', None),
+            etag,
+        )
+
+    def get(self, key):
+        with self._lock:
+            validators = self._entries.get(key)
+            if validators is None:
+                self._counts['misses'] += 1
+                return None
+            self._counts['hits'] += 1
+            self._entries.move_to_end(key)
+            return validators
+
+    def set(self, key, validators) -> None:
+        with self._lock:
+            self._entries[key] = validators
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self._counts['not_modified'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counts = dict.fromkeys(self._counts, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, 'entries': len(self._entries)}
+
+
+validator_cache = ValidatorCache()
@@ -0,0 +1,215 @@
+"""
+Patient/$export jobs.
+
+The kick-off view (apps.fhir.bluebutton.views.export) checks the token like a search of each resource type
+would be, prepares the first BFD search request of each one with FhirDataView.prepare_backend_request, so
+that the SAMHSA and Part D parameters are added exactly as for a search, and saves an ExportJob. The job
+then runs on this process' pool of FHIR_SERVER['EXPORT_WORKERS'] threads: the first page of each search
+gives the Bundle total, the other pages are fetched EXPORT_PARALLELISM at a time, every page goes through
+the view's handle_backend_response checks, and the resources are written one per line to an NDJSON file
+per resource type in the export storage.
+
+The storage is the FHIR_SERVER['EXPORT_STORAGE'] alias of STORAGES, or a FileSystemStorage in
+EXPORT_ROOT. Jobs are kept in the database, so any worker can answer the status and download requests,
+but a job only runs in the process it was started in: one that has not been updated for
+EXPORT_JOB_TIMEOUT seconds is reported as failed.
+"""
+
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Any, NamedTuple
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import connections
+from django.utils import timezone
+from requests import Request
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.bluebutton.models import ExportJob
+from apps.fhir.bluebutton.signals import pre_fetch
+from apps.fhir.bluebutton.views.generic import FhirDataView
+from apps.fhir.server import singleflight
+from apps.fhir.server.client import bfd_client
+from apps.fhir.server.settings import fhir_settings
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+NDJSON_CONTENT_TYPE = 'application/fhir+ndjson'
+
+
+class ExportPlan(NamedTuple):
+    """How to search one resource type of an export, as prepared by the kick-off view"""
+
+    resource_type: str
+    # The export search view and the kick-off request, for handle_backend_response
+    view: Any
+    request: Any
+    # The first page's BackendRequest
+    backend_request: Any
+
+
+def get_export_storage():
+    if fhir_settings.export_storage:
+        return storages[fhir_settings.export_storage]
+    return FileSystemStorage(
+        location=fhir_settings.export_root or os.path.join(tempfile.gettempdir(), 'bluebutton-exports')
+    )
+
+
+def is_stale(job: ExportJob) -> bool:
+    """Whether ``job`` should be running but has not been updated for too long, its process likely stopped"""
+    return job.status in (ExportJob.ACCEPTED, ExportJob.IN_PROGRESS) and (
+        timezone.now() - job.updated_at > timedelta(seconds=fhir_settings.export_job_timeout)
+    )
+
+
+def is_expired(job: ExportJob) -> bool:
+    return job.finished_at is not None and (
+        timezone.now() - job.finished_at > timedelta(seconds=fhir_settings.export_retention)
+    )
+
+
+def delete_export(job: ExportJob) -> None:
+    """Delete ``job`` and its files"""
+    storage = get_export_storage()
+    for output in job.output:
+        storage.delete(output['file'])
+    job.delete()
+
+
+def fetch_page(plan: ExportPlan, start_index: int) -> dict:
+    """Return the checked search Bundle of ``plan`` starting at ``start_index``"""
+    first = plan.backend_request.request
+    request = Request('GET', first.url, params={**first.params, 'startIndex': start_index}, headers=dict(first.headers))
+    prepped = bfd_client.session(first.url).prepare_request(request)
+    backend_request = plan.backend_request._replace(request=request, prepped=prepped, cache_key=None)
+
+    pre_fetch.send_robust(FhirDataView, request=request, auth_request=plan.request, api_ver=backend_request.api_ver)
+    r = singleflight.send(prepped, timeout=fhir_settings.wait_time, verify=fhir_settings.verify_server)
+    return plan.view.handle_backend_response(plan.request, plan.resource_type, backend_request, r)
+
+
+def fetch_page_in_thread(plan: ExportPlan, start_index: int) -> dict:
+    try:
+        return fetch_page(plan, start_index)
+    finally:
+        connections.close_all()
+
+
+def iter_pages(plan: ExportPlan, pool: ThreadPoolExecutor):
+    """Yield the search Bundles of ``plan`` in order"""
+    first = fetch_page(plan, 0)
+    yield first
+
+    page_size = fhir_settings.export_page_size
+    total = first.get('total')
+    if total is not None:
+        # The pages are yielded in order, while up to EXPORT_PARALLELISM of them are fetched
+        start_indexes = range(page_size, math.ceil(total / page_size) * page_size, page_size)
+        yield from pool.map(partial(fetch_page_in_thread, plan), start_indexes)
+        return
+
+    # Without a total, page until BFD stops returning a next link
+    bundle, start_index = first, 0
+    while any(link.get('relation') == 'next' for link in bundle.get('link', [])):
+        start_index += page_size
+        bundle = fetch_page(plan, start_index)
+        yield bundle
+
+
+def export_resource_type(job: ExportJob, plan: ExportPlan, storage, pool: ThreadPoolExecutor) -> dict:
+    """Write the resources of ``plan`` to an NDJSON file, return its output entry"""
+    count = 0
+    with tempfile.TemporaryFile() as ndjson:
+        for bundle in iter_pages(plan, pool):
+            for entry in bundle.get('entry', []):
+                ndjson.write(json.dumps(entry['resource'], separators=(',', ':')).encode() + b'\n')
+                count += 1
+            # Shows the job is still running to the status requests
+            ExportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now())
+        ndjson.seek(0)
+        name = storage.save(f'{job.pk}/{plan.resource_type}.ndjson', File(ndjson))
+    return {'type': plan.resource_type, 'file': name, 'count': count}
+
+
+class ExportRunner:
+    """Runs the export jobs started in this process"""
+
+    def __init__(self):
+        self._reset_after_fork()
+
+    def submit(self, job: ExportJob, plans) -> None:
+        """Queue ``job``, or run it right away when FHIR_SERVER['EXPORT_WORKERS'] is 0"""
+        with self._lock:
+            self._counts['submitted'] += 1
+            if fhir_settings.export_workers > 0 and self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=fhir_settings.export_workers, thread_name_prefix='bb2-export'
+                )
+            executor = self._executor if fhir_settings.export_workers > 0 else None
+
+        if executor is None:
+            self.run(job, plans)
+        else:
+            executor.submit(self._run_in_thread, job, plans)
+
+    def _run_in_thread(self, job: ExportJob, plans) -> None:
+        try:
+            self.run(job, plans)
+        finally:
+            # Runs in its own thread, with its own database connections
+            connections.close_all()
+
+    def run(self, job: ExportJob, plans) -> None:
+        storage = get_export_storage()
+        output = []
+        try:
+            ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.IN_PROGRESS, updated_at=timezone.now())
+            with ThreadPoolExecutor(max_workers=fhir_settings.export_parallelism) as pool:
+                for plan in plans:
+                    output.append(export_resource_type(job, plan, storage, pool))
+        except Exception as e:
+            logger.exception('Export %s failed' % job.pk)
+            for entry in output:
+                storage.delete(entry['file'])
+            ExportJob.objects.filter(pk=job.pk).update(
+                status=ExportJob.FAILED, error=str(e) or type(e).__name__, finished_at=timezone.now()
+            )
+            self._count('failed')
+        else:
+            updated = ExportJob.objects.filter(pk=job.pk).update(
+                status=ExportJob.COMPLETED, output=output, finished_at=timezone.now()
+            )
+            if not updated:
+                # Deleted by the client while it was running
+                for entry in output:
+                    storage.delete(entry['file'])
+            self._count('completed')
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+    def _reset_after_fork(self) -> None:
+        # The executor's threads are not running in the child
+        self._lock = threading.Lock()
+        self._executor = None
+        self._counts = dict.fromkeys(('submitted', 'completed', 'failed'), 0)
+
+
+export_runner = ExportRunner()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=export_runner._reset_after_fork)
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.7 on 2026-10-18 20:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bluebutton', '0012_alter_archivedcrosswalk__user_id_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        migrations.swappable_dependency(settings.OAUTH2_PROVIDER_APPLICATION_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('version', models.PositiveSmallIntegerField()),
+                ('request_url', models.TextField()),
+                ('resource_types', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('accepted', 'Accepted'), ('in-progress', 'In progress'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='accepted', max_length=16)),
+                ('output', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.OAUTH2_PROVIDER_APPLICATION_MODEL)),
+                ('beneficiary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 import binascii
+import uuid
 from datetime import datetime
 from http import HTTPStatus
 
@@ -298,6 +299,51 @@ class ArchivedCrosswalk(models.Model):
         return acw
 
 
+class ExportJob(models.Model):
+    """
+    A Patient/$export of the beneficiary's data for an application, run by apps.fhir.bluebutton.export.
+
+    Attributes:
+        beneficiary: the user whose data is exported
+        application: the application that requested it
+        version: API version of the kick-off request
+        request_url: URL of the kick-off request, returned in the manifest
+        resource_types: resource types to export
+        status: accepted, in-progress, completed or failed
+        output: [{type, file, count}] of the NDJSON files written, once completed
+        error: why the job failed
+    """
+
+    ACCEPTED = 'accepted'
+    IN_PROGRESS = 'in-progress'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (ACCEPTED, 'Accepted'),
+        (IN_PROGRESS, 'In progress'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    beneficiary = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=CASCADE, related_name='export_jobs')
+    application = models.ForeignKey(
+        settings.OAUTH2_PROVIDER_APPLICATION_MODEL, on_delete=CASCADE, related_name='export_jobs'
+    )
+    version = models.PositiveSmallIntegerField()
+    request_url = models.TextField()
+    resource_types = models.JSONField(default=list)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=ACCEPTED, db_index=True)
+    output = models.JSONField(default=list)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s %s' % (self.id, self.status)
+
+
 class Fhir_Response(Response):
     """
     Build a more consistent Response object
@@ -1,14 +1,12 @@
 import logging
 
 from django.contrib.auth import get_user_model
-from oauth2_provider.models import get_application_model
-from oauth2_provider.views.base import get_access_token_model
 from rest_framework import exceptions, permissions
 from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
 from rest_framework.request import Request
 from waffle import get_waffle_flag_model
 
-from apps.capabilities.models import ProtectedCapability
+from apps.authorization.ownership import MISMATCH, check_ownership
 from apps.constants import (
     APPLICATION_DOES_NOT_HAVE_V3_ENABLED_YET,
     APPLICATION_DOES_NOT_HAVE_VALID_SCOPES,
@@ -20,6 +18,7 @@ from apps.constants import (
     FHIR_RES_TYPE_PATIENT,
     HHS_SERVER_LOGNAME_FMT,
 )
+from apps.dot_ext.auth_context import get_auth_context
 from apps.fhir.constants import ALLOWED_RESOURCE_TYPES, READ_SCOPE, READ_SEARCH_SCOPE_LOOKUP, SEARCH_SCOPE
 from apps.versions import VersionNotMatched, Versions
 
@@ -55,35 +54,13 @@ class ReadCrosswalkPermission(HasCrosswalk):
             fhir_id = request.crosswalk.fhir_id(view.version)
         else:
             raise VersionNotMatched('Version not matched in has_object_permission in ReadCrosswalkPermission')
-        try:
-            if request.resource_type == 'Coverage':
-                reference = obj['beneficiary']['reference']
-                reference_id = reference.split('/')[1]
-                if reference_id != fhir_id:
-                    raise exceptions.NotFound()
-            elif request.resource_type == 'ExplanationOfBenefit':
-                reference = obj['patient']['reference']
-                reference_id = reference.split('/')[1]
-                if reference_id != fhir_id:
-                    raise exceptions.NotFound()
-            elif request.resource_type == FHIR_RES_TYPE_AUDIT_EVENT:
-                entity = obj.get('entity', [{}])
-                patient_info = entity[0].get('what', {})
-                reference = patient_info.get('reference', '')
-                reference_id = reference.split('/')[1]
-                if reference_id != fhir_id:
-                    raise exceptions.NotFound()
-            else:
-                reference_id = obj['id']
-                if reference_id != fhir_id:
-                    raise exceptions.NotFound()
-
-        except exceptions.NotFound:
-            raise
-        except Exception:
-            logger.exception('An error occurred fetching beneficiary id')
-            return False
-        return True
+
+        result = check_ownership(request, obj, fhir_id, request.resource_type)
+        if result.status == MISMATCH:
+            raise exceptions.NotFound()
+        if not result.ok:
+            logger.error('Could not tell the beneficiary of a %s read', result.resource_type)
+        return result.ok
 
 
 class SearchCrosswalkPermission(HasCrosswalk):
@@ -120,15 +97,13 @@ class V3EarlyAdopterPermission(permissions.BasePermission):
         if view.version < Versions.V3:
             return True
 
-        token = get_access_token_model().objects.get(token=request._auth)
-        application = get_application_model().objects.get(id=token.application_id)
-        application_user = get_user_model().objects.get(id=application.user_id)
+        context = get_auth_context(request, request._auth)
         flag = get_waffle_flag_model().get('v3_early_adopter')
 
-        if flag.id is None or flag.is_active_for_user(application_user):
+        if flag.id is None or flag.is_active_for_user(context.developer):
             return True
         else:
-            raise PermissionDenied(APPLICATION_DOES_NOT_HAVE_V3_ENABLED_YET.format(application.name))
+            raise PermissionDenied(APPLICATION_DOES_NOT_HAVE_V3_ENABLED_YET.format(context.application.name))
 
 
 class AppScopePermission(permissions.BasePermission):
@@ -148,12 +123,11 @@ class AppScopePermission(permissions.BasePermission):
         if view.version < Versions.V3:
             return True
 
-        token = get_access_token_model().objects.get(token=request._auth)
-        if not token or not token.application_id:
+        context = get_auth_context(request, request._auth)
+        if context is None or context.application is None:
             return False
-        app_scopes = list(
-            ProtectedCapability.objects.filter(application=token.application_id).values_list('slug', flat=True).all()
-        )
+        token = context.token
+        app_scopes = context.capabilities
         # Determine if the request is read, search, or c4dic
         view_name = type(view).__name__.lower()
         request_type = ''
@@ -206,11 +180,9 @@ class V2ExplanationOfBenefitPermission(permissions.BasePermission):
         if view.version == Versions.V3:
             return True
 
-        token = get_access_token_model().objects.get(token=request.auth)
-
-        try:
-            extension = token.accesstokenextension
-        except get_access_token_model().accesstokenextension.RelatedObjectDoesNotExist:
+        context = get_auth_context(request, request.auth)
+        extension = context.extension if context else None
+        if extension is None:
             return True
 
         return extension.include_samhsa and not extension.part_d_eob_only
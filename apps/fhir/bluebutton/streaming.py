@@ -0,0 +1,222 @@
+"""
+Streaming pass-through of BFD responses.
+
+A search Bundle from BFD can hold many large ExplanationOfBenefit resources. Instead of decoding the
+whole body and rendering it again, FhirDataView.stream_data passes the BFD bytes through to the client
+as they arrive. BundleStreamScanner sits in between: it follows the JSON structure of the body without
+building it, and holds back each element of the Bundle's ``entry`` array until it is complete and has
+passed the view's object permission checks. Peak memory is set by the largest entry rather than the
+size of the Bundle, and no entry reaches the client before it has been checked.
+
+A body that is not a Bundle with an ``entry`` array (a read, an empty search) is buffered and checked
+as a whole, the same as the non-streaming path.
+
+Streamed calls are not coalesced with identical concurrent ones (apps.fhir.server.singleflight) and
+their responses have no ETag. Requests with an If-None-Match header are not streamed.
+"""
+
+import codecs
+import json
+import re
+
+from apps.fhir.bluebutton.exceptions import UpstreamServerException
+
+# Size of the chunks read from BFD
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+_STRING_END = re.compile(r'["\\]')
+_ENTRY_START = re.compile(r'[^\s,]')
+
+# A decode error this close to the end of the buffer may just mean the entry has not all arrived yet
+_TRUNCATED_TAIL = 32
+
+_decoder = json.JSONDecoder()
+
+
+class BundleStreamScanner:
+    """
+    Incremental checker for a BFD response body.
+
+    feed() takes the body a chunk at a time and returns the bytes that are safe to send on, close()
+    returns whatever is left once the body is complete. ``check_object`` is called with everything that
+    is sent: the Bundle without its entries, then a single entry Bundle for each entry (so the view's
+    permission classes see the same shape as in the non-streaming path), or with the whole body when it
+    is not streamed. It is expected to raise to stop the response.
+
+    Outside of the entry array the structure is followed one token at a time, inside it each entry is
+    left to the json module's decoder, which finds where the entry ends while parsing it.
+    """
+
+    def __init__(self, check_object):
+        self.check_object = check_object
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        # Text received and not sent yet, the offsets below are relative to it
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.string_start = None
+        # Last string seen directly in the top level object, the key when an array is opened there
+        self.last_key = None
+        # None until the top level object is known to be a Bundle (True) or not (False)
+        self.streaming = None
+        self.in_entries = False
+        self.entry_start = None
+        # Buffered length of the current entry at which to try decoding it again
+        self.decode_at = 0
+        self.entries_checked = 0
+
+    def feed(self, chunk: bytes) -> bytes:
+        self.buffer += self._decode(chunk)
+        if self.streaming is False:
+            return b''
+        self._scan()
+        return self._flush()
+
+    def close(self) -> bytes:
+        self.buffer += self._decode(b'', final=True)
+        if self.streaming is not True:
+            obj = self._loads(self.buffer)
+            self.check_object(obj)
+            self.streaming = False
+            return self.buffer.encode()
+
+        self.decode_at = 0
+        self._scan()
+        if self.depth or self.in_string or self.entry_start is not None:
+            raise UpstreamServerException('Incomplete response from the upstream server')
+        data = self.buffer.encode()
+        self.buffer = ''
+        return data
+
+    def _scan(self):
+        buf = self.buffer
+        pos = self.pos
+        while True:
+            if self.in_entries:
+                self.pos = pos
+                if not self._scan_entries():
+                    return
+                pos = self.pos
+                continue
+
+            if self.in_string:
+                m = _STRING_END.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                i = m.start()
+                if buf[i] == '\\':
+                    if i + 1 == len(buf):
+                        # The escaped character is in the next chunk
+                        pos = i
+                        break
+                    pos = i + 2
+                    continue
+                self.in_string = False
+                pos = i + 1
+                if self.depth == 1:
+                    self.last_key = buf[self.string_start + 1 : i] if i - self.string_start < 32 else None
+                continue
+
+            m = _STRUCTURE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            i = m.start()
+            c = buf[i]
+            pos = i + 1
+
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+            elif c == '{' or c == '[':
+                if self.depth == 1 and c == '[' and self.last_key == 'entry':
+                    if not self._start_entries(i):
+                        # Not a Bundle, keep the rest of the body for close()
+                        break
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth < 0:
+                    raise UpstreamServerException('Malformed response from the upstream server')
+        self.pos = pos
+
+    def _start_entries(self, i):
+        if self.streaming is None:
+            # Everything before the entry array is small, check it as a Bundle with no entries
+            head = self._loads(self.buffer[:i] + '[]}')
+            if not isinstance(head, dict) or head.get('resourceType') != 'Bundle':
+                self.streaming = False
+                return False
+            self.check_object(head)
+            self.streaming = True
+        self.in_entries = True
+        return True
+
+    def _scan_entries(self):
+        """Check the entries that are complete, return True once the entry array has been closed"""
+        buf = self.buffer
+        while True:
+            if self.entry_start is None:
+                m = _ENTRY_START.search(buf, self.pos)
+                if m is None:
+                    self.pos = len(buf)
+                    return False
+                i = m.start()
+                if buf[i] == ']':
+                    self.depth -= 1
+                    self.in_entries = False
+                    self.pos = i + 1
+                    return True
+                if buf[i] != '{':
+                    raise UpstreamServerException('Unexpected Bundle entry from the upstream server')
+                self.entry_start = self.pos = i
+                self.decode_at = 0
+
+            if len(buf) - self.entry_start < self.decode_at:
+                return False
+            try:
+                entry, end = _decoder.raw_decode(buf, self.entry_start)
+            except json.JSONDecodeError as e:
+                if not e.msg.startswith('Unterminated string') and e.pos < len(buf) - _TRUNCATED_TAIL:
+                    raise UpstreamServerException('Malformed response from the upstream server')
+                # Wait until the entry has doubled before decoding it again, to keep large entries linear
+                self.decode_at = 2 * (len(buf) - self.entry_start)
+                return False
+
+            self.check_object({'resourceType': 'Bundle', 'entry': [entry]})
+            self.entries_checked += 1
+            self.entry_start = None
+            self.pos = end
+
+    def _flush(self):
+        if self.streaming is not True:
+            return b''
+        end = self.pos if self.entry_start is None else self.entry_start
+        if self.in_string and self.depth == 1:
+            # Keep a top level key whole so the next entry array is still recognized
+            end = min(end, self.string_start)
+
+        data = self.buffer[:end].encode()
+        self.buffer = self.buffer[end:]
+        self.pos -= end
+        if self.entry_start is not None:
+            self.entry_start -= end
+        if self.in_string:
+            self.string_start -= end
+        return data
+
+    def _decode(self, chunk, final=False):
+        try:
+            return self.text_decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            raise UpstreamServerException('Malformed response from the upstream server')
+
+    @staticmethod
+    def _loads(data):
+        try:
+            return json.loads(data)
+        except ValueError:
+            raise UpstreamServerException('Malformed response from the upstream server')
@@ -0,0 +1,41 @@
+from django.urls import include, path, re_path
+
+from apps.fhir.bluebutton.views.asynchronous import (
+    AsyncReadViewExplanationOfBenefit,
+    AsyncReadViewPatient,
+    AsyncSearchViewExplanationOfBenefit,
+    fhir_waffle_switch,
+)
+
+# Async FHIR views, served the way apps.fhir.bluebutton.v2.urls does when FHIR_SERVER['ASYNC_VIEWS'] is enabled
+fhir_urlpatterns = [
+    re_path(
+        r'Patient/(?P<resource_id>[^/]+)',
+        AsyncReadViewPatient.as_view(version=2),
+        name='bb_oauth_fhir_patient_read_or_update_or_delete_v2',
+    ),
+    re_path(
+        r'ExplanationOfBenefit/(?P<resource_id>[^/]+)',
+        AsyncReadViewExplanationOfBenefit.as_view(version=2),
+        name='bb_oauth_fhir_eob_read_or_update_or_delete_v2',
+    ),
+    re_path(
+        r'ExplanationOfBenefit[/]?',
+        AsyncSearchViewExplanationOfBenefit.as_view(version=2),
+        name='bb_oauth_fhir_eob_search_v2',
+    ),
+]
+
+fhir_urlpatterns_v3 = [
+    re_path(
+        r'Patient/(?P<resource_id>[^/]+)',
+        fhir_waffle_switch('v3_endpoints')(AsyncReadViewPatient.as_view(version=3)),
+        name='bb_oauth_fhir_patient_read_or_update_or_delete_v3',
+    ),
+]
+
+urlpatterns = [
+    path('v2/fhir/', include(fhir_urlpatterns)),
+    path('v3/fhir/', include(fhir_urlpatterns_v3)),
+    path('', include('hhs_oauth_server.urls')),
+]
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+from django.utils import timezone
+from httmock import HTTMock, all_requests
+from oauth2_provider.models import AccessToken, get_application_model
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.bluebutton.activity import ApplicationActivity
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+Application = get_application_model()
+
+
+@all_requests
+def patient(url, req):
+    return {'status_code': 200, 'content': {'resourceType': 'Patient', 'id': DEFAULT_SAMPLE_FHIR_ID_V2}}
+
+
+@patch.dict(fhir_settings.user_settings, {'APP_ACTIVITY_FLUSH_INTERVAL': 3600})
+class TestApplicationActivity(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+        self.application = AccessToken.objects.get(token=self.access_token).application
+
+        self.activity = ApplicationActivity()
+        self.addCleanup(self.activity._stop.set)
+        patcher = patch('apps.fhir.bluebutton.authentication.app_activity', self.activity)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self):
+        with HTTMock(patient):
+            response = self.client.get(
+                f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}',
+                headers={'Authorization': f'Bearer {self.access_token}'},
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_first_active_is_written_right_away(self):
+        self._get()
+
+        self.application.refresh_from_db()
+        self.assertIsNotNone(self.application.first_active)
+        self.assertEqual(self.application.last_active, self.application.first_active)
+        self.assertEqual(self.activity.stats()['pending'], 0)
+
+    def test_last_active_is_written_in_bulk(self):
+        self._get()
+        self.application.refresh_from_db()
+        first_active = self.application.first_active
+
+        self._get()
+        self._get()
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.last_active, first_active)
+        self.assertEqual(self.activity.stats()['pending'], 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.activity.flush(), 1)
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.first_active, first_active)
+        self.assertGreater(self.application.last_active, first_active)
+        self.assertEqual(self.activity.stats(), {'recorded': 2, 'flushes': 1, 'written': 1, 'pending': 0})
+
+    def test_applications_are_coalesced(self):
+        other = self._create_application('other', user=self.application.user)
+        for application in (self.application, other, self.application, other):
+            application.first_active = timezone.now()
+            self.activity.record(application)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.activity.flush(), 2)
+        other.refresh_from_db()
+        self.assertIsNotNone(other.last_active)
+        self.assertEqual(self.activity.flush(), 0)
+
+    def test_failed_flush_is_retried(self):
+        self.application.first_active = timezone.now()
+        self.activity.record(self.application)
+
+        with patch.object(Application.objects, 'bulk_update', side_effect=Exception('database is down')):
+            self.assertEqual(self.activity.flush(), 0)
+        self.assertEqual(self.activity.flush(), 1)
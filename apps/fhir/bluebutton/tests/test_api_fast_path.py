@@ -0,0 +1,82 @@
+import threading
+from http.server import ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from django.test import RequestFactory, override_settings
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.bluebutton.tests.test_cache import StubBFDHandler
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+from hhs_oauth_server.middleware import is_api_fast_path
+
+
+class TestApiFastPath(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings, {'FHIR_URL': f'http://127.0.0.1:{self.server.server_port}'}
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+
+    def _get(self, path):
+        return self.client.get(path, headers={'Authorization': f'Bearer {self.access_token}'})
+
+    def test_api_paths(self):
+        factory = RequestFactory()
+        for path, expected in [
+            (f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}', True),
+            ('/v1/fhir/ExplanationOfBenefit/', True),
+            ('/v3/connect/userinfo', True),
+            ('/v2/o/authorize/', False),
+            ('/v2/accounts/logout', False),
+            ('/health', False),
+        ]:
+            self.assertEqual(is_api_fast_path(factory.get(path)), expected, path)
+
+        with override_settings(API_FAST_PATH_PATTERN=''):
+            self.assertFalse(is_api_fast_path(factory.get('/v2/fhir/Patient/')))
+
+    def test_api_calls_skip_the_browser_middleware(self):
+        # A client that also holds a session cookie
+        self.client.force_login(User.objects.create_user('browser'))
+
+        with (
+            patch.object(SessionMiddleware, 'process_request') as process_request,
+            patch.object(CsrfViewMiddleware, 'process_view') as process_view,
+        ):
+            response = self._get(f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self._get('/v2/connect/userinfo').status_code, 200)
+
+        process_request.assert_not_called()
+        process_view.assert_not_called()
+        self.assertNotIn('Content-Language', response)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+    def test_other_requests_run_the_browser_middleware(self):
+        with patch.object(
+            SessionMiddleware, 'process_request', autospec=True, side_effect=SessionMiddleware.process_request
+        ) as process_request:
+            self.client.get('/health')
+        process_request.assert_called_once()
+
+        with override_settings(API_FAST_PATH_PATTERN=None):
+            response = self._get(f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
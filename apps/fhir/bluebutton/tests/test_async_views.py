@@ -0,0 +1,137 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.test import TestCase, override_settings
+from waffle.testutils import override_switch
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.bluebutton.views.asynchronous import (
+    AsyncReadViewPatient,
+    AsyncSearchViewExplanationOfBenefit,
+    fhir_view,
+)
+from apps.fhir.bluebutton.views.read import ReadViewPatient
+from apps.fhir.bluebutton.views.search import SearchViewExplanationOfBenefit
+from apps.fhir.server.client import async_bfd_client
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+
+class StubBFDHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        status, content = self.server.responses.get(self.path.split('?')[0], (404, {}))
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+PATIENT = {'resourceType': 'Patient', 'id': DEFAULT_SAMPLE_FHIR_ID_V2}
+
+
+@override_settings(ROOT_URLCONF='apps.fhir.bluebutton.tests.async_urls')
+class TestAsyncFhirViews(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.requests = []
+        self.server.responses = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.fhir_url = f'http://127.0.0.1:{self.server.server_port}'
+
+        fhir_settings_patcher = patch.dict(fhir_settings.user_settings, {'FHIR_URL': self.fhir_url})
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def _get(self, path, token=None):
+        response = await self.async_client.get(path, headers={'Authorization': f'Bearer {token or self.access_token}'})
+        await async_bfd_client.aclose()
+        return response
+
+    async def test_read_patient(self):
+        self.server.responses[f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}/'] = (200, PATIENT)
+
+        response = await self._get(f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), PATIENT)
+        path, headers = self.server.requests[0]
+        self.assertEqual(headers['BlueButton-BeneficiaryId'], f'patientId:{DEFAULT_SAMPLE_FHIR_ID_V2}')
+        self.assertEqual(headers['BlueButton-OriginalUrl'], f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+        self.assertEqual(headers['BlueButton-Application'], 'John_Smith_test')
+
+    async def test_search_eob(self):
+        bundle = {'resourceType': 'Bundle', 'entry': []}
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (200, bundle)
+
+        response = await self._get('/v2/fhir/ExplanationOfBenefit/?_count=5')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), bundle)
+        path, headers = self.server.requests[0]
+        self.assertIn(f'patient={DEFAULT_SAMPLE_FHIR_ID_V2}', path)
+        self.assertIn('_count=5', path)
+
+    async def test_object_permissions_are_checked(self):
+        eob = {'resourceType': 'ExplanationOfBenefit', 'patient': {'reference': 'Patient/-20000000000001'}}
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/eob_id/'] = (200, eob)
+
+        response = await self._get('/v2/fhir/ExplanationOfBenefit/eob_id')
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_invalid_token_never_reaches_bfd(self):
+        response = await self._get(f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}', token='bogus')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.server.requests, [])
+
+    async def test_upstream_error(self):
+        self.server.responses[f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}/'] = (500, {})
+
+        response = await self._get(f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+
+        self.assertEqual(response.status_code, 502)
+
+    @override_switch('v3_endpoints', active=False)
+    def test_waffle_switch_on_async_view(self):
+        response = async_to_sync(self._get)(f'/v3/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.server.requests, [])
+
+
+class TestFhirView(TestCase):
+    def test_sync_views_by_default(self):
+        view = fhir_view(ReadViewPatient, version=2)
+
+        self.assertIs(view.view_class, ReadViewPatient)
+        self.assertFalse(iscoroutinefunction(view))
+
+    def test_async_views_when_enabled(self):
+        with patch.dict(fhir_settings.user_settings, {'ASYNC_VIEWS': True}):
+            read_view = fhir_view(ReadViewPatient, version=2)
+            search_view = fhir_view(SearchViewExplanationOfBenefit, version=2)
+
+        self.assertIs(read_view.view_class, AsyncReadViewPatient)
+        self.assertIs(search_view.view_class, AsyncSearchViewExplanationOfBenefit)
+        self.assertTrue(iscoroutinefunction(read_view))
+        self.assertEqual(read_view.view_initkwargs, {'version': 2})
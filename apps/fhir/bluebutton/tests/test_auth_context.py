@@ -0,0 +1,83 @@
+import threading
+from http.server import ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import RequestFactory
+from oauth2_provider.models import AccessToken
+
+from apps.authorization.models import DataAccessGrant
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.dot_ext.auth_context import get_auth_context, set_auth_context
+from apps.fhir.bluebutton.tests.test_cache import StubBFDHandler
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+
+class TestAuthContext(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings, {'FHIR_URL': f'http://127.0.0.1:{self.server.server_port}'}
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+
+    def _get(self):
+        return self.client.get(
+            f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}', headers={'Authorization': f'Bearer {self.access_token}'}
+        )
+
+    def test_context_is_loaded_once(self):
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(1):
+            context = get_auth_context(request, self.access_token)
+            self.assertIs(get_auth_context(request, self.access_token), context)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(context.crosswalk.fhir_id(2), DEFAULT_SAMPLE_FHIR_ID_V2)
+            self.assertEqual(context.developer, context.application.user)
+            self.assertEqual(context.grant.beneficiary, context.beneficiary)
+            self.assertFalse(context.grant.has_expired())
+            self.assertIsNone(context.extension)
+
+        self.assertIsNone(get_auth_context(request, 'unknown'))
+        self.assertIsNone(get_auth_context(request, None))
+
+    def test_set_context_is_used(self):
+        request = RequestFactory().get('/')
+        token = AccessToken.objects.get(token=self.access_token)
+        context = set_auth_context(request, token)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_auth_context(request, token), context)
+
+    def test_queries_per_fhir_request(self):
+        # Loads the waffle switches into the cache and builds the scope catalog
+        self.assertEqual(self._get().status_code, 200)
+
+        # The token with everything related to it and the application activity update, the scopes
+        # known to DOT and those of the request log come from the scope catalog
+        with self.assertNumQueries(2):
+            response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_grant_for_another_application(self):
+        token = AccessToken.objects.get(token=self.access_token)
+        other = self._create_application('other', user=token.application.user)
+        # Without the post_delete signal that would also revoke the token
+        DataAccessGrant.objects.update(application=other)
+
+        self.assertEqual(self._get().status_code, 403)
+        self.assertEqual(self.server.requests, [])
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from oauth2_provider.models import AccessToken
+from waffle.testutils import override_switch
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2, DEFAULT_SAMPLE_FHIR_ID_V3
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+
+class StubBFDHandler(BaseHTTPRequestHandler):
+    """Serves reads and one entry searches, and records how many requests it handled at once"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        time.sleep(self.server.delay)
+
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        if len(parts) == 4:
+            body = {'resourceType': parts[2], 'id': parts[3]}
+        else:
+            resource = {'resourceType': parts[2], 'id': '1'}
+            if parts[2] == 'Coverage':
+                resource['beneficiary'] = {'reference': params['beneficiary'][0]}
+            else:
+                resource['patient'] = {'reference': f'Patient/{params["patient"][0]}'}
+            body = {'resourceType': 'Bundle', 'total': 1, 'entry': [{'resource': resource}]}
+
+        with self.server.lock:
+            self.server.active -= 1
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_switch('v3_endpoints', active=True)
+class TestBatch(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token(
+            'John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2, fhir_id_v3=DEFAULT_SAMPLE_FHIR_ID_V3
+        )
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.lock = threading.Lock()
+        self.server.active = self.server.max_active = 0
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        fhir_url = f'http://127.0.0.1:{self.server.server_port}'
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings, {'FHIR_URL': fhir_url, 'FHIR_URL_V3': fhir_url, 'BATCH_CONCURRENCY': 2}
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+
+    def _batch(self, *urls, method='GET'):
+        bundle = {
+            'resourceType': 'Bundle',
+            'type': 'batch',
+            'entry': [{'request': {'method': method, 'url': url}} for url in urls],
+        }
+        return self.client.post(
+            '/v3/fhir/',
+            json.dumps(bundle),
+            content_type='application/fhir+json',
+            headers={'Authorization': f'Bearer {self.access_token}'},
+        )
+
+    def test_batch(self):
+        response = self._batch(
+            f'Patient/{DEFAULT_SAMPLE_FHIR_ID_V3}',
+            'Coverage',
+            '/v3/fhir/ExplanationOfBenefit?_count=5',
+        )
+        self.assertEqual(response.status_code, 200)
+        bundle = response.json()
+        self.assertEqual(bundle['type'], 'batch-response')
+        self.assertEqual([entry['response']['status'] for entry in bundle['entry']], ['200 OK'] * 3)
+        self.assertEqual(
+            [entry['resource']['resourceType'] for entry in bundle['entry']], ['Patient', 'Bundle', 'Bundle']
+        )
+
+        # Each call gets the parameters of its search view
+        eob = next(parse_qs(urlparse(path).query) for path in self.server.requests if 'ExplanationOfBenefit' in path)
+        self.assertEqual(eob['_count'], ['5'])
+        self.assertEqual(eob['patient'], [DEFAULT_SAMPLE_FHIR_ID_V3])
+        self.assertEqual(eob['_source'], ['NCH,DDPS'])
+
+    def test_failed_entries(self):
+        response = self._batch(
+            'Patient/-30250000000001',
+            'Observation',
+            'Coverage?_count=500',
+            'Coverage',
+        )
+        self.assertEqual(response.status_code, 200)
+        statuses = [entry['response']['status'] for entry in response.json()['entry']]
+        self.assertEqual(statuses, ['404 Not Found', '404 Not Found', '400 Bad Request', '200 OK'])
+        self.assertEqual(response.json()['entry'][1]['response']['outcome']['resourceType'], 'OperationOutcome')
+
+        response = self._batch('Coverage', method='POST')
+        self.assertEqual(response.json()['entry'][0]['response']['status'], '405 Method Not Allowed')
+
+    def test_entries_are_checked_like_separate_calls(self):
+        token = AccessToken.objects.get(token=self.access_token)
+        token.scope = 'patient/Patient.rs patient/Coverage.rs'
+        token.save()
+
+        with override_switch('require-scopes', active=True):
+            response = self._batch('Coverage', 'ExplanationOfBenefit')
+        statuses = [entry['response']['status'] for entry in response.json()['entry']]
+        self.assertEqual(statuses, ['200 OK', '403 Forbidden'])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_limits(self):
+        self.server.delay = 0.2
+        response = self._batch(*['Coverage'] * 4)
+        self.assertEqual(len(response.json()['entry']), 4)
+        self.assertEqual(self.server.max_active, 2)
+
+        with patch.dict(fhir_settings.user_settings, {'BATCH_MAX_ENTRIES': 3}):
+            self.assertEqual(self._batch(*['Coverage'] * 4).status_code, 400)
+
+        response = self.client.post(
+            '/v3/fhir/',
+            json.dumps({'resourceType': 'Bundle', 'type': 'transaction'}),
+            content_type='application/fhir+json',
+            headers={'Authorization': f'Bearer {self.access_token}'},
+        )
+        self.assertEqual(response.status_code, 400)
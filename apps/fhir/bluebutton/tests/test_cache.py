@@ -0,0 +1,193 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+from oauth2_provider.models import AccessToken
+
+from apps.authorization.models import DataAccessGrant
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.bluebutton.cache import FhirResponseCache, response_cache
+from apps.fhir.bluebutton.models import Crosswalk
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+CACHE_SETTINGS = {
+    'RESPONSE_CACHE_TTL': {'Patient': 60, 'ExplanationOfBenefit': 60},
+    'RESPONSE_CACHE_MAX_BYTES': 1000,
+}
+
+
+def prepare(url, **headers):
+    return requests.Request('GET', url, headers=headers).prepare()
+
+
+@patch.dict(fhir_settings.user_settings, CACHE_SETTINGS)
+class TestFhirResponseCache(SimpleTestCase):
+    def setUp(self):
+        self.cache = FhirResponseCache()
+
+    def key(self, url='https://bfd.example.gov/v2/fhir/Patient/?_id=-1', resource_type='Patient', fhir_id='-1'):
+        return self.cache.key(fhir_id, 2, resource_type, prepare(url), False, False)
+
+    def test_key_normalizes_query_parameters(self):
+        self.assertEqual(
+            self.key('https://bfd.example.gov/v2/fhir/Patient/?_id=-1&_format=json'),
+            self.key('https://bfd.example.gov/v2/fhir/Patient/?_format=json&_id=-1'),
+        )
+        self.assertNotEqual(self.key(), self.key(fhir_id='-2'))
+        self.assertNotEqual(
+            self.cache.key('-1', 3, 'ExplanationOfBenefit', prepare('https://bfd.example.gov/'), False, False),
+            self.cache.key('-1', 3, 'ExplanationOfBenefit', prepare('https://bfd.example.gov/'), False, True),
+        )
+
+    def test_key_has_the_forwarded_host_and_scheme(self):
+        # BFD builds the paging links of a Bundle from them
+        url = 'https://bfd.example.gov/v2/fhir/ExplanationOfBenefit/?patient=-1'
+        api = {'X-Forwarded-Host': 'api.bluebutton.cms.gov', 'X-Forwarded-Proto': 'https'}
+        keys = {
+            self.cache.key('-1', 2, 'ExplanationOfBenefit', prepare(url, **headers), False, False)
+            for headers in (
+                api,
+                {**api, 'X-Forwarded-Host': 'sandbox.bluebutton.cms.gov'},
+                {**api, 'X-Forwarded-Proto': 'http'},
+            )
+        }
+        self.assertEqual(len(keys), 3)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get(self.key()))
+        self.cache.set(self.key(), 1, {'resourceType': 'Patient'}, 100)
+
+        self.assertEqual(self.cache.get(self.key()), {'resourceType': 'Patient'})
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries'], stats['bytes']), (1, 1, 1, 100))
+
+    def test_entries_expire(self):
+        with patch('apps.fhir.bluebutton.cache.time.monotonic', return_value=1000):
+            self.cache.set(self.key(), 1, {}, 100)
+        with patch('apps.fhir.bluebutton.cache.time.monotonic', return_value=1059):
+            self.assertIsNotNone(self.cache.get(self.key()))
+        with patch('apps.fhir.bluebutton.cache.time.monotonic', return_value=1060):
+            self.assertIsNone(self.cache.get(self.key()))
+
+        self.assertEqual(self.cache.stats()['expired'], 1)
+        self.assertEqual(self.cache.stats()['bytes'], 0)
+
+    def test_uncached_resource_type(self):
+        key = self.key('https://bfd.example.gov/v2/fhir/Coverage/', resource_type='Coverage')
+        self.cache.set(key, 1, {}, 100)
+
+        self.assertIsNone(self.cache.get(key))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = [self.key(fhir_id=str(i)) for i in range(4)]
+        for key in keys[:3]:
+            self.cache.set(key, 1, {}, 300)
+        self.cache.get(keys[0])
+        self.cache.set(keys[3], 1, {}, 300)
+
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertEqual(self.cache.stats()['evicted'], 1)
+        self.assertEqual(self.cache.stats()['bytes'], 900)
+
+        # Larger than the whole cache
+        self.cache.set(self.key(fhir_id='big'), 1, {}, 1001)
+        self.assertIsNone(self.cache.get(self.key(fhir_id='big')))
+
+    def test_purge_user(self):
+        self.cache.set(self.key(fhir_id='-1'), 1, {}, 100)
+        self.cache.set(self.key(fhir_id='-2'), 2, {}, 100)
+
+        self.cache.purge_user(1)
+
+        self.assertIsNone(self.cache.get(self.key(fhir_id='-1')))
+        self.assertIsNotNone(self.cache.get(self.key(fhir_id='-2')))
+        self.assertEqual(self.cache.stats()['purged'], 1)
+
+
+class StubBFDHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = json.dumps({'resourceType': 'Patient', 'id': DEFAULT_SAMPLE_FHIR_ID_V2}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCachedFhirViews(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+        self.user = AccessToken.objects.get(token=self.access_token).user
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings, {'FHIR_URL': f'http://127.0.0.1:{self.server.server_port}', **CACHE_SETTINGS}
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+        self.addCleanup(response_cache.clear)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, path=f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}'):
+        return self.client.get(path, headers={'Authorization': f'Bearer {self.access_token}'})
+
+    def test_repeated_read_is_served_from_the_cache(self):
+        first = self._get()
+        second = self._get()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_uncached_resource_type_has_no_header(self):
+        response = self._get('/v2/fhir/Coverage/')
+
+        self.assertNotIn('X-Cache', response)
+
+    def test_crosswalk_change_purges_the_cache(self):
+        self._get()
+        Crosswalk.objects.get(user=self.user).save()
+
+        self.assertEqual(self._get()['X-Cache'], 'MISS')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_grant_delete_purges_the_cache(self):
+        self._get()
+        self.assertEqual(response_cache.stats()['entries'], 1)
+
+        DataAccessGrant.objects.filter(beneficiary=self.user).delete()
+
+        self.assertEqual(response_cache.stats()['entries'], 0)
+        self.assertEqual(self._get().status_code, 401)
+
+    def test_token_revoke_purges_the_cache(self):
+        self._get()
+        self.assertEqual(response_cache.stats()['entries'], 1)
+
+        AccessToken.objects.get(token=self.access_token).revoke()
+
+        self.assertEqual(response_cache.stats()['entries'], 0)
+        self.assertEqual(self._get().status_code, 401)
@@ -0,0 +1,119 @@
+import json
+import time
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+from httmock import HTTMock, urlmatch
+
+from apps.fhir.bluebutton.capability import CAPABILITY_RETRY_INTERVAL, capability_statements
+from apps.fhir.bluebutton.tests.data_conformance import CONFORMANCE
+from apps.fhir.server.settings import fhir_settings
+
+
+class StubMetadata:
+    """BFD's metadata endpoint, counting calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.status_code = 200
+        self.publisher = 'Not provided'
+
+    def __call__(self, url, request):
+        self.calls += 1
+        statement = json.loads(CONFORMANCE)
+        statement['publisher'] = self.publisher
+        return {'status_code': self.status_code, 'content': json.dumps(statement) if self.status_code == 200 else ''}
+
+
+class TestCapabilityStatement(TestCase):
+    def setUp(self):
+        self.bfd = StubMetadata()
+        mock = HTTMock(urlmatch(path=r'/v2/fhir/metadata')(self.bfd))
+        mock.__enter__()
+        self.addCleanup(mock.__exit__, None, None, None)
+        capability_statements.clear()
+        self.addCleanup(capability_statements.clear)
+
+    def _get(self, **headers):
+        return self.client.get(reverse('fhir_conformance_metadata_v2'), headers=headers)
+
+    def _wait_for_refresh(self, refreshes=1):
+        for _ in range(200):
+            if capability_statements.stats()['refreshes'] >= refreshes:
+                return
+            time.sleep(0.01)
+        self.fail('The CapabilityStatement was not refreshed')
+
+    def test_statement_is_built_once(self):
+        first = self._get()
+        second = self._get()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], 'application/json')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.bfd.calls, 1)
+
+        statement = first.json()
+        self.assertEqual(statement['format'], ['application/json', 'application/fhir+json'])
+        self.assertIn('security', statement['rest'][0])
+        self.assertNotIn('vision', [resource['type'] for resource in statement['rest'][0]['resource']])
+
+    def test_if_none_match(self):
+        etag = self._get()['ETag']
+
+        response = self._get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        self.assertEqual(self._get(if_none_match='"stale"').status_code, 200)
+
+    def test_stale_statement_is_refreshed_in_the_background(self):
+        first = self._get()
+        self.bfd.publisher = 'BFD'
+
+        later = time.monotonic() + fhir_settings.capability_refresh_interval
+        with patch('apps.fhir.bluebutton.capability.time.monotonic', return_value=later):
+            # Served from memory while the refresh runs
+            self.assertEqual(self._get()['ETag'], first['ETag'])
+            self._wait_for_refresh()
+
+            refreshed = self._get()
+        self.assertEqual(refreshed.json()['publisher'], 'BFD')
+        self.assertNotEqual(refreshed['ETag'], first['ETag'])
+        self.assertEqual(self.bfd.calls, 2)
+
+    def test_last_good_statement_is_kept_when_bfd_fails(self):
+        first = self._get()
+        self.bfd.status_code = 500
+
+        later = time.monotonic() + fhir_settings.capability_refresh_interval
+        with patch('apps.fhir.bluebutton.capability.time.monotonic', return_value=later):
+            self._get()
+            self._wait_for_refresh()
+            self.assertEqual(self._get().content, first.content)
+        self.assertEqual(capability_statements.stats()['refresh_errors'], 1)
+
+        # Tried again after the retry interval
+        with patch('apps.fhir.bluebutton.capability.time.monotonic', return_value=later + CAPABILITY_RETRY_INTERVAL):
+            self._get()
+            self._wait_for_refresh(2)
+        self.assertEqual(self.bfd.calls, 3)
+
+    def test_first_error_is_returned_and_not_kept(self):
+        self.bfd.status_code = 502
+
+        self.assertEqual(self._get().status_code, 502)
+        self.bfd.status_code = 200
+        self.assertEqual(self._get().status_code, 200)
+        self.assertEqual(self.bfd.calls, 2)
+
+    @patch.dict(fhir_settings.user_settings, {'CAPABILITY_REFRESH_INTERVAL': 0})
+    def test_disabled(self):
+        self._get()
+        self._get()
+
+        self.assertEqual(self.bfd.calls, 2)
+        self.assertEqual(capability_statements.stats()['statements'], 0)
@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.bluebutton.conditional import bfd_validators, conditional_headers, make_etag, validator_cache
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+PATIENT = {
+    'resourceType': 'Patient',
+    'id': DEFAULT_SAMPLE_FHIR_ID_V2,
+    'meta': {'versionId': '7', 'lastUpdated': '2024-05-01T12:00:00.000+00:00'},
+}
+
+
+class StubBFDHandler(BaseHTTPRequestHandler):
+    """Serves PATIENT, with a 304 when asked for it with its versionId"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == 'W/"7"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(PATIENT).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConditionalHelpers(SimpleTestCase):
+    def test_etag(self):
+        etag = make_etag(PATIENT, 'application/fhir+json')
+        self.assertEqual(etag, make_etag(dict(PATIENT), 'application/fhir+json'))
+        self.assertNotEqual(etag, make_etag(PATIENT, 'application/json'))
+        self.assertNotEqual(etag, make_etag({**PATIENT, 'id': '-1'}, 'application/fhir+json'))
+
+    def test_conditional_headers(self):
+        self.assertEqual(
+            conditional_headers(bfd_validators(PATIENT)),
+            {'If-None-Match': 'W/"7"', 'If-Modified-Since': 'Wed, 01 May 2024 12:00:00 GMT'},
+        )
+        self.assertIsNone(bfd_validators({'resourceType': 'Bundle'}))
+
+
+class TestConditionalRequests(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings, {'FHIR_URL': f'http://127.0.0.1:{self.server.server_port}'}
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+        validator_cache.clear()
+        self.addCleanup(validator_cache.clear)
+
+    def _get(self, **headers):
+        return self.client.get(
+            f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}',
+            headers={'Authorization': f'Bearer {self.access_token}', **headers},
+        )
+
+    def test_if_none_match(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, make_etag(response.json(), 'application/fhir+json'))
+        self.assertNotIn('If-None-Match', self.server.requests[0])
+
+        # BFD is asked for a 304 with the resource's validators, and it is passed on without a body
+        with patch('apps.fhir.bluebutton.views.generic.FhirDataView.handle_backend_response') as handle:
+            response = self._get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        handle.assert_not_called()
+        self.assertEqual(self.server.requests[1]['If-None-Match'], 'W/"7"')
+        self.assertEqual(self.server.requests[1]['If-Modified-Since'], 'Wed, 01 May 2024 12:00:00 GMT')
+        self.assertEqual(validator_cache.stats()['not_modified'], 1)
+
+        # Other ETags are not sent upstream
+        response = self._get(if_none_match='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('If-None-Match', self.server.requests[2])
+
+    def test_unknown_etag_of_unchanged_data(self):
+        etag = self._get()['ETag']
+        validator_cache.clear()
+
+        with patch('apps.fhir.bluebutton.views.generic.Response') as response_class:
+            response = self._get(if_none_match=f'"other", {etag}')
+        self.assertEqual(response.status_code, 304)
+        response_class.assert_not_called()
+        self.assertNotIn('If-None-Match', self.server.requests[1])
@@ -0,0 +1,207 @@
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+from waffle.testutils import override_switch
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2, DEFAULT_SAMPLE_FHIR_ID_V3
+from apps.dot_ext.models import AccessTokenExtension
+from apps.fhir.bluebutton.models import ExportJob
+from apps.fhir.constants import EXCLUDE_SAMHSA_PARAMETER_VALUE
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+# Resources the stub BFD has of each type
+TOTALS = {'Patient': 1, 'Coverage': 4, 'ExplanationOfBenefit': 7}
+
+
+class StubBFDSearchHandler(BaseHTTPRequestHandler):
+    """Serves paged search Bundles of TOTALS resources"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        resource_type = url.path.rstrip('/').rsplit('/', 1)[-1]
+        start, count = int(params.get('startIndex', ['0'])[0]), int(params['_count'][0])
+        ids = range(start, min(start + count, TOTALS[resource_type]))
+        body = json.dumps(
+            {
+                'resourceType': 'Bundle',
+                'total': TOTALS[resource_type],
+                'entry': [{'resource': self.resource(resource_type, str(i), params)} for i in ids],
+            }
+        ).encode()
+        self.send_response(500 if resource_type in self.server.failing else 200)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def resource(self, resource_type, id, params):
+        # For the beneficiary of the search, as the object permission checks expect
+        if resource_type == 'Patient':
+            return {'resourceType': 'Patient', 'id': params['_id'][0]}
+        if resource_type == 'Coverage':
+            return {'resourceType': 'Coverage', 'id': id, 'beneficiary': {'reference': params['beneficiary'][0]}}
+        return {'resourceType': resource_type, 'id': id, 'patient': {'reference': f'Patient/{params["patient"][0]}'}}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestExport(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token(
+            'John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2, fhir_id_v3=DEFAULT_SAMPLE_FHIR_ID_V3
+        )
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDSearchHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.failing = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        fhir_url = f'http://127.0.0.1:{self.server.server_port}'
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings,
+            {
+                'FHIR_URL': fhir_url,
+                'FHIR_URL_V3': fhir_url,
+                'EXPORT_WORKERS': 0,
+                'EXPORT_PAGE_SIZE': 3,
+                'EXPORT_ROOT': export_root.name,
+            },
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+
+    def _request(self, method, path, **headers):
+        return getattr(self.client, method)(path, headers={'Authorization': f'Bearer {self.access_token}', **headers})
+
+    def _kick_off(self, path='/v2/fhir/Patient/$export'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._request('get', path, Prefer='respond-async')
+
+    def test_export(self):
+        response = self._kick_off('/v2/fhir/Patient/$export?_since=2024-01-01T00:00:00Z')
+        self.assertEqual(response.status_code, 202)
+        status_url = response['Content-Location']
+        self.assertIn('/v2/fhir/$export-status/', status_url)
+
+        response = self._request('get', status_url)
+        self.assertEqual(response.status_code, 200)
+        manifest = response.json()
+        self.assertTrue(manifest['requiresAccessToken'])
+        self.assertEqual(
+            [(output['type'], output['count']) for output in manifest['output']],
+            [('Patient', 1), ('Coverage', 4), ('ExplanationOfBenefit', 7)],
+        )
+
+        response = self._request('get', manifest['output'][2]['url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/fhir+ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [str(i) for i in range(7)])
+
+        # Pages of up to EXPORT_PAGE_SIZE resources, for the token's beneficiary
+        eob_requests = [
+            parse_qs(urlparse(path).query) for path in self.server.requests if 'ExplanationOfBenefit' in path
+        ]
+        self.assertEqual(sorted(int(params.get('startIndex', ['0'])[0]) for params in eob_requests), [0, 3, 6])
+        for params in eob_requests:
+            self.assertEqual(params['patient'], [DEFAULT_SAMPLE_FHIR_ID_V2])
+            self.assertEqual(params['_lastUpdated'], ['ge2024-01-01T00:00:00Z'])
+
+        response = self._request('delete', status_url)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertEqual(self._request('get', status_url).status_code, 404)
+
+    @override_switch('v3_endpoints', active=True)
+    def test_v3_export_filters_like_search(self):
+        token = AccessToken.objects.get(token=self.access_token)
+        AccessTokenExtension.objects.create(access_token=token, include_samhsa=False, part_d_eob_only=True)
+
+        response = self._kick_off('/v3/fhir/Patient/$export?_type=ExplanationOfBenefit')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ExportJob.objects.get().resource_types, ['ExplanationOfBenefit'])
+
+        for path in self.server.requests:
+            params = parse_qs(urlparse(path).query)
+            self.assertEqual(params['_security:not'], [EXCLUDE_SAMHSA_PARAMETER_VALUE])
+            self.assertEqual(params['_source'], ['DDPS'])
+            self.assertEqual(params['patient'], [DEFAULT_SAMPLE_FHIR_ID_V3])
+
+    def test_kick_off_validation(self):
+        self.assertEqual(self._request('get', '/v2/fhir/Patient/$export').status_code, 400)
+        self.assertEqual(self._kick_off('/v2/fhir/Patient/$export?_type=Observation').status_code, 400)
+        self.assertEqual(self._kick_off('/v2/fhir/Patient/$export?_outputFormat=text/csv').status_code, 400)
+        self.assertEqual(self._kick_off('/v2/fhir/Patient/$export?_since=yesterday').status_code, 400)
+
+        # Denied for an explicitly requested type, left out otherwise
+        token = AccessToken.objects.get(token=self.access_token)
+        token.scope = 'patient/Patient.read patient/Coverage.read'
+        token.save()
+        with override_switch('require-scopes', active=True):
+            self.assertEqual(self._kick_off('/v2/fhir/Patient/$export?_type=ExplanationOfBenefit').status_code, 403)
+            self.assertEqual(self._kick_off().status_code, 202)
+        self.assertEqual(ExportJob.objects.get().resource_types, ['Patient', 'Coverage'])
+
+    def test_running_and_failed_jobs(self):
+        with patch('apps.fhir.bluebutton.views.export.export_runner.submit'):
+            status_url = self._kick_off()['Content-Location']
+
+        response = self._request('get', status_url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(response['X-Progress'], ExportJob.ACCEPTED)
+        # One running export per beneficiary and application
+        self.assertEqual(self._kick_off().status_code, 429)
+
+        # A job its process stopped updating has failed
+        ExportJob.objects.update(updated_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self._request('get', status_url).status_code, 500)
+
+        ExportJob.objects.all().delete()
+        self.server.failing.add('Coverage')
+        status_url = self._kick_off()['Content-Location']
+        response = self._request('get', status_url)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['resourceType'], 'OperationOutcome')
+
+    def test_jobs_are_only_visible_to_their_token(self):
+        status_url = self._kick_off()['Content-Location']
+        job = ExportJob.objects.get()
+
+        access_token = self.access_token
+        self.access_token = self.create_token(
+            'Jane',
+            'Doe',
+            fhir_id_v2='-20140000008326',
+            fhir_id_v3='-30250000008326',
+            hicn_hash='1' * 64,
+            mbi=self._generate_random_mbi(),
+        )
+        self.assertEqual(self._request('get', status_url).status_code, 404)
+        self.assertEqual(self._request('get', f'/v2/fhir/$export-file/{job.pk}/Patient').status_code, 404)
+
+        # Expired jobs are deleted
+        ExportJob.objects.update(finished_at=timezone.now() - timedelta(days=2))
+        self.access_token = access_token
+        self.assertEqual(self._request('get', status_url).status_code, 404)
+        self.assertFalse(ExportJob.objects.exists())
@@ -0,0 +1,99 @@
+import datetime
+import io
+import json
+import os
+from collections import OrderedDict
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+from rest_framework import parsers, renderers
+
+from apps.fhir import json_codec
+from apps.fhir.parsers import FHIRParser
+from apps.fhir.renderers import FHIRRenderer
+
+FIXTURE_DIRS = ['fhir_resources', 'sample_requests', 'sample_responses']
+
+# Each its own document, one needing the stdlib would make it encode the others too
+FLOATS = [0.1, 1e-05, 1.2345e-07, 1e-10, 0.0001, 1e16, 2.5e21, 1.5e300, -0.0, 123456789012345.67]
+
+EDGE_CASES = [
+    *({'total': {'value': value}} for value in FLOATS),
+    {'int': [2**63, 2**64, -(2**63) - 1, 10**30]},
+    {'text': ['café', '\u2028\u2029', '\x00\x1f\x7f"\\/', '\U0001f600']},
+    {'null': None, 'bool': [True, False]},
+    {'types': [datetime.datetime(2024, 5, 1, 12), datetime.date(2024, 5, 1), Decimal('1.10')]},
+    OrderedDict([('b', 1), ('a', 2)]),
+    {1: 'non string key'},
+    [],
+    'string',
+]
+
+
+def fixtures():
+    base = os.path.dirname(__file__)
+    for name in FIXTURE_DIRS:
+        for file_name in sorted(os.listdir(os.path.join(base, name))):
+            with open(os.path.join(base, name, file_name), 'rb') as f:
+                yield file_name, f.read()
+
+
+class TestJSONCodec(SimpleTestCase):
+    def assertRendersLikeDRF(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FHIRRenderer().render(data, accepted_media_type),
+            renderers.JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_fixtures(self):
+        for file_name, content in fixtures():
+            with self.subTest(file_name):
+                data = json.loads(content)
+                self.assertRendersLikeDRF(data)
+                self.assertRendersLikeDRF(data, 'application/fhir+json; indent=4')
+                self.assertEqual(FHIRParser().parse(io.BytesIO(content)), data)
+                self.assertEqual(json_codec.response_json(Mock(content=content)), data)
+
+    def test_edge_cases(self):
+        for data in EDGE_CASES:
+            with self.subTest(data):
+                self.assertRendersLikeDRF(data)
+                for args in [{}, {'separators': (',', ':')}, {'separators': (',', ':'), 'sort_keys': True}]:
+                    self.assertEqual(
+                        json_codec.dumps(data, default=str, **args), json.dumps(data, default=str, **args).encode()
+                    )
+
+        with self.assertRaises(ValueError):
+            FHIRRenderer().render({'nan': float('nan')})
+
+    def test_orjson_exponents(self):
+        # What orjson writes for these depends on its version
+        for encoded in [b'{"a":1e16}', b'{"a":2.5e21}', b'{"a":1e-7}', b'{"a":0.00001}']:
+            with self.subTest(encoded):
+                self.assertFalse(json_codec.is_stdlib_output(encoded, True))
+        for encoded in [b'{"a":1e+16}', b'{"a":1e-10}', b'{"a":"e1"}', b'{"a":0.0001}']:
+            with self.subTest(encoded):
+                self.assertTrue(json_codec.is_stdlib_output(encoded, True))
+
+    def test_decode_fallback(self):
+        for content in [b'{"a": 1e400, "b": NaN}', b'{"a": "\\ud800"}', '{"a": "é"}'.encode('latin-1')]:
+            r = Mock(content=content)
+            r.json.side_effect = lambda content=content: json.loads(content.decode('latin-1'))
+            with self.subTest(content):
+                self.assertEqual(json_codec.response_json(r), r.json())
+
+        with self.assertRaisesRegex(parsers.ParseError, 'JSON parse error - Out of range float'):
+            FHIRParser().parse(io.BytesIO(b'{"a": NaN}'))
+        self.assertEqual(FHIRParser().parse(io.BytesIO(b'{"a": %d}' % 2**70)), {'a': 2**70})
+        self.assertEqual(
+            FHIRParser().parse(io.BytesIO('{"a": "é"}'.encode('latin-1')), parser_context={'encoding': 'latin-1'}),
+            {'a': 'é'},
+        )
+
+    def test_without_orjson(self):
+        with patch.object(json_codec, 'orjson', None):
+            for file_name, content in fixtures():
+                data = json.loads(content)
+                self.assertRendersLikeDRF(data)
+                self.assertEqual(FHIRParser().parse(io.BytesIO(content)), data)
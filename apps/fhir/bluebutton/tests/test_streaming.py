@@ -0,0 +1,258 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import NotFound
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.bluebutton.exceptions import UpstreamServerException
+from apps.fhir.bluebutton.streaming import BundleStreamScanner
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+
+def eob(patient_id, **extra):
+    return {
+        'resourceType': 'ExplanationOfBenefit',
+        'id': 'carrier--%s' % len(extra),
+        'patient': {'reference': 'Patient/%s' % patient_id},
+        **extra,
+    }
+
+
+def bundle(*resources, **extra):
+    return {
+        'resourceType': 'Bundle',
+        'type': 'searchset',
+        'total': len(resources),
+        **extra,
+        'entry': [{'resource': resource} for resource in resources],
+    }
+
+
+class TestBundleStreamScanner(SimpleTestCase):
+    def setUp(self):
+        self.checked = []
+
+    def check_object(self, obj):
+        self.checked.append(obj)
+        for entry in obj.get('entry', []):
+            if entry['resource']['patient']['reference'] != 'Patient/-1':
+                raise NotFound()
+
+    def scan(self, body, chunk_size=7):
+        scanner = BundleStreamScanner(self.check_object)
+        out = b''.join(scanner.feed(body[i : i + chunk_size]) for i in range(0, len(body), chunk_size))
+        return out + scanner.close(), scanner
+
+    def test_bundle_is_passed_through_and_checked_per_entry(self):
+        data = bundle(eob(-1, text='a "quoted" } ] { [ \\ value'), eob(-1, text='é☃'), link=[{'url': 'x'}])
+        head = {**data, 'entry': []}
+        # Members after the entry array are passed through as well
+        data['signature'] = {'type': []}
+        for body in (json.dumps(data).encode(), json.dumps(data, indent=2, ensure_ascii=False).encode()):
+            for chunk_size in (1, 7, 4096):
+                self.checked = []
+                out, scanner = self.scan(body, chunk_size)
+
+                self.assertEqual(out, body)
+                self.assertEqual(scanner.entries_checked, 2)
+                self.assertEqual(self.checked[0], head)
+                self.assertEqual(self.checked[1], {'resourceType': 'Bundle', 'entry': [data['entry'][0]]})
+                self.assertEqual(self.checked[2], {'resourceType': 'Bundle', 'entry': [data['entry'][1]]})
+
+    def test_entry_is_not_sent_before_it_is_checked(self):
+        body = json.dumps(bundle(eob(-1), eob(-2))).encode()
+        scanner = BundleStreamScanner(self.check_object)
+        second_entry = body.rindex(b'{"resource"')
+
+        sent = scanner.feed(body[: second_entry + 20])
+        self.assertTrue(sent.endswith(b', '))
+        with self.assertRaises(NotFound):
+            scanner.feed(body[second_entry + 20 :])
+
+    def test_buffered_entry_is_bounded_by_the_entry(self):
+        body = json.dumps(bundle(*[eob(-1, text='x' * 1000) for _ in range(50)])).encode()
+        scanner = BundleStreamScanner(self.check_object)
+        largest = 0
+        for i in range(0, len(body), 512):
+            scanner.feed(body[i : i + 512])
+            largest = max(largest, len(scanner.buffer))
+        scanner.close()
+
+        self.assertLess(largest, 2 * 1024 + 512)
+
+    def test_resource_is_checked_whole(self):
+        body = json.dumps({'resourceType': 'Patient', 'id': '-1'}).encode()
+        out, scanner = self.scan(body)
+
+        self.assertEqual(out, body)
+        self.assertEqual(self.checked, [{'resourceType': 'Patient', 'id': '-1'}])
+        self.assertEqual(scanner.entries_checked, 0)
+
+    def test_bundle_without_entries(self):
+        body = json.dumps({'resourceType': 'Bundle', 'type': 'searchset', 'total': 0}).encode()
+        out, scanner = self.scan(body)
+
+        self.assertEqual(out, body)
+        self.assertEqual(len(self.checked), 1)
+
+    def test_entry_array_in_another_resource_is_not_streamed(self):
+        body = json.dumps({'resourceType': 'Patient', 'entry': [{'resource': eob(-2)}]}).encode()
+        scanner = BundleStreamScanner(self.check_object)
+
+        self.assertEqual(scanner.feed(body), b'')
+        with self.assertRaises(NotFound):
+            scanner.close()
+
+    def test_entries_must_be_objects(self):
+        for entries in (b'[1]', b'["a"]', b'[[]]', b'[{"resource": %s}, null]' % json.dumps(eob(-1)).encode()):
+            with self.assertRaises(UpstreamServerException):
+                self.scan(b'{"resourceType": "Bundle", "entry": %s}' % entries)
+
+    def test_malformed_or_truncated_body(self):
+        body = json.dumps(bundle(eob(-1), eob(-1))).encode()
+        for bad in (body[:-1], body[:-20], b'', b'{"resourceType": "Bundle", "entry": [{"resource": }]}'):
+            with self.assertRaises(UpstreamServerException):
+                self.scan(bad)
+
+
+class StubBFDHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status, body = self.server.responses.get(self.path.split('?')[0], (404, b'{}'))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestStreamedFhirViews(BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBFDHandler)
+        self.server.daemon_threads = True
+        self.server.responses = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        fhir_settings_patcher = patch.dict(
+            fhir_settings.user_settings,
+            {'FHIR_URL': f'http://127.0.0.1:{self.server.server_port}', 'STREAM_RESPONSES': True},
+        )
+        fhir_settings_patcher.start()
+        self.addCleanup(fhir_settings_patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, path):
+        return self.client.get(path, headers={'Authorization': f'Bearer {self.access_token}'})
+
+    def test_search_is_streamed(self):
+        body = json.dumps(bundle(eob(DEFAULT_SAMPLE_FHIR_ID_V2), eob(DEFAULT_SAMPLE_FHIR_ID_V2)), indent=2).encode()
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (200, body)
+
+        with patch('apps.logging.signals.FHIRResponse') as fhir_response:
+            response = self._get('/v2/fhir/ExplanationOfBenefit/')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/fhir+json')
+            fhir_response.assert_not_called()
+
+            self.assertEqual(b''.join(response.streaming_content), body)
+
+        # post_fetch is sent once the whole body has been read
+        backend_response = fhir_response.call_args.args[0]
+        self.assertEqual(backend_response.streamed_size, len(body))
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=0)
+    def test_request_log_has_the_streamed_size(self):
+        body = json.dumps(bundle(eob(DEFAULT_SAMPLE_FHIR_ID_V2)), indent=2).encode()
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (200, body)
+
+        with self.assertLogs('audit.hhs_oauth_server.request_logging') as logs:
+            response = self._get('/v2/fhir/ExplanationOfBenefit/')
+            # Not before the body has been sent
+            self.assertEqual(logs.records, [])
+            self.assertEqual(b''.join(response.streaming_content), body)
+            response.close()
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(json.loads(logs.records[0].getMessage())['size'], len(body))
+
+    def test_conditional_request_is_not_streamed(self):
+        body = json.dumps(bundle(eob(DEFAULT_SAMPLE_FHIR_ID_V2))).encode()
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (200, body)
+
+        response = self.client.get(
+            '/v2/fhir/ExplanationOfBenefit/',
+            headers={'Authorization': f'Bearer {self.access_token}', 'If-None-Match': '"stale"'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        etag = response['ETag']
+
+        response = self.client.get(
+            '/v2/fhir/ExplanationOfBenefit/',
+            headers={'Authorization': f'Bearer {self.access_token}', 'If-None-Match': etag},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_read_is_passed_through(self):
+        body = json.dumps({'resourceType': 'Patient', 'id': DEFAULT_SAMPLE_FHIR_ID_V2}).encode()
+        self.server.responses[f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}/'] = (200, body)
+
+        response = self._get(f'/v2/fhir/Patient/{DEFAULT_SAMPLE_FHIR_ID_V2}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), body)
+
+    def test_read_for_another_beneficiary(self):
+        body = json.dumps(eob('-20000000000001')).encode()
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/eob_id/'] = (200, body)
+
+        response = self._get('/v2/fhir/ExplanationOfBenefit/eob_id')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_first_entry_for_another_beneficiary(self):
+        body = json.dumps(bundle(eob('-20000000000001'), eob(DEFAULT_SAMPLE_FHIR_ID_V2))).encode()
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (200, body)
+
+        response = self._get('/v2/fhir/ExplanationOfBenefit/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_later_entry_for_another_beneficiary_aborts_the_response(self):
+        # Large enough for the last entry to be read after the response has started
+        entries = [eob(DEFAULT_SAMPLE_FHIR_ID_V2, text='x' * 10000) for _ in range(10)]
+        body = json.dumps(bundle(*entries, eob('-20000000000001'))).encode()
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (200, body)
+
+        response = self._get('/v2/fhir/ExplanationOfBenefit/')
+        self.assertEqual(response.status_code, 200)
+
+        sent = []
+        with self.assertRaises(NotFound):
+            for data in response.streaming_content:
+                sent.append(data)
+        self.assertNotIn(b'-20000000000001', b''.join(sent))
+
+    def test_upstream_error(self):
+        self.server.responses['/v2/fhir/ExplanationOfBenefit/'] = (500, b'{}')
+
+        response = self._get('/v2/fhir/ExplanationOfBenefit/')
+
+        self.assertEqual(response.status_code, 502)
@@ -465,21 +465,17 @@ class PatientMatchResponseJsonTestCase(BaseApiTest):
         with pytest.raises(Exception):
             get_patient_match_response_json(url=url, json=json_payload, headers=headers, method='POST')
 
-    def _make_mock_session(self, response_json=None):
-        """Helper to build a mock requests.Session that returns a successful response."""
+    def _make_mock_response(self, response_json=None):
+        """Helper to build a mock BFD response for a successful call."""
         mock_response = MagicMock()
         mock_response.raise_for_status.return_value = None
         mock_response.json.return_value = response_json or {}
-        mock_session = MagicMock()
-        mock_session.send.return_value = mock_response
-        return mock_session
+        return mock_response
 
-    @patch('apps.fhir.bluebutton.utils.requests.Session')
-    @patch('apps.fhir.bluebutton.utils.FhirServerAuth')
-    def test_http_scheme_allowed_on_local_env(self, mock_auth, mock_session_cls):
+    @patch('apps.fhir.bluebutton.utils.bfd_client')
+    def test_http_scheme_allowed_on_local_env(self, mock_bfd_client):
         """http is permitted when TARGET_ENV == 'local'."""
-        mock_auth.return_value = {'cert_file': '', 'key_file': ''}
-        mock_session_cls.return_value = self._make_mock_session()
+        mock_bfd_client.send.return_value = self._make_mock_response()
 
         fhir_v3_host = settings.MOCK_FHIR_V3_ENDPOINT_HOSTNAME
         url = f'http://{fhir_v3_host}/v3/fhir/Patient/$match'
@@ -489,12 +485,10 @@ class PatientMatchResponseJsonTestCase(BaseApiTest):
             result = get_patient_match_response_json(url=url, json={}, headers={}, method='POST')
         self.assertEqual(result, {})
 
-    @patch('apps.fhir.bluebutton.utils.requests.Session')
-    @patch('apps.fhir.bluebutton.utils.FhirServerAuth')
-    def test_http_scheme_allowed_when_target_env_unset(self, mock_auth, mock_session_cls):
+    @patch('apps.fhir.bluebutton.utils.bfd_client')
+    def test_http_scheme_allowed_when_target_env_unset(self, mock_bfd_client):
         """http is permitted when TARGET_ENV is not set (treated as local)."""
-        mock_auth.return_value = {'cert_file': '', 'key_file': ''}
-        mock_session_cls.return_value = self._make_mock_session()
+        mock_bfd_client.send.return_value = self._make_mock_response()
 
         fhir_v3_host = settings.MOCK_FHIR_V3_ENDPOINT_HOSTNAME
         url = f'http://{fhir_v3_host}/v3/fhir/Patient/$match'
@@ -504,12 +498,10 @@ class PatientMatchResponseJsonTestCase(BaseApiTest):
             result = get_patient_match_response_json(url=url, json={}, headers={}, method='POST')
         self.assertEqual(result, {})
 
-    @patch('apps.fhir.bluebutton.utils.requests.Session')
-    @patch('apps.fhir.bluebutton.utils.FhirServerAuth')
-    def test_https_scheme_allowed_on_non_local_env(self, mock_auth, mock_session_cls):
+    @patch('apps.fhir.bluebutton.utils.bfd_client')
+    def test_https_scheme_allowed_on_non_local_env(self, mock_bfd_client):
         """https is always permitted regardless of TARGET_ENV."""
-        mock_auth.return_value = {'cert_file': '', 'key_file': ''}
-        mock_session_cls.return_value = self._make_mock_session()
+        mock_bfd_client.send.return_value = self._make_mock_response()
 
         fhir_v3_host = settings.MOCK_FHIR_V3_ENDPOINT_HOSTNAME
         url = f'https://{fhir_v3_host}/v3/fhir/Patient/$match'
@@ -529,11 +521,9 @@ class PatientMatchResponseJsonTestCase(BaseApiTest):
     ],
     ids=['wrong_netloc_local', 'wrong_netloc_non_local', 'http_scheme_test', 'http_scheme_prod'],
 )
-@patch('apps.fhir.bluebutton.utils.FhirServerAuth')
-def test_invalid_url_rejected(mock_auth, url, target_env):
+@patch('apps.fhir.bluebutton.utils.bfd_client')
+def test_invalid_url_rejected(mock_bfd_client, url, target_env):
     """URLs with wrong netloc or http scheme on non-local envs are rejected."""
-    mock_auth.return_value = {'cert_file': '', 'key_file': ''}
-
     with patch.dict(os.environ, {'TARGET_ENV': target_env}):
         with pytest.raises(ValueError, match='URL does not match the configured FHIR server'):
             get_patient_match_response_json(url=url, json={}, headers={}, method='POST')
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import re_path
 
+from apps.fhir.bluebutton.views.asynchronous import fhir_view
 from apps.fhir.bluebutton.views.read import (
     ReadViewCoverage,
     ReadViewExplanationOfBenefit,
@@ -18,33 +19,33 @@ urlpatterns = [
     # Patient ReadView
     re_path(
         r'Patient/(?P<resource_id>[^/]+)',
-        ReadViewPatient.as_view(),
+        fhir_view(ReadViewPatient),
         name='bb_oauth_fhir_patient_read_or_update_or_delete',
     ),
     # Patient SearchView
-    re_path(r'Patient[/]?', SearchViewPatient.as_view(), name='bb_oauth_fhir_patient_search'),
+    re_path(r'Patient[/]?', fhir_view(SearchViewPatient), name='bb_oauth_fhir_patient_search'),
     # Coverage ReadView
     re_path(
         r'Coverage/(?P<resource_id>[^/]+)',
-        ReadViewCoverage.as_view(),
+        fhir_view(ReadViewCoverage),
         name='bb_oauth_fhir_coverage_read_or_update_or_delete',
     ),
     # Coverage SearchView
     re_path(
         r'Coverage[/]?',
-        SearchViewCoverage.as_view(),
+        fhir_view(SearchViewCoverage),
         name='bb_oauth_fhir_coverage_search',
     ),
     # EOB ReadView
     re_path(
         r'ExplanationOfBenefit/(?P<resource_id>[^/]+)',
-        ReadViewExplanationOfBenefit.as_view(),
+        fhir_view(ReadViewExplanationOfBenefit),
         name='bb_oauth_fhir_eob_read_or_update_or_delete',
     ),
     # EOB SearchView
     re_path(
         r'ExplanationOfBenefit[/]?',
-        SearchViewExplanationOfBenefit.as_view(),
+        fhir_view(SearchViewExplanationOfBenefit),
         name='bb_oauth_fhir_eob_search',
     ),
 ]
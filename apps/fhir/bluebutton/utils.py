@@ -12,11 +12,11 @@ from django.conf import settings
 from django.contrib import messages
 from fhir.resources.bundle import Bundle
 from fhir.resources.patient import Patient
-from oauth2_provider.models import AccessToken
 from pytz import timezone
 
 import apps.logging.request_logger as bb2logging
 from apps.constants import HHS_SERVER_LOGNAME_FMT, OPERATION_OUTCOME
+from apps.dot_ext.auth_context import get_auth_context
 from apps.dot_ext.utils import get_api_version_number_from_url
 from apps.fhir.bluebutton.models import Crosswalk, Fhir_Response
 from apps.fhir.constants import (
@@ -24,6 +24,7 @@ from apps.fhir.constants import (
     MBI_URL,
     REQUEST_EOB_KEEP_ALIVE,
 )
+from apps.fhir.server.client import bfd_client
 from apps.fhir.server.settings import fhir_settings
 from apps.versions import Versions
 from apps.wellknown.views import base_issuer, build_endpoint_info
@@ -155,7 +156,11 @@ def generate_info_headers(request, version: int = Versions.NOT_AN_API_VERSION):
 
     # Return resource_owner or user
     user = get_user_from_request(request)
-    crosswalk = get_crosswalk(user)
+    context = get_auth_context(request, get_access_token_from_request(request)) if user else None
+    if context is not None and context.beneficiary == user:
+        crosswalk = context.crosswalk
+    else:
+        crosswalk = get_crosswalk(user)
 
     if version == Versions.NOT_AN_API_VERSION:
         version = get_api_version_number_from_url(request.path)
@@ -174,14 +179,13 @@ def generate_info_headers(request, version: int = Versions.NOT_AN_API_VERSION):
     if user:
         result['BlueButton-UserId'] = str(user.id)
         result['BlueButton-User'] = str(user)
-        if AccessToken.objects.filter(token=get_access_token_from_request(request)).exists():
-            at = AccessToken.objects.get(token=get_access_token_from_request(request))
-            result['BlueButton-Application'] = str(at.application.name)
-            result['BlueButton-ApplicationId'] = str(at.application.id)
+        if context is not None:
+            result['BlueButton-Application'] = str(context.application.name)
+            result['BlueButton-ApplicationId'] = str(context.application.id)
             # BB2-2011 update logging w.r.t new fields application data_access_type
-            result['BlueButton-ApplicationDataAccessType'] = str(at.application.data_access_type)
-            result['BlueButton-DeveloperId'] = str(at.application.user.id)
-            result['BlueButton-Developer'] = str(at.application.user)
+            result['BlueButton-ApplicationDataAccessType'] = str(context.application.data_access_type)
+            result['BlueButton-DeveloperId'] = str(context.developer.id)
+            result['BlueButton-Developer'] = str(context.developer)
         else:
             result['BlueButton-Application'] = ''
             result['BlueButton-ApplicationId'] = ''
@@ -697,19 +701,15 @@ def get_v2_patient_by_id(id, request):
     a helper adapted to just get patient given an id out of band of auth flow
     or normal data flow, use by tools such as BB2-Tools admin viewers
     """
-    auth_settings = FhirServerAuth()
-    certs = (auth_settings['cert_file'], auth_settings['key_file'])
-
     headers = generate_info_headers(request)
     headers['BlueButton-Application'] = 'BB2-Tools'
     headers['includeIdentifiers'] = 'true'
     # for now this will only work for v1/v2 patients, but we'll need to be able to
     # determine if the user is V3 and use those endpoints later
     url = f'{fhir_settings.fhir_url}/v2/fhir/Patient/{id}?_format={FHIR_PARAM_FORMAT}'
-    s = requests.Session()
     req = requests.Request('GET', url, headers=headers)
     prepped = req.prepare()
-    response = s.send(prepped, cert=certs, verify=False)
+    response = bfd_client.send(prepped, verify=False)
     response.raise_for_status()
     return response.json()
 
@@ -718,8 +718,6 @@ def get_v2_patient_by_id(id, request):
 # of the ticket to remove the user_mbi_hash column from the crosswalk table
 # We can remove this entire function at that point
 def get_patient_by_mbi_hash(mbi_hash, request):
-    auth_settings = FhirServerAuth()
-    certs = (auth_settings['cert_file'], auth_settings['key_file'])
     headers = generate_info_headers(request)
     headers['BlueButton-Application'] = 'BB2-Tools'
     headers['includeIdentifiers'] = 'true'
@@ -728,10 +726,9 @@ def get_patient_by_mbi_hash(mbi_hash, request):
     payload = {'identifier': search_identifier}
     url = f'{fhir_settings.fhir_url}/v2/fhir/Patient/_search'
 
-    s = requests.Session()
     req = requests.Request('POST', url, headers=headers, data=payload)
     prepped = req.prepare()
-    response = s.send(prepped, cert=certs, verify=False)
+    response = bfd_client.send(prepped, verify=False)
 
     response.raise_for_status()
     return response.json()
@@ -875,9 +872,6 @@ def get_patient_match_response_json(url: str, json: str, headers: Dict[str, str]
     Returns:
         dict: The response from BFD as a json/dict object
     """
-    auth_settings = FhirServerAuth()
-    certs = (auth_settings['cert_file'], auth_settings['key_file'])
-
     # Validate the URL against the configured FHIR server base URL
     parsed_url = urlparse(url)
     allowed_base = urlparse(fhir_settings.fhir_url_v3)
@@ -892,10 +886,9 @@ def get_patient_match_response_json(url: str, json: str, headers: Dict[str, str]
     # We could just do a requests.post but this way is useful for debugging and testing,
     # to be able to see the prepared request and manipulate if needed before sending,
     # and to use the same pattern for certs and headers as other calls to BFD
-    s = requests.Session()
     req = requests.Request(url=url, json=json, headers=headers, method=method)
     prepped = req.prepare()
-    response = s.send(prepped, cert=certs, verify=False)
+    response = bfd_client.send(prepped, verify=False)
 
     response.raise_for_status()
     return response.json()
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import re_path
 
+from apps.fhir.bluebutton.views.asynchronous import fhir_view
+from apps.fhir.bluebutton.views.export import ExportFileView, ExportStatusView, ExportView
 from apps.fhir.bluebutton.views.read import (
     ReadViewCoverage,
     ReadViewExplanationOfBenefit,
@@ -15,40 +17,56 @@ from apps.fhir.bluebutton.views.search import (
 admin.autodiscover()
 
 urlpatterns = [
+    # Bulk export, ahead of the Patient read view that would take $export as a resource id
+    re_path(
+        r'^Patient/\$export$',
+        ExportView.as_view(version=2),
+        name='bb_oauth_fhir_export_v2',
+    ),
+    re_path(
+        r'^\$export-status/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$',
+        ExportStatusView.as_view(version=2),
+        name='bb_oauth_fhir_export_status_v2',
+    ),
+    re_path(
+        r'^\$export-file/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/(?P<output_type>[A-Za-z]+)$',
+        ExportFileView.as_view(version=2),
+        name='bb_oauth_fhir_export_file_v2',
+    ),
     # Patient ReadView
     re_path(
         r'Patient/(?P<resource_id>[^/]+)',
-        ReadViewPatient.as_view(version=2),
+        fhir_view(ReadViewPatient, version=2),
         name='bb_oauth_fhir_patient_read_or_update_or_delete_v2',
     ),
     # Patient SearchView
     re_path(
         r'Patient[/]?',
-        SearchViewPatient.as_view(version=2),
+        fhir_view(SearchViewPatient, version=2),
         name='bb_oauth_fhir_patient_search_v2',
     ),
     # Coverage ReadView
     re_path(
         r'Coverage/(?P<resource_id>[^/]+)',
-        ReadViewCoverage.as_view(version=2),
+        fhir_view(ReadViewCoverage, version=2),
         name='bb_oauth_fhir_coverage_read_or_update_or_delete_v2',
     ),
     # Coverage SearchView
     re_path(
         r'Coverage[/]?',
-        SearchViewCoverage.as_view(version=2),
+        fhir_view(SearchViewCoverage, version=2),
         name='bb_oauth_fhir_coverage_search_v2',
     ),
     # EOB ReadView
     re_path(
         r'ExplanationOfBenefit/(?P<resource_id>[^/]+)',
-        ReadViewExplanationOfBenefit.as_view(version=2),
+        fhir_view(ReadViewExplanationOfBenefit, version=2),
         name='bb_oauth_fhir_eob_read_or_update_or_delete_v2',
     ),
     # EOB SearchView
     re_path(
         r'ExplanationOfBenefit[/]?',
-        SearchViewExplanationOfBenefit.as_view(version=2),
+        fhir_view(SearchViewExplanationOfBenefit, version=2),
         name='bb_oauth_fhir_eob_search_v2',
     ),
 ]
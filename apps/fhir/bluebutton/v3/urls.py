@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.urls import re_path
 from waffle.decorators import waffle_switch
 
+from apps.fhir.bluebutton.views.asynchronous import fhir_view, fhir_waffle_switch
 from apps.fhir.bluebutton.views.audit_event import AuditEventView, ReadViewAuditEventView
+from apps.fhir.bluebutton.views.batch import BatchView
+from apps.fhir.bluebutton.views.export import ExportFileView, ExportStatusView, ExportView
 from apps.fhir.bluebutton.views.insurancecard import DigitalInsuranceCardView
 from apps.fhir.bluebutton.views.read import (
     ReadViewCoverage,
@@ -18,6 +21,28 @@ from apps.fhir.bluebutton.views.search import (
 admin.autodiscover()
 
 urlpatterns = [
+    # Batch Bundle
+    re_path(
+        r'^$',
+        fhir_waffle_switch('v3_endpoints')(BatchView.as_view(version=3)),
+        name='bb_oauth_fhir_batch_v3',
+    ),
+    # Bulk export, ahead of the Patient read view that would take $export as a resource id
+    re_path(
+        r'^Patient/\$export$',
+        fhir_waffle_switch('v3_endpoints')(ExportView.as_view(version=3)),
+        name='bb_oauth_fhir_export_v3',
+    ),
+    re_path(
+        r'^\$export-status/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$',
+        fhir_waffle_switch('v3_endpoints')(ExportStatusView.as_view(version=3)),
+        name='bb_oauth_fhir_export_status_v3',
+    ),
+    re_path(
+        r'^\$export-file/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/(?P<output_type>[A-Za-z]+)$',
+        fhir_waffle_switch('v3_endpoints')(ExportFileView.as_view(version=3)),
+        name='bb_oauth_fhir_export_file_v3',
+    ),
     # C4DIC
     # Digital Insurance Card View
     re_path(
@@ -27,37 +52,37 @@ urlpatterns = [
     ),
     re_path(
         r'Patient/(?P<resource_id>[^/]+)',
-        waffle_switch('v3_endpoints')(ReadViewPatient.as_view(version=3)),
+        fhir_waffle_switch('v3_endpoints')(fhir_view(ReadViewPatient, version=3)),
         name='bb_oauth_fhir_patient_read_or_update_or_delete_v3',
     ),
     # Patient SearchView
     re_path(
         r'Patient[/]?',
-        waffle_switch('v3_endpoints')(SearchViewPatient.as_view(version=3)),
+        fhir_waffle_switch('v3_endpoints')(fhir_view(SearchViewPatient, version=3)),
         name='bb_oauth_fhir_patient_search_v3',
     ),
     # Coverage ReadView
     re_path(
         r'Coverage/(?P<resource_id>[^/]+)',
-        waffle_switch('v3_endpoints')(ReadViewCoverage.as_view(version=3)),
+        fhir_waffle_switch('v3_endpoints')(fhir_view(ReadViewCoverage, version=3)),
         name='bb_oauth_fhir_coverage_read_or_update_or_delete_v3',
     ),
     # Coverage SearchView
     re_path(
         r'Coverage[/]?',
-        waffle_switch('v3_endpoints')(SearchViewCoverage.as_view(version=3)),
+        fhir_waffle_switch('v3_endpoints')(fhir_view(SearchViewCoverage, version=3)),
         name='bb_oauth_fhir_coverage_search_v3',
     ),
     # EOB ReadView
     re_path(
         r'ExplanationOfBenefit/(?P<resource_id>[^/]+)',
-        waffle_switch('v3_endpoints')(ReadViewExplanationOfBenefit.as_view(version=3)),
+        fhir_waffle_switch('v3_endpoints')(fhir_view(ReadViewExplanationOfBenefit, version=3)),
         name='bb_oauth_fhir_eob_read_or_update_or_delete_v3',
     ),
     # EOB SearchView
     re_path(
         r'ExplanationOfBenefit[/]?',
-        waffle_switch('v3_endpoints')(SearchViewExplanationOfBenefit.as_view(version=3)),
+        fhir_waffle_switch('v3_endpoints')(fhir_view(SearchViewExplanationOfBenefit, version=3)),
         name='bb_oauth_fhir_eob_search_v3',
     ),
     re_path(
@@ -0,0 +1,152 @@
+"""
+Native async versions of the FHIR read and search views, for ASGI deployments.
+
+Under WSGI each FHIR call holds a worker thread while it waits on BFD. These views run the
+same pipeline, but the BFD call is awaited on the event loop through ``async_bfd_client``:
+
+    authentication, throttling and permission classes    (FhirDataView.initial, in a thread)
+    request preparation and response cache lookup        (start_backend_request, in a thread)
+    BFD call                                             (async_bfd_client.send, on the event loop)
+    error handling and object permission checks          (handle_backend_response, in a thread)
+
+The ORM is only ever touched from the thread-sensitive sync_to_async steps. The async views are
+served when FHIR_SERVER['ASYNC_VIEWS'] is enabled, which should only be done when the app is run
+through hhs_oauth_server.asgi (gunicorn -k asgi). The sync views are unchanged and are used otherwise.
+"""
+
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import Http404
+from waffle import switch_is_active
+from waffle.decorators import waffle_switch
+
+from apps.fhir.bluebutton.conditional import NotModified, not_modified_response
+from apps.fhir.bluebutton.views.read import (
+    ReadViewCoverage,
+    ReadViewExplanationOfBenefit,
+    ReadViewPatient,
+)
+from apps.fhir.bluebutton.views.search import (
+    SearchViewCoverage,
+    SearchViewExplanationOfBenefit,
+    SearchViewPatient,
+)
+from apps.fhir.server.client import async_bfd_client
+from apps.fhir.server.settings import fhir_settings
+
+
+class AsyncFhirDataViewMixin:
+    """Async dispatch for FhirDataView subclasses, mirrors rest_framework's APIView.dispatch"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            out_data = await self.afetch_data(request, self.resource_type, *args, **kwargs)
+        except NotModified as e:
+            return not_modified_response(e.etag)
+        return self.data_response(request, out_data)
+
+    async def afetch_data(self, request, resource_type, *args, **kwargs):
+        backend_request, out_data = await sync_to_async(self.start_backend_request)(
+            request, resource_type, *args, **kwargs
+        )
+        if out_data is not None:
+            return out_data
+
+        backend_request = self.conditional_backend_request(request, backend_request)
+        r = await async_bfd_client.send(
+            backend_request.prepped,
+            timeout=fhir_settings.wait_time,
+            verify=fhir_settings.verify_server,
+        )
+        await sync_to_async(self.check_not_modified)(request, backend_request, r)
+        out_data = await sync_to_async(self.handle_backend_response)(
+            request, resource_type, backend_request, r, **kwargs
+        )
+        self.cache_backend_data(request, backend_request, r, out_data)
+        return out_data
+
+
+class AsyncReadViewPatient(AsyncFhirDataViewMixin, ReadViewPatient):
+    pass
+
+
+class AsyncReadViewCoverage(AsyncFhirDataViewMixin, ReadViewCoverage):
+    pass
+
+
+class AsyncReadViewExplanationOfBenefit(AsyncFhirDataViewMixin, ReadViewExplanationOfBenefit):
+    pass
+
+
+class AsyncSearchViewPatient(AsyncFhirDataViewMixin, SearchViewPatient):
+    pass
+
+
+class AsyncSearchViewCoverage(AsyncFhirDataViewMixin, SearchViewCoverage):
+    pass
+
+
+class AsyncSearchViewExplanationOfBenefit(AsyncFhirDataViewMixin, SearchViewExplanationOfBenefit):
+    pass
+
+
+ASYNC_VIEWS = {
+    ReadViewPatient: AsyncReadViewPatient,
+    ReadViewCoverage: AsyncReadViewCoverage,
+    ReadViewExplanationOfBenefit: AsyncReadViewExplanationOfBenefit,
+    SearchViewPatient: AsyncSearchViewPatient,
+    SearchViewCoverage: AsyncSearchViewCoverage,
+    SearchViewExplanationOfBenefit: AsyncSearchViewExplanationOfBenefit,
+}
+
+
+def fhir_view(view_class, **initkwargs):
+    """as_view() for a FHIR view class, using its async version when FHIR_SERVER['ASYNC_VIEWS'] is enabled"""
+    if fhir_settings.async_views:
+        view_class = ASYNC_VIEWS.get(view_class, view_class)
+    return view_class.as_view(**initkwargs)
+
+
+def fhir_waffle_switch(switch_name):
+    """waffle_switch that also wraps async views, waffle's decorator only supports sync views"""
+
+    def decorator(view):
+        if not iscoroutinefunction(view):
+            return waffle_switch(switch_name)(view)
+
+        @wraps(view)
+        async def _wrapped_view(request, *args, **kwargs):
+            if not await sync_to_async(switch_is_active)(switch_name):
+                raise Http404
+            return await view(request, *args, **kwargs)
+
+        return _wrapped_view
+
+    return decorator
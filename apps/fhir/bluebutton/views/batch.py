@@ -0,0 +1,218 @@
+"""
+FHIR batch endpoint: POST /v3/fhir/ with a ``batch`` Bundle of GET entries for the token's beneficiary.
+
+The token, the application and the data access grant are checked once, for the batch. Each entry is then
+handled by the read or search view its URL would have been routed to, on a copy of the request for that
+URL: the view's own permission classes, throttle, query parameter validation, SAMHSA and Part D
+parameters and response checks all apply to it as they would to a separate call. Only the BFD calls,
+up to FHIR_SERVER['BATCH_CONCURRENCY'] at a time, and the checks of their responses run in threads.
+
+A failed entry does not fail the batch, it gets the error status and an OperationOutcome in the
+``batch-response`` Bundle, in the order of the request.
+"""
+
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from django.db import connections
+from django.http import Http404, QueryDict
+from rest_framework import exceptions, permissions
+from rest_framework.request import ForcedAuthentication, Request
+from rest_framework.response import Response
+
+from apps.authorization.permissions import DataAccessGrantPermission
+from apps.constants import HHS_SERVER_LOGNAME_FMT, OPERATION_OUTCOME
+from apps.fhir.bluebutton.permissions import (
+    ApplicationActivePermission,
+    HasCrosswalk,
+    V3EarlyAdopterPermission,
+)
+from apps.fhir.bluebutton.views.generic import FhirDataView
+from apps.fhir.bluebutton.views.read import ReadViewCoverage, ReadViewExplanationOfBenefit, ReadViewPatient
+from apps.fhir.bluebutton.views.search import SearchViewCoverage, SearchViewExplanationOfBenefit, SearchViewPatient
+from apps.fhir.server import singleflight
+from apps.fhir.server.settings import fhir_settings
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+# {resource type: (read view, search view)}
+BATCH_VIEWS = {
+    'Patient': (ReadViewPatient, SearchViewPatient),
+    'Coverage': (ReadViewCoverage, SearchViewCoverage),
+    'ExplanationOfBenefit': (ReadViewExplanationOfBenefit, SearchViewExplanationOfBenefit),
+}
+
+# Attributes the authentication class and FhirDataView.initial keep on the batch request
+REQUEST_ATTRS = ('resource_owner', 'crosswalk', 'include_samhsa', 'part_d_eob_only')
+
+
+def entry_status(status_code):
+    return f'{status_code} {HTTPStatus(status_code).phrase}'
+
+
+def error_entry(exc):
+    """The batch-response entry of an entry that raised ``exc``"""
+    if isinstance(exc, Http404):
+        exc = exceptions.NotFound()
+    if isinstance(exc, exceptions.APIException):
+        status_code, detail = exc.status_code, exc.detail
+    else:
+        status_code, detail = 500, 'A server error occurred'
+
+    if isinstance(detail, dict) and detail.get('resourceType') == OPERATION_OUTCOME:
+        outcome = detail
+    else:
+        outcome = {
+            'resourceType': OPERATION_OUTCOME,
+            'issue': [{'severity': 'error', 'code': 'processing', 'diagnostics': str(detail)}],
+        }
+    return {'response': {'status': entry_status(status_code), 'outcome': outcome}}
+
+
+class BatchEntry:
+    """One entry of a batch, with the view and the request it is handled by"""
+
+    def __init__(self, view, request, kwargs):
+        self.view = view
+        self.request = request
+        self.kwargs = kwargs
+        self.backend_request = None
+        self.result = None
+
+
+class BatchView(FhirDataView):
+    permission_classes = [
+        permissions.IsAuthenticated,
+        ApplicationActivePermission,
+        HasCrosswalk,
+        DataAccessGrantPermission,
+        V3EarlyAdopterPermission,
+    ]
+    # Each entry is throttled as the call it stands for
+    throttle_classes = []
+
+    def initial(self, request, *args, **kwargs):
+        return super().initial(request, 'Bundle', *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        bundle = request.data
+        if not isinstance(bundle, dict) or bundle.get('resourceType') != 'Bundle' or bundle.get('type') != 'batch':
+            raise exceptions.ParseError('The request body must be a batch Bundle')
+        entries = bundle.get('entry') or []
+        if not isinstance(entries, list):
+            raise exceptions.ParseError('The Bundle entry must be a list')
+        if len(entries) > fhir_settings.batch_max_entries:
+            raise exceptions.ParseError(f'A batch may have at most {fhir_settings.batch_max_entries} entries')
+
+        batch = []
+        for entry in entries:
+            try:
+                batch_entry = self.start_entry(request, entry)
+            except Exception as exc:
+                batch.append(self.failed_entry(exc))
+                continue
+            batch.append(batch_entry)
+
+        pending = [entry for entry in batch if isinstance(entry, BatchEntry) and entry.result is None]
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(fhir_settings.batch_concurrency, len(pending))) as pool:
+                for entry, result in zip(pending, pool.map(self.fetch_entry, pending)):
+                    entry.result = result
+
+        return Response(
+            {
+                'resourceType': 'Bundle',
+                'type': 'batch-response',
+                'entry': [entry.result if isinstance(entry, BatchEntry) else entry for entry in batch],
+            }
+        )
+
+    def entry_route(self, entry):
+        """The view class, resource type, query string and view kwargs of a batch entry's request"""
+        entry_request = entry.get('request') if isinstance(entry, dict) else None
+        if not isinstance(entry_request, dict) or not isinstance(entry_request.get('url'), str):
+            raise exceptions.ParseError('Each entry must have a request with a url')
+        if entry_request.get('method', 'GET').upper() != 'GET':
+            raise exceptions.MethodNotAllowed(entry_request['method'])
+
+        url = urlsplit(entry_request['url'])
+        path = url.path.lstrip('/')
+        prefix = f'v{self.version}/fhir/'
+        if path.startswith(prefix):
+            path = path[len(prefix) :]
+        parts = path.rstrip('/').split('/')
+        if parts[0] not in BATCH_VIEWS or len(parts) > 2:
+            raise exceptions.NotFound(f'{entry_request["url"]} is not supported in a batch')
+
+        read_view, search_view = BATCH_VIEWS[parts[0]]
+        if len(parts) == 2:
+            return read_view, parts[0], url.query, {'resource_id': parts[1]}
+        return search_view, parts[0], url.query, {}
+
+    def entry_request(self, request, resource_type, path, query):
+        """A copy of the batch request, for a GET of ``path``"""
+        http_request = copy.copy(request._request)
+        http_request.method = 'GET'
+        http_request.path = http_request.path_info = path
+        http_request.META = {**http_request.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query}
+        http_request.GET = QueryDict(query)
+
+        entry_request = Request(
+            http_request,
+            parsers=self.get_parsers(),
+            authenticators=[ForcedAuthentication(request.user, request.auth)],
+            negotiator=self.get_content_negotiator(),
+        )
+        for attr in REQUEST_ATTRS:
+            if hasattr(request, attr):
+                setattr(entry_request, attr, getattr(request, attr))
+        entry_request.resource_type = resource_type
+        return entry_request
+
+    def start_entry(self, request, entry) -> BatchEntry:
+        """Check an entry like its view would, and prepare its BFD request"""
+        view_class, resource_type, query, kwargs = self.entry_route(entry)
+        path = f'/v{self.version}/fhir/{resource_type}/' + kwargs.get('resource_id', '')
+        entry_request = self.entry_request(request, resource_type, path, query)
+
+        view = view_class(version=self.version)
+        view.args, view.kwargs, view.headers = (), kwargs, {}
+        view.request = entry_request
+        view.format_kwarg = None
+        view.check_permissions(entry_request)
+        view.check_throttles(entry_request)
+
+        batch_entry = BatchEntry(view, entry_request, kwargs)
+        batch_entry.backend_request, out_data = view.start_backend_request(entry_request, resource_type, **kwargs)
+        if out_data is not None:
+            batch_entry.result = self.resource_entry(batch_entry, out_data)
+        return batch_entry
+
+    def fetch_entry(self, entry: BatchEntry):
+        """Call BFD for an entry and check the response, in a thread of the batch"""
+        try:
+            r = singleflight.send(
+                entry.backend_request.prepped,
+                timeout=fhir_settings.wait_time,
+                verify=fhir_settings.verify_server,
+            )
+            out_data = entry.view.handle_backend_response(
+                entry.request, entry.request.resource_type, entry.backend_request, r, **entry.kwargs
+            )
+            entry.view.cache_backend_data(entry.request, entry.backend_request, r, out_data)
+            return self.resource_entry(entry, out_data)
+        except Exception as exc:
+            return self.failed_entry(exc)
+        finally:
+            connections.close_all()
+
+    def resource_entry(self, entry: BatchEntry, out_data):
+        return {'resource': out_data, 'response': {'status': entry_status(200)}}
+
+    def failed_entry(self, exc):
+        if not isinstance(exc, (exceptions.APIException, Http404)):
+            logger.exception('Batch entry failed')
+        return error_entry(exc)
@@ -0,0 +1,247 @@
+from functools import partial
+
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions, permissions, status
+from rest_framework.response import Response
+
+from apps.authorization.permissions import DataAccessGrantPermission
+from apps.constants import FHIR_RES_TYPE_COVERAGE, FHIR_RES_TYPE_EOB, FHIR_RES_TYPE_PATIENT, OPERATION_OUTCOME
+from apps.fhir.bluebutton.export import (
+    NDJSON_CONTENT_TYPE,
+    ExportPlan,
+    delete_export,
+    export_runner,
+    get_export_storage,
+    is_expired,
+    is_stale,
+)
+from apps.fhir.bluebutton.models import ExportJob
+from apps.fhir.bluebutton.permissions import (
+    ApplicationActivePermission,
+    AppScopePermission,
+    HasCrosswalk,
+    V2ExplanationOfBenefitPermission,
+    V3EarlyAdopterPermission,
+)
+from apps.fhir.bluebutton.views.generic import FhirDataView
+from apps.fhir.bluebutton.views.search import (
+    HasSearchScope,
+    SearchViewCoverage,
+    SearchViewExplanationOfBenefit,
+    SearchViewPatient,
+)
+from apps.fhir.server.settings import fhir_settings
+
+NDJSON_FORMATS = ('application/fhir+ndjson', 'application/ndjson', 'ndjson')
+
+
+class ExportSearchMixin:
+    """
+    The search of one resource type of an export. Only the paging and _since parameters are its own,
+    everything else, the beneficiary, SAMHSA and Part D parameters included, is the search view's.
+    """
+
+    # Checked for each exported resource type, the kick-off view checks the rest
+    export_permission_classes = [HasSearchScope, AppScopePermission, V2ExplanationOfBenefitPermission]
+
+    def __init__(self, version=1, since=None):
+        super().__init__(version)
+        self.since = since
+
+    def filter_parameters(self, request):
+        return {
+            '_count': fhir_settings.export_page_size,
+            '_lastUpdated': [f'ge{self.since}'] if self.since else [],
+        }
+
+    def has_export_permission(self, request) -> bool:
+        return all(permission().has_permission(request, self) for permission in self.export_permission_classes)
+
+
+class ExportSearchViewPatient(ExportSearchMixin, SearchViewPatient):
+    pass
+
+
+class ExportSearchViewCoverage(ExportSearchMixin, SearchViewCoverage):
+    pass
+
+
+class ExportSearchViewExplanationOfBenefit(ExportSearchMixin, SearchViewExplanationOfBenefit):
+    pass
+
+
+EXPORT_SEARCH_VIEWS = {
+    FHIR_RES_TYPE_PATIENT: ExportSearchViewPatient,
+    FHIR_RES_TYPE_COVERAGE: ExportSearchViewCoverage,
+    FHIR_RES_TYPE_EOB: ExportSearchViewExplanationOfBenefit,
+}
+
+
+def operation_outcome(diagnostics, code='processing'):
+    return {
+        'resourceType': OPERATION_OUTCOME,
+        'issue': [{'severity': 'error', 'code': code, 'diagnostics': diagnostics}],
+    }
+
+
+class ExportBaseView(FhirDataView):
+    """Authentication and throttling of the FHIR views, for the export of the token's own beneficiary"""
+
+    permission_classes = [
+        permissions.IsAuthenticated,
+        ApplicationActivePermission,
+        HasCrosswalk,
+        DataAccessGrantPermission,
+        V3EarlyAdopterPermission,
+    ]
+
+    def initial(self, request, *args, **kwargs):
+        return super().initial(request, FHIR_RES_TYPE_PATIENT, *args, **kwargs)
+
+    def url_name(self, name):
+        return f'bb_oauth_fhir_{name}_v{self.version}'
+
+    def get_job(self, request, job_id) -> ExportJob:
+        """The job, when it was started for this token's beneficiary and application"""
+        try:
+            job = ExportJob.objects.get(pk=job_id, beneficiary=request.user, application=request.auth.application)
+        except ExportJob.DoesNotExist:
+            raise Http404
+        if is_expired(job):
+            delete_export(job)
+            raise Http404
+        return job
+
+
+class ExportView(ExportBaseView):
+    """
+    Patient/$export kick-off, see https://hl7.org/fhir/uv/bulkdata/export.html
+
+    Starts an ExportJob for the resource types of ``_type`` the token may search, all of them by default,
+    and answers with the status URL to poll in Content-Location.
+    """
+
+    def get(self, request, *args, **kwargs):
+        prefer = [value.strip() for value in request.META.get('HTTP_PREFER', '').split(',')]
+        if 'respond-async' not in prefer:
+            raise exceptions.ParseError('The Prefer header must be respond-async')
+
+        output_format = request.query_params.get('_outputFormat')
+        if output_format is not None and output_format not in NDJSON_FORMATS:
+            raise exceptions.ParseError(f'Unsupported _outputFormat: {output_format}')
+
+        since = request.query_params.get('_since')
+        if since is not None and parse_datetime(since) is None:
+            raise exceptions.ParseError('_since must be a FHIR instant')
+
+        requested_types = [t.strip() for t in request.query_params.get('_type', '').split(',') if t.strip()]
+        for resource_type in requested_types:
+            if resource_type not in EXPORT_SEARCH_VIEWS:
+                raise exceptions.ParseError(f'Unsupported _type: {resource_type}')
+
+        if self.running_job(request) is not None:
+            return Response(
+                operation_outcome('An export is already running for this beneficiary and application', 'throttled'),
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(fhir_settings.export_retry_after)},
+            )
+
+        plans = []
+        for resource_type in requested_types or EXPORT_SEARCH_VIEWS:
+            request.resource_type = resource_type
+            view = EXPORT_SEARCH_VIEWS[resource_type](version=self.version, since=since)
+            view.request, view.args, view.kwargs, view.headers = request, (), {}, {}
+            try:
+                allowed = view.has_export_permission(request)
+            except exceptions.PermissionDenied:
+                allowed = False
+            if not allowed:
+                # Types that were not asked for explicitly are left out of the export
+                if requested_types:
+                    self.permission_denied(request, f'The token may not search the {resource_type} resource type')
+                continue
+            plans.append(ExportPlan(resource_type, view, request, view.prepare_backend_request(request, resource_type)))
+        request.resource_type = FHIR_RES_TYPE_PATIENT
+
+        if not plans:
+            self.permission_denied(request, 'The token may not search any of the exported resource types')
+
+        job = ExportJob.objects.create(
+            beneficiary=request.user,
+            application=request.auth.application,
+            version=self.version,
+            request_url=request.build_absolute_uri(),
+            resource_types=[plan.resource_type for plan in plans],
+        )
+        transaction.on_commit(partial(export_runner.submit, job, plans))
+
+        status_url = request.build_absolute_uri(reverse(self.url_name('export_status'), args=[job.pk]))
+        return Response(status=status.HTTP_202_ACCEPTED, headers={'Content-Location': status_url})
+
+    def running_job(self, request):
+        jobs = ExportJob.objects.filter(
+            beneficiary=request.user,
+            application=request.auth.application,
+            status__in=(ExportJob.ACCEPTED, ExportJob.IN_PROGRESS),
+        )
+        return next((job for job in jobs if not is_stale(job)), None)
+
+
+class ExportStatusView(ExportBaseView):
+    """Status of an ExportJob, its manifest once it is complete. DELETE cancels or deletes it"""
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = self.get_job(request, job_id)
+
+        if job.status == ExportJob.FAILED or is_stale(job):
+            return Response(
+                operation_outcome(job.error or 'The export stopped before it was complete', 'exception'),
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        if job.status != ExportJob.COMPLETED:
+            return Response(
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': str(fhir_settings.export_retry_after), 'X-Progress': job.status},
+            )
+
+        return Response(
+            {
+                'transactionTime': job.created_at.isoformat(),
+                'request': job.request_url,
+                'requiresAccessToken': True,
+                'output': [
+                    {
+                        'type': output['type'],
+                        'url': request.build_absolute_uri(
+                            reverse(self.url_name('export_file'), args=[job.pk, output['type']])
+                        ),
+                        'count': output['count'],
+                    }
+                    for output in job.output
+                ],
+                'error': [],
+            }
+        )
+
+    def delete(self, request, job_id, *args, **kwargs):
+        delete_export(self.get_job(request, job_id))
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+class ExportFileView(ExportBaseView):
+    """The NDJSON file of one resource type of a complete ExportJob"""
+
+    def get(self, request, job_id, output_type, *args, **kwargs):
+        job = self.get_job(request, job_id)
+        output = next((output for output in job.output if output['type'] == output_type), None)
+        if job.status != ExportJob.COMPLETED or output is None:
+            raise Http404
+        return FileResponse(
+            get_export_storage().open(output['file']),
+            content_type=NDJSON_CONTENT_TYPE,
+            filename=f'{output_type}.ndjson',
+        )
@@ -1,23 +1,33 @@
 import hashlib
 import logging
+from functools import partial
+from itertools import chain
+from typing import NamedTuple, Optional
 from urllib.parse import quote
 
 import voluptuous
-from django.core.exceptions import ObjectDoesNotExist
-from oauth2_provider.models import AccessToken
-from requests import Request, Session
+from django.http import StreamingHttpResponse
+from requests import PreparedRequest, Request
 from rest_framework import exceptions, permissions
 from rest_framework.exceptions import NotFound, ValidationError
-from rest_framework.parsers import JSONParser
-from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.authorization.permissions import DataAccessGrantPermission
 from apps.constants import FHIR_RES_TYPE_EOB, FHIR_RES_TYPE_PATIENT, HHS_SERVER_LOGNAME_FMT
-from apps.dot_ext.models import AccessTokenExtension
+from apps.dot_ext.auth_context import get_auth_context
 from apps.dot_ext.throttling import TokenRateThrottle
 from apps.fhir.bluebutton.authentication import OAuth2ResourceOwner
+from apps.fhir.bluebutton.cache import CACHE_HEADER, response_cache
+from apps.fhir.bluebutton.conditional import (
+    NotModified,
+    bfd_validators,
+    conditional_headers,
+    make_etag,
+    not_modified_response,
+    request_etags,
+    validator_cache,
+)
 from apps.fhir.bluebutton.exceptions import process_error_response
 from apps.fhir.bluebutton.permissions import (
     ApplicationActivePermission,
@@ -25,23 +35,39 @@ from apps.fhir.bluebutton.permissions import (
     ResourcePermission,
 )
 from apps.fhir.bluebutton.signals import post_fetch, pre_fetch
+from apps.fhir.bluebutton.streaming import STREAM_CHUNK_SIZE, BundleStreamScanner
 from apps.fhir.bluebutton.utils import (
-    FhirServerAuth,
     build_fhir_response,
     determine_eob_search_parameter_to_add,
     valid_patient_read_or_search_call,
     validate_query_parameters,
 )
 from apps.fhir.constants import ENFORCE_PARAM_VALIDATION, EXCLUDE_SAMHSA_PARAMETER_VALUE
-from apps.fhir.parsers import FHIRParser
-from apps.fhir.renderers import FHIRRenderer
+from apps.fhir.json_codec import response_json
+from apps.fhir.parsers import FHIRParser, JSONParser
+from apps.fhir.renderers import FHIRRenderer, JSONRenderer
 from apps.fhir.server import connection as backend_connection
+from apps.fhir.server import singleflight
+from apps.fhir.server.client import bfd_client
 from apps.fhir.server.settings import fhir_settings
 from apps.versions import VersionNotMatched, Versions
 
 logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
 
 
+class BackendRequest(NamedTuple):
+    """A prepared BFD request, as built by FhirDataView.prepare_backend_request"""
+
+    target_url: str
+    request: Request
+    prepped: PreparedRequest
+    api_ver: str
+    # Key of the call in response_cache, None when responses for the resource type are not cached
+    cache_key: Optional[tuple] = None
+    # The client's ETag when the request asks BFD for a 304, see apps.fhir.bluebutton.conditional
+    etag: Optional[str] = None
+
+
 class FhirDataView(APIView):
     version = 1
     parser_classes = [JSONParser, FHIRParser]
@@ -56,6 +82,8 @@ class FhirDataView(APIView):
         ResourcePermission,
         DataAccessGrantPermission,
     ]
+    # Whether get() may stream the BFD response through when FHIR_SERVER['STREAM_RESPONSES'] is enabled
+    stream_response = False
 
     def __init__(self, version=1):
         self.version = version
@@ -98,36 +126,184 @@ class FhirDataView(APIView):
         logger.debug('Interaction: read')
         logger.debug('Request.path: %s' % request.path)
         req_meta = request.META
+        request.resource_type = resource_type
 
         if 'HTTP_AUTHORIZATION' in req_meta and req_meta['HTTP_AUTHORIZATION'].lower().startswith('bearer '):
             access_token = req_meta['HTTP_AUTHORIZATION'].partition(' ')[2]
-            try:
-                at = AccessToken.objects.get(token=access_token)
+            # Authenticate first, it loads the token and everything related to it once for the whole request
+            self.perform_authentication(request)
+            context = get_auth_context(request, access_token)
+            if context is not None:
                 log_message = {
                     'name': 'FHIR Endpoint AT Logging',
-                    'access_token_id': at.id,
-                    'access_token_application_id': at.application.id,
+                    'access_token_id': context.token.id,
+                    'access_token_application_id': context.application.id,
                     'access_token_hash': {hashlib.sha256(str(access_token).encode('utf-8')).hexdigest()},
-                    'access_token_username': at.user.username,
+                    'access_token_username': context.beneficiary.username,
                 }
                 logger.info(log_message)
-                at_extension = AccessTokenExtension.objects.get(access_token=at)
-                request.include_samhsa = at_extension.include_samhsa
-                request.part_d_eob_only = at_extension.part_d_eob_only
-            except ObjectDoesNotExist:
-                pass
-
-        request.resource_type = resource_type
+                if context.extension is not None:
+                    request.include_samhsa = context.extension.include_samhsa
+                    request.part_d_eob_only = context.extension.part_d_eob_only
 
         super(FhirDataView, self).initial(request, *args, **kwargs)
 
     def get(self, request, resource_type, *args, **kwargs):
+        if (
+            self.stream_response
+            and fhir_settings.stream_responses
+            and not response_cache.ttl(resource_type)
+            # A conditional request may be answered with a 304, which needs the ETag of the checked data
+            and not request_etags(request)
+        ):
+            return self.stream_data(request, resource_type, *args, **kwargs)
 
-        out_data = self.fetch_data(request, resource_type, *args, **kwargs)
+        try:
+            out_data = self.fetch_data(request, resource_type, *args, **kwargs)
+        except NotModified as e:
+            return not_modified_response(e.etag)
 
-        return Response(out_data)
+        return self.data_response(request, out_data)
+
+    def data_response(self, request, out_data):
+        """The response for checked data with its ETag, or a 304 when the client already has it"""
+        etag = make_etag(out_data, request.accepted_renderer.media_type)
+        validators = bfd_validators(out_data)
+        if validators is not None:
+            validator_cache.set(validator_cache.key(request, self.version, etag), validators)
+
+        if etag in request_etags(request):
+            return not_modified_response(etag)
+        return Response(out_data, headers={'ETag': etag})
 
     def fetch_data(self, request, resource_type, *args, **kwargs):
+        backend_request, out_data = self.start_backend_request(request, resource_type, *args, **kwargs)
+        if out_data is not None:
+            return out_data
+
+        backend_request = self.conditional_backend_request(request, backend_request)
+        r = singleflight.send(
+            backend_request.prepped,
+            timeout=fhir_settings.wait_time,
+            verify=fhir_settings.verify_server,
+        )
+        self.check_not_modified(request, backend_request, r)
+        out_data = self.handle_backend_response(request, resource_type, backend_request, r, **kwargs)
+        self.cache_backend_data(request, backend_request, r, out_data)
+        return out_data
+
+    def conditional_backend_request(self, request, backend_request):
+        """
+        Make the BFD request conditional when the client sent the ETag of data whose BFD validators are
+        known, see apps.fhir.bluebutton.conditional
+        """
+        for etag in request_etags(request):
+            validators = validator_cache.get(validator_cache.key(request, self.version, etag))
+            if validators is not None:
+                prepped = backend_request.prepped.copy()
+                prepped.headers.update(conditional_headers(validators))
+                return backend_request._replace(prepped=prepped, etag=etag)
+        return backend_request
+
+    def check_not_modified(self, request, backend_request, r):
+        """Raise NotModified when BFD answered the conditional request with 304"""
+        if backend_request.etag is None or r.status_code != 304:
+            return
+        post_fetch.send_robust(
+            FhirDataView,
+            request=backend_request.prepped,
+            auth_request=request,
+            response=r,
+            api_ver=backend_request.api_ver,
+        )
+        validator_cache.count_not_modified()
+        raise NotModified(backend_request.etag)
+
+    def stream_data(self, request, resource_type, *args, **kwargs):
+        """
+        Like fetch_data, but the BFD body is passed through to the client as it arrives instead of being
+        decoded and rendered again. Every resource is still checked before it is sent, see
+        apps.fhir.bluebutton.streaming.
+
+        The call goes to bfd_client directly: singleflight shares whole responses between callers, a body
+        read as it arrives cannot be. The response has no ETag either, it is only known once the whole
+        body has been checked, so conditional requests take the fetch_data path.
+        """
+        backend_request, _ = self.start_backend_request(request, resource_type, *args, **kwargs)
+        r = bfd_client.send(
+            backend_request.prepped,
+            timeout=fhir_settings.wait_time,
+            verify=fhir_settings.verify_server,
+            stream=True,
+        )
+        if r.status_code >= 300:
+            # Error responses are small, read them and let handle_backend_response raise the right exception
+            try:
+                return Response(self.handle_backend_response(request, resource_type, backend_request, r, **kwargs))
+            finally:
+                r.close()
+
+        scanner = BundleStreamScanner(partial(self.check_backend_data, request, resource_type, **kwargs))
+        body = self.iter_backend_response(request, backend_request, r, scanner)
+
+        # Hold the response back until the first entry has been checked, so that a response for the wrong
+        # beneficiary still gets the usual error status. Past that point a failed check aborts the response.
+        head = []
+        for data in body:
+            head.append(data)
+            if scanner.entries_checked:
+                break
+
+        return StreamingHttpResponse(chain(head, body), content_type=request.accepted_renderer.media_type)
+
+    def iter_backend_response(self, request, backend_request, r, scanner):
+        """Yield the checked BFD body, then send the post_fetch signal once it has been read"""
+        # Read by apps.logging.serializers.Response.size, a streamed body is never held in r.content
+        r.streamed_size = 0
+        try:
+            for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                r.streamed_size += len(chunk)
+                data = scanner.feed(chunk)
+                if data:
+                    yield data
+            data = scanner.close()
+            if data:
+                yield data
+        except Exception:
+            logger.warning('Stopped streaming the response for %s' % backend_request.target_url)
+            raise
+        finally:
+            r.close()
+            post_fetch.send_robust(
+                FhirDataView,
+                request=backend_request.prepped,
+                auth_request=request,
+                response=r,
+                api_ver=backend_request.api_ver,
+            )
+
+    def start_backend_request(self, request, resource_type, *args, **kwargs):
+        """
+        Prepare the BFD request for this call, then return it with its cached data when there is a
+        cache hit, or with None after sending the pre_fetch signal
+        """
+        backend_request = self.prepare_backend_request(request, resource_type, *args, **kwargs)
+
+        if backend_request.cache_key is not None:
+            out_data = response_cache.get(backend_request.cache_key)
+            self.headers[CACHE_HEADER] = 'MISS' if out_data is None else 'HIT'
+            if out_data is not None:
+                self.check_backend_data(request, resource_type, out_data, **kwargs)
+                return backend_request, out_data
+
+        # Send signal
+        pre_fetch.send_robust(
+            FhirDataView, request=backend_request.request, auth_request=request, api_ver=backend_request.api_ver
+        )
+        return backend_request, None
+
+    def prepare_backend_request(self, request, resource_type, *args, **kwargs) -> BackendRequest:
+        """Build the BFD request for this call"""
         target_url = self.build_url(fhir_settings, resource_type, *args, **kwargs)
 
         logger.debug('FHIR URL with key:%s' % target_url)
@@ -138,13 +314,11 @@ class FhirDataView(APIView):
             raise exceptions.ParseError(detail=e.msg)
 
         logger.debug('Here is the URL to send, %s now add GET parameters %s' % (target_url, get_parameters))
-        request.session.version = self.version
-
         # Now make the call to the backend API
         req = Request(
             'GET', target_url, params=get_parameters, headers=backend_connection.headers(request, url=target_url)
         )
-        s = Session()
+        s = bfd_client.session(target_url)
 
         # BB2-1544 request header url encode if header value (app name) contains char (>256)
         if req.headers.get('BlueButton-Application') is not None:
@@ -231,28 +405,54 @@ class FhirDataView(APIView):
             case _:
                 raise VersionNotMatched(f'{self.version} is not a valid version constant')
 
-        # Send signal
-        fhir_server_auth = FhirServerAuth()
-        pre_fetch.send_robust(FhirDataView, request=req, auth_request=request, api_ver=api_ver_str)
-        r = s.send(
-            prepped,
-            cert=(fhir_server_auth['cert_file'], fhir_server_auth['key_file']),
-            timeout=fhir_settings.wait_time,
-            verify=fhir_settings.verify_server,
+        cache_key = None
+        if response_cache.ttl(resource_type):
+            cache_key = response_cache.key(
+                request.crosswalk.fhir_id(self.version),
+                self.version,
+                resource_type,
+                prepped,
+                getattr(request, 'include_samhsa', None),
+                getattr(request, 'part_d_eob_only', None),
+            )
+
+        return BackendRequest(
+            target_url=target_url, request=req, prepped=prepped, api_ver=api_ver_str, cache_key=cache_key
         )
+
+    def handle_backend_response(self, request, resource_type, backend_request, r, **kwargs):
+        """Send the post_fetch signal, then check the BFD response and return its json"""
         # Send signal
-        post_fetch.send_robust(FhirDataView, request=prepped, auth_request=request, response=r, api_ver=api_ver_str)
-        response = build_fhir_response(request._request, target_url, request.crosswalk, r=r, e=None)
+        post_fetch.send_robust(
+            FhirDataView,
+            request=backend_request.prepped,
+            auth_request=request,
+            response=r,
+            api_ver=backend_request.api_ver,
+        )
+        response = build_fhir_response(request._request, backend_request.target_url, request.crosswalk, r=r, e=None)
 
         # BB2-128
         error = process_error_response(response, self.version)
         if error is not None:
             raise error
 
-        out_data = r.json()
+        out_data = response_json(r)
+
+        self.check_backend_data(request, resource_type, out_data, **kwargs)
 
+        return out_data
+
+    def cache_backend_data(self, request, backend_request, r, out_data):
+        """Keep checked BFD data in the response cache, when responses for the call are cached"""
+        if backend_request.cache_key is not None:
+            response_cache.set(backend_request.cache_key, request.user.pk, out_data, len(r.content))
+
+    def check_backend_data(self, request, resource_type, out_data, **kwargs):
+        """Check that data from BFD may be returned for this request, raise if not"""
         self.check_object_permissions(request, out_data)
 
+        resource_id = kwargs.get('resource_id')
         # If it is a v3 read EOB, make sure we are not returning non-part D data for an access token that can only
         # access part D data. This is a temporary implementation as part of BB2-4901, will likely change in near term.
         if (
@@ -264,5 +464,3 @@ class FhirDataView(APIView):
             if out_data.get('meta', {}).get('source') != 'DDPS':
                 error = NotFound('Not found.')
                 raise error
-
-        return out_data
@@ -1,18 +1,23 @@
 import json
 import logging
 from collections import OrderedDict
+from functools import partial
 from urllib.parse import urlencode, urlparse
 
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseNotModified
 from django.shortcuts import HttpResponse
+from django.utils.http import parse_etags
 
 from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.bluebutton.capability import CapabilityStatement, capability_statements, make_capability_statement
 from apps.fhir.bluebutton.utils import build_oauth_resource, get_response_text, prepend_q, request_call
 
 # from oauth2_provider.compat import urlparse
 from apps.fhir.constants import ALLOWED_RESOURCE_TYPES
 from apps.fhir.server.settings import fhir_settings
 from apps.versions import VersionNotMatched, Versions
+from apps.wellknown.views import base_issuer
 
 logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
 
@@ -62,13 +67,13 @@ def _fhir_conformance(request, version=Versions.NOT_AN_API_VERSION, *args):
 
     BaseStu3 = "CapabilityStatement"
 
+    The statement is built once per version and served from memory, see apps.fhir.bluebutton.capability
+
     :param request:
     :param args:
     :param kwargs:
     :return:
     """
-    crosswalk = None
-
     match version:
         case Versions.V1:
             fhir_url = fhir_settings.fhir_url
@@ -79,6 +84,24 @@ def _fhir_conformance(request, version=Versions.NOT_AN_API_VERSION, *args):
         case _:
             raise VersionNotMatched('Could not match API version in _fhir_conformance')
 
+    statement = capability_statements.get(
+        (version, fhir_url, base_issuer(request)), partial(_build_capability_statement, request, version, fhir_url)
+    )
+    if not isinstance(statement, CapabilityStatement):
+        return statement
+
+    if statement.etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(statement.body, content_type='application/json')
+    response['ETag'] = statement.etag
+    return response
+
+
+def _build_capability_statement(request, version, fhir_url):
+    """The filtered CapabilityStatement from BFD, or the error response to return"""
+    crosswalk = None
+
     parsed_url = urlparse(fhir_url)
     call_to = None
     if parsed_url.path is not None:
@@ -92,7 +115,7 @@ def _fhir_conformance(request, version=Versions.NOT_AN_API_VERSION, *args):
     encoded_params = urlencode(pass_params)
     pass_params = prepend_q(encoded_params)
 
-    r = request_call(request, call_to + pass_params, crosswalk)
+    r = request_call(request, call_to + pass_params, crosswalk, timeout=fhir_settings.wait_time)
 
     text_out = ''
 
@@ -112,7 +135,8 @@ def _fhir_conformance(request, version=Versions.NOT_AN_API_VERSION, *args):
     # Fix format values
     od['format'] = ['application/json', 'application/fhir+json']
 
-    return JsonResponse(od)
+    # Rendered the same way as JsonResponse(od)
+    return make_capability_statement(json.dumps(od, cls=DjangoJSONEncoder).encode())
 
 
 def fhir_conformance_v1(request):
@@ -32,6 +32,7 @@ class ReadView(FhirDataView):
         AppScopePermission,
         V2ExplanationOfBenefitPermission,
     ]
+    stream_response = True
 
     def __init__(self, version=1):
         self.resource_type = None
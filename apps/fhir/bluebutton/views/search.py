@@ -51,6 +51,7 @@ class SearchView(FhirDataView):
         AppScopePermission,
         V2ExplanationOfBenefitPermission,
     ]
+    stream_response = True
 
     # Regex to match a valid _lastUpdated value that can begin with lt, le, gt and ge operators
     REGEX_LASTUPDATED_VALUE = r'^((lt)|(le)|(gt)|(ge)).+'
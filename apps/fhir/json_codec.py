@@ -0,0 +1,93 @@
+"""
+JSON encoding and decoding for the FHIR views, with orjson when it is installed.
+
+orjson is optional: without it every function here is the stdlib ``json`` call it replaces. With it, the
+output is byte for byte what the stdlib (and DRF's JSONRenderer) would have written, and the decoded
+data is the same. Whatever orjson cannot reproduce exactly is handed to the stdlib instead:
+
+- encoding with an indent or sorted keys, with separators other than ``(',', ':')``, or with
+  ``ensure_ascii`` and non-ASCII output
+- types orjson does not encode the way the stdlib encoder class would (datetimes, dataclasses,
+  subclasses of str, int, dict and list, anything needing the encoder's ``default``), integers over 64
+  bits and lone surrogates, which orjson refuses
+- floats with an exponent or under 1e-4, which orjson may format differently (``0.00001`` for
+  ``1e-05``, ``1e-7`` for ``1e-07``, and depending on its version ``1e16`` for ``1e+16``)
+- output with a ``null``, which orjson also writes for NaN and infinities where the stdlib writes
+  ``NaN`` or refuses them (FHIR JSON has no nulls)
+- bodies that are not UTF-8, or have NaN, Infinity, big integers or lone surrogates, on decoding
+"""
+
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+COMPACT_SEPARATORS = (',', ':')
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+    if orjson is not None
+    else 0
+)
+
+# Floats orjson writes differently from Python: with a one digit negative exponent (``1e-7`` for
+# ``1e-07``), with a positive exponent without its sign (``1e16`` for ``1e+16``, Python always writes
+# it), and under 1e-4 without one (``0.00001`` for ``1e-05``). Text in a string that looks like one is
+# only encoded again.
+SHORT_EXPONENT_RE = re.compile(rb'[0-9]e(?:[0-9]|-[1-9](?![0-9]))')
+SMALL_FLOAT = b'0.0000'
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def is_stdlib_output(encoded: bytes, ensure_ascii) -> bool:
+    """Whether orjson's ``encoded`` is what the stdlib would have written"""
+    if b'null' in encoded or SMALL_FLOAT in encoded or (ensure_ascii and not encoded.isascii()):
+        return False
+    return not SHORT_EXPONENT_RE.search(encoded)
+
+
+def dumps(data, ensure_ascii=True, separators=None, indent=None, sort_keys=False, **kwargs) -> bytes:
+    """``json.dumps(data, ...).encode()``"""
+    if orjson is not None and indent is None and not sort_keys and separators == COMPACT_SEPARATORS:
+        try:
+            encoded = orjson.dumps(data, option=ORJSON_OPTIONS)
+        except TypeError:  # orjson.JSONEncodeError
+            pass
+        else:
+            if is_stdlib_output(encoded, ensure_ascii):
+                return encoded
+    return json.dumps(
+        data, ensure_ascii=ensure_ascii, separators=separators, indent=indent, sort_keys=sort_keys, **kwargs
+    ).encode()
+
+
+def loads(content: bytes):
+    """``json.loads(content)``"""
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except ValueError:  # orjson.JSONDecodeError
+            pass
+    return json.loads(content)
+
+
+def response_json(r):
+    """``r.json()`` of a requests response, decoded with orjson when it can be"""
+    if orjson is not None:
+        try:
+            return orjson.loads(r.content)
+        except ValueError:  # orjson.JSONDecodeError
+            pass
+    return r.json()
+
+
+def escape_js_separators(encoded: bytes) -> bytes:
+    """Escape U+2028 and U+2029, as DRF's JSONRenderer does, so the JSON is also valid JavaScript"""
+    if LINE_SEPARATOR in encoded or PARAGRAPH_SEPARATOR in encoded:
+        encoded = encoded.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+    return encoded
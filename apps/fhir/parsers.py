@@ -1,4 +1,26 @@
-from rest_framework.parsers import JSONParser
+import io
+
+from django.conf import settings
+from rest_framework import parsers
+
+from apps.fhir import json_codec
+
+
+class JSONParser(parsers.JSONParser):
+    """DRF's JSONParser, decoding UTF-8 bodies with apps.fhir.json_codec"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if json_codec.orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read()
+        try:
+            return json_codec.orjson.loads(content)
+        except ValueError:
+            # Parsed (or refused, with its error) as DRF would
+            return super().parse(io.BytesIO(content), media_type, parser_context)
 
 
 class FHIRParser(JSONParser):
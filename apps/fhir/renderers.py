@@ -1,4 +1,33 @@
-from rest_framework.renderers import JSONRenderer
+from rest_framework import renderers
+from rest_framework.compat import INDENT_SEPARATORS, LONG_SEPARATORS, SHORT_SEPARATORS
+
+from apps.fhir import json_codec
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, encoding with apps.fhir.json_codec"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+
+        if indent is None:
+            separators = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        else:
+            separators = INDENT_SEPARATORS
+
+        ret = json_codec.dumps(
+            data,
+            cls=self.encoder_class,
+            indent=indent,
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=separators,
+        )
+        return json_codec.escape_js_separators(ret)
 
 
 class FHIRRenderer(JSONRenderer):
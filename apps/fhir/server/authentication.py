@@ -1,4 +1,7 @@
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
 from typing import NamedTuple, Optional
 from urllib.parse import quote
 
@@ -15,10 +18,41 @@ from apps.fhir.bluebutton.utils import (
     set_default_header,
 )
 from apps.fhir.constants import FHIR_PATIENT_SEARCH_PARAM_IDENTIFIER_MBI, FHIR_POST_SEARCH_PARAM_IDENTIFIER_HICN_HASH
+from apps.fhir.json_codec import response_json
+from apps.fhir.server import singleflight
+from apps.fhir.server.breaker import CircuitOpen
 from apps.fhir.server.loggers import log_match_fhir_id
 from apps.fhir.server.settings import fhir_settings
 from apps.versions import Versions
 
+# Set by deferred_side_effects() to a list that collects the log lines and session writes of the lookups
+_deferred = ContextVar('match_fhir_id_deferred', default=None)
+
+
+@contextmanager
+def deferred_side_effects(effects):
+    """Collect the signals, log lines and session writes of the lookups made in this context into ``effects``
+    instead of running them, so that lookups running at once on several threads can have them replayed in order
+    on the request's thread. Each one is a callable of no arguments.
+    """
+    token = _deferred.set(effects)
+    try:
+        yield effects
+    finally:
+        _deferred.reset(token)
+
+
+def _run_or_defer(func, *args, **kwargs):
+    effects = _deferred.get()
+    if effects is None:
+        func(*args, **kwargs)
+    else:
+        effects.append(partial(func, *args, **kwargs))
+
+
+def _log_match_fhir_id(*args):
+    _run_or_defer(log_match_fhir_id, *args)
+
 
 def search_fhir_id_by_identifier_mbi(mbi, request=None, version=Versions.NOT_AN_API_VERSION):
     """
@@ -53,9 +87,6 @@ def search_fhir_id_by_identifier(search_identifier, request=None, version=Versio
     Returns:
         fhir_id (str): matched ID (or None for no match)
     """
-    # Get certs from FHIR server settings
-    auth_settings = FhirServerAuth()
-    certs = (auth_settings['cert_file'], auth_settings['key_file'])
     # Add headers for FHIR backend logging, including auth_flow_dict
     if request:
         # Get auth flow session values.
@@ -93,22 +124,28 @@ def search_fhir_id_by_identifier(search_identifier, request=None, version=Versio
     env = os.environ.get('TARGET_ENV')
     while retries <= max_retries:
         try:
-            s = requests.Session()
             payload = {'identifier': search_identifier}
             req = requests.Request('POST', url, headers=headers, data=payload)
             prepped = req.prepare()
-            pre_fetch.send_robust(FhirServerAuth, request=req, auth_request=request, api_ver=ver)
-            response = s.send(prepped, cert=certs, verify=False)
-            post_fetch.send_robust(FhirServerAuth, request=req, auth_request=request, response=response, api_ver=ver)
+            _run_or_defer(pre_fetch.send_robust, FhirServerAuth, request=req, auth_request=request, api_ver=ver)
+            response = singleflight.send(prepped, verify=False)
+            _run_or_defer(
+                post_fetch.send_robust,
+                FhirServerAuth,
+                request=req,
+                auth_request=request,
+                response=response,
+                api_ver=ver,
+            )
             response.raise_for_status()
-            backend_data = response.json()
+            backend_data = response_json(response)
 
             # retrieve the beneficiary name from the response in order to display it
             # on the v3 permissions page. The AuthorizationViewMiddleware class will read the beneficiary name
             # from the session and attach it to the request object if the request path is the authorization path,
             # so it can be accessed in the AuthorizationView get_context_data method.
             beneficiary_name = format_patient_name(backend_data)
-            request.session['beneficiary_name'] = beneficiary_name
+            _run_or_defer(request.session.__setitem__, 'beneficiary_name', beneficiary_name)
 
             # Parse and validate backend_data (bundle of patients) response.
             fhir_id, err_detail = _validate_patient_search_result(backend_data)
@@ -117,6 +154,9 @@ def search_fhir_id_by_identifier(search_identifier, request=None, version=Versio
             return fhir_id
         except requests.exceptions.HTTPError as e:
             raise UpstreamServerException(e)
+        except CircuitOpen as e:
+            # A plain APIException, the login callback only turns upstream errors into its 502
+            raise UpstreamServerException(e.detail['issue'][0]['diagnostics'])
         except requests.exceptions.SSLError as e:
             if retries < max_retries and (env is None or env == 'local'):
                 # Checking target_env ensures the retry logic only happens on local
@@ -175,7 +215,7 @@ def match_fhir_id(mbi, hicn_hash, request=None, version=Versions.NOT_AN_API_VERS
     """
     # Don't do v3 BFD lookups if the v3 switch isn't enabled to allow us to prevent extra errors in logs
     if not switch_is_active('v3_endpoints') and version == Versions.V3:
-        log_match_fhir_id(request, version, None, hicn_hash, False, 'M', "Server settings don't enable v3 lookups.")
+        _log_match_fhir_id(request, version, None, hicn_hash, False, 'M', "Server settings don't enable v3 lookups.")
         return MatchFhirIdResult(
             error="This server's settings do not allow lookups of v3 ids",
             error_type=MatchFhirIdErrorType.NOT_FOUND,
@@ -187,7 +227,7 @@ def match_fhir_id(mbi, hicn_hash, request=None, version=Versions.NOT_AN_API_VERS
         try:
             fhir_id = search_fhir_id_by_identifier_mbi(mbi, request, version)
         except UpstreamServerException as err:
-            log_match_fhir_id(request, version, None, hicn_hash, False, 'M', str(err))
+            _log_match_fhir_id(request, version, None, hicn_hash, False, 'M', str(err))
             # Don't return a 404 because retrying later will not fix this.
             return MatchFhirIdResult(
                 error=str(err.detail), error_type=MatchFhirIdErrorType.UPSTREAM, lookup_type=MatchFhirIdLookupType.MBI
@@ -195,7 +235,7 @@ def match_fhir_id(mbi, hicn_hash, request=None, version=Versions.NOT_AN_API_VERS
 
         if fhir_id:
             # Found beneficiary!
-            log_match_fhir_id(request, version, fhir_id, hicn_hash, True, 'M', 'FOUND beneficiary via user_mbi')
+            _log_match_fhir_id(request, version, fhir_id, hicn_hash, True, 'M', 'FOUND beneficiary via user_mbi')
             return MatchFhirIdResult(fhir_id=fhir_id, lookup_type=MatchFhirIdLookupType.MBI)
 
     # Perform secondary lookup using HICN_HASH
@@ -207,7 +247,7 @@ def match_fhir_id(mbi, hicn_hash, request=None, version=Versions.NOT_AN_API_VERS
         try:
             fhir_id = search_fhir_id_by_identifier_hicn_hash(hicn_hash, request, version)
         except UpstreamServerException as err:
-            log_match_fhir_id(request, version, None, hicn_hash, False, 'H', str(err))
+            _log_match_fhir_id(request, version, None, hicn_hash, False, 'H', str(err))
             return MatchFhirIdResult(
                 error=str(err.detail),
                 error_type=MatchFhirIdErrorType.UPSTREAM,
@@ -215,10 +255,10 @@ def match_fhir_id(mbi, hicn_hash, request=None, version=Versions.NOT_AN_API_VERS
             )
 
         if fhir_id:
-            log_match_fhir_id(request, version, fhir_id, hicn_hash, True, 'H', 'FOUND beneficiary via hicn_hash')
+            _log_match_fhir_id(request, version, fhir_id, hicn_hash, True, 'H', 'FOUND beneficiary via hicn_hash')
             return MatchFhirIdResult(fhir_id=fhir_id, lookup_type=MatchFhirIdLookupType.HICN_HASH)
 
-    log_match_fhir_id(request, version, None, hicn_hash, False, None, 'FHIR ID NOT FOUND for both mbi and hicn_hash')
+    _log_match_fhir_id(request, version, None, hicn_hash, False, None, 'FHIR ID NOT FOUND for both mbi and hicn_hash')
     return MatchFhirIdResult(
         error='The requested Beneficiary has no entry, however this may change',
         error_type=MatchFhirIdErrorType.NOT_FOUND,
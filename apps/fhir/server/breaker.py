@@ -0,0 +1,168 @@
+"""
+Circuit breakers and adaptive timeouts for BFD calls.
+
+When BFD slows down, every worker would otherwise wait the full WAIT_TIME on each call and the whole
+API browns out. With FHIR_SERVER['CIRCUIT_BREAKER'] enabled, ``bfd_client`` keeps a breaker for each
+BFD base URL and resource type (Patient, Coverage, ExplanationOfBenefit, ...). Every call made through
+the client is recorded in a rolling window of the last BREAKER_WINDOW seconds:
+
+    closed:    calls go through. Once the window holds BREAKER_MIN_CALLS calls and BREAKER_ERROR_PERCENT
+               of them failed (a connection error, a timeout or a 5XX) or took longer than
+               BREAKER_SLOW_CALL seconds, the breaker opens.
+    open:      calls fail fast with CircuitOpen, a 503 OperationOutcome with a Retry-After header,
+               for BREAKER_OPEN_TIME seconds.
+    half-open: a single probe call is let through. The breaker closes again if it succeeds, and is
+               opened for another BREAKER_OPEN_TIME if it fails.
+
+With FHIR_SERVER['ADAPTIVE_TIMEOUT'] enabled, the timeout of a call is set from the p99 latency of the
+window (ADAPTIVE_TIMEOUT_FACTOR times it, at least ADAPTIVE_TIMEOUT_MIN seconds), instead of always
+being the configured timeout, which stays the upper bound.
+
+Breakers are per process, the health endpoint /health/bfd_breakers reports those of the worker that
+serves it. Health checks call BFD directly and are never stopped by a breaker.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from apps.constants import OPERATION_OUTCOME
+from apps.fhir.server.settings import fhir_settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# Adaptive timeouts are this many times the p99 latency
+ADAPTIVE_TIMEOUT_FACTOR = 3
+# Calls kept for the p99, and seconds between recomputing it
+LATENCY_SAMPLES = 1000
+LATENCY_REFRESH = 1
+
+
+class CircuitOpen(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_code = 'service_unavailable'
+
+    def __init__(self, wait: float):
+        # Sent as Retry-After by the DRF exception handler
+        self.wait = max(1, math.ceil(wait))
+        self.detail = {
+            'resourceType': OPERATION_OUTCOME,
+            'issue': [
+                {
+                    'severity': 'error',
+                    'code': 'transient',
+                    'diagnostics': 'The upstream server is unavailable, try again later.',
+                }
+            ],
+        }
+
+
+def resource_type_from_url(url: str) -> str:
+    """The FHIR resource type a BFD URL is for, e.g. Patient for /v2/fhir/Patient/_search"""
+    parts = urlparse(url).path.strip('/').split('/')
+    if 'fhir' in parts:
+        i = parts.index('fhir')
+        if i + 1 < len(parts):
+            return parts[i + 1]
+    return ''
+
+
+class CircuitBreaker:
+    """Thread-safe breaker with rolling error rate and latency windows for one BFD base URL and resource type"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        # (monotonic time, failed or slow) of the calls in the window
+        self._calls = deque()
+        self._failures = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._p99 = None
+        self._p99_at = 0
+        self._opened_at = 0
+        self._probe_until = 0
+        self._counts = dict.fromkeys(('opened', 'rejected'), 0)
+
+    def allow(self) -> None:
+        """Raise CircuitOpen unless a call may be made now"""
+        now = time.monotonic()
+        open_time = fhir_settings.breaker_open_time
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and now - self._opened_at >= open_time:
+                self.state = HALF_OPEN
+            # Only one probe at a time, unless the last one never reported back
+            if self.state == HALF_OPEN and self._probe_until <= now:
+                self._probe_until = now + open_time
+                return
+            self._counts['rejected'] += 1
+            raise CircuitOpen(max(self._opened_at + open_time - now, 1))
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        """Record the outcome of a call, ``ok`` is False for connection errors, timeouts and 5XX responses"""
+        now = time.monotonic()
+        failed = not ok or elapsed >= fhir_settings.breaker_slow_call
+        with self._lock:
+            self._latencies.append(elapsed)
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._probe_until = 0
+                    self._calls.clear()
+                    self._failures = 0
+                return
+            if self.state == OPEN:
+                return
+
+            self._calls.append((now, failed))
+            self._failures += failed
+            window_start = now - fhir_settings.breaker_window
+            while self._calls and self._calls[0][0] < window_start:
+                self._failures -= self._calls.popleft()[1]
+            calls = len(self._calls)
+            if (
+                calls >= fhir_settings.breaker_min_calls
+                and self._failures * 100 >= fhir_settings.breaker_error_percent * calls
+            ):
+                self._open(now)
+
+    def timeout(self, timeout: float) -> float:
+        """Timeout for the next call, from the p99 latency when there are enough samples, at most ``timeout``"""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._latencies) < fhir_settings.breaker_min_calls:
+                return timeout
+            if now - self._p99_at >= LATENCY_REFRESH:
+                latencies = sorted(self._latencies)
+                self._p99 = latencies[min(len(latencies) - 1, math.ceil(len(latencies) * 0.99) - 1)]
+                self._p99_at = now
+            p99 = self._p99
+        return min(timeout, max(fhir_settings.adaptive_timeout_min, p99 * ADAPTIVE_TIMEOUT_FACTOR))
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': len(self._calls),
+                'failures': self._failures,
+                'p99': self._p99,
+                **self._counts,
+            }
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_until = 0
+        self._calls.clear()
+        self._failures = 0
+        self._counts['opened'] += 1
@@ -0,0 +1,643 @@
+"""
+Pooled, keep-alive HTTP client for all calls to the BFD (FHIR) backend.
+
+A single process-wide ``bfd_client`` owns one ``requests.Session`` per BFD base URL
+(``FHIR_URL`` and ``FHIR_URL_V3``). Connections are kept alive in a urllib3 pool, so the
+TCP + mutual TLS handshake is paid once per pooled connection rather than once per
+beneficiary request. The client certificate is loaded into a shared SSLContext once.
+
+Pooling is tuned through the FHIR_SERVER settings:
+
+    POOL_MAXSIZE:      connections kept per BFD base URL
+    POOL_BLOCK:        block (instead of opening an extra connection) when the pool is exhausted
+    POOL_IDLE_TIMEOUT: seconds a pooled connection may sit unused before it is dropped
+    POOL_MAX_AGE:      seconds after which a connection is dropped, regardless of use
+
+Both clients guard their calls with the circuit breakers and adaptive timeouts of
+apps.fhir.server.breaker when they are enabled.
+
+``async_bfd_client`` is the asyncio counterpart used by the async FHIR views under ASGI. It
+uses the client certificate and pool timeouts of ``bfd_client`` and allows up to ASYNC_MAX_CONNECTIONS
+concurrent connections per BFD base URL.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import ssl
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import timedelta
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import DecodeError, ProtocolError
+from urllib3.poolmanager import PoolManager
+from urllib3.util.ssl_ import create_urllib3_context
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.server.breaker import CircuitBreaker, resource_type_from_url
+from apps.fhir.server.settings import fhir_settings
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+
+class BFDPoolStats:
+    """Thread-safe connection counters for one BFD base URL"""
+
+    FIELDS = ('new_connections', 'reused_connections', 'evicted_idle', 'evicted_age')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            self._counts[field] += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+class _ManagedPoolMixin:
+    """Idle eviction, max connection age and reuse accounting for a urllib3 connection pool.
+
+    The owning BFDEndpoint is attached as ``bfd_endpoint`` by _BFDPoolManager.
+    """
+
+    bfd_endpoint = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        endpoint = self.bfd_endpoint
+        if endpoint is None:
+            return conn
+
+        now = time.monotonic()
+        if conn.sock is not None:
+            if endpoint.max_age and now - getattr(conn, '_bfd_connected_at', now) >= endpoint.max_age:
+                conn.close()
+                endpoint.stats.incr('evicted_age')
+            elif endpoint.idle_timeout and now - getattr(conn, '_bfd_last_used', now) >= endpoint.idle_timeout:
+                conn.close()
+                endpoint.stats.incr('evicted_idle')
+
+        # A connection without a socket will do a fresh TCP + TLS handshake when it is used
+        if conn.sock is None:
+            conn._bfd_connected_at = now
+            endpoint.stats.incr('new_connections')
+        else:
+            endpoint.stats.incr('reused_connections')
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._bfd_last_used = time.monotonic()
+        super()._put_conn(conn)
+
+
+class BFDHTTPConnectionPool(_ManagedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class BFDHTTPSConnectionPool(_ManagedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _BFDPoolManager(PoolManager):
+    def __init__(self, *args, bfd_endpoint=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bfd_endpoint = bfd_endpoint
+        self.pool_classes_by_scheme = {'http': BFDHTTPConnectionPool, 'https': BFDHTTPSConnectionPool}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool.bfd_endpoint = self.bfd_endpoint
+        return pool
+
+
+class BFDHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that uses the managed BFD pools and the client's preloaded SSLContext"""
+
+    def __init__(self, bfd_endpoint, **kwargs):
+        # init_poolmanager() is called from HTTPAdapter.__init__, so the endpoint must be set first
+        self.bfd_endpoint = bfd_endpoint
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _BFDPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, bfd_endpoint=self.bfd_endpoint, **pool_kwargs
+        )
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        if host_params['scheme'] == 'https':
+            pool_kwargs['ssl_context'] = self.bfd_endpoint.client.ssl_context(verify)
+        return host_params, pool_kwargs
+
+
+class BFDEndpoint:
+    """Pooled session and connection counters for a single BFD base URL"""
+
+    def __init__(self, client, base_url: str):
+        self.client = client
+        self.base_url = base_url
+        self.stats = BFDPoolStats()
+        self.session = self._build_session()
+
+    @property
+    def idle_timeout(self):
+        return self.client.idle_timeout
+
+    @property
+    def max_age(self):
+        return self.client.max_age
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        # The session is shared by every beneficiary request, never let BFD cookies leak between them
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = BFDHTTPAdapter(
+            self,
+            pool_connections=1,
+            pool_maxsize=self.client.pool_maxsize,
+            pool_block=self.client.pool_block,
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+class BFDClient:
+    """Process-wide, thread-safe client for the BFD backend.
+
+    Sessions are created lazily on first use for each BFD base URL (scheme + host), so
+    nothing is opened before gunicorn forks its workers.
+    """
+
+    def __init__(self, pool_maxsize=None, pool_block=None, idle_timeout=None, max_age=None):
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._idle_timeout = idle_timeout
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._ssl_contexts = {}
+        self._breakers = {}
+
+    @property
+    def pool_maxsize(self) -> int:
+        return self._pool_maxsize if self._pool_maxsize is not None else fhir_settings.pool_maxsize
+
+    @property
+    def pool_block(self) -> bool:
+        return self._pool_block if self._pool_block is not None else fhir_settings.pool_block
+
+    @property
+    def idle_timeout(self):
+        return self._idle_timeout if self._idle_timeout is not None else fhir_settings.pool_idle_timeout
+
+    @property
+    def max_age(self):
+        return self._max_age if self._max_age is not None else fhir_settings.pool_max_age
+
+    def endpoint(self, url: str) -> BFDEndpoint:
+        parsed_url = urlparse(url)
+        base_url = f'{parsed_url.scheme}://{parsed_url.netloc}'
+        endpoint = self._endpoints.get(base_url)
+        if endpoint is None:
+            with self._lock:
+                endpoint = self._endpoints.get(base_url)
+                if endpoint is None:
+                    endpoint = BFDEndpoint(self, base_url)
+                    self._endpoints[base_url] = endpoint
+        return endpoint
+
+    def session(self, url: str) -> requests.Session:
+        """Return the pooled session for the BFD base URL that ``url`` belongs to"""
+        return self.endpoint(url).session
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """Return the circuit breaker for the BFD base URL and resource type of ``url``"""
+        parsed_url = urlparse(url)
+        key = (f'{parsed_url.scheme}://{parsed_url.netloc}', resource_type_from_url(url))
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker())
+        return breaker
+
+    def guard(self, prepped: requests.PreparedRequest, timeout):
+        """
+        The breaker for a call about to be made and its timeout, or (None, timeout) when neither breakers
+        nor adaptive timeouts are enabled. Raises CircuitOpen when the call must not be made.
+        """
+        if not (fhir_settings.circuit_breaker or fhir_settings.adaptive_timeout):
+            return None, timeout
+        breaker = self.breaker(prepped.url)
+        if fhir_settings.circuit_breaker:
+            breaker.allow()
+        if fhir_settings.adaptive_timeout:
+            timeout = breaker.timeout(timeout or fhir_settings.wait_time)
+        return breaker, timeout
+
+    def send(self, prepped: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """Send a prepared request over the pooled session for its BFD base URL"""
+        breaker, kwargs['timeout'] = self.guard(prepped, kwargs.get('timeout'))
+        if breaker is None:
+            return self.session(prepped.url).send(prepped, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            response = self.session(prepped.url).send(prepped, **kwargs)
+        except requests.exceptions.RequestException:
+            breaker.record(False, time.perf_counter() - start)
+            raise
+        breaker.record(response.status_code < 500, time.perf_counter() - start)
+        return response
+
+    def client_cert(self):
+        """(cert_file, key_file) for mutual TLS with BFD, or None if client auth is disabled"""
+        if not fhir_settings.client_auth:
+            return None
+        return (
+            os.path.join(settings.FHIR_CLIENT_CERTSTORE, fhir_settings.cert_file),
+            os.path.join(settings.FHIR_CLIENT_CERTSTORE, fhir_settings.key_file),
+        )
+
+    def create_ssl_context(self, verify) -> ssl.SSLContext:
+        """A new SSLContext with the client certificate chain loaded"""
+        context = create_urllib3_context(cert_reqs=ssl.CERT_REQUIRED if verify else ssl.CERT_NONE)
+        cert = self.client_cert()
+        if cert:
+            # Keep the same errors requests raises when it is handed a missing cert path
+            if not os.path.exists(cert[0]):
+                raise OSError(f'Could not find the TLS certificate file, invalid path: {cert[0]}')
+            if not os.path.exists(cert[1]):
+                raise OSError(f'Could not find the TLS key file, invalid path: {cert[1]}')
+            context.load_cert_chain(cert[0], cert[1])
+        return context
+
+    def ssl_context(self, verify) -> ssl.SSLContext:
+        """SSLContext of the urllib3 pools, built once per ``verify`` mode. urllib3 loads the CA bundle"""
+        key = bool(verify)
+        context = self._ssl_contexts.get(key)
+        if context is None:
+            with self._lock:
+                context = self._ssl_contexts.get(key)
+                if context is None:
+                    context = self.create_ssl_context(verify)
+                    self._ssl_contexts[key] = context
+        return context
+
+    def stats(self) -> dict:
+        """Connection counters keyed by BFD base URL"""
+        return {base_url: endpoint.stats.as_dict() for base_url, endpoint in list(self._endpoints.items())}
+
+    def breaker_stats(self) -> dict:
+        """Circuit breaker states keyed by BFD base URL, then resource type"""
+        result = {}
+        for (base_url, resource_type), breaker in list(self._breakers.items()):
+            result.setdefault(base_url, {})[resource_type] = breaker.as_dict()
+        return result
+
+    def close(self) -> None:
+        """Close every pooled connection and forget the sessions, SSL contexts and circuit breakers"""
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+            self._endpoints = {}
+            self._ssl_contexts = {}
+            self._breakers = {}
+        for endpoint in endpoints:
+            endpoint.session.close()
+
+    def _reset_after_fork(self) -> None:
+        # Sockets inherited from the parent process must not be shared, just drop them
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._ssl_contexts = {}
+        self._breakers = {}
+
+
+class _AsyncConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.connected_at = time.monotonic()
+        self.last_used = self.connected_at
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncBFDEndpoint:
+    """Keep-alive connections to a single BFD base URL, for one event loop"""
+
+    def __init__(self, client, base_url: str, verify):
+        self.client = client
+        self.base_url = base_url
+        parsed_url = urlparse(base_url)
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port or (443 if parsed_url.scheme == 'https' else 80)
+        self.ssl_context = None
+        if parsed_url.scheme == 'https':
+            self.ssl_context = client.ssl_context(verify)
+        self.stats = client.endpoint_stats(base_url)
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(client.max_connections)
+
+    async def acquire(self) -> _AsyncConnection:
+        await self._slots.acquire()
+        try:
+            now = time.monotonic()
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.reader.at_eof() or conn.writer.is_closing():
+                    conn.close()
+                elif self.client.max_age and now - conn.connected_at >= self.client.max_age:
+                    conn.close()
+                    self.stats.incr('evicted_age')
+                elif self.client.idle_timeout and now - conn.last_used >= self.client.idle_timeout:
+                    conn.close()
+                    self.stats.incr('evicted_idle')
+                else:
+                    self.stats.incr('reused_connections')
+                    conn.reused = True
+                    return conn
+
+            reader, writer = await asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=self.ssl_context,
+                server_hostname=self.host if self.ssl_context else None,
+                limit=2**20,
+            )
+            self.stats.incr('new_connections')
+            return _AsyncConnection(reader, writer)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: _AsyncConnection, keep_alive: bool) -> None:
+        if keep_alive:
+            conn.last_used = time.monotonic()
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+
+class AsyncBFDClient:
+    """asyncio client for the BFD backend, used by the async FHIR views.
+
+    A plain HTTP/1.1 keep-alive client on top of asyncio streams, with BFDClient's client certificate,
+    idle timeout and max age. Connections are kept per event loop and BFD base URL, with at most
+    ``max_connections`` open (and in flight) to each. Responses are returned as ``requests.Response``
+    objects, with their body decoded by urllib3 like requests does, and errors (malformed responses
+    and bodies included) are raised as the matching ``requests`` exceptions, so everything after
+    the BFD call (signals, error handling, permission checks) is shared with the sync views.
+    """
+
+    def __init__(self, sync_client, max_connections=None):
+        self.sync_client = sync_client
+        self._max_connections = max_connections
+        self._lock = threading.Lock()
+        self._endpoints = weakref.WeakKeyDictionary()
+        self._ssl_contexts = {}
+        self._stats = {}
+        self.in_flight = 0
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections if self._max_connections is not None else fhir_settings.async_max_connections
+
+    @property
+    def idle_timeout(self):
+        return self.sync_client.idle_timeout
+
+    @property
+    def max_age(self):
+        return self.sync_client.max_age
+
+    def endpoint_stats(self, base_url: str) -> BFDPoolStats:
+        return self._stats.setdefault(base_url, BFDPoolStats())
+
+    def ssl_context(self, verify) -> ssl.SSLContext:
+        """
+        SSLContext of the connections, with the CA bundle ``verify`` names (requests' one when it is
+        True) loaded, built once per ``verify``. It is not the one of the urllib3 pools, which load
+        their CA bundle into theirs for every connection.
+        """
+        context = self._ssl_contexts.get(verify)
+        if context is None:
+            with self._lock:
+                context = self._ssl_contexts.get(verify)
+                if context is None:
+                    context = self.sync_client.create_ssl_context(verify)
+                    if verify:
+                        context.load_verify_locations(verify if isinstance(verify, str) else requests.certs.where())
+                    self._ssl_contexts[verify] = context
+        return context
+
+    def endpoint(self, url: str, verify=True) -> AsyncBFDEndpoint:
+        parsed_url = urlparse(url)
+        base_url = f'{parsed_url.scheme}://{parsed_url.netloc}'
+        endpoints = self._endpoints.setdefault(asyncio.get_running_loop(), {})
+        key = (base_url, verify)
+        endpoint = endpoints.get(key)
+        if endpoint is None:
+            endpoint = AsyncBFDEndpoint(self, base_url, verify)
+            endpoints[key] = endpoint
+        return endpoint
+
+    async def send(self, prepped: requests.PreparedRequest, timeout=None, verify=True) -> requests.Response:
+        """Send a prepared request to BFD without blocking the event loop"""
+        breaker, timeout = self.sync_client.guard(prepped, timeout)
+        if breaker is None:
+            return await self._send(prepped, timeout, verify)
+
+        start = time.perf_counter()
+        try:
+            response = await self._send(prepped, timeout, verify)
+        except requests.exceptions.RequestException:
+            breaker.record(False, time.perf_counter() - start)
+            raise
+        breaker.record(response.status_code < 500, time.perf_counter() - start)
+        return response
+
+    async def _send(self, prepped, timeout, verify):
+        endpoint = self.endpoint(prepped.url, verify)
+        self.in_flight += 1
+        try:
+            # A reused connection may have been closed by BFD while it was idle, retry once on a new one
+            for attempt in range(2):
+                start = time.perf_counter()
+                try:
+                    async with asyncio.timeout(timeout):
+                        conn = await endpoint.acquire()
+                except TimeoutError as e:
+                    raise requests.exceptions.ConnectTimeout(e, request=prepped)
+                except ssl.SSLError as e:
+                    raise requests.exceptions.SSLError(e, request=prepped)
+                except OSError as e:
+                    raise requests.exceptions.ConnectionError(e, request=prepped)
+
+                keep_alive = False
+                try:
+                    async with asyncio.timeout(timeout):
+                        status, reason, headers, content, keep_alive = await self._exchange(conn, prepped)
+                except (asyncio.IncompleteReadError, ConnectionError) as e:
+                    if conn.reused and attempt == 0:
+                        continue
+                    raise requests.exceptions.ConnectionError(e, request=prepped)
+                except ProtocolError as e:
+                    raise requests.exceptions.ConnectionError(e, request=prepped)
+                except DecodeError as e:
+                    raise requests.exceptions.ContentDecodingError(e, request=prepped)
+                except TimeoutError as e:
+                    raise requests.exceptions.ReadTimeout(e, request=prepped)
+                except OSError as e:
+                    raise requests.exceptions.ConnectionError(e, request=prepped)
+                finally:
+                    endpoint.release(conn, keep_alive)
+
+                response = requests.Response()
+                response.status_code = status
+                response.reason = reason
+                response.headers = headers
+                response.encoding = get_encoding_from_headers(headers)
+                response._content = content
+                response.url = prepped.url
+                response.elapsed = timedelta(seconds=time.perf_counter() - start)
+                response.request = prepped
+                return response
+        finally:
+            self.in_flight -= 1
+
+    async def _exchange(self, conn, prepped):
+        body = prepped.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        head = [f'{prepped.method} {prepped.path_url} HTTP/1.1', f'Host: {urlparse(prepped.url).netloc}']
+        head.extend(f'{name}: {value}' for name, value in prepped.headers.items())
+        if body and 'Content-Length' not in prepped.headers:
+            head.append(f'Content-Length: {len(body)}')
+        conn.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await conn.writer.drain()
+
+        reader = conn.reader
+        # Interim responses (100 Continue, 103 Early Hints) come before the final one, on the same connection
+        http_version, status, reason, headers = await self._read_head(reader)
+        while status < 200:
+            http_version, status, reason, headers = await self._read_head(reader)
+
+        connection = headers.get('Connection', '').lower()
+        if http_version == 'HTTP/1.0':
+            keep_alive = 'keep-alive' in connection
+        else:
+            keep_alive = 'close' not in connection
+
+        if prepped.method == 'HEAD' or status in (204, 304):
+            content = b''
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            chunks = []
+            while True:
+                size = self._parse_int((await reader.readuntil(b'\r\n')).split(b';', 1)[0], 16, 'chunk size')
+                if size == 0:
+                    # Skip any trailers
+                    while await reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b''.join(chunks)
+        elif 'Content-Length' in headers:
+            content = await reader.readexactly(self._parse_int(headers['Content-Length'], 10, 'Content-Length'))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        if content and headers.get('Content-Encoding'):
+            # With urllib3's decoders, like requests, raises DecodeError
+            content = urllib3.HTTPResponse(
+                body=io.BytesIO(content),
+                headers=headers,
+                preload_content=False,
+                decode_content=True,
+                enforce_content_length=False,
+            ).read()
+        return status, reason, headers, content, keep_alive
+
+    async def _read_head(self, reader):
+        """HTTP version, status, reason and headers of the next response on the connection"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.LimitOverrunError as e:
+            raise ProtocolError('Response headers too long') from e
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        http_version, status, reason = (status_line.split(' ', 2) + [''])[:3]
+        if not http_version.startswith('HTTP/1.') or len(status) != 3:
+            raise ProtocolError(f'Malformed status line {status_line!r}')
+        status = self._parse_int(status, 10, 'status')
+        headers = CaseInsensitiveDict()
+        for line in header_lines:
+            if line:
+                name, colon, value = line.partition(':')
+                if not colon:
+                    raise ProtocolError(f'Malformed header line {line!r}')
+                name, value = name.strip(), value.strip()
+                headers[name] = f'{headers[name]}, {value}' if name in headers else value
+        return http_version, status, reason, headers
+
+    @staticmethod
+    def _parse_int(value, base: int, what: str) -> int:
+        try:
+            number = int(value, base)
+        except ValueError:
+            number = -1
+        if number < 0:
+            raise ProtocolError(f'Malformed {what} {value!r}')
+        return number
+
+    def stats(self) -> dict:
+        """Connection counters keyed by BFD base URL"""
+        return {base_url: stats.as_dict() for base_url, stats in list(self._stats.items())}
+
+    async def aclose(self) -> None:
+        """Close the idle connections that belong to the running event loop"""
+        for endpoint in self._endpoints.pop(asyncio.get_running_loop(), {}).values():
+            endpoint.close()
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints = weakref.WeakKeyDictionary()
+        self._ssl_contexts = {}
+        self._stats = {}
+        self.in_flight = 0
+
+
+bfd_client = BFDClient()
+async_bfd_client = AsyncBFDClient(bfd_client)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=bfd_client._reset_after_fork)
+    os.register_at_fork(after_in_child=async_bfd_client._reset_after_fork)
@@ -23,6 +23,49 @@ DEFAULTS = {
     'SERVER_VERIFY': False,
     'WAIT_TIME': 30,
     'VERIFY_SERVER': False,
+    # Connection pooling for the BFD client in apps.fhir.server.client
+    'POOL_MAXSIZE': 10,
+    'POOL_BLOCK': False,
+    'POOL_IDLE_TIMEOUT': 60,
+    'POOL_MAX_AGE': 300,
+    # Native async FHIR views for ASGI deployments, see apps.fhir.bluebutton.views.asynchronous
+    'ASYNC_VIEWS': False,
+    'ASYNC_MAX_CONNECTIONS': 1000,
+    # Pass BFD responses through to the client as they arrive, see apps.fhir.bluebutton.streaming
+    'STREAM_RESPONSES': False,
+    # Seconds BFD responses are cached for, by resource type, see apps.fhir.bluebutton.cache
+    'RESPONSE_CACHE_TTL': {},
+    'RESPONSE_CACHE_MAX_BYTES': 64 * 1024 * 1024,
+    # Coalesce identical concurrent BFD requests, optionally across processes through a cache alias,
+    # see apps.fhir.server.singleflight
+    'COALESCE_REQUESTS': False,
+    'COALESCE_CACHE': None,
+    # Seconds before the CapabilityStatement served by /metadata is rebuilt, see apps.fhir.bluebutton.capability
+    'CAPABILITY_REFRESH_INTERVAL': 60 * 60,
+    # Circuit breakers and adaptive timeouts for BFD calls, see apps.fhir.server.breaker
+    'CIRCUIT_BREAKER': False,
+    'BREAKER_WINDOW': 30,
+    'BREAKER_MIN_CALLS': 20,
+    'BREAKER_ERROR_PERCENT': 50,
+    'BREAKER_SLOW_CALL': 10,
+    'BREAKER_OPEN_TIME': 30,
+    'ADAPTIVE_TIMEOUT': False,
+    'ADAPTIVE_TIMEOUT_MIN': 2,
+    # Seconds between bulk writes of Application.last_active, 0 writes it on every request,
+    # see apps.fhir.bluebutton.activity
+    'APP_ACTIVITY_FLUSH_INTERVAL': 0,
+    # Patient/$export jobs, see apps.fhir.bluebutton.export. EXPORT_WORKERS 0 runs a job within its kick-off request
+    'EXPORT_WORKERS': 2,
+    'EXPORT_PARALLELISM': 4,
+    'EXPORT_PAGE_SIZE': 50,
+    'EXPORT_STORAGE': None,
+    'EXPORT_ROOT': None,
+    'EXPORT_RETRY_AFTER': 5,
+    'EXPORT_RETENTION': 24 * 60 * 60,
+    'EXPORT_JOB_TIMEOUT': 60 * 60,
+    # POST /v3/fhir/ batch Bundles, see apps.fhir.bluebutton.views.batch
+    'BATCH_MAX_ENTRIES': 10,
+    'BATCH_CONCURRENCY': 4,
 }
 
 # List of settings that cannot be empty
@@ -0,0 +1,226 @@
+"""
+Coalescing of identical, concurrent BFD requests.
+
+An app that fans out or retries aggressively sends bursts of the same FHIR call for a beneficiary
+within milliseconds. With FHIR_SERVER['COALESCE_REQUESTS'] enabled, ``send`` lets only the first of a
+set of identical in-flight requests through to BFD, and hands its response to the others when it
+arrives. Each caller still runs its own permission checks on the shared response.
+
+Requests are identical when their method, URL (with query parameters), body and the headers that can
+change BFD's response (COALESCE_HEADERS) match. The audit headers of the requests that were coalesced
+(BlueButton-OriginalQueryId and the like) are not sent to BFD, their pre_fetch / post_fetch audit
+logs are still written by the API.
+
+By default requests are coalesced within a process. When FHIR_SERVER['COALESCE_CACHE'] names a cache
+alias shared by all processes (not the database cache), a second layer coalesces across processes: the
+first process to register a call in the cache makes it and stores the response there for a few
+seconds, the other processes poll for it. Responses hold beneficiary data, so that cache must only be
+reachable by the API.
+
+``stats()`` counts the calls made to BFD and the calls that were collapsed into another.
+"""
+
+import copy
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import requests
+from django.core.cache import caches
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.server.client import bfd_client
+from apps.fhir.server.settings import fhir_settings
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+# Request headers that can change what BFD returns. BFD builds the paging links of a Bundle from the
+# forwarded host and scheme, and they are passed on to the app as they are.
+COALESCE_HEADERS = (
+    'X-Forwarded-Host',
+    'X-Forwarded-Proto',
+    'includeAddressFields',
+    'BlueButton-BeneficiaryId',
+    'Accept',
+    'Accept-Encoding',
+    'Content-Type',
+    'If-None-Match',
+    'If-Modified-Since',
+)
+
+# Seconds a response shared through the cache is kept for the processes waiting on it
+CACHE_RESULT_TTL = 5
+CACHE_POLL_INTERVAL = 0.01
+
+
+def request_key(prepped: requests.PreparedRequest) -> str:
+    """Digest of everything in a prepared request that BFD's response depends on"""
+    digest = hashlib.sha256()
+    body = prepped.body or b''
+    for part in (
+        prepped.method,
+        prepped.url,
+        body if isinstance(body, bytes) else body.encode('utf-8'),
+        *(prepped.headers.get(name, '') for name in COALESCE_HEADERS),
+    ):
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class _FlightStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'calls': 0, 'collapsed': 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+    def _incr(self, field):
+        with self._lock:
+            self._counts[field] += 1
+
+
+class SingleFlight(_FlightStats):
+    """Shares the result of a call between the threads of this process that make it at the same time"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """Return fn(), or the result of the identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(timeout):
+                self._incr('collapsed')
+                if call.error is not None:
+                    raise call.error
+                return call.response
+            logger.warning('Gave up waiting on a coalesced BFD call, calling BFD instead')
+            self._incr('calls')
+            return fn()
+
+        self._incr('calls')
+        try:
+            call.response = fn()
+            return call.response
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class CacheSingleFlight(_FlightStats):
+    """Shares the response of a BFD call between processes, through a Django cache they all use"""
+
+    def do(self, key, fn, timeout=None, prepped=None, alias='default'):
+        cache = caches[alias]
+        lock_key = f'bfd-flight:{key}'
+        timeout = timeout or fhir_settings.wait_time
+        token = uuid.uuid4().hex
+
+        if not cache.add(lock_key, token, timeout=math.ceil(timeout) + 1):
+            response = self._wait(cache, lock_key, timeout, prepped)
+            if response is not None:
+                self._incr('collapsed')
+                return response
+
+        self._incr('calls')
+        try:
+            response = fn()
+            cache.set(f'{lock_key}:{token}', self._dump(response), timeout=CACHE_RESULT_TTL)
+            return response
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    def _wait(self, cache, lock_key, timeout, prepped):
+        deadline = time.monotonic() + timeout
+        token = cache.get(lock_key)
+        while token is not None and time.monotonic() < deadline:
+            data = cache.get(f'{lock_key}:{token}')
+            if data is not None:
+                return self._load(data, prepped)
+            time.sleep(CACHE_POLL_INTERVAL)
+            # The lock is gone once the call has finished, or failed
+            if cache.get(lock_key) is None:
+                data = cache.get(f'{lock_key}:{token}')
+                return None if data is None else self._load(data, prepped)
+        return None
+
+    @staticmethod
+    def _dump(response):
+        return {
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'encoding': response.encoding,
+            'content': response.content,
+            'url': response.url,
+            'elapsed': response.elapsed.total_seconds(),
+        }
+
+    @staticmethod
+    def _load(data, prepped):
+        response = requests.Response()
+        response.status_code = data['status_code']
+        response.reason = data['reason']
+        response.headers = requests.structures.CaseInsensitiveDict(data['headers'])
+        response.encoding = data['encoding']
+        response._content = data['content']
+        response.url = data['url']
+        response.elapsed = timedelta(seconds=data['elapsed'])
+        response.request = prepped
+        return response
+
+
+process_flight = SingleFlight()
+cache_flight = CacheSingleFlight()
+
+
+def send(prepped: requests.PreparedRequest, **kwargs) -> requests.Response:
+    """bfd_client.send, coalesced with identical concurrent requests when FHIR_SERVER['COALESCE_REQUESTS'] is on"""
+    if not fhir_settings.coalesce_requests:
+        return bfd_client.send(prepped, **kwargs)
+
+    key = request_key(prepped)
+    timeout = kwargs.get('timeout')
+    alias = fhir_settings.coalesce_cache
+
+    def call():
+        if alias:
+            return cache_flight.do(key, lambda: bfd_client.send(prepped, **kwargs), timeout, prepped, alias)
+        return bfd_client.send(prepped, **kwargs)
+
+    response = process_flight.do(key, call, timeout)
+    if response.request is not prepped:
+        # Shared with the first caller, the audit logs need this caller's own request headers
+        response = copy.copy(response)
+        response.request = prepped
+    return response
+
+
+def stats() -> dict:
+    """BFD calls made and collapsed, within this process and across processes"""
+    return {'process': process_flight.stats(), 'cache': cache_flight.stats()}
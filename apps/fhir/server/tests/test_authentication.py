@@ -1,10 +1,12 @@
 import json
+from unittest.mock import patch
 
 from django.test import RequestFactory
 from django.test.client import Client
 from httmock import HTTMock, urlmatch
 
 from apps.fhir.server.authentication import MatchFhirIdErrorType, MatchFhirIdLookupType, match_fhir_id
+from apps.fhir.server.breaker import CircuitOpen
 from apps.fhir.server.tests.responses import responses
 from apps.test import BaseApiTest
 from apps.versions import Versions
@@ -141,6 +143,20 @@ class TestAuthentication(BaseApiTest):
             self.assertEqual(match_fhir_id_result.lookup_type, MatchFhirIdLookupType.MBI)
             self.assertEqual(match_fhir_id_result.error_type, MatchFhirIdErrorType.UPSTREAM)
 
+    @patch('apps.fhir.server.authentication.singleflight.send', side_effect=CircuitOpen(30))
+    def test_match_fhir_id_circuit_open(self, send):
+        """
+        Testing responses: the BFD circuit breaker is open
+        Expecting: an upstream error, not CircuitOpen
+        """
+        match_fhir_id_result = match_fhir_id(
+            mbi=self.test_mbi, hicn_hash=self.test_hicn_hash, request=self.request, version=Versions.V2
+        )
+        self.assertIsNone(match_fhir_id_result.fhir_id)
+        self.assertEqual(match_fhir_id_result.lookup_type, MatchFhirIdLookupType.MBI)
+        self.assertEqual(match_fhir_id_result.error_type, MatchFhirIdErrorType.UPSTREAM)
+        self.assertEqual(match_fhir_id_result.error, 'The upstream server is unavailable, try again later.')
+
     def test_match_fhir_id_duplicates_hicn(self):
         """
         Testing responses: HICN = duplicates
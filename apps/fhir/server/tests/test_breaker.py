@@ -0,0 +1,223 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from apps.constants import DEFAULT_SAMPLE_FHIR_ID_V2
+from apps.fhir.server.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, resource_type_from_url
+from apps.fhir.server.client import AsyncBFDClient, BFDClient, bfd_client
+from apps.fhir.server.settings import fhir_settings
+from apps.test import BaseApiTest
+
+BREAKER_SETTINGS = {
+    'CIRCUIT_BREAKER': True,
+    'BREAKER_WINDOW': 30,
+    'BREAKER_MIN_CALLS': 4,
+    'BREAKER_ERROR_PERCENT': 50,
+    'BREAKER_SLOW_CALL': 10,
+    'BREAKER_OPEN_TIME': 30,
+    'ADAPTIVE_TIMEOUT_MIN': 2,
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+
+@patch.dict(fhir_settings.user_settings, BREAKER_SETTINGS)
+class TestCircuitBreaker(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch('apps.fhir.server.breaker.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker()
+
+    def test_resource_type_from_url(self):
+        self.assertEqual(resource_type_from_url('https://bfd.example.gov/v2/fhir/Patient/_search'), 'Patient')
+        self.assertEqual(resource_type_from_url('https://bfd.example.gov/v3/fhir/Coverage/?a=1'), 'Coverage')
+        self.assertEqual(resource_type_from_url('https://bfd.example.gov/'), '')
+
+    def test_opens_on_error_rate(self):
+        for ok in (True, False, True):
+            self.breaker.record(ok, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen) as cm:
+            self.breaker.allow()
+        self.assertEqual(cm.exception.wait, 30)
+        self.assertEqual(cm.exception.detail['resourceType'], 'OperationOutcome')
+
+    def test_slow_calls_count_as_failures(self):
+        for _ in range(4):
+            self.breaker.record(True, 10)
+
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_old_calls_leave_the_window(self):
+        self.breaker.record(False, 0.1)
+        self.breaker.record(False, 0.1)
+        self.clock.now += 31
+        self.breaker.record(True, 0.1)
+        self.breaker.record(True, 0.1)
+
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.as_dict()['calls'], 2)
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.breaker.record(False, 0.1)
+        self.clock.now += 30
+
+        # A single probe is let through
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.allow()
+
+        # A failed probe opens the breaker again
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.allow()
+
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.allow()
+        self.assertEqual(self.breaker.as_dict()['opened'], 2)
+
+    def test_adaptive_timeout(self):
+        self.assertEqual(self.breaker.timeout(30), 30)
+
+        for _ in range(98):
+            self.breaker.record(True, 0.5)
+        self.breaker.record(True, 3)
+        self.breaker.record(True, 3)
+        self.assertEqual(self.breaker.timeout(30), 9)
+        self.assertEqual(self.breaker.timeout(4), 4)
+
+        # Recomputed at most once a second
+        for _ in range(100):
+            self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.timeout(30), 9)
+        self.clock.now += 1
+        self.assertEqual(self.breaker.timeout(30), 2)
+
+
+class ErrorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests += 1
+        body = b'{}'
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubBFDTestMixin:
+    def start_bfd(self, status=500):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ErrorHandler)
+        self.server.daemon_threads = True
+        self.server.requests = 0
+        self.server.status = status
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+
+@patch.dict(fhir_settings.user_settings, BREAKER_SETTINGS)
+class TestClientBreakers(StubBFDTestMixin, SimpleTestCase):
+    def setUp(self):
+        self.start_bfd()
+        self.client = BFDClient()
+        self.addCleanup(self.client.close)
+
+    def _send(self, path='/v2/fhir/Coverage/'):
+        return self.client.send(requests.Request('GET', self.base_url + path).prepare(), timeout=5)
+
+    def test_breaker_per_resource_type(self):
+        for _ in range(4):
+            self.assertEqual(self._send().status_code, 500)
+
+        with self.assertRaises(CircuitOpen):
+            self._send()
+        self.assertEqual(self.server.requests, 4)
+        # Other resource types are still sent
+        self.assertEqual(self._send('/v2/fhir/Patient/').status_code, 500)
+
+        stats = self.client.breaker_stats()[self.base_url]
+        self.assertEqual(stats['Coverage']['state'], OPEN)
+        self.assertEqual(stats['Coverage']['rejected'], 1)
+        self.assertEqual(stats['Patient']['state'], CLOSED)
+
+    def test_connection_errors_are_failures(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for _ in range(4):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self._send()
+
+        with self.assertRaises(CircuitOpen):
+            self._send()
+
+    async def test_async_client_shares_the_breakers(self):
+        async_client = AsyncBFDClient(self.client)
+        for _ in range(4):
+            await async_client.send(requests.Request('GET', self.base_url + '/v2/fhir/Coverage/').prepare(), timeout=5)
+        await async_client.aclose()
+
+        with self.assertRaises(CircuitOpen):
+            self._send()
+
+    @patch.dict(fhir_settings.user_settings, {'CIRCUIT_BREAKER': False})
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(self._send().status_code, 500)
+
+        self.assertEqual(self.client.breaker_stats(), {})
+
+
+@patch.dict(fhir_settings.user_settings, BREAKER_SETTINGS)
+class TestFhirViewWithOpenBreaker(StubBFDTestMixin, BaseApiTest):
+    def setUp(self):
+        self.read_capability = self._create_capability('Read', [])
+        self.write_capability = self._create_capability('Write', [])
+        self.access_token = self.create_token('John', 'Smith', fhir_id_v2=DEFAULT_SAMPLE_FHIR_ID_V2)
+        self.start_bfd()
+        patcher = patch.dict(fhir_settings.user_settings, {'FHIR_URL': self.base_url})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(bfd_client.close)
+
+    def test_open_breaker_returns_operation_outcome(self):
+        for _ in range(4):
+            bfd_client.breaker(f'{self.base_url}/v2/fhir/Coverage/').record(False, 0.1)
+
+        response = self.client.get('/v2/fhir/Coverage/', headers={'Authorization': f'Bearer {self.access_token}'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(json.loads(response.content)['resourceType'], 'OperationOutcome')
+        self.assertEqual(self.server.requests, 0)
+
+        health = self.client.get('/health/bfd_breakers')
+        self.assertEqual(health.status_code, 503)
+        self.assertEqual(health.json()['breakers'][self.base_url]['Coverage']['state'], OPEN)
@@ -0,0 +1,244 @@
+import gzip
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.test import TestCase
+
+from apps.fhir.server.client import AsyncBFDClient, BFDClient
+
+BUNDLE = b'{"resourceType": "Bundle"}'
+# Deflate without the zlib header and checksum, that some servers send
+RAW_DEFLATE = zlib.compress(BUNDLE, wbits=-zlib.MAX_WBITS)
+RAW_RESPONSES = {
+    'http10': b'HTTP/1.0 200 OK\r\nContent-Length: %d\r\n\r\n%s' % (len(BUNDLE), BUNDLE),
+    'raw-deflate': b'HTTP/1.1 200 OK\r\nContent-Encoding: deflate\r\nContent-Length: %d\r\n\r\n%s'
+    % (len(RAW_DEFLATE), RAW_DEFLATE),
+    'bad-gzip': b'HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\nContent-Length: 4\r\n\r\nnope',
+    'bad-status': b'HTTP/1.1 OK\r\nContent-Length: 0\r\n\r\n',
+    'bad-length': b'HTTP/1.1 200 OK\r\nContent-Length: many\r\n\r\n',
+}
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+        body = BUNDLE
+        if self.path.startswith('/raw/'):
+            # A response written as is, for the ones http.server can't send
+            self.wfile.write(RAW_RESPONSES[self.path.split('?')[0][len('/raw/') :]])
+            return
+        if self.path.startswith('/early-hints'):
+            self.wfile.write(b'HTTP/1.1 103 Early Hints\r\nLink: </metadata>; rel=preload\r\n\r\n')
+        if self.path.startswith('/chunked'):
+            body = gzip.compress(body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/fhir+json')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (body[:10], body[10:]):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'AWSALB=sticky; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBFDClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, client, path='/v2/fhir/Patient/'):
+        url = self.base_url + path
+        response = client.session(url).get(url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_one_session_per_base_url(self):
+        client = BFDClient()
+        self.assertIs(
+            client.session('https://bfd.example.gov/v2/fhir/Patient/'),
+            client.session('https://bfd.example.gov/v2/fhir/Coverage/?beneficiary=Patient/-1'),
+        )
+        self.assertIsNot(
+            client.session('https://bfd.example.gov/v2/fhir/Patient/'),
+            client.session('https://bfd-v3.example.gov/v3/fhir/Patient/'),
+        )
+
+    def test_connections_are_reused(self):
+        client = BFDClient(idle_timeout=60, max_age=300)
+        for _ in range(5):
+            self._get(client)
+
+        stats = client.stats()[self.base_url]
+        self.assertEqual(stats['new_connections'], 1)
+        self.assertEqual(stats['reused_connections'], 4)
+        client.close()
+
+    def test_idle_connections_are_evicted(self):
+        client = BFDClient(idle_timeout=0.05, max_age=300)
+        self._get(client)
+        time.sleep(0.1)
+        self._get(client)
+
+        stats = client.stats()[self.base_url]
+        self.assertEqual(stats['evicted_idle'], 1)
+        self.assertEqual(stats['new_connections'], 2)
+        self.assertEqual(stats['reused_connections'], 0)
+        client.close()
+
+    def test_old_connections_are_evicted(self):
+        client = BFDClient(idle_timeout=60, max_age=0.05)
+        self._get(client)
+        self._get(client)
+        time.sleep(0.1)
+        self._get(client)
+
+        stats = client.stats()[self.base_url]
+        self.assertEqual(stats['evicted_age'], 1)
+        self.assertEqual(stats['new_connections'], 2)
+        self.assertEqual(stats['reused_connections'], 1)
+        client.close()
+
+    def test_cookies_are_not_shared_between_requests(self):
+        client = BFDClient()
+        response = self._get(client)
+
+        self.assertIn('AWSALB', response.headers['Set-Cookie'])
+        self.assertEqual(len(client.session(self.base_url).cookies), 0)
+        client.close()
+
+    def test_missing_client_cert(self):
+        client = BFDClient()
+        client.client_cert = lambda: ('/nonexistent/certstore/ca.cert.pem', '/nonexistent/certstore/ca.key.pem')
+
+        with self.assertRaisesRegex(OSError, 'Could not find the TLS certificate file'):
+            client.ssl_context(False)
+
+
+class TestAsyncBFDClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.server.daemon_threads = True
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.client = AsyncBFDClient(BFDClient(idle_timeout=60, max_age=300))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _prepare(self, path='/v2/fhir/Patient/'):
+        return requests.Request('GET', self.base_url + path, params={'_format': 'json'}).prepare()
+
+    async def test_send_returns_a_requests_response(self):
+        prepped = self._prepare()
+        response = await self.client.send(prepped, timeout=5)
+
+        self.assertIsInstance(response, requests.Response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'resourceType': 'Bundle'})
+        self.assertEqual(response.headers['content-type'], 'application/fhir+json')
+        self.assertIn('AWSALB', response.headers['Set-Cookie'])
+        self.assertIs(response.request, prepped)
+        self.assertGreater(response.elapsed.total_seconds(), 0)
+        self.assertEqual(self.client.in_flight, 0)
+        await self.client.aclose()
+
+    def test_ssl_context_is_its_own(self):
+        self.client.sync_client.client_cert = lambda: None
+        sync_context = self.client.sync_client.ssl_context(True)
+        sync_cas = sync_context.cert_store_stats()['x509_ca']
+        context = self.client.ssl_context(True)
+
+        self.assertIsNot(context, sync_context)
+        self.assertIs(self.client.ssl_context(True), context)
+        self.assertGreater(context.cert_store_stats()['x509_ca'], 0)
+        self.assertEqual(sync_context.cert_store_stats()['x509_ca'], sync_cas)
+        # A CA bundle path is loaded instead of requests' one
+        with self.assertRaises(FileNotFoundError):
+            self.client.ssl_context('/nonexistent/ca.pem')
+
+    async def test_one_endpoint_per_base_url(self):
+        endpoint = self.client.endpoint(self.base_url + '/v2/fhir/Patient/')
+        self.assertIs(endpoint, self.client.endpoint(self.base_url + '/v2/fhir/Coverage/'))
+        self.assertIsNot(endpoint, self.client.endpoint('http://127.0.0.2:8080/v2/fhir/Patient/'))
+        await self.client.aclose()
+
+    async def test_connections_are_reused(self):
+        for _ in range(5):
+            await self.client.send(self._prepare(), timeout=5)
+
+        stats = self.client.stats()[self.base_url]
+        self.assertEqual(stats['new_connections'], 1)
+        self.assertEqual(stats['reused_connections'], 4)
+        await self.client.aclose()
+
+    async def test_chunked_gzip_response(self):
+        response = await self.client.send(self._prepare('/chunked'), timeout=5)
+
+        self.assertEqual(response.json(), {'resourceType': 'Bundle'})
+        await self.client.aclose()
+
+    async def test_interim_responses_are_skipped(self):
+        response = await self.client.send(self._prepare('/early-hints'), timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'resourceType': 'Bundle'})
+
+        # The connection is reused with nothing of the first response left on it
+        response = await self.client.send(self._prepare('/chunked'), timeout=5)
+        self.assertEqual(response.json(), {'resourceType': 'Bundle'})
+        self.assertEqual(self.client.stats()[self.base_url]['reused_connections'], 1)
+        await self.client.aclose()
+
+    async def test_http_10_connections_are_not_kept(self):
+        for _ in range(2):
+            response = await self.client.send(self._prepare('/raw/http10'), timeout=5)
+            self.assertEqual(response.json(), {'resourceType': 'Bundle'})
+
+        stats = self.client.stats()[self.base_url]
+        self.assertEqual(stats['new_connections'], 2)
+        self.assertEqual(stats['reused_connections'], 0)
+        await self.client.aclose()
+
+    async def test_raw_deflate_response(self):
+        response = await self.client.send(self._prepare('/raw/raw-deflate'), timeout=5)
+
+        self.assertEqual(response.json(), {'resourceType': 'Bundle'})
+        await self.client.aclose()
+
+    async def test_malformed_responses_raise_requests_exceptions(self):
+        with self.assertRaises(requests.exceptions.ContentDecodingError):
+            await self.client.send(self._prepare('/raw/bad-gzip'), timeout=5)
+        for path in ('/raw/bad-status', '/raw/bad-length'):
+            with self.subTest(path=path), self.assertRaises(requests.exceptions.ConnectionError):
+                await self.client.send(self._prepare(path), timeout=5)
+        self.assertEqual(self.client.in_flight, 0)
+        await self.client.aclose()
+
+    async def test_timeout_raises_requests_timeout(self):
+        with self.assertRaises(requests.exceptions.Timeout):
+            await self.client.send(self._prepare('/slow'), timeout=0.1)
+        self.assertEqual(self.client.in_flight, 0)
+        await self.client.aclose()
@@ -0,0 +1,203 @@
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from apps.fhir.server import singleflight
+from apps.fhir.server.settings import fhir_settings
+from apps.fhir.server.singleflight import CacheSingleFlight, SingleFlight, request_key
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'flight': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'flight'},
+}
+
+
+def prepare(url='https://bfd.example.gov/v2/fhir/Patient/-1', **headers):
+    return requests.Request('GET', url, headers=headers).prepare()
+
+
+def make_response(content=b'{"resourceType": "Patient"}'):
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.headers['Content-Type'] = 'application/fhir+json'
+    response._content = content
+    response.url = 'https://bfd.example.gov/v2/fhir/Patient/-1'
+    return response
+
+
+def run_concurrently(fn, count=5):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def target(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestRequestKey(SimpleTestCase):
+    def test_audit_headers_are_ignored(self):
+        self.assertEqual(
+            request_key(prepare(**{'BlueButton-OriginalQueryId': '1', 'BlueButton-Application': 'a'})),
+            request_key(prepare(**{'BlueButton-OriginalQueryId': '2', 'BlueButton-Application': 'b'})),
+        )
+
+    def test_response_headers_and_url_are_not_ignored(self):
+        self.assertNotEqual(request_key(prepare()), request_key(prepare('https://bfd.example.gov/v2/fhir/Patient/-2')))
+        self.assertNotEqual(
+            request_key(prepare(includeAddressFields='True')), request_key(prepare(includeAddressFields='False'))
+        )
+
+    def test_forwarded_host_and_scheme_are_not_ignored(self):
+        # BFD builds the paging links of a Bundle from them
+        self.assertNotEqual(
+            request_key(prepare(**{'X-Forwarded-Host': 'api.bluebutton.cms.gov'})),
+            request_key(prepare(**{'X-Forwarded-Host': 'sandbox.bluebutton.cms.gov'})),
+        )
+        self.assertNotEqual(
+            request_key(prepare(**{'X-Forwarded-Proto': 'https'})),
+            request_key(prepare(**{'X-Forwarded-Proto': 'http'})),
+        )
+
+
+class TestSingleFlight(SimpleTestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    def slow_call(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return self.calls
+
+    def test_concurrent_calls_are_collapsed(self):
+        results = run_concurrently(lambda i: self.flight.do('key', self.slow_call))
+
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.flight.stats(), {'calls': 1, 'collapsed': 4})
+
+    def test_different_keys_are_not_collapsed(self):
+        run_concurrently(lambda i: self.flight.do(i, self.slow_call))
+
+        self.assertEqual(self.calls, 5)
+        self.assertEqual(self.flight.stats(), {'calls': 5, 'collapsed': 0})
+
+    def test_sequential_calls_are_not_collapsed(self):
+        self.assertEqual(self.flight.do('key', self.slow_call), 1)
+        self.assertEqual(self.flight.do('key', self.slow_call), 2)
+
+    def test_errors_are_shared(self):
+        def failing_call():
+            time.sleep(0.2)
+            raise requests.exceptions.ConnectionError('BFD is down')
+
+        results = run_concurrently(lambda i: self.flight.do('key', failing_call))
+
+        self.assertTrue(all(isinstance(result, requests.exceptions.ConnectionError) for result in results))
+        self.assertEqual(self.flight.stats(), {'calls': 1, 'collapsed': 4})
+        # The failed call is not kept
+        self.assertEqual(self.flight.do('key', lambda: 'ok'), 'ok')
+
+    def test_waiting_callers_give_up_after_the_timeout(self):
+        def call(i):
+            if i:
+                time.sleep(0.05)
+            return self.flight.do('key', self.slow_call if i else lambda: time.sleep(1) or 'slow', timeout=0.1)
+
+        results = run_concurrently(call, count=2)
+
+        self.assertEqual(results, ['slow', 1])
+        self.assertEqual(self.flight.stats(), {'calls': 2, 'collapsed': 0})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestCacheSingleFlight(SimpleTestCase):
+    def setUp(self):
+        self.flight = CacheSingleFlight()
+        self.calls = 0
+
+    def slow_call(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return make_response()
+
+    def test_concurrent_calls_are_collapsed(self):
+        results = run_concurrently(lambda i: self.flight.do('key', self.slow_call, 1, prepare(), 'flight'))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.stats(), {'calls': 1, 'collapsed': 4})
+        for response in results:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'resourceType': 'Patient'})
+            self.assertEqual(response.headers['content-type'], 'application/fhir+json')
+
+    def test_failed_call_is_not_shared(self):
+        def call(i):
+            if i:
+                time.sleep(0.05)
+                return self.flight.do('key', self.slow_call, 1, prepare(), 'flight')
+
+            def failing_call():
+                time.sleep(0.2)
+                raise requests.exceptions.ConnectionError('BFD is down')
+
+            return self.flight.do('key', failing_call, 1, prepare(), 'flight')
+
+        results = run_concurrently(call, count=2)
+
+        self.assertIsInstance(results[0], requests.exceptions.ConnectionError)
+        self.assertEqual(results[1].status_code, 200)
+        self.assertEqual(self.flight.stats(), {'calls': 2, 'collapsed': 0})
+
+
+class TestSend(SimpleTestCase):
+    def setUp(self):
+        self.process_flight = patch.object(singleflight, 'process_flight', SingleFlight())
+        self.process_flight.start()
+        self.addCleanup(self.process_flight.stop)
+
+    def send(self, i):
+        return singleflight.send(prepare(**{'BlueButton-OriginalQueryId': str(i)}), timeout=1)
+
+    @patch('apps.fhir.server.singleflight.bfd_client')
+    def test_disabled_by_default(self, mock_bfd_client):
+        mock_bfd_client.send.side_effect = lambda *args, **kwargs: time.sleep(0.1) or make_response()
+
+        run_concurrently(self.send)
+
+        self.assertEqual(mock_bfd_client.send.call_count, 5)
+        self.assertEqual(singleflight.stats()['process'], {'calls': 0, 'collapsed': 0})
+
+    @patch.dict(fhir_settings.user_settings, {'COALESCE_REQUESTS': True})
+    @patch('apps.fhir.server.singleflight.bfd_client')
+    def test_each_caller_gets_its_own_request(self, mock_bfd_client):
+        def send(prepped, **kwargs):
+            time.sleep(0.2)
+            response = make_response()
+            response.request = prepped
+            return response
+
+        mock_bfd_client.send.side_effect = send
+
+        results = run_concurrently(self.send)
+
+        self.assertEqual(mock_bfd_client.send.call_count, 1)
+        self.assertEqual(singleflight.stats()['process'], {'calls': 1, 'collapsed': 4})
+        self.assertEqual(
+            sorted(response.request.headers['BlueButton-OriginalQueryId'] for response in results),
+            ['0', '1', '2', '3', '4'],
+        )
+        self.assertTrue(all(response.json() == {'resourceType': 'Patient'} for response in results))
@@ -1,10 +1,9 @@
 import logging
 
-import requests
 from django.db import connection
 
 from apps.constants import HHS_SERVER_LOGNAME_FMT
-from apps.fhir.bluebutton.utils import FhirServerAuth
+from apps.fhir.server.client import bfd_client
 from apps.fhir.server.settings import fhir_settings
 from apps.mymedicare_cb.authorization import OAuth2ConfigSLSx
 
@@ -17,13 +16,10 @@ def django_rds_database(v2=False):
 
 
 def bfd_fhir_dataserver(v2=False):
-    fhir_server_auth = FhirServerAuth()
-
     target_url = '{}{}'.format(fhir_settings.fhir_url, '/v2/fhir/metadata' if v2 else '/v1/fhir/metadata')
-    r = requests.get(
+    r = bfd_client.session(target_url).get(
         target_url,
         params={'_format': 'json'},
-        cert=(fhir_server_auth['cert_file'], fhir_server_auth['key_file']),
         verify=False,
         timeout=5,
     )
@@ -12,6 +12,8 @@ ENDPOINT_TEST_CASES = [
     ('/health/test', 404),
     ('/health/internal', 404),
     ('/health/', 200),
+    ('/health/bfd_breakers', 200),
+    ('/health/cache', 200),
 ]
 
 EXTERNAL_ENDPOINTS = [
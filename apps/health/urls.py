@@ -2,6 +2,8 @@ from django.urls import path, re_path
 
 from apps.health.views import (
     CheckBFD,
+    CheckBFDBreakers,
+    CheckCache,
     CheckDB,
     CheckExternal,
     CheckInternal,
@@ -15,6 +17,8 @@ urlpatterns = [
     re_path(r'/db/?$', CheckDB.as_view()),
     re_path(r'/bfd/?$', CheckBFD.as_view()),
     re_path(r'/bfd_v2/?$', CheckBFD.as_view()),
+    re_path(r'/bfd_breakers/?$', CheckBFDBreakers.as_view()),
+    re_path(r'/cache/?$', CheckCache.as_view()),
     re_path(r'^$', CheckInternal.as_view()),
     path('/', CheckInternal.as_view()),
 ]
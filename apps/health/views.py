@@ -1,11 +1,14 @@
 import logging
 
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from apps.constants import HHS_SERVER_LOGNAME_FMT
+from apps.fhir.server.breaker import OPEN
+from apps.fhir.server.client import bfd_client
 from apps.health.checks import (
     bfd_services,
     db_services,
@@ -67,3 +70,23 @@ class CheckBFD(Check):
 
 class CheckDB(Check):
     services = db_services
+
+
+class CheckBFDBreakers(APIView):
+    """States of this process' BFD circuit breakers, 503 while any of them is open"""
+
+    def get(self, request, format=None):
+        breakers = bfd_client.breaker_stats()
+        if any(breaker['state'] == OPEN for resources in breakers.values() for breaker in resources.values()):
+            return Response(
+                {'message': 'BFD circuit breaker open', 'breakers': breakers}, status=ServiceUnavailable.status_code
+            )
+        return Response({'message': "all's well", 'breakers': breakers})
+
+
+class CheckCache(APIView):
+    """Lookup counts of this process' two-tier cache (apps.core.cache), when it is the default cache"""
+
+    def get(self, request, format=None):
+        stats = cache.stats() if hasattr(cache, 'stats') else None
+        return Response({'message': "all's well", 'backend': type(cache).__name__, 'stats': stats})
@@ -0,0 +1,137 @@
+"""
+Audit log lines built and written off the request thread.
+
+A request hands audit_writer a function that builds and writes its log line, with a snapshot of what the
+line needs. With AUDIT_LOG_QUEUE_SIZE set, the function is put on a bounded queue and a background
+thread runs queued functions, up to AUDIT_LOG_BATCH_SIZE at a time, with its own database connections.
+Without it, or for a function that cannot be queued, the function runs right away on the request thread.
+
+When the queue is full, AUDIT_LOG_OVERFLOW decides: ``inline`` (the default) runs the function on the
+request thread, so no line is lost and requests slow down to the rate lines can be written; ``drop``
+drops it, counts it and logs how many were dropped. stats() has the counts and the deepest the queue has
+been. Whatever is queued is written when the worker exits.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from apps.constants import HHS_SERVER_LOGNAME_FMT
+
+logger = logging.getLogger(HHS_SERVER_LOGNAME_FMT.format(__name__))
+
+OVERFLOW_INLINE = 'inline'
+OVERFLOW_DROP = 'drop'
+
+# Seconds the worker's exit waits for queued lines to be written
+EXIT_TIMEOUT = 5
+
+
+class BackgroundLogWriter:
+    def __init__(self):
+        self._reset_after_fork()
+
+    def submit(self, func, *args) -> None:
+        """Run ``func(*args)``, on the background thread when the queue is enabled and has room"""
+        if settings.AUDIT_LOG_QUEUE_SIZE <= 0:
+            func(*args)
+            return
+
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=settings.AUDIT_LOG_QUEUE_SIZE)
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+                self._thread.start()
+            log_queue = self._queue
+
+        try:
+            log_queue.put_nowait((func, args))
+        except queue.Full:
+            if settings.AUDIT_LOG_OVERFLOW == OVERFLOW_DROP:
+                self._incr('dropped')
+                return
+            self._incr('inline')
+            func(*args)
+            return
+
+        depth = log_queue.qsize()
+        with self._lock:
+            self._counts['queued'] += 1
+            self._counts['max_depth'] = max(self._counts['max_depth'], depth)
+
+    def flush(self, timeout=None) -> bool:
+        """Wait until the queued lines are written, False if ``timeout`` seconds passed first"""
+        log_queue = self._queue
+        if log_queue is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with log_queue.all_tasks_done:
+            while log_queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                log_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            depth = self._queue.qsize() if self._queue is not None else 0
+            return {**self._counts, 'depth': depth}
+
+    def _incr(self, name) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _run(self, log_queue):
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < settings.AUDIT_LOG_BATCH_SIZE:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            written = failed = 0
+            for func, args in batch:
+                try:
+                    func(*args)
+                    written += 1
+                except Exception:
+                    failed += 1
+                    logger.exception('Failed to write an audit log line')
+            # Runs in its own thread, with its own database connections
+            connections.close_all()
+
+            with self._lock:
+                self._counts['batches'] += 1
+                self._counts['written'] += written
+                self._counts['failed'] += failed
+                dropped = self._counts['dropped']
+                reported = dropped - self._dropped_since_report
+                self._dropped_since_report = dropped
+            if reported:
+                logger.warning('Dropped %d audit log lines, the queue was full', reported)
+
+            for _ in batch:
+                log_queue.task_done()
+
+    def _reset_after_fork(self) -> None:
+        # The parent process writes what it queued, the writer thread is not running in the child
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._dropped_since_report = 0
+        self._counts = dict.fromkeys(('queued', 'written', 'failed', 'dropped', 'inline', 'batches', 'max_depth'), 0)
+
+
+audit_writer = BackgroundLogWriter()
+
+atexit.register(audit_writer.flush, EXIT_TIMEOUT)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=audit_writer._reset_after_fork)
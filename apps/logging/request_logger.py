@@ -81,6 +81,18 @@ class BasicLogger:
     def info(self, data_dict, cls=None):
         self._logger.info(self.format_for_output(data_dict, cls=cls))
 
+    def info_at(self, created, data_dict, cls=None):
+        # info() for an event at ``created`` (a time.time()), for lines written later by another thread
+        if not self._logger.isEnabledFor(INFO):
+            return
+        record = self._logger.makeRecord(
+            self._logger.name, INFO, '(unknown file)', 0, self.format_for_output(data_dict, cls=cls), (), None
+        )
+        record.relativeCreated -= (record.created - created) * 1000
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        self._logger.handle(record)
+
     def error(self, data_dict, cls=None):
         self._logger.error(self.format_for_output(data_dict, cls=cls))
 
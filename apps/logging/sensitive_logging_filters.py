@@ -1,6 +1,7 @@
 import logging
 import logging.config
 import re
+from operator import is_not
 
 MBI_WITH_HYPHEN_PATTERN = r"""\b
     [1-9](?![SLOIBZsloibz])[A-Za-z](?![SLOIBZsloibz)])[A-Za-z\d]\d
@@ -18,24 +19,70 @@ MBI_WITHOUT_HYPHEN_PATTERN = r"""\b
 MBI_PATTERN = f'({MBI_WITH_HYPHEN_PATTERN}|{MBI_WITHOUT_HYPHEN_PATTERN})'
 SENSITIVE_DATA_FILTER = 'sensitive_data_filter'
 
+# MBI_PATTERN with each letter lookahead folded into its character class, and the \b before the first
+# digit checked once the first 4 characters matched (they are word characters), so that the pattern
+# starts with a character class the regex engine can scan for. It masks the same text as MBI_PATTERN.
+MBI_LETTER = '[AC-HJKMNP-RT-Yac-hjkmnp-rt-y]'
+MBI_LETTER_OR_DIGIT = r'[AC-HJKMNP-RT-Yac-hjkmnp-rt-y\d]'
+MBI_RE = re.compile(
+    rf"""
+    [1-9]{MBI_LETTER}{MBI_LETTER_OR_DIGIT}\d(?<!\w\w\w\w\w)
+    (?:
+        -{MBI_LETTER}{MBI_LETTER_OR_DIGIT}\d-{MBI_LETTER}{{2}}\d{{2}}
+        |
+        {MBI_LETTER}{MBI_LETTER_OR_DIGIT}\d[AC-HJKMNP-RT-Yace-hjkmnp-rt-y]{{2}}\d{{2}}
+    )
+    \b""",
+    re.VERBOSE,
+)
+# An MBI without hyphens is 11 characters, shorter text can't have one
+MBI_MIN_LENGTH = 11
+MBI_MASK = '***MBI***'
+
 
 def mask_if_has_mbi(text):
-    return re.sub(MBI_PATTERN, '***MBI***', str(text), flags=re.VERBOSE)
+    text = str(text)
+    if len(text) < MBI_MIN_LENGTH:
+        return text
+    return MBI_RE.sub(MBI_MASK, text)
+
+
+def mask_items(values):
+    """The items of a tuple or list as masked strings, ``values`` itself when they are unchanged strings"""
+    masked = [mask_if_has_mbi(value) for value in values]
+    if type(values) in (tuple, list) and not any(map(is_not, masked, values)):
+        return values
+    return tuple(masked) if isinstance(values, tuple) else masked
 
 
 def mask_mbi(value_to_mask):
     if isinstance(value_to_mask, str):
         return mask_if_has_mbi(value_to_mask)
 
-    if isinstance(value_to_mask, tuple):
-        return tuple([mask_if_has_mbi(arg) for arg in value_to_mask])
-
-    if isinstance(value_to_mask, list):
-        return [mask_if_has_mbi(arg) for arg in value_to_mask]
+    if isinstance(value_to_mask, (tuple, list)):
+        return mask_items(value_to_mask)
 
     if isinstance(value_to_mask, dict):
-        for key, value in value_to_mask.items():
-            value_to_mask[key] = mask_mbi(value)
+        # Masked in place, the dicts nested in it from a stack rather than by recursion
+        dicts = [value_to_mask]
+        seen = set()
+        while dicts:
+            current = dicts.pop()
+            if id(current) in seen:
+                continue
+            seen.add(id(current))
+            for key, value in current.items():
+                if isinstance(value, str):
+                    masked = mask_if_has_mbi(value)
+                elif isinstance(value, (tuple, list)):
+                    masked = mask_items(value)
+                elif isinstance(value, dict):
+                    dicts.append(value)
+                    continue
+                else:
+                    continue
+                if masked is not value:
+                    current[key] = masked
 
     return value_to_mask
 
@@ -212,7 +212,9 @@ class Response:
         return self.resp.status_code
 
     def size(self):
-        return len(self.resp.content)
+        # Streamed FHIR responses are never held in content, their size is counted as they are read
+        streamed_size = getattr(self.resp, 'streamed_size', None)
+        return len(self.resp.content) if streamed_size is None else streamed_size
 
     def elapsed(self):
         return self.resp.elapsed.total_seconds()
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.logging.background import BackgroundLogWriter, audit_writer
+from apps.logging.request_logger import AUDIT_HHS_AUTH_SERVER_REQ_LOGGER
+from hhs_oauth_server.request_logging import RequestTimeLoggingMiddleware
+
+
+class TestBackgroundLogWriter(SimpleTestCase):
+    def setUp(self):
+        self.writer = BackgroundLogWriter()
+        self.lines = []
+        # Held by a test to keep the writer's thread busy with the first line
+        self.release = threading.Event()
+        self.release.set()
+
+    def write(self, line):
+        self.release.wait(5)
+        self.lines.append(line)
+
+    def fill(self, lines):
+        """Block the writer's thread on the first line and submit the others behind it"""
+        self.release.clear()
+        self.writer.submit(self.write, 0)
+        while self.writer.stats()['depth']:
+            time.sleep(0.001)
+        for line in range(1, lines):
+            self.writer.submit(self.write, line)
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=0)
+    def test_without_queue(self):
+        self.writer.submit(self.write, 'line')
+        self.assertEqual(self.lines, ['line'])
+        self.assertEqual(self.writer.stats()['queued'], 0)
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=100, AUDIT_LOG_BATCH_SIZE=10)
+    def test_batches(self):
+        self.fill(51)
+        self.release.set()
+        self.assertTrue(self.writer.flush(5))
+
+        self.assertEqual(self.lines, list(range(51)))
+        stats = self.writer.stats()
+        self.assertEqual(stats['queued'], 51)
+        self.assertEqual(stats['written'], 51)
+        self.assertEqual(stats['max_depth'], 50)
+        self.assertEqual(stats['depth'], 0)
+        # The first line, then the 50 behind it 10 at a time
+        self.assertEqual(stats['batches'], 6)
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=3, AUDIT_LOG_OVERFLOW='inline')
+    def test_overflow_inline(self):
+        self.fill(4)
+        self.assertFalse(self.writer.flush(0.01))
+        self.writer.submit(self.lines.append, 'inline')
+        self.assertEqual(self.lines, ['inline'])
+
+        self.release.set()
+        self.assertTrue(self.writer.flush(5))
+        self.assertEqual(self.lines, ['inline', 0, 1, 2, 3])
+        self.assertEqual(self.writer.stats()['inline'], 1)
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=3, AUDIT_LOG_OVERFLOW='drop')
+    def test_overflow_drop(self):
+        self.fill(6)
+        with self.assertLogs('hhs_server.apps.logging.background', 'WARNING') as logs:
+            self.release.set()
+            self.assertTrue(self.writer.flush(5))
+            # The warning follows the batch the lines were dropped during
+            self.writer.submit(self.write, 6)
+            self.assertTrue(self.writer.flush(5))
+
+        self.assertEqual(self.lines, [0, 1, 2, 3, 6])
+        self.assertEqual(self.writer.stats()['dropped'], 2)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Dropped 2 audit log lines', logs.output[0])
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=10)
+    def test_failed_line(self):
+        def fail():
+            raise ValueError('bad line')
+
+        with self.assertLogs('hhs_server.apps.logging.background', 'ERROR'):
+            self.writer.submit(fail)
+            self.writer.submit(self.write, 'after')
+            self.assertTrue(self.writer.flush(5))
+        self.assertEqual(self.lines, ['after'])
+        self.assertEqual(self.writer.stats()['failed'], 1)
+        self.assertEqual(self.writer.stats()['written'], 1)
+
+
+class TestBackgroundRequestLogging(SimpleTestCase):
+    def log_lines(self, response):
+        """The request log line of the same request written on the request thread, then by the writer"""
+        request = RequestFactory().get(
+            '/v2/fhir/Patient', {'_count': '5', 'patient': '-20140000008325'}, HTTP_USER_AGENT='test'
+        )
+        request.user = AnonymousUser()
+        middleware = RequestTimeLoggingMiddleware(lambda r: response)
+        middleware.process_request(request)
+
+        with self.assertLogs(AUDIT_HHS_AUTH_SERVER_REQ_LOGGER, 'INFO') as logs:
+            middleware.process_response(request, response)
+            with override_settings(AUDIT_LOG_QUEUE_SIZE=100):
+                before = time.time()
+                middleware.process_response(request, response)
+                after = time.time()
+                self.assertTrue(audit_writer.flush(5))
+
+        self.assertEqual(request._logging_pass, 3)
+        sync_record, async_record = logs.records
+        self.assertGreaterEqual(async_record.created, before)
+        self.assertLessEqual(async_record.created, after)
+        return json.loads(sync_record.getMessage()), json.loads(async_record.getMessage())
+
+    def assertSameLine(self, sync_line, async_line):
+        for key in ('end_time', 'elapsed'):
+            self.assertGreaterEqual(async_line.pop(key), sync_line.pop(key))
+        self.assertEqual(list(async_line.items()), list(sync_line.items()))
+
+    def test_same_line(self):
+        response = HttpResponse(b'{"resourceType": "Patient"}', content_type='application/json')
+        response['X-Cache'] = 'HIT'
+        sync_line, async_line = self.log_lines(response)
+        self.assertEqual(async_line['size'], len(response.content))
+        self.assertEqual(async_line['fhir_cache'], 'HIT')
+        self.assertEqual(async_line['req_qparam__count'], '5')
+        self.assertSameLine(sync_line, async_line)
+
+    def test_same_line_redirect(self):
+        sync_line, async_line = self.log_lines(HttpResponseRedirect('/v2/o/authorize/'))
+        self.assertEqual(async_line['location'], '/v2/o/authorize/')
+        self.assertSameLine(sync_line, async_line)
@@ -0,0 +1,120 @@
+import copy
+import logging
+import random
+import re
+from collections import namedtuple
+
+from django.test import SimpleTestCase
+
+from apps.logging.sensitive_logging_filters import MBI_PATTERN, SensitiveDataFilter, mask_if_has_mbi, mask_mbi
+
+# The characters MBIs are made of at each position, with the ones an MBI can't have mixed in
+MBI_POSITIONS = [
+    '123456789',
+    'ACDEFGHJKMNPQRTUVWXYacdyBs',
+    'ACX0123bL',
+    '0123456789',
+    'ACDEFGHJKMNPQRTUVWXYko',
+    'AC01d',
+    '0123456789',
+    'ACDEFGHJKMNPQRTUVWXYSd',
+    'ACDEFGHJKMNPQRTUVWXYdz',
+    '0123456789',
+    '0123456789A',
+]
+TEXT = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_ .,/:"\'()\n٣é'
+
+Coding = namedtuple('Coding', ['system', 'code'])
+
+
+def old_mask_if_has_mbi(text):
+    return re.sub(MBI_PATTERN, '***MBI***', str(text), flags=re.VERBOSE)
+
+
+def old_mask_mbi(value_to_mask):
+    if isinstance(value_to_mask, str):
+        return old_mask_if_has_mbi(value_to_mask)
+
+    if isinstance(value_to_mask, tuple):
+        return tuple([old_mask_if_has_mbi(arg) for arg in value_to_mask])
+
+    if isinstance(value_to_mask, list):
+        return [old_mask_if_has_mbi(arg) for arg in value_to_mask]
+
+    if isinstance(value_to_mask, dict):
+        for key, value in value_to_mask.items():
+            value_to_mask[key] = old_mask_mbi(value)
+
+    return value_to_mask
+
+
+def random_mbi(rng):
+    mbi = ''.join(rng.choice(chars) for chars in MBI_POSITIONS)
+    if rng.random() < 0.5:
+        mbi = f'{mbi[:4]}-{mbi[4:7]}-{mbi[7:]}'
+    if rng.random() < 0.1:
+        # A Unicode digit is a \d too
+        position = rng.choice([2, 3])
+        mbi = mbi[:position] + '٣' + mbi[position + 1 :]
+    return mbi.lower() if rng.random() < 0.2 else mbi
+
+
+def random_text(rng):
+    text = ''.join(rng.choice(TEXT) for _ in range(rng.randrange(30)))
+    for _ in range(rng.randrange(3)):
+        position = rng.randrange(len(text) + 1)
+        text = text[:position] + random_mbi(rng) + text[position:]
+    return text
+
+
+def random_value(rng, depth=0):
+    choice = rng.random()
+    if choice < 0.1 and depth < 3:
+        return {f'key{i}': random_value(rng, depth + 1) for i in range(rng.randrange(5))}
+    if choice < 0.15:
+        return [random_value(rng, 3) for _ in range(rng.randrange(4))]
+    if choice < 0.2:
+        return tuple(random_value(rng, 3) for _ in range(rng.randrange(4)))
+    if choice < 0.22:
+        return Coding(random_text(rng), rng.randrange(100))
+    if choice < 0.3:
+        return rng.choice([None, 42, 3.5, True])
+    return random_text(rng)
+
+
+class TestSensitiveDataFilter(SimpleTestCase):
+    def test_same_as_pattern(self):
+        rng = random.Random(2031)
+        for _ in range(20000):
+            text = random_text(rng)
+            self.assertEqual(mask_if_has_mbi(text), old_mask_if_has_mbi(text), repr(text))
+
+    def test_same_as_recursive_mask(self):
+        rng = random.Random(2032)
+        for _ in range(5000):
+            value = random_value(rng)
+            expected = old_mask_mbi(copy.deepcopy(value))
+            masked = mask_mbi(value)
+            self.assertEqual(masked, expected, repr(value))
+            self.assertIs(type(masked), type(expected))
+
+    def test_unchanged(self):
+        args = ('no MBI here', 'or here')
+        self.assertIs(mask_mbi(args), args)
+        items = ['no MBI here', '1EG4-TE5-MK74']
+        self.assertEqual(mask_mbi(items), ['no MBI here', '***MBI***'])
+        self.assertEqual(items, ['no MBI here', '1EG4-TE5-MK74'])
+        self.assertEqual(mask_mbi((1, 'x')), ('1', 'x'))
+
+        # Dicts are masked in place, a dict in itself too
+        data = {'mbi': '1EG4TE5MK74', 'entry': {'id': 'x'}}
+        data['entry']['parent'] = data
+        self.assertIs(mask_mbi(data), data)
+        self.assertEqual(data['mbi'], '***MBI***')
+
+    def test_filter(self):
+        record = logging.LogRecord(
+            'audit', logging.INFO, __file__, 1, 'Beneficiary %s with %s', ('1EG4-TE5-MK74', 'no MBI'), None
+        )
+        self.assertTrue(SensitiveDataFilter().filter(record))
+        self.assertEqual(record.getMessage(), 'Beneficiary ***MBI*** with no MBI')
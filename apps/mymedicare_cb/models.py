@@ -1,15 +1,20 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.contrib.auth.models import Group, User
 from django.core.exceptions import ValidationError
-from django.db import models, transaction
+from django.db import connections, models, transaction
 from rest_framework.exceptions import NotFound
+from waffle import switch_is_active
 
 import apps.logging.request_logger as logging
 from apps.accounts.models import UserProfile
 from apps.constants import USER_TYPE_ALIGNED_NETWORKS_BENEFICIARY, USER_TYPE_BENEFICIARY
+from apps.dot_ext.loggers import get_session_auth_flow_trace
 from apps.dot_ext.utils import get_api_version_number_from_url
 from apps.fhir.bluebutton.exceptions import UpstreamServerException
 from apps.fhir.bluebutton.models import ArchivedCrosswalk, Crosswalk
-from apps.fhir.server.authentication import MatchFhirIdErrorType, match_fhir_id
+from apps.fhir.server.authentication import MatchFhirIdErrorType, deferred_side_effects, match_fhir_id
 from apps.mymedicare_cb.authorization import OAuth2ConfigSLSx
 from apps.mymedicare_cb.constants import (
     MAX_HICN_HASH_LENGTH,
@@ -67,16 +72,8 @@ def __get_and_update_user(mbi, user_id, hicn_hash, request, auth_type, slsx_clie
     # version, bubble that error. If the backend simply returns no match
     # (NotFound), treat that as no FHIR id available and continue.
 
-    versioned_match_fhir_id_results = {}
-    for supported_version in Versions.latest_versions():
-        match_fhir_id_result = match_fhir_id(
-            mbi=mbi,
-            hicn_hash=hicn_hash,
-            request=request,
-            version=supported_version,
-        )
-        versioned_match_fhir_id_results[supported_version] = match_fhir_id_result
-
+    versioned_match_fhir_id_results, match_fhir_id_elapsed = _match_fhir_ids(mbi, hicn_hash, request)
+    for supported_version, match_fhir_id_result in versioned_match_fhir_id_results.items():
         if _match_fhir_id_error_should_be_checked(version, supported_version):
             # If there is not a fhir_id found for the requested version, then we want to raise an exception
             if match_fhir_id_result.error_type == MatchFhirIdErrorType.UPSTREAM:
@@ -107,6 +104,7 @@ def __get_and_update_user(mbi, user_id, hicn_hash, request, auth_type, slsx_clie
         'fhir_id_v3': bfd_fhir_id_v3,
         'hicn_hash': hicn_hash,
         'hash_lookup_type': version_user_id_type,
+        **match_fhir_id_elapsed,
         'crosswalk': {},
         'crosswalk_before': {},
     }
@@ -255,6 +253,47 @@ def get_and_update_user_from_initial_auth(slsx_client: OAuth2ConfigSLSx, request
     )
 
 
+def _match_fhir_ids(mbi, hicn_hash, request):
+    """Run match_fhir_id for each of the latest versions at once, each on its own thread.
+
+    The lookups of a version still run one after the other: the hicn_hash is only searched
+    for after the MBI search found no match. Their log lines and session writes are replayed
+    here afterwards, version by version, so they come out as if the versions ran in turn.
+
+    Returns:
+        {version: MatchFhirIdResult}, and the seconds each version's lookups and all of them took
+        as 'fhir_id_v<version>_elapsed' and 'match_fhir_id_elapsed' log entries
+    """
+    versions = Versions.latest_versions()
+    # Load the session and the v3 switch match_fhir_id reads on this thread, rather than on each worker
+    get_session_auth_flow_trace(request)
+    switch_is_active('v3_endpoints')
+
+    def timed_match_fhir_id(version, effects):
+        start = time.monotonic()
+        try:
+            with deferred_side_effects(effects):
+                result = match_fhir_id(mbi=mbi, hicn_hash=hicn_hash, request=request, version=version)
+            return result, round(time.monotonic() - start, 3)
+        finally:
+            connections.close_all()
+
+    start = time.monotonic()
+    effects = {version: [] for version in versions}
+    with ThreadPoolExecutor(max_workers=len(versions)) as pool:
+        futures = {version: pool.submit(timed_match_fhir_id, version, effects[version]) for version in versions}
+    elapsed = {'match_fhir_id_elapsed': round(time.monotonic() - start, 3)}
+
+    for version in versions:
+        for effect in effects[version]:
+            effect()
+
+    results = {}
+    for version in versions:
+        results[version], elapsed[f'fhir_id_v{version}_elapsed'] = futures[version].result()
+    return results, elapsed
+
+
 def _match_fhir_id_error_should_be_checked(
     request_version: int,
     match_fhir_id_version: int,
@@ -28,6 +28,7 @@ from apps.dot_ext.constants import PATIENT_DATA_CANNOT_BE_FOUND
 from apps.dot_ext.models import Application, Approval
 from apps.fhir.bluebutton.models import ArchivedCrosswalk, Crosswalk
 from apps.fhir.server.authentication import MatchFhirIdErrorType, MatchFhirIdLookupType, MatchFhirIdResult
+from apps.fhir.server.breaker import CircuitOpen
 from apps.logging.utils import cleanup_logger, get_log_content, get_log_lines_list, redirect_loggers
 from apps.mymedicare_cb.authorization import OAuth2ConfigSLSx
 from apps.mymedicare_cb.constants import (
@@ -1153,6 +1154,32 @@ class MyMedicareSLSxBlueButtonClientApiUserInfoTest(BaseApiTest):
             self.assertIsNotNone(log_rec_json)
             self.assertEqual(log_rec_json.get('sls_status_mesg'), err_msg)
 
+    @patch('apps.fhir.server.authentication.singleflight.send', side_effect=CircuitOpen(30))
+    def test_callback_circuit_open(self, send):
+        """With the BFD circuit breaker open, the callback answers with its 502, not the breaker's 503"""
+        state = generate_nonce()
+        AnonUserState.objects.create(
+            state=state,
+            next_uri=(
+                'http://www.doesnotexist.gov?next=/v1/o/authorize'
+                '&client_id=test&redirect_uri=test.com&response_type=token&state=test'
+            ),
+        )
+
+        with HTTMock(
+            self.mock_response.slsx_token_mock,
+            self.mock_response.slsx_user_info_mock,
+            self.mock_response.slsx_health_ok_mock,
+            self.mock_response.slsx_signout_ok_mock,
+        ):
+            response = self.client.get(
+                self.callback_url,
+                data={'req_token': '0000-test_req_token-0000', 'relay': state},
+            )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_GATEWAY)
+        self.assertEqual(response.json()['error'], 'Failed to retrieve data from data source.')
+        self.assertTrue(send.called)
+
     @patch(
         'apps.mymedicare_cb.models.match_fhir_id',
         return_value=(
@@ -1,3 +1,6 @@
+import json
+import threading
+import time
 from unittest.mock import Mock, patch
 
 from django.contrib.auth.models import Group, User
@@ -6,6 +9,7 @@ from django.http import HttpRequest
 from django.test import TestCase
 from waffle.testutils import override_switch
 
+import apps.logging.request_logger as logging
 from apps.constants import USER_TYPE_BENEFICIARY
 from apps.fhir.bluebutton.models import Crosswalk
 from apps.fhir.server.authentication import MatchFhirIdErrorType, MatchFhirIdLookupType, MatchFhirIdResult
@@ -510,3 +514,41 @@ class BeneficiaryLoginTest(TestCase):
         self.assertIsNotNone(user.crosswalk)
         self.assertEqual(crosswalk_type, 'C')
         self.assertIsNone(user.crosswalk.fhir_id_v3)
+
+    @override_switch('v3_endpoints', active=True)
+    def test_versions_matched_at_once(self) -> None:
+        """The v2 and v3 lookups run at the same time, their log lines come out in version order"""
+        both_searching = threading.Barrier(2, timeout=5)
+
+        def search(search_identifier, request, version):
+            both_searching.wait()
+            if version == Versions.V2:
+                # Finish after v3
+                time.sleep(0.05)
+            return search_fhir_id_by_identifier_side_effect(search_identifier, request, version)
+
+        slsx_client = Mock(spec=OAuth2ConfigSLSx)
+        slsx_client.user_id = DEFAULT_USERNAME
+        slsx_client.mbi = '1S00EU7JH82'
+        slsx_client.hicn_hash = DEFAULT_HICN_HASH
+        slsx_client.firstname = DEFAULT_FIRST_NAME
+        slsx_client.lastname = DEFAULT_LAST_NAME
+        slsx_client.email = DEFAULT_EMAIL
+
+        with (
+            patch('apps.fhir.server.authentication.search_fhir_id_by_identifier', side_effect=search),
+            self.assertLogs(logging.AUDIT_AUTHN_MATCH_FHIR_ID_LOGGER, 'INFO') as match_logs,
+            self.assertLogs(logging.AUDIT_AUTHN_MED_CALLBACK_LOGGER, 'INFO') as callback_logs,
+        ):
+            user, crosswalk_type = get_and_update_user_from_initial_auth(slsx_client, mock_request)
+
+        self.assertEqual(user.crosswalk.fhir_id_v2, '-20140000008325')
+        self.assertEqual(user.crosswalk.fhir_id_v3, '-30250000008325')
+        match_lines = [json.loads(record.getMessage()) for record in match_logs.records]
+        self.assertEqual([line['bfd_version'] for line in match_lines], [Versions.V2, Versions.V3])
+        self.assertEqual([line['fhir_id_v2'] for line in match_lines], ['-20140000008325', '-30250000008325'])
+
+        callback_line = json.loads(callback_logs.records[-1].getMessage())
+        self.assertGreaterEqual(callback_line['fhir_id_v2_elapsed'], 0.05)
+        self.assertLess(callback_line['fhir_id_v3_elapsed'], callback_line['fhir_id_v2_elapsed'])
+        self.assertGreaterEqual(callback_line['match_fhir_id_elapsed'], callback_line['fhir_id_v2_elapsed'])
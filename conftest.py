@@ -228,3 +228,18 @@ def create_application(db):
         return application
 
     return _create_application
+
+
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """
+    The applications and capabilities a test creates are rolled back without their post_delete
+    signal, so the application registry and the scope catalog are cleared after each test, before
+    another test reuses their ids.
+    """
+    yield
+    from apps.capabilities.catalog import scope_catalog
+    from apps.dot_ext.app_registry import application_registry
+
+    application_registry.clear()
+    scope_catalog.clear()
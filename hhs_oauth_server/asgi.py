@@ -0,0 +1,18 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+# import dotenv
+from dotenv import load_dotenv
+
+# project root folder
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DJANGO_CUSTOM_SETTINGS_DIR = os.path.join(BASE_DIR, '..')
+
+# If the .env file is present, load it
+if os.path.isfile(os.path.join(DJANGO_CUSTOM_SETTINGS_DIR, '.env')):
+    load_dotenv(os.path.join(DJANGO_CUSTOM_SETTINGS_DIR, '.env'))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.base')
+
+application = get_asgi_application()
@@ -5,12 +5,80 @@ SecurityHeadersMiddleware adds response headers that were previously
 provided by the nginx reverse proxy. With the migration to Fargate
 (gunicorn handles TLS directly), these headers are now set at the
 application layer.
+
+The session, locale, CSRF, authentication, messages and axes middleware
+below are Django's and axes' own, skipped for the bearer token API calls
+matching API_FAST_PATH_PATTERN (the FHIR and userinfo endpoints): they
+only serve the browser pages, and the API views authenticate with the
+access token alone. API requests have no request.session, anything they
+need to keep for the request is set on the request itself.
 """
 
 import os
+import re
+from functools import lru_cache
 
+from axes.middleware import AxesMiddleware as BaseAxesMiddleware
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf, locale
 from django.utils.deprecation import MiddlewareMixin
 
+API_FAST_PATH_ATTR = '_bb2_api_fast_path'
+
+
+@lru_cache(maxsize=None)
+def _compile(pattern):
+    return re.compile(pattern)
+
+
+def is_api_fast_path(request) -> bool:
+    """Whether ``request`` is a bearer token API call the browser-only middleware is skipped for"""
+    fast_path = getattr(request, API_FAST_PATH_ATTR, None)
+    if fast_path is None:
+        pattern = getattr(settings, 'API_FAST_PATH_PATTERN', None)
+        fast_path = bool(pattern) and _compile(pattern).match(request.path_info) is not None
+        setattr(request, API_FAST_PATH_ATTR, fast_path)
+    return fast_path
+
+
+class BrowserOnlyMixin:
+    """Passes API_FAST_PATH_PATTERN requests straight on to the next middleware"""
+
+    def __call__(self, request):
+        if is_api_fast_path(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(BrowserOnlyMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class LocaleMiddleware(BrowserOnlyMixin, locale.LocaleMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(BrowserOnlyMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_fast_path(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(BrowserOnlyMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(BrowserOnlyMixin, messages_middleware.MessageMiddleware):
+    pass
+
+
+class AxesMiddleware(BrowserOnlyMixin, BaseAxesMiddleware):
+    pass
+
 
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """Adds Content-Security-Policy-Report-Only header (BB2-233).
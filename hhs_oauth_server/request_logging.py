@@ -1,14 +1,22 @@
+import copy
 import datetime
 import hashlib
 import json
+import time
 import uuid
+from functools import partial
+from typing import NamedTuple, Optional
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponseBase
 from django.utils.deprecation import MiddlewareMixin
-from oauth2_provider.models import AccessToken, RefreshToken, get_application_model
+from oauth2_provider.models import AccessToken, RefreshToken
 from rest_framework.response import Response
 
 import apps.logging.request_logger as logging
+from apps.dot_ext.app_registry import application_registry
+from apps.dot_ext.auth_context import get_auth_context
 from apps.dot_ext.constants import SESSION_AUTH_FLOW_TRACE_KEYS
 from apps.dot_ext.loggers import (
     get_session_auth_flow_trace,
@@ -19,10 +27,98 @@ from apps.fhir.bluebutton.utils import (
     get_ip_from_request,
     get_user_from_request,
 )
+from apps.logging.background import audit_writer
 from apps.versions import Versions
 
 audit = logging.getLogger('audit.%s' % __name__)
 
+REDIRECT_STATUS_CODES = (300, 301, 302, 307)
+
+
+class ResponseSummary(NamedTuple):
+    """What the log line needs from a response, taken before the response is sent"""
+
+    status_code: int
+    location: str = ''
+    size: int = 0
+    cache: Optional[str] = None
+    # The fhir_* log items of a FHIR response
+    fhir: Optional[dict] = None
+    # Content of a refresh_token grant response
+    content: Optional[bytes] = None
+
+
+class StreamedContent:
+    """
+    The body of a streamed response, counting the bytes sent. Django closes it with the response, after
+    the body was sent or the client went away, which calls ``on_close`` with the byte count.
+    """
+
+    def __init__(self, content, on_close):
+        self.content = content
+        self.on_close = on_close
+        self.size = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.content:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close(self.size)
+
+
+def summarize_response(request, response) -> ResponseSummary:
+    status_code = getattr(response, 'status_code', 0)
+    location, size = '', 0
+    if status_code in REDIRECT_STATUS_CODES:
+        location = response.get('Location', '?')
+    elif getattr(response, 'streaming', False):
+        # Set once the body has been sent, see StreamedContent
+        size = getattr(response, 'streamed_size', 0)
+    elif getattr(response, 'content', False):
+        size = len(response.content)
+
+    cache = None
+    if isinstance(response, HttpResponseBase) and response.has_header('X-Cache'):
+        cache = response['X-Cache']
+
+    fhir = None
+    if isinstance(response, Response) and isinstance(response.data, dict):
+        fhir = {
+            'fhir_bundle_type': response.data.get('type', None),
+            'fhir_resource_id': response.data.get('id', None),
+            'fhir_resource_type': response.data.get('resourceType', None),
+            'fhir_attribute_count': len(response.data),
+            'fhir_entry_count': len(response.data['entry']) if response.data.get('entry', False) else None,
+        }
+
+    content = None
+    if getattr(request, 'method', None) == 'POST' and getattr(response, 'content', False):
+        post = getattr(request, 'POST', None)
+        if post is not None and post.get('grant_type') == 'refresh_token':
+            content = response.content
+
+    return ResponseSummary(status_code, location, size, cache, fhir, content)
+
+
+def snapshot_request(request):
+    """
+    A shallow copy of ``request`` to build its log line from on another thread, with the auth flow items
+    of the session in place of the session, which is saved and may change after the response.
+    """
+    # Parsed here, the copy shares the request's stream
+    getattr(request, 'POST', None)
+    snapshot = copy.copy(request)
+    if getattr(request, 'session', False) and is_path_part_of_auth_flow_trace(request.path):
+        snapshot.session = get_session_auth_flow_trace(request)
+    else:
+        snapshot.session = {}
+    return snapshot
+
 
 class RequestResponseLog(object):
     """Audit log message to JSON string
@@ -48,6 +144,7 @@ class RequestResponseLog(object):
         - end_time = Unix Epoch format time of the response processed.
         - fhir_attribute_count = FHIR payload number of top level object attributes.
         - fhir_bundle_type = FHIR payload 'type'.
+        - fhir_cache = FHIR response cache HIT or MISS, for resource types that are cached.
         - fhir_entry_count = FHIR entry count in response.
         - fhir_id = Bene patient id.
         - fhir_resource_id = FHIR payload 'id'.
@@ -119,9 +216,11 @@ class RequestResponseLog(object):
     request = None
     response = None
 
-    def __init__(self, req, resp):
+    def __init__(self, req, resp, end_dt=None):
         self.request = req
+        # The response or its ResponseSummary
         self.response = resp
+        self.end_dt = end_dt
         """
         Init log message. NOTE: These values set to empty for backward Splunk dashboard compatibility.
         The convention for newly added items is to set empty values to None.
@@ -193,9 +292,10 @@ class RequestResponseLog(object):
         """
         --- Logging custom items ---
         """
+        end_dt = self.end_dt or datetime.datetime.utcnow()
         self.log_msg['start_time'] = self.request._logging_start_dt.timestamp()
-        self.log_msg['end_time'] = datetime.datetime.utcnow().timestamp()
-        self.log_msg['elapsed'] = datetime.datetime.utcnow().timestamp() - self.request._logging_start_dt.timestamp()
+        self.log_msg['end_time'] = end_dt.timestamp()
+        self.log_msg['elapsed'] = end_dt.timestamp() - self.request._logging_start_dt.timestamp()
         self.log_msg['ip_addr'] = get_ip_from_request(self.request)
         self.log_msg['request_uuid'] = str(self.request._logging_uuid)
 
@@ -242,7 +342,7 @@ class RequestResponseLog(object):
 
                 if self.log_msg.get('req_client_id', False):
                     try:
-                        application = get_application_model().objects.get(client_id=self.log_msg.get('req_client_id'))
+                        application = application_registry.get(self.log_msg.get('req_client_id'))
                         self._log_msg_update_from_object(application, 'req_app_name', 'name')
                         self._log_msg_update_from_object(application, 'req_app_id', 'id')
                     except ObjectDoesNotExist:
@@ -321,9 +421,7 @@ class RequestResponseLog(object):
 
             if self.log_msg.get('req_qparam_client_id', False):
                 try:
-                    application = get_application_model().objects.get(
-                        client_id=self.log_msg.get('req_qparam_client_id')
-                    )
+                    application = application_registry.get(self.log_msg.get('req_qparam_client_id'))
                     self._log_msg_update_from_object(application, 'req_app_name', 'name')
                     self._log_msg_update_from_object(application, 'req_app_id', 'id')
                 except ObjectDoesNotExist:
@@ -354,62 +452,56 @@ class RequestResponseLog(object):
         """
         access_token = getattr(self.request, 'auth', get_access_token_from_request(self.request))
 
-        if access_token:
-            try:
-                at = AccessToken.objects.get(token=access_token)
-
-                self.log_msg['access_token_hash'] = hashlib.sha256(str(access_token).encode('utf-8')).hexdigest()
-                self.log_msg['access_token_scopes'] = ' '.join([s for s in at.scopes])
-                self._log_msg_update_from_object(at, 'access_token_id', 'id')
-
-                self._log_msg_update_from_object(at.application, 'app_name', 'name')
-                self._log_msg_update_from_object(at.application, 'app_id', 'id')
-                self._log_msg_update_from_object(
-                    at.application,
-                    'app_require_demographic_scopes',
-                    'require_demographic_scopes',
-                )
-                self._log_msg_update_from_object(at.application.user, 'dev_id', 'id')
-                self._log_msg_update_from_object(at.application.user, 'dev_name', 'username')
+        context = get_auth_context(self.request, access_token)
+        if context is not None:
+            at = context.token
 
-                self._log_msg_update_from_object(at.user, 'user_id', 'id')
-                self._log_msg_update_from_object(at.user, 'user_username', 'username')
-            except ObjectDoesNotExist:
-                pass
+            self.log_msg['access_token_hash'] = hashlib.sha256(str(access_token).encode('utf-8')).hexdigest()
+            self.log_msg['access_token_scopes'] = ' '.join([s for s in context.scopes])
+            self._log_msg_update_from_object(at, 'access_token_id', 'id')
+
+            self._log_msg_update_from_object(context.application, 'app_name', 'name')
+            self._log_msg_update_from_object(context.application, 'app_id', 'id')
+            self._log_msg_update_from_object(
+                context.application,
+                'app_require_demographic_scopes',
+                'require_demographic_scopes',
+            )
+            self._log_msg_update_from_object(context.developer, 'dev_id', 'id')
+            self._log_msg_update_from_object(context.developer, 'dev_name', 'username')
+
+            self._log_msg_update_from_object(context.beneficiary, 'user_id', 'id')
+            self._log_msg_update_from_object(context.beneficiary, 'user_username', 'username')
 
         """
         --- Logging items from response ---
         """
-        self.log_msg['response_code'] = getattr(self.response, 'status_code', 0)
-        if self.log_msg['response_code'] in (300, 301, 302, 307):
-            self.log_msg['location'] = self.response.get('Location', '?')
-        elif getattr(self.response, 'content', False):
-            self.log_msg['size'] = len(self.response.content)
+        response = self.response
+        if not isinstance(response, ResponseSummary):
+            response = summarize_response(self.request, response)
+        self.log_msg['response_code'] = response.status_code
+        self.log_msg['location'] = response.location
+        self.log_msg['size'] = response.size
+        if response.cache is not None:
+            self.log_msg['fhir_cache'] = response.cache
 
         """
         --- Logging items from a FHIR type response ---
         """
-        if isinstance(self.response, Response) and isinstance(self.response.data, dict):
-            self.log_msg['fhir_bundle_type'] = self.response.data.get('type', None)
-            self.log_msg['fhir_resource_id'] = self.response.data.get('id', None)
-            self.log_msg['fhir_resource_type'] = self.response.data.get('resourceType', None)
-            self.log_msg['fhir_attribute_count'] = len(self.response.data)
-            if self.response.data.get('entry', False):
-                self.log_msg['fhir_entry_count'] = len(self.response.data.get('entry'))
-            else:
-                self.log_msg['fhir_entry_count'] = None
+        if response.fhir is not None:
+            self.log_msg.update(response.fhir)
 
         """
         --- Logging items from response content (refresh_token)
         """
         if (
-            getattr(self.response, 'content', False)
+            response.content
             and self.log_msg.get('req_post_grant_type', False)
             and self.log_msg.get('request_method', False)
         ):
             if self.log_msg['req_post_grant_type'] == 'refresh_token' and self.log_msg['request_method'] == 'POST':
                 try:
-                    response_content = json.loads(self.response.content)
+                    response_content = json.loads(response.content)
                 except json.decoder.JSONDecodeError:
                     response_content = {}  # Set to empty DICT
 
@@ -476,6 +568,10 @@ class RequestTimeLoggingMiddleware(MiddlewareMixin):
         audit.info(RequestResponseLog(request, response).to_dict())
         request._logging_pass += 1
 
+    @staticmethod
+    def write_message(request, response, end_dt, created):
+        audit.info_at(created, RequestResponseLog(request, response, end_dt).to_dict())
+
     def process_request(self, request):
         """
         --- Get request (pre-response) logging items
@@ -504,5 +600,31 @@ class RequestTimeLoggingMiddleware(MiddlewareMixin):
                 pass
 
     def process_response(self, request, response):
-        self.log_message(request, response)
+        if getattr(response, 'streaming', False):
+            # Logged once the body has been sent, with its size
+            response.streaming_content = StreamedContent(
+                response.streaming_content, partial(self.log_streamed_response, request, response)
+            )
+        else:
+            self.log_response(request, response)
         return response
+
+    def log_streamed_response(self, request, response, size):
+        response.streamed_size = size
+        self.log_response(request, response)
+
+    def log_response(self, request, response):
+        if settings.AUDIT_LOG_QUEUE_SIZE <= 0:
+            self.log_message(request, response)
+            return
+
+        # Only what the line needs from the request and response is taken here, the line is built and
+        # written by the audit log writer's thread
+        audit_writer.submit(
+            self.write_message,
+            snapshot_request(request),
+            summarize_response(request, response),
+            datetime.datetime.utcnow(),
+            time.time(),
+        )
+        request._logging_pass += 1
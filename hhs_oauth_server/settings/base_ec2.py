@@ -34,6 +34,9 @@ from hhs_oauth_server.utils import bool_env, int_env
 # Remove this slash as it is unnecessary. If this pattern is targeted in an
 # include(), ensure the include() pattern has a trailing '/'.
 SILENCED_SYSTEM_CHECKS = ['urls.W002']
+# axes.W002 looks for axes.middleware.AxesMiddleware itself, the subclass in
+# hhs_oauth_server.middleware is installed instead
+SILENCED_SYSTEM_CHECKS += ['axes.W002']
 #
 # If we use APPEND_SLASH, it also suppresses the warnings, but it also
 # changes Django's behavior. For example,
@@ -234,6 +237,11 @@ REST_FRAMEWORK = {
         # "token": os.environ.get("TOKEN_THROTTLE_RATE", "100000/s"),
     },
 }
+# Where token rate limits are kept, see apps/dot_ext/throttling.py. SharedMemoryStore limits each host
+# separately and needs THROTTLE_SHARED_MEMORY_PATH, a file only the server's user can write to.
+THROTTLE_STORE = env('THROTTLE_STORE', 'apps.dot_ext.throttling.CacheStore')
+THROTTLE_SHARED_MEMORY_PATH = env('THROTTLE_SHARED_MEMORY_PATH', None)
+THROTTLE_CACHE = env('THROTTLE_CACHE', 'default')
 
 # Failed Login Attempt Module: AXES
 # Either integer or timedelta.
@@ -259,16 +267,16 @@ MIDDLEWARE = [
     'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'hhs_oauth_server.middleware.SecurityHeadersMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'hhs_oauth_server.middleware.SessionMiddleware',
     'hhs_oauth_server.request_logging.RequestTimeLoggingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     # Must be before CommonMiddleware but after SessionMiddleware
-    'django.middleware.locale.LocaleMiddleware',
+    'hhs_oauth_server.middleware.LocaleMiddleware',
     # Middleware that can send a response must be below this line
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'hhs_oauth_server.middleware.CsrfViewMiddleware',
+    'hhs_oauth_server.middleware.AuthenticationMiddleware',
+    'hhs_oauth_server.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'apps.dot_ext.throttling.ThrottleMiddleware',
     'waffle.middleware.WaffleMiddleware',
@@ -278,8 +286,11 @@ MIDDLEWARE = [
     # on failed user authentication attempts from login views.
     # If you do not want Axes to override the authentication response
     # you can skip installing the middleware and use your own views.
-    'axes.middleware.AxesMiddleware',
+    'hhs_oauth_server.middleware.AxesMiddleware',
 ]
+# Requests the session, locale, CSRF, authentication, messages and axes middleware are skipped for,
+# the bearer token API calls. An empty value runs them for every request. See hhs_oauth_server/middleware.py
+API_FAST_PATH_PATTERN = env('API_FAST_PATH_PATTERN', r'^/v[123]/(fhir/|connect/userinfo)')
 
 # Security headers (previously set by nginx, now via Django SecurityMiddleware)
 SECURE_HSTS_SECONDS = 31536000
@@ -341,6 +352,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'hhs_oauth_server.wsgi.application'
 
+# CACHE_BACKEND=apps.core.cache.TwoTierCache keeps hot keys in process in front of the
+# shared cache, see apps/core/cache.py
 CACHES = {
     'default': {
         'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
@@ -418,6 +431,13 @@ EMAIL_SSL_CERTFILE = env('DJANGO_EMAIL_SSL_CERTFILE', None)
 # Option for local development to pretty print/format JSON logging
 LOG_JSON_FORMAT_PRETTY = env('DJANGO_LOG_JSON_FORMAT_PRETTY', False)
 
+# Audit log lines of requests are built and written by a background thread, through a queue of this size,
+# 0 to write them on the request thread. When the queue is full, 'inline' writes the line on the request
+# thread and 'drop' drops it.
+AUDIT_LOG_QUEUE_SIZE = int_env(env('DJANGO_AUDIT_LOG_QUEUE_SIZE', 10000))
+AUDIT_LOG_BATCH_SIZE = int_env(env('DJANGO_AUDIT_LOG_BATCH_SIZE', 100))
+AUDIT_LOG_OVERFLOW = env('DJANGO_AUDIT_LOG_OVERFLOW', 'inline')
+
 
 LOG_DIR = '/var/log/pyapps'
 READ_ONLY_FS = False
@@ -723,6 +743,50 @@ FHIR_SERVER = {
     'CERT_FILE': os.path.join(FHIR_CLIENT_CERTSTORE, env('FHIR_CERT_FILE', 'ca.cert.pem')),
     'KEY_FILE': os.path.join(FHIR_CLIENT_CERTSTORE, env('FHIR_KEY_FILE', 'ca.key.nocrypt.pem')),
     'CLIENT_AUTH': True,
+    # Keep-alive connection pool used for every BFD call, see apps/fhir/server/client.py
+    'POOL_MAXSIZE': int_env(env('FHIR_POOL_MAXSIZE', 10)),
+    'POOL_IDLE_TIMEOUT': int_env(env('FHIR_POOL_IDLE_TIMEOUT', 60)),
+    'POOL_MAX_AGE': int_env(env('FHIR_POOL_MAX_AGE', 300)),
+    # Only enable when served through hhs_oauth_server.asgi, see apps/fhir/bluebutton/views/asynchronous.py
+    'ASYNC_VIEWS': bool_env(env('FHIR_ASYNC_VIEWS', False)),
+    'ASYNC_MAX_CONNECTIONS': int_env(env('FHIR_ASYNC_MAX_CONNECTIONS', 1000)),
+    # Stream BFD responses through the read and search views, see apps/fhir/bluebutton/streaming.py
+    'STREAM_RESPONSES': bool_env(env('FHIR_STREAM_RESPONSES', False)),
+    # Per beneficiary BFD response cache, 0 disables it for a resource type, see apps/fhir/bluebutton/cache.py
+    'RESPONSE_CACHE_TTL': {
+        'Patient': int_env(env('FHIR_CACHE_TTL_PATIENT', 0)),
+        'Coverage': int_env(env('FHIR_CACHE_TTL_COVERAGE', 0)),
+        'ExplanationOfBenefit': int_env(env('FHIR_CACHE_TTL_EOB', 0)),
+    },
+    'RESPONSE_CACHE_MAX_BYTES': int_env(env('FHIR_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    # Coalesce identical concurrent BFD requests, see apps/fhir/server/singleflight.py
+    'COALESCE_REQUESTS': bool_env(env('FHIR_COALESCE_REQUESTS', False)),
+    'COALESCE_CACHE': env('FHIR_COALESCE_CACHE', None),
+    # Rebuild the /metadata CapabilityStatement after this many seconds, 0 disables it, see apps/fhir/bluebutton/capability.py
+    'CAPABILITY_REFRESH_INTERVAL': int_env(env('FHIR_CAPABILITY_REFRESH_INTERVAL', 60 * 60)),
+    # Circuit breakers and adaptive timeouts for BFD calls, see apps/fhir/server/breaker.py
+    'CIRCUIT_BREAKER': bool_env(env('FHIR_CIRCUIT_BREAKER', False)),
+    'BREAKER_WINDOW': int_env(env('FHIR_BREAKER_WINDOW', 30)),
+    'BREAKER_MIN_CALLS': int_env(env('FHIR_BREAKER_MIN_CALLS', 20)),
+    'BREAKER_ERROR_PERCENT': int_env(env('FHIR_BREAKER_ERROR_PERCENT', 50)),
+    'BREAKER_SLOW_CALL': int_env(env('FHIR_BREAKER_SLOW_CALL', 10)),
+    'BREAKER_OPEN_TIME': int_env(env('FHIR_BREAKER_OPEN_TIME', 30)),
+    'ADAPTIVE_TIMEOUT': bool_env(env('FHIR_ADAPTIVE_TIMEOUT', False)),
+    'ADAPTIVE_TIMEOUT_MIN': int_env(env('FHIR_ADAPTIVE_TIMEOUT_MIN', 2)),
+    # Write Application.last_active in bulk every this many seconds, see apps/fhir/bluebutton/activity.py
+    'APP_ACTIVITY_FLUSH_INTERVAL': int_env(env('FHIR_APP_ACTIVITY_FLUSH_INTERVAL', 0)),
+    # Patient/$export jobs, see apps/fhir/bluebutton/export.py. EXPORT_STORAGE is an alias of STORAGES
+    'EXPORT_WORKERS': int_env(env('FHIR_EXPORT_WORKERS', 2)),
+    'EXPORT_PARALLELISM': int_env(env('FHIR_EXPORT_PARALLELISM', 4)),
+    'EXPORT_PAGE_SIZE': int_env(env('FHIR_EXPORT_PAGE_SIZE', 50)),
+    'EXPORT_STORAGE': env('FHIR_EXPORT_STORAGE', None),
+    'EXPORT_ROOT': env('FHIR_EXPORT_ROOT', None),
+    'EXPORT_RETRY_AFTER': int_env(env('FHIR_EXPORT_RETRY_AFTER', 5)),
+    'EXPORT_RETENTION': int_env(env('FHIR_EXPORT_RETENTION', 24 * 60 * 60)),
+    'EXPORT_JOB_TIMEOUT': int_env(env('FHIR_EXPORT_JOB_TIMEOUT', 60 * 60)),
+    # POST /v3/fhir/ batch Bundles, see apps/fhir/bluebutton/views/batch.py
+    'BATCH_MAX_ENTRIES': int_env(env('FHIR_BATCH_MAX_ENTRIES', 10)),
+    'BATCH_CONCURRENCY': int_env(env('FHIR_BATCH_CONCURRENCY', 4)),
 }
 
 # The mock FHIR endpoint is a hostname used in many tests. It was previously a host
@@ -66,16 +66,16 @@ AUTH_PASSWORD_VALIDATORS = [
 MIDDLEWARE = [
     # Middleware that adds headers to the response
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'hhs_oauth_server.middleware.SessionMiddleware',
     'hhs_oauth_server.request_logging.RequestTimeLoggingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     # Must be before CommonMiddleware but after SessionMiddleware
-    'django.middleware.locale.LocaleMiddleware',
+    'hhs_oauth_server.middleware.LocaleMiddleware',
     # Middleware that can send a response must be below this line
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'hhs_oauth_server.middleware.CsrfViewMiddleware',
+    'hhs_oauth_server.middleware.AuthenticationMiddleware',
+    'hhs_oauth_server.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'apps.dot_ext.throttling.ThrottleMiddleware',
     'waffle.middleware.WaffleMiddleware',
@@ -85,8 +85,11 @@ MIDDLEWARE = [
     # on failed user authentication attempts from login views.
     # If you do not want Axes to override the authentication response
     # you can skip installing the middleware and use your own views.
-    'axes.middleware.AxesMiddleware',
+    'hhs_oauth_server.middleware.AxesMiddleware',
 ]
+# Requests the session, locale, CSRF, authentication, messages and axes middleware are skipped for,
+# the bearer token API calls. An empty value runs them for every request. See hhs_oauth_server/middleware.py
+API_FAST_PATH_PATTERN = env('API_FAST_PATH_PATTERN', default=r'^/v[123]/(fhir/|connect/userinfo)')
 
 TEMPLATES = [
     {
@@ -180,6 +183,8 @@ ROOT_URLCONF = 'hhs_oauth_server.urls'
 
 WSGI_APPLICATION = 'hhs_oauth_server.wsgi.application'
 
+# CACHE_BACKEND=apps.core.cache.TwoTierCache keeps hot keys in process in front of the
+# shared cache, see apps/core/cache.py
 CACHES = {
     'default': {
         'BACKEND': env('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
@@ -357,6 +362,9 @@ DEBUG = env.bool('DEBUG', default=False)
 # Remove this slash as it is unnecessary. If this pattern is targeted in an
 # include(), ensure the include() pattern has a trailing '/'.
 SILENCED_SYSTEM_CHECKS = ['urls.W002']
+# axes.W002 looks for axes.middleware.AxesMiddleware itself, the subclass in
+# hhs_oauth_server.middleware is installed instead
+SILENCED_SYSTEM_CHECKS += ['axes.W002']
 #
 # If we use APPEND_SLASH, it also suppresses the warnings, but it also
 # changes Django's behavior. For example,
@@ -407,6 +415,11 @@ REST_FRAMEWORK = {
         'token': env('TOKEN_THROTTLE_RATE', default='100000/s'),
     },
 }
+# Where token rate limits are kept, see apps/dot_ext/throttling.py. SharedMemoryStore limits each host
+# separately and needs THROTTLE_SHARED_MEMORY_PATH, a file only the server's user can write to.
+THROTTLE_STORE = env('THROTTLE_STORE', default='apps.dot_ext.throttling.CacheStore')
+THROTTLE_SHARED_MEMORY_PATH = env('THROTTLE_SHARED_MEMORY_PATH', default=None)
+THROTTLE_CACHE = env('THROTTLE_CACHE', default='default')
 
 # CORS settings
 # In local development we default to allowing all origins for convenience.
@@ -469,6 +482,13 @@ if env('OPTIONAL_INSTALLED_APPS', default=False):
 # Option for local development to pretty print/format JSON logging
 LOG_JSON_FORMAT_PRETTY = env.bool('DJANGO_LOG_JSON_FORMAT_PRETTY', default=False)
 
+# Audit log lines of requests are built and written by a background thread, through a queue of this size,
+# 0 to write them on the request thread. When the queue is full, 'inline' writes the line on the request
+# thread and 'drop' drops it.
+AUDIT_LOG_QUEUE_SIZE = env.int('DJANGO_AUDIT_LOG_QUEUE_SIZE', default=10000)
+AUDIT_LOG_BATCH_SIZE = env.int('DJANGO_AUDIT_LOG_BATCH_SIZE', default=100)
+AUDIT_LOG_OVERFLOW = env('DJANGO_AUDIT_LOG_OVERFLOW', default='inline')
+
 # Set the theme
 THEME = THEMES[THEME_SELECTED]
 
@@ -525,6 +545,50 @@ FHIR_SERVER = {
     'CERT_FILE': os.path.join(FHIR_CLIENT_CERTSTORE, env('FHIR_CERT_FILE', default='ca.cert.pem')),
     'KEY_FILE': os.path.join(FHIR_CLIENT_CERTSTORE, env('FHIR_KEY_FILE', default='ca.key.nocrypt.pem')),
     'CLIENT_AUTH': True,
+    # Keep-alive connection pool used for every BFD call, see apps/fhir/server/client.py
+    'POOL_MAXSIZE': env.int('FHIR_POOL_MAXSIZE', default=10),
+    'POOL_IDLE_TIMEOUT': env.int('FHIR_POOL_IDLE_TIMEOUT', default=60),
+    'POOL_MAX_AGE': env.int('FHIR_POOL_MAX_AGE', default=300),
+    # Only enable when served through hhs_oauth_server.asgi, see apps/fhir/bluebutton/views/asynchronous.py
+    'ASYNC_VIEWS': env.bool('FHIR_ASYNC_VIEWS', default=False),
+    'ASYNC_MAX_CONNECTIONS': env.int('FHIR_ASYNC_MAX_CONNECTIONS', default=1000),
+    # Stream BFD responses through the read and search views, see apps/fhir/bluebutton/streaming.py
+    'STREAM_RESPONSES': env.bool('FHIR_STREAM_RESPONSES', default=False),
+    # Per beneficiary BFD response cache, 0 disables it for a resource type, see apps/fhir/bluebutton/cache.py
+    'RESPONSE_CACHE_TTL': {
+        'Patient': env.int('FHIR_CACHE_TTL_PATIENT', default=0),
+        'Coverage': env.int('FHIR_CACHE_TTL_COVERAGE', default=0),
+        'ExplanationOfBenefit': env.int('FHIR_CACHE_TTL_EOB', default=0),
+    },
+    'RESPONSE_CACHE_MAX_BYTES': env.int('FHIR_CACHE_MAX_BYTES', default=64 * 1024 * 1024),
+    # Coalesce identical concurrent BFD requests, see apps/fhir/server/singleflight.py
+    'COALESCE_REQUESTS': env.bool('FHIR_COALESCE_REQUESTS', default=False),
+    'COALESCE_CACHE': env('FHIR_COALESCE_CACHE', default=None),
+    # Rebuild the /metadata CapabilityStatement after this many seconds, 0 disables it, see apps/fhir/bluebutton/capability.py
+    'CAPABILITY_REFRESH_INTERVAL': env.int('FHIR_CAPABILITY_REFRESH_INTERVAL', default=60 * 60),
+    # Circuit breakers and adaptive timeouts for BFD calls, see apps/fhir/server/breaker.py
+    'CIRCUIT_BREAKER': env.bool('FHIR_CIRCUIT_BREAKER', default=False),
+    'BREAKER_WINDOW': env.int('FHIR_BREAKER_WINDOW', default=30),
+    'BREAKER_MIN_CALLS': env.int('FHIR_BREAKER_MIN_CALLS', default=20),
+    'BREAKER_ERROR_PERCENT': env.int('FHIR_BREAKER_ERROR_PERCENT', default=50),
+    'BREAKER_SLOW_CALL': env.int('FHIR_BREAKER_SLOW_CALL', default=10),
+    'BREAKER_OPEN_TIME': env.int('FHIR_BREAKER_OPEN_TIME', default=30),
+    'ADAPTIVE_TIMEOUT': env.bool('FHIR_ADAPTIVE_TIMEOUT', default=False),
+    'ADAPTIVE_TIMEOUT_MIN': env.int('FHIR_ADAPTIVE_TIMEOUT_MIN', default=2),
+    # Write Application.last_active in bulk every this many seconds, see apps/fhir/bluebutton/activity.py
+    'APP_ACTIVITY_FLUSH_INTERVAL': env.int('FHIR_APP_ACTIVITY_FLUSH_INTERVAL', default=0),
+    # Patient/$export jobs, see apps/fhir/bluebutton/export.py. EXPORT_STORAGE is an alias of STORAGES
+    'EXPORT_WORKERS': env.int('FHIR_EXPORT_WORKERS', default=2),
+    'EXPORT_PARALLELISM': env.int('FHIR_EXPORT_PARALLELISM', default=4),
+    'EXPORT_PAGE_SIZE': env.int('FHIR_EXPORT_PAGE_SIZE', default=50),
+    'EXPORT_STORAGE': env('FHIR_EXPORT_STORAGE', default=None),
+    'EXPORT_ROOT': env('FHIR_EXPORT_ROOT', default=None),
+    'EXPORT_RETRY_AFTER': env.int('FHIR_EXPORT_RETRY_AFTER', default=5),
+    'EXPORT_RETENTION': env.int('FHIR_EXPORT_RETENTION', default=24 * 60 * 60),
+    'EXPORT_JOB_TIMEOUT': env.int('FHIR_EXPORT_JOB_TIMEOUT', default=60 * 60),
+    # POST /v3/fhir/ batch Bundles, see apps/fhir/bluebutton/views/batch.py
+    'BATCH_MAX_ENTRIES': env.int('FHIR_BATCH_MAX_ENTRIES', default=10),
+    'BATCH_CONCURRENCY': env.int('FHIR_BATCH_CONCURRENCY', default=4),
 }
 
 # The mock FHIR endpoint is a hostname used in many tests. It was previously a host
@@ -74,6 +74,9 @@ AUTH_PASSWORD_VALIDATORS = [
 # http required in ALLOWED_REDIRECT_URI_SCHEMES for tests to function correctly
 APPLICATION_TITLE = 'Blue Button API TEST'
 
+# Write audit log lines on the request thread, where the tests read them
+AUDIT_LOG_QUEUE_SIZE = 0
+
 
 LOGGING = {
     'version': 1,
@@ -0,0 +1,96 @@
+"""
+Time per address in normalize_address for the parser before AddressNormalizer, loaded from git, against
+AddressNormalizer with no cache, with its caches warm, and normalize_addresses over a batch.
+
+    python scripts/benchmarks/address_normalization.py --passes 5 --batch 5000
+
+The addresses are those of apps/dot_ext/tests/address_normalization_golden.json. The batch draws --batch
+of them at random, the way an offline job would see the same addresses again. Each run checks that both
+parsers format every address the same.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from apps.dot_ext.parser import AddressNormalizer  # noqa: E402
+
+GOLDEN_FILE = os.path.join(ROOT, 'apps', 'dot_ext', 'tests', 'address_normalization_golden.json')
+PARSER = 'apps/dot_ext/parser.py'
+
+
+def git(*args):
+    return subprocess.run(['git', *args], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+
+
+def load_baseline(rev):
+    """The parser module as of ``rev``, by default the commit before AddressNormalizer was added"""
+    if rev is None:
+        added = git('log', '--format=%H', '-S', 'class AddressNormalizer', '--', PARSER).split()
+        rev = f'{added[-1]}^' if added else 'HEAD'
+    module = types.ModuleType('apps.dot_ext.baseline_parser')
+    module.__package__ = 'apps.dot_ext'
+    exec(compile(git('show', f'{rev}:{PARSER}'), f'{rev}:{PARSER}', 'exec'), module.__dict__)
+    return rev, module
+
+
+def measure(normalize, addresses, passes):
+    start = time.perf_counter()
+    for _ in range(passes):
+        results = [normalize(address) for address in addresses]
+    return (time.perf_counter() - start) / (passes * len(addresses)), results
+
+
+def main(args):
+    with open(GOLDEN_FILE, encoding='utf-8') as f:
+        addresses = [case['input'] for case in json.load(f)]
+    rev, baseline = load_baseline(args.baseline)
+
+    old, old_results = measure(baseline.normalize_address, addresses, args.passes)
+    uncached, new_results = measure(AddressNormalizer(cache_size=0).normalize, addresses, args.passes)
+    if old_results != new_results:
+        sys.exit('The parsers format the addresses differently')
+    normalizer = AddressNormalizer()
+    list(normalizer.normalize_many(addresses))
+    warm, _ = measure(normalizer.normalize, addresses, args.passes)
+
+    batch = random.Random(0).choices(addresses, k=args.batch)
+    start = time.perf_counter()
+    for address in batch:
+        baseline.normalize_address(address)
+    old_batch = (time.perf_counter() - start) / len(batch)
+    normalizer = AddressNormalizer()
+    start = time.perf_counter()
+    list(normalizer.normalize_many(batch))
+    new_batch = (time.perf_counter() - start) / len(batch)
+
+    print(f'{len(addresses)} addresses, baseline parser from {rev}')
+    print(f'{"normalize_address":<24} {"per address":>12}')
+    print(f'{"baseline":<24} {old * 1e6:>10.0f}us')
+    print(f'{"no cache":<24} {uncached * 1e6:>10.0f}us  ({old / uncached:.1f}x)')
+    print(f'{"cache warm":<24} {warm * 1e6:>10.0f}us  ({old / warm:.0f}x)')
+    print(f'{"batch of " + str(len(batch)):<24} {"":>12}')
+    print(f'{"baseline":<24} {old_batch * 1e6:>10.0f}us')
+    print(f'{"normalize_addresses":<24} {new_batch * 1e6:>10.0f}us  ({old_batch / new_batch:.0f}x)')
+    print(f'cache: {normalizer.cache_info()}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare normalize_address before and after AddressNormalizer')
+    parser.add_argument('--passes', type=int, default=5, help='passes over the addresses timed per way')
+    parser.add_argument('--batch', type=int, default=5000, help='addresses in the batch')
+    parser.add_argument('--baseline', help='git revision of the parser to compare against')
+    main(parser.parse_args())
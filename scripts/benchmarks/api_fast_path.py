@@ -0,0 +1,96 @@
+"""
+Time per request spent in the middleware for a bearer token API call, with the browser-only middleware
+run for it (API_FAST_PATH_PATTERN empty) and skipped (the default pattern), through the full MIDDLEWARE
+of the settings and a view that does no work.
+
+    python scripts/benchmarks/api_fast_path.py --iterations 5000
+
+Each mode is timed for a client without cookies and for one that sends the cookies of a logged in
+browser session, kept in a throwaway in-memory SQLite database.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+os.environ.setdefault('DD_TRACE_ENABLED', 'false')
+
+import django
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import Client, RequestFactory, override_settings  # noqa: E402
+from django.urls import re_path  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+PATH = '/v2/fhir/Patient/-20140000008325'
+
+
+class NoopView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        # What FhirDataView keeps for the request
+        request.version = 2
+        return HttpResponse('{}', content_type='application/json')
+
+
+urlpatterns = [re_path(r'^v2/fhir/', NoopView.as_view())]
+
+
+def start_response(status, headers):
+    pass
+
+
+def measure(handler, environ, iterations):
+    for _ in range(min(iterations, 100)):
+        handler(dict(environ), start_response)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        handler(dict(environ), start_response)
+    return (time.perf_counter() - start) / iterations
+
+
+def main(args):
+    old_config = connection.creation.create_test_db(verbosity=0)
+    try:
+        with override_settings(ROOT_URLCONF=__name__, DEBUG=False):
+            client = Client()
+            client.force_login(User.objects.create_user('benchmark'))
+            cookie = '; '.join(f'{key}={morsel.value}' for key, morsel in client.cookies.items())
+
+            handler = WSGIHandler()
+            factory = RequestFactory()
+            environs = {
+                'no cookies': factory._base_environ(PATH_INFO=PATH, HTTP_AUTHORIZATION='Bearer benchmark'),
+                'session cookie': factory._base_environ(
+                    PATH_INFO=PATH, HTTP_AUTHORIZATION='Bearer benchmark', HTTP_COOKIE=cookie
+                ),
+            }
+
+            print(f'{len(settings.MIDDLEWARE)} middleware\n')
+            print(f'{"client":<16} {"all middleware":>15} {"fast path":>10} {"saved":>9}')
+            for name, environ in environs.items():
+                with override_settings(API_FAST_PATH_PATTERN=''):
+                    before = measure(handler, environ, args.iterations)
+                after = measure(handler, environ, args.iterations)
+                print(f'{name:<16} {before * 1e6:>13.0f}us {after * 1e6:>8.0f}us {(before - after) * 1e6:>7.0f}us')
+    finally:
+        connection.creation.destroy_test_db(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare the middleware time of API calls with and without the fast path'
+    )
+    parser.add_argument('--iterations', type=int, default=5000, help='requests timed per mode')
+    main(parser.parse_args())
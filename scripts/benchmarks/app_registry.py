@@ -0,0 +1,81 @@
+"""
+Time and queries per lookup of a request's application by its client_id, with Application.objects.get as
+get_application_from_data and the request audit log used to do, against get_application_snapshot_from_data
+with application_registry cold (cleared before each lookup) and warm.
+
+    python scripts/benchmarks/app_registry.py --calls 2000
+
+Runs against a test database created for the run, on the database of the test settings.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from apps.dot_ext.app_registry import application_registry  # noqa: E402
+from apps.dot_ext.models import Application  # noqa: E402
+from apps.dot_ext.utils import get_application_snapshot_from_data  # noqa: E402
+
+
+def old_lookup(request):
+    return Application.objects.get(client_id=request.POST['client_id'])
+
+
+def measure(lookup, before_call, request, calls):
+    with CaptureQueriesContext(connection) as queries:
+        elapsed = 0
+        for _ in range(calls):
+            before_call()
+            start = time.perf_counter()
+            lookup(request)
+            elapsed += time.perf_counter() - start
+    return elapsed / calls, len(queries) / calls
+
+
+def main(args):
+    old_config = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user('dev', password='123456')
+        app = Application.objects.create(
+            name='Benchmark App',
+            user=user,
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE,
+        )
+        request = RequestFactory().post('/v2/o/introspect/', {'client_id': app.client_id})
+
+        old, old_queries = measure(old_lookup, lambda: None, request, args.calls)
+        cold, cold_queries = measure(
+            get_application_snapshot_from_data, application_registry.clear, request, args.calls
+        )
+        application_registry.clear()
+        warm, warm_queries = measure(get_application_snapshot_from_data, lambda: None, request, args.calls)
+
+        print(f'{"application lookup":<24} {"per call":>10} {"queries":>8}')
+        print(f'{"Application.objects.get":<24} {old * 1e6:>8.0f}us {old_queries:>8.2f}')
+        print(f'{"registry, cold":<24} {cold * 1e6:>8.0f}us {cold_queries:>8.2f}')
+        print(f'{"registry, warm":<24} {warm * 1e6:>8.0f}us {warm_queries:>8.2f}  ({old / warm:.0f}x)')
+        print(f'registry: {application_registry.stats()}')
+    finally:
+        connection.creation.destroy_test_db(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare loading the application of each call with application_registry'
+    )
+    parser.add_argument('--calls', type=int, default=2000, help='lookups timed per way')
+    main(parser.parse_args())
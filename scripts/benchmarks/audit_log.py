@@ -0,0 +1,102 @@
+"""
+Time per request spent on the request thread by RequestTimeLoggingMiddleware.process_response, with the
+audit log line built and written there (AUDIT_LOG_QUEUE_SIZE=0) against the snapshot handed to the
+background writer, for a bearer token FHIR read that also names its client_id.
+
+    python scripts/benchmarks/audit_log.py --iterations 2000
+
+The token and application are kept in a throwaway in-memory SQLite database, the lines are written to
+a NullHandler. The writer's counts are printed after its queue is flushed.
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+os.environ.setdefault('DD_TRACE_ENABLED', 'false')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from oauth2_provider.models import AccessToken  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+
+from apps.dot_ext.models import Application  # noqa: E402
+from apps.logging.background import audit_writer  # noqa: E402
+from apps.logging.request_logger import AUDIT_HHS_AUTH_SERVER_REQ_LOGGER  # noqa: E402
+from hhs_oauth_server.request_logging import RequestTimeLoggingMiddleware  # noqa: E402
+
+PATH = '/v2/fhir/Patient/-20140000008325'
+
+
+def make_response():
+    response = Response({'resourceType': 'Patient', 'id': '-20140000008325', 'name': [{'family': 'Doe'}]})
+    response.content = b'{"resourceType": "Patient", "id": "-20140000008325", "name": [{"family": "Doe"}]}'
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def measure(middleware, client_id, iterations):
+    factory = RequestFactory()
+    response = make_response()
+    elapsed = 0
+    for _ in range(iterations):
+        request = factory.get(PATH, {'client_id': client_id}, HTTP_AUTHORIZATION='Bearer benchmark')
+        request.user = User()
+        middleware.process_request(request)
+        start = time.perf_counter()
+        middleware.process_response(request, response)
+        elapsed += time.perf_counter() - start
+    return elapsed / iterations
+
+
+def main(args):
+    old_config = connection.creation.create_test_db(verbosity=0)
+    audit = logging.getLogger(AUDIT_HHS_AUTH_SERVER_REQ_LOGGER)
+    audit.handlers, audit.propagate = [logging.NullHandler()], False
+    try:
+        developer = User.objects.create_user('developer')
+        beneficiary = User.objects.create_user('beneficiary')
+        application = Application.objects.create(
+            name='Benchmark', user=developer, client_type='confidential', authorization_grant_type='authorization-code'
+        )
+        AccessToken.objects.create(
+            token='benchmark',
+            user=beneficiary,
+            application=application,
+            scope='patient/Patient.read',
+            expires=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1),
+        )
+
+        middleware = RequestTimeLoggingMiddleware(lambda request: None)
+        sync = measure(middleware, application.client_id, args.iterations)
+        with override_settings(AUDIT_LOG_QUEUE_SIZE=args.queue_size, AUDIT_LOG_BATCH_SIZE=args.batch_size):
+            queued = measure(middleware, application.client_id, args.iterations)
+            start = time.perf_counter()
+            audit_writer.flush()
+            drain = time.perf_counter() - start
+
+        print(f'{"request thread":<16} {"per request":>12}')
+        print(f'{"sync":<16} {sync * 1e6:>10.0f}us')
+        print(f'{"queued":<16} {queued * 1e6:>10.0f}us  ({sync / queued:.1f}x)')
+        print(f'\nflush after the last request: {drain * 1000:.0f}ms')
+        print(f'writer: {audit_writer.stats()}')
+    finally:
+        connection.creation.destroy_test_db(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare audit log lines written on and off the request thread')
+    parser.add_argument('--iterations', type=int, default=2000, help='requests timed per mode')
+    parser.add_argument('--queue-size', type=int, default=10000, help='AUDIT_LOG_QUEUE_SIZE of the queued mode')
+    parser.add_argument('--batch-size', type=int, default=100, help='AUDIT_LOG_BATCH_SIZE of the queued mode')
+    main(parser.parse_args())
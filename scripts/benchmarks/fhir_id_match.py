@@ -0,0 +1,137 @@
+"""
+Time to match a beneficiary's v2 and v3 FHIR ids at login, with match_fhir_id run for one version
+after the other, as __get_and_update_user used to, against _match_fhir_ids, with a slow local BFD stub.
+
+    python scripts/benchmarks/fhir_id_match.py --delay 0.1 --logins 20
+
+With --mbi-miss the stub finds no one by MBI, so the v2 lookup also searches by hicn_hash. Each run
+checks that both ways match the same ids and write the same match_fhir_id log lines.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+os.environ.setdefault('DD_TRACE_ENABLED', 'false')
+
+MBI = '1S00EU7JH82'
+HICN_HASH = 'f7dd6b126d55a6c49f05987f4aab450deae3f990dcb5697875fd83cc61583948'
+
+
+class BFDStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.1
+    mbi_miss = False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        identifier = parse_qs(body.decode())['identifier'][0]
+        time.sleep(self.delay)
+        if self.mbi_miss and identifier.endswith(MBI):
+            bundle = {'resourceType': 'Bundle', 'type': 'searchset', 'total': 0}
+        else:
+            fhir_id = '-30250000008325' if self.path.startswith('/v3/') else '-20140000008325'
+            patient = {'resourceType': 'Patient', 'id': fhir_id, 'name': [{'family': 'Doe', 'given': ['Jane']}]}
+            bundle = {'resourceType': 'Bundle', 'type': 'searchset', 'total': 1, 'entry': [{'resource': patient}]}
+        content = json.dumps(bundle).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/fhir+json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+stub = ThreadingHTTPServer(('127.0.0.1', 0), BFDStub)
+threading.Thread(target=stub.serve_forever, daemon=True).start()
+os.environ['FHIR_URL'] = os.environ['FHIR_URL_V3'] = f'http://127.0.0.1:{stub.server_address[1]}'
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.contrib.sessions.backends.cache import SessionStore  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from waffle.models import Switch  # noqa: E402
+
+from apps.fhir.server.authentication import match_fhir_id  # noqa: E402
+from apps.logging.request_logger import AUDIT_AUTHN_MATCH_FHIR_ID_LOGGER  # noqa: E402
+from apps.mymedicare_cb.models import _match_fhir_ids  # noqa: E402
+from apps.versions import Versions  # noqa: E402
+
+
+class Lines(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+def one_by_one(mbi, hicn_hash, request):
+    return {
+        version: match_fhir_id(mbi=mbi, hicn_hash=hicn_hash, request=request, version=version)
+        for version in Versions.latest_versions()
+    }
+
+
+def at_once(mbi, hicn_hash, request):
+    return _match_fhir_ids(mbi, hicn_hash, request)[0]
+
+
+def measure(match, logins, lines):
+    elapsed = []
+    for _ in range(logins):
+        request = RequestFactory().get('/mymedicare/sls-callback')
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        request.session['version'] = Versions.V2
+        start = time.perf_counter()
+        results = match(MBI, HICN_HASH, request)
+        elapsed.append(time.perf_counter() - start)
+    del lines[: -len(Versions.latest_versions())]
+    return sum(elapsed) / logins, results, [(line['bfd_version'], line['hash_lookup_mesg']) for line in lines]
+
+
+def main(args):
+    BFDStub.delay, BFDStub.mbi_miss = args.delay, args.mbi_miss
+    old_config = connection.creation.create_test_db(verbosity=0)
+    handler = Lines()
+    audit = logging.getLogger(AUDIT_AUTHN_MATCH_FHIR_ID_LOGGER)
+    audit.handlers, audit.propagate = [handler], False
+    try:
+        Switch.objects.create(name='v3_endpoints', active=True)
+        old, old_results, old_lines = measure(one_by_one, args.logins, handler.lines)
+        handler.lines.clear()
+        new, new_results, new_lines = measure(at_once, args.logins, handler.lines)
+        if old_results != new_results or old_lines != new_lines:
+            sys.exit(f'The matches differ: {old_results} {old_lines} against {new_results} {new_lines}')
+
+        print(f'BFD stub at {os.environ["FHIR_URL"]} ({args.delay}s per search)')
+        print(f'{"matching":<12} {"per login":>10}')
+        print(f'{"one by one":<12} {old * 1000:>8.0f}ms')
+        print(f'{"at once":<12} {new * 1000:>8.0f}ms  ({old / new:.1f}x)')
+    finally:
+        connection.creation.destroy_test_db(old_config, verbosity=0)
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare matching the FHIR ids of each version in turn and at once')
+    parser.add_argument('--delay', type=float, default=0.1, help='seconds the stub waits before each response')
+    parser.add_argument('--logins', type=int, default=20, help='logins timed per way')
+    parser.add_argument('--mbi-miss', action='store_true', help='find no one by MBI, so v2 also searches by hicn_hash')
+    main(parser.parse_args())
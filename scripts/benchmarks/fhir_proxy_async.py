@@ -0,0 +1,135 @@
+"""
+Throughput of the sync BFD client (a fixed pool of worker threads, like gunicorn) against the
+async BFD client used by the ASGI FHIR views, with a slow local BFD stub.
+
+    python scripts/benchmarks/fhir_proxy_async.py --delay 0.25 --requests 2000 --threads 4 --concurrency 1000
+
+With --stub-only the stub is left running, so a WSGI and an ASGI deployment can be pointed at it
+(FHIR_URL=http://127.0.0.1:<port>) and compared end to end with locust:
+
+    gunicorn hhs_oauth_server.wsgi:application --workers 1 --threads 4
+    FHIR_ASYNC_VIEWS=True gunicorn hhs_oauth_server.asgi:application -k asgi --workers 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from apps.fhir.server.client import AsyncBFDClient, BFDClient  # noqa: E402
+
+BODY = b'{"resourceType": "Bundle", "type": "searchset", "total": 0, "entry": []}'
+
+
+async def handle_bfd_connection(reader, writer, delay):
+    # Minimal HTTP/1.1 keep-alive server: answer every request with an empty Bundle after `delay` seconds
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            if length:
+                await reader.readexactly(length)
+            await asyncio.sleep(delay)
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/fhir+json\r\nContent-Length: %d\r\n\r\n%s'
+                % (len(BODY), BODY)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_stub(port, delay):
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_bfd_connection(reader, writer, delay), '127.0.0.1', port, backlog=4096
+    )
+    return server, server.sockets[0].getsockname()[1]
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    print(
+        f'{name:<6} {len(latencies):>6} requests in {elapsed:6.2f}s  {len(latencies) / elapsed:8.1f} req/s  '
+        f'p50 {statistics.median(latencies) * 1000:7.1f}ms  p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f}ms'
+    )
+
+
+def prepare(url):
+    return requests.Request('GET', url, params={'_format': 'application/fhir+json'}).prepare()
+
+
+def run_sync(url, total, threads):
+    client = BFDClient(pool_maxsize=threads)
+
+    def call(_):
+        start = time.perf_counter()
+        client.send(prepare(url), timeout=30).raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(call, range(total)))
+    report('sync', time.perf_counter() - start, latencies)
+    client.close()
+
+
+async def run_async(url, total, concurrency):
+    client = AsyncBFDClient(BFDClient(pool_maxsize=concurrency), max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            (await client.send(prepare(url), timeout=30)).raise_for_status()
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(call() for _ in range(total)))
+    report('async', time.perf_counter() - start, latencies)
+    await client.aclose()
+
+
+async def main(args):
+    server, port = await start_stub(args.port, args.delay)
+    url = f'http://127.0.0.1:{port}/v2/fhir/ExplanationOfBenefit/'
+    print(f'BFD stub listening on http://127.0.0.1:{port} ({args.delay}s per response)')
+
+    if args.stub_only:
+        async with server:
+            await server.serve_forever()
+        return
+
+    if not args.skip_sync:
+        await asyncio.get_running_loop().run_in_executor(None, run_sync, url, args.requests, args.threads)
+    await run_async(url, args.requests, args.concurrency)
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the sync and async BFD clients against a slow BFD stub')
+    parser.add_argument('--delay', type=float, default=0.25, help='seconds the stub waits before each response')
+    parser.add_argument('--requests', type=int, default=2000, help='requests sent by each client')
+    parser.add_argument('--threads', type=int, default=4, help='worker threads for the sync client')
+    parser.add_argument('--concurrency', type=int, default=1000, help='in-flight requests for the async client')
+    parser.add_argument('--port', type=int, default=0, help='port for the BFD stub, random by default')
+    parser.add_argument('--skip-sync', action='store_true', help='only run the async client')
+    parser.add_argument('--stub-only', action='store_true', help='only run the BFD stub')
+    asyncio.run(main(parser.parse_args()))
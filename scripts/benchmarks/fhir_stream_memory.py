@@ -0,0 +1,99 @@
+"""
+Peak memory and time per response for the two ways a FHIR view can return a BFD search Bundle:
+decoding the whole body and rendering it again (the default), or passing it through the streaming
+ownership scanner (FHIR_SERVER['STREAM_RESPONSES']).
+
+    python scripts/benchmarks/fhir_stream_memory.py --entries 10 100 1000 --entry-size 20000
+
+The body is fed in network sized chunks from memory, so only the work done by the API is measured.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from apps.authorization.permissions import is_resource_for_patient  # noqa: E402
+from apps.fhir.bluebutton.streaming import STREAM_CHUNK_SIZE, BundleStreamScanner  # noqa: E402
+from apps.fhir.renderers import FHIRRenderer  # noqa: E402
+
+PATIENT_ID = '-20140000008325'
+
+
+def make_bundle(entries, entry_size):
+    eob = {
+        'resourceType': 'ExplanationOfBenefit',
+        'id': 'carrier--10000000000000',
+        'patient': {'reference': f'Patient/{PATIENT_ID}'},
+        'item': [{'sequence': i, 'note': 'x' * 80} for i in range(entry_size // 110)],
+    }
+    bundle = {
+        'resourceType': 'Bundle',
+        'type': 'searchset',
+        'total': entries,
+        'link': [{'relation': 'self', 'url': 'https://bfd.example.gov/v2/fhir/ExplanationOfBenefit/'}],
+        'entry': [{'resource': eob} for _ in range(entries)],
+    }
+    return json.dumps(bundle).encode()
+
+
+def chunks(body):
+    for i in range(0, len(body), STREAM_CHUNK_SIZE):
+        yield body[i : i + STREAM_CHUNK_SIZE]
+
+
+def buffered(body):
+    # r.content, then r.json(), check_object_permissions and the DRF renderer
+    content = b''.join(chunks(body))
+    data = json.loads(content)
+    is_resource_for_patient(data, PATIENT_ID)
+    return len(FHIRRenderer().render(data))
+
+
+def streamed(body):
+    scanner = BundleStreamScanner(lambda obj: is_resource_for_patient(obj, PATIENT_ID))
+    sent = 0
+    for chunk in chunks(body):
+        sent += len(scanner.feed(chunk))
+    return sent + len(scanner.close())
+
+
+def measure(func, body, repeat):
+    tracemalloc.start()
+    func(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(body)
+    return peak, (time.perf_counter() - start) / repeat
+
+
+def main(args):
+    print(f'{"entries":>8} {"body":>10} {"buffered peak":>14} {"streamed peak":>14} {"buffered":>10} {"streamed":>10}')
+    for entries in args.entries:
+        body = make_bundle(entries, args.entry_size)
+        buffered_peak, buffered_time = measure(buffered, body, args.repeat)
+        streamed_peak, streamed_time = measure(streamed, body, args.repeat)
+        print(
+            f'{entries:>8} {len(body) / 2**20:>8.1f}MB {buffered_peak / 2**20:>12.1f}MB {streamed_peak / 2**20:>12.1f}MB '
+            f'{buffered_time * 1000:>8.1f}ms {streamed_time * 1000:>8.1f}ms'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare buffered and streamed FHIR responses')
+    parser.add_argument('--entries', type=int, nargs='+', default=[10, 100, 1000], help='entries per Bundle')
+    parser.add_argument('--entry-size', type=int, default=20000, help='approximate bytes per entry')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per Bundle')
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""
+Time per search Bundle to decode a BFD body and render it again, with DRF's JSON renderer and the
+stdlib decoder against apps.fhir.json_codec (orjson when it is installed), for growing EOB Bundles.
+
+    python scripts/benchmarks/json_codec.py --entries 10 100 1000
+
+The Bundles repeat the ExplanationOfBenefit resources of the v2 EOB search fixture. Each run also
+checks that both paths render the same bytes.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from apps.fhir import json_codec  # noqa: E402
+from apps.fhir.renderers import FHIRRenderer  # noqa: E402
+
+FIXTURE = os.path.join('apps', 'fhir', 'bluebutton', 'tests', 'fhir_resources', 'eob_search_v2.json')
+
+
+def make_bundle(entries):
+    with open(FIXTURE) as f:
+        bundle = json.load(f)
+    resources = [entry['resource'] for entry in bundle['entry']]
+    bundle['entry'] = [{'resource': resources[i % len(resources)]} for i in range(entries)]
+    bundle['total'] = entries
+    return json.dumps(bundle).encode()
+
+
+def stdlib(body):
+    # r.json() and DRF's JSONRenderer
+    return JSONRenderer().render(json.loads(body))
+
+
+def codec(body):
+    return FHIRRenderer().render(json_codec.loads(body))
+
+
+def measure(func, body, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(body)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(args):
+    print(f'orjson: {"installed" if json_codec.orjson is not None else "not installed"}')
+    print(f'{"entries":>8} {"body":>10} {"stdlib":>10} {"codec":>10} {"speedup":>8}')
+    for entries in args.entries:
+        body = make_bundle(entries)
+        if stdlib(body) != codec(body):
+            sys.exit(f'The codec rendered a {entries} entry Bundle differently')
+        stdlib_time = measure(stdlib, body, args.repeat)
+        codec_time = measure(codec, body, args.repeat)
+        print(
+            f'{entries:>8} {len(body) / 2**20:>8.1f}MB {stdlib_time * 1000:>8.1f}ms {codec_time * 1000:>8.1f}ms '
+            f'{stdlib_time / codec_time:>7.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the stdlib JSON path with apps.fhir.json_codec')
+    parser.add_argument('--entries', type=int, nargs='+', default=[10, 100, 1000], help='entries per Bundle')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per Bundle')
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""
+Time per client_credentials token call to get the signing keys of its two JWTs and verify them, with a
+PyJWKClient made for each JWKS URI on every call, as TokenView.post used to, against jwks_registry cold
+(cleared before each call) and warm, with a local JWKS server for the application and one for the CSP.
+
+    python scripts/benchmarks/jwks_cache.py --delay 0.02 --calls 200
+
+Each key set has --keys RSA keys, the JWTs are signed with the last one.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt import PyJWKClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from apps.dot_ext.jwks import jwks_registry  # noqa: E402
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.server.content)))
+        self.end_headers()
+        self.wfile.write(self.server.content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_jwks_server(name, keys, delay):
+    """A JWKS server of ``keys`` RSA keys, and the last private key"""
+    jwks = []
+    for i in range(keys):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwks.append({**jwk, 'kid': f'{name}-{i}', 'use': 'sig', 'alg': 'RS256'})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), JWKSHandler)
+    server.content, server.delay = json.dumps({'keys': jwks}).encode(), delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}/jwks.json', private_key, jwks[-1]['kid']
+
+
+def verify(token, jwks_client):
+    key = jwks_client.get_signing_key_from_jwt(token)
+    return jwt.decode(token, key, algorithms=['RS256'], options={'verify_aud': False})
+
+
+def measure(get_client, before_call, app, csp, calls):
+    elapsed = 0
+    for _ in range(calls):
+        before_call()
+        tokens = [
+            jwt.encode({'iss': name, 'jti': str(uuid.uuid4())}, private_key, algorithm='RS256', headers={'kid': kid})
+            for name, (uri, private_key, kid) in (('app', app), ('csp', csp))
+        ]
+        start = time.perf_counter()
+        verify(tokens[0], get_client(app[0]))
+        verify(tokens[1], get_client(csp[0]))
+        elapsed += time.perf_counter() - start
+    return elapsed / calls
+
+
+def main(args):
+    app = start_jwks_server('app', args.keys, args.delay)
+    csp = start_jwks_server('csp', args.keys, args.delay)
+
+    old = measure(PyJWKClient, lambda: None, app, csp, args.calls)
+    cold = measure(jwks_registry.get, jwks_registry.clear, app, csp, args.calls)
+    jwks_registry.clear()
+    warm = measure(jwks_registry.get, lambda: None, app, csp, args.calls)
+
+    print(f'JWKS servers answer after {args.delay * 1000:.0f}ms, {args.keys} keys each')
+    print(f'{"signing keys":<24} {"per call":>10}')
+    print(f'{"PyJWKClient per call":<24} {old * 1000:>8.2f}ms')
+    print(f'{"registry, cold":<24} {cold * 1000:>8.2f}ms')
+    print(f'{"registry, warm":<24} {warm * 1000:>8.2f}ms  ({old / warm:.0f}x)')
+    print(f'registry: {jwks_registry.stats()}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare fetching JWKS on every token call with jwks_registry')
+    parser.add_argument('--delay', type=float, default=0.02, help='seconds the JWKS servers wait before answering')
+    parser.add_argument('--calls', type=int, default=200, help='token calls timed per way')
+    parser.add_argument('--keys', type=int, default=3, help='RSA keys in each key set')
+    main(parser.parse_args())
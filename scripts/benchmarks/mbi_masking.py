@@ -0,0 +1,121 @@
+"""
+Time per log record in SensitiveDataFilter.filter for the recursive re.sub(MBI_PATTERN) masking the
+filter used to do against mask_mbi, for the kinds of records the audit and application loggers write.
+
+    python scripts/benchmarks/mbi_masking.py --iterations 2000
+
+The records are a request_response_middleware audit line, a FHIR read audit line with an EOB of the v2
+EOB search fixture in its message, a record with a dict of that EOB as its args, and short messages with
+tuple args, one of them with an MBI. Each run also checks that both mask every record the same.
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from apps.logging.sensitive_logging_filters import MBI_PATTERN, SensitiveDataFilter  # noqa: E402
+
+FIXTURE = os.path.join('apps', 'fhir', 'bluebutton', 'tests', 'fhir_resources', 'eob_search_v2.json')
+
+
+def recursive_mask(value_to_mask):
+    if isinstance(value_to_mask, str):
+        return re.sub(MBI_PATTERN, '***MBI***', value_to_mask, flags=re.VERBOSE)
+    if isinstance(value_to_mask, tuple):
+        return tuple([re.sub(MBI_PATTERN, '***MBI***', str(arg), flags=re.VERBOSE) for arg in value_to_mask])
+    if isinstance(value_to_mask, list):
+        return [re.sub(MBI_PATTERN, '***MBI***', str(arg), flags=re.VERBOSE) for arg in value_to_mask]
+    if isinstance(value_to_mask, dict):
+        for key, value in value_to_mask.items():
+            value_to_mask[key] = recursive_mask(value)
+    return value_to_mask
+
+
+class RecursiveFilter(logging.Filter):
+    def filter(self, record):
+        record.args = recursive_mask(record.args)
+        record.msg = recursive_mask(record.msg)
+        return True
+
+
+def records():
+    with open(FIXTURE) as f:
+        eob = json.load(f)['entry'][0]['resource']
+    request_line = {
+        'type': 'request_response_middleware',
+        'access_token_hash': '0e89820860c342f2c7ec694d144023b10301c2accdd078cb5167a06d0c3d5bcc',
+        'app_id': 12,
+        'app_name': 'TestApp',
+        'dev_id': 7,
+        'dev_name': 'developer@example.com',
+        'location': '',
+        'size': 5210,
+        'start_time': 1760000000.123456,
+        'end_time': 1760000000.234567,
+        'elapsed': 0.111111,
+        'ip_addr': '10.0.1.25',
+        'request_uuid': '3b8f6c4e-9a2b-11f0-8de9-0242ac120002',
+        'req_header_user_agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)',
+        'req_qparam__count': '10',
+        'path': '/v2/fhir/ExplanationOfBenefit/',
+        'request_method': 'GET',
+        'request_scheme': 'https',
+        'fhir_id_v2': '-20140000008325',
+        'access_token_scopes': 'patient/Patient.read patient/Coverage.read patient/ExplanationOfBenefit.read',
+        'response_code': 200,
+        'fhir_bundle_type': 'searchset',
+        'fhir_resource_type': 'Bundle',
+        'fhir_entry_count': 10,
+    }
+    fhir_line = {'type': 'fhir_pre_fetch', 'fhir_id': '-20140000008325', 'resource': eob}
+    return {
+        'request line': (json.dumps(request_line), ()),
+        'FHIR line': (json.dumps(fhir_line), ()),
+        'FHIR dict args': ('%(type)s %(id)s', ({**eob, 'type': 'fhir'},)),
+        'short tuple args': ('Matched beneficiary %s in %s ms', ('-20140000008325', 120)),
+        'short with MBI': ('MBI lookup for %s', ('1EG4-TE5-MK74',)),
+    }
+
+
+def make_record(msg, args):
+    return logging.LogRecord('audit', logging.INFO, __file__, 1, msg, copy.deepcopy(args), None)
+
+
+def measure(log_filter, msg, args, iterations):
+    batch = [make_record(msg, args) for _ in range(iterations)]
+    start = time.perf_counter()
+    for record in batch:
+        log_filter.filter(record)
+    return (time.perf_counter() - start) / iterations
+
+
+def main(args):
+    old_filter, new_filter = RecursiveFilter(), SensitiveDataFilter()
+    print(f'{"record":<18} {"recursive":>10} {"mask_mbi":>10} {"speedup":>8}')
+    for name, (msg, record_args) in records().items():
+        old_record, new_record = make_record(msg, record_args), make_record(msg, record_args)
+        old_filter.filter(old_record)
+        new_filter.filter(new_record)
+        if old_record.getMessage() != new_record.getMessage():
+            sys.exit(f'The {name} record was masked differently')
+        old = measure(old_filter, msg, record_args, args.iterations)
+        new = measure(new_filter, msg, record_args, args.iterations)
+        print(f'{name:<18} {old * 1e6:>8.1f}us {new * 1e6:>8.1f}us {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the recursive MBI masking with mask_mbi')
+    parser.add_argument('--iterations', type=int, default=2000, help='records timed per kind')
+    main(parser.parse_args())
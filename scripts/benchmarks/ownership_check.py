@@ -0,0 +1,105 @@
+"""
+Time per ownership check of a BFD search Bundle for the recursive is_resource_for_patient the FHIR views
+used to call against the single pass validate_ownership, for Bundles of ExplanationOfBenefit, Coverage
+and a nested Bundle.
+
+    python scripts/benchmarks/ownership_check.py --entries 50 --iterations 20000
+
+The EOBs are those of the v2 EOB search fixture.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from rest_framework import exceptions  # noqa: E402
+
+from apps.authorization.ownership import validate_ownership  # noqa: E402
+
+FIXTURE = os.path.join('apps', 'fhir', 'bluebutton', 'tests', 'fhir_resources', 'eob_search_v2.json')
+
+
+def recursive_check(obj, patient_id):
+    try:
+        if obj['resourceType'] == 'Coverage':
+            reference = obj['beneficiary']['reference']
+            reference_id = reference.split('/')[1]
+            if reference_id != patient_id:
+                raise exceptions.NotFound()
+        elif obj['resourceType'] == 'ExplanationOfBenefit':
+            reference = obj['patient']['reference']
+            reference_id = reference.split('/')[1]
+            if reference_id != patient_id:
+                raise exceptions.NotFound()
+        elif obj['resourceType'] == 'Patient':
+            reference_id = obj['id']
+            if reference_id != patient_id:
+                raise exceptions.NotFound()
+        elif obj['resourceType'] == 'Bundle':
+            for entry in obj.get('entry', []):
+                recursive_check(entry['resource'], patient_id)
+        elif obj['resourceType'] == 'AuditEvent':
+            entity = obj.get('entity', [{}])
+            patient_info = entity[0].get('what', {})
+            reference = patient_info.get('reference', '')
+            reference_id = reference.split('/')[1]
+            if reference_id != patient_id:
+                raise exceptions.NotFound()
+        else:
+            raise exceptions.NotFound()
+
+    except exceptions.NotFound:
+        raise
+    except Exception:
+        return False
+    return True
+
+
+def bundles(entries):
+    with open(FIXTURE) as f:
+        eobs = [entry['resource'] for entry in json.load(f)['entry']]
+    patient_id = eobs[0]['patient']['reference'].split('/')[1]
+    coverage = {'resourceType': 'Coverage', 'beneficiary': {'reference': f'Patient/{patient_id}'}}
+
+    def bundle(resources):
+        return {'resourceType': 'Bundle', 'entry': [{'resource': resource} for resource in resources]}
+
+    eob_bundle = bundle(eobs[i % len(eobs)] for i in range(entries))
+    return patient_id, {
+        'ExplanationOfBenefit': eob_bundle,
+        'Coverage': bundle([coverage] * entries),
+        'nested': bundle([eob_bundle, bundle([coverage] * entries)]),
+    }
+
+
+def measure(check, obj, patient_id, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        check(obj, patient_id)
+    return (time.perf_counter() - start) / iterations
+
+
+def main(args):
+    patient_id, cases = bundles(args.entries)
+    print(f'{"Bundle":<22} {"recursive":>10} {"single pass":>12} {"speedup":>8}')
+    for name, obj in cases.items():
+        assert recursive_check(obj, patient_id) and validate_ownership(obj, patient_id).ok
+        old = measure(recursive_check, obj, patient_id, args.iterations)
+        new = measure(validate_ownership, obj, patient_id, args.iterations)
+        print(f'{name:<22} {old * 1e6:>8.1f}us {new * 1e6:>10.1f}us {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the recursive and single pass ownership checks')
+    parser.add_argument('--entries', type=int, default=50, help='entries per Bundle')
+    parser.add_argument('--iterations', type=int, default=20000, help='checks timed per Bundle')
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+"""
+Time and queries per call of the CapabilitiesScopes methods and AuthContext.capabilities, with the
+ProtectedCapability queries they used to make against the in-memory scope catalog, with the real scopes
+from create_blue_button_scopes and applications that each have all of them.
+
+    python scripts/benchmarks/scope_catalog.py --calls 5000 --applications 200
+
+The scopes are loaded in a throwaway in-memory SQLite database, so the old queries are cheaper here than
+against PostgreSQL in a deployment.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from apps.capabilities.catalog import scope_catalog  # noqa: E402
+from apps.capabilities.models import ProtectedCapability  # noqa: E402
+from apps.dot_ext.models import Application  # noqa: E402
+from apps.dot_ext.scopes import CapabilitiesScopes  # noqa: E402
+
+SCOPES = CapabilitiesScopes()
+GRANTED = ['openid', 'profile', 'patient/Patient.rs', 'patient/Coverage.rs', 'patient/ExplanationOfBenefit.rs']
+
+
+def old_smart_scope_contains(original, requested):
+    try:
+        orig_resource, orig_perms = original.rsplit('.', 1)
+        req_resource, req_perms = requested.rsplit('.', 1)
+    except ValueError:
+        return False
+    return orig_resource == req_resource and set(req_perms).issubset(set(orig_perms))
+
+
+OLD = {
+    'get_all_scopes': lambda app: dict(ProtectedCapability.objects.values_list('slug', 'title')),
+    'get_available_scopes': lambda app: list(
+        ProtectedCapability.objects.filter(Q(default=True) | Q(application=app))
+        .values_list('slug', flat=True)
+        .distinct()
+    ),
+    'get_default_scopes': lambda app: list(
+        ProtectedCapability.objects.filter(default=True).values_list('slug', flat=True)
+    ),
+    'AuthContext.capabilities': lambda app: list(
+        ProtectedCapability.objects.filter(application=app.id).values_list('slug', flat=True)
+    ),
+    'is_smart_subscope': lambda app: any(old_smart_scope_contains(orig, 'patient/Coverage.r') for orig in GRANTED),
+}
+
+NEW = {
+    'get_all_scopes': lambda app: SCOPES.get_all_scopes(),
+    'get_available_scopes': lambda app: scope_catalog.available_scopes(app.id),
+    'get_default_scopes': lambda app: scope_catalog.default_scopes(),
+    'AuthContext.capabilities': lambda app: scope_catalog.application_scopes(app.id),
+    'is_smart_subscope': lambda app: SCOPES.is_smart_subscope('patient/Coverage.r', GRANTED),
+}
+
+
+def measure(call, applications, calls):
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for i in range(calls):
+            result = call(applications[i % len(applications)])
+        elapsed = time.perf_counter() - start
+    return elapsed / calls, len(queries) / calls, result
+
+
+def main(args):
+    old_config = connection.creation.create_test_db(verbosity=0)
+    try:
+        call_command('create_blue_button_scopes')
+        capabilities = list(ProtectedCapability.objects.all())
+        user = User.objects.create_user('dev', password='123456')
+        applications = []
+        for i in range(args.applications):
+            application = Application.objects.create(
+                name=f'Benchmark App {i}',
+                user=user,
+                client_type=Application.CLIENT_CONFIDENTIAL,
+                authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE,
+            )
+            application.scope.add(*capabilities)
+            applications.append(application)
+
+        scope_catalog.clear()
+        start = time.perf_counter()
+        scope_catalog.get()
+        print(
+            f'{len(capabilities)} scopes, {args.applications} applications, catalog built in '
+            f'{(time.perf_counter() - start) * 1e3:.1f}ms\n'
+        )
+
+        print(f'{"call":<26} {"queries":>14} {"per call":>10} {"catalog":>10} {"speedup":>8}')
+        for name, old_call in OLD.items():
+            old, old_queries, old_result = measure(old_call, applications, args.calls)
+            new, new_queries, new_result = measure(NEW[name], applications, args.calls)
+            # The old queries had no ordering
+            assert old_result == new_result or sorted(old_result) == sorted(new_result), name
+            print(
+                f'{name:<26} {old_queries:>6.0f} -> {new_queries:<5.0f} {old * 1e6:>8.1f}us {new * 1e6:>8.2f}us '
+                f'{old / new:>7.0f}x'
+            )
+        print(f'\ncatalog: {scope_catalog.stats()}')
+    finally:
+        connection.creation.destroy_test_db(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the per-call scope queries with the scope catalog')
+    parser.add_argument('--calls', type=int, default=5000, help='calls timed per way')
+    parser.add_argument('--applications', type=int, default=200, help='applications the calls are made for')
+    main(parser.parse_args())
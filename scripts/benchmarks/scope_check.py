@@ -0,0 +1,91 @@
+"""
+Time per TokenHasProtectedCapability check for the per-request lookup it used to make (a query for the
+token's ProtectedCapability rows, then every pattern tried in turn) against the in-memory scope route
+index, with the real scopes from create_blue_button_scopes.
+
+    python scripts/benchmarks/scope_check.py --iterations 20000
+
+The scopes are loaded in a throwaway in-memory SQLite database, so the old check's query is cheaper here
+than against PostgreSQL in a deployment.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hhs_oauth_server.settings.test')
+
+import django
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from apps.capabilities.index import scope_routes  # noqa: E402
+from apps.capabilities.models import ProtectedCapability  # noqa: E402
+
+REQUESTS = [
+    ('GET', '/v2/fhir/Patient/-20140000008325'),
+    ('GET', '/v2/fhir/ExplanationOfBenefit/'),
+    ('GET', '/v3/fhir/Coverage/part-a--20140000008325'),
+    ('GET', '/v2/connect/userinfo'),
+    # Denied, every pattern of every scope is tried
+    ('POST', '/v2/fhir/Patient/'),
+]
+
+
+def per_request_check(scopes, method, path):
+    protected_resources = list(
+        ProtectedCapability.objects.filter(slug__in=scopes).values_list('protected_resources', flat=True).all()
+    )
+    for protected_resource in protected_resources:
+        for resource in json.loads(protected_resource):
+            if len(resource) != 2:
+                continue
+            allowed_method, allowed_path = resource
+            if allowed_method != method:
+                continue
+            if allowed_path == path or re.fullmatch(allowed_path, path) is not None:
+                return True
+    return False
+
+
+def index_check(scopes, method, path):
+    return scope_routes.allows(scopes, method, path)
+
+
+def measure(check, scopes, method, path, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = check(scopes, method, path)
+    return (time.perf_counter() - start) / iterations, result
+
+
+def main(args):
+    old_config = connection.creation.create_test_db(verbosity=0)
+    try:
+        call_command('create_blue_button_scopes')
+        scopes = list(ProtectedCapability.objects.values_list('slug', flat=True))
+        print(f'{len(scopes)} scopes on the token\n')
+        print(f'{"request":<50} {"allowed":>8} {"per request":>12} {"index":>10} {"speedup":>8}')
+        for method, path in REQUESTS:
+            old, old_result = measure(per_request_check, scopes, method, path, args.iterations)
+            new, new_result = measure(index_check, scopes, method, path, args.iterations)
+            assert old_result == new_result, (method, path)
+            print(
+                f'{method + " " + path:<50} {str(new_result):>8} {old * 1e6:>10.1f}us {new * 1e6:>8.2f}us '
+                f'{old / new:>7.0f}x'
+            )
+    finally:
+        connection.creation.destroy_test_db(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the per-request and indexed scope checks')
+    parser.add_argument('--iterations', type=int, default=20000, help='checks timed per request')
+    main(parser.parse_args())